@@ -3,16 +3,18 @@ Email Agent using LangGraph
 Implements a workflow for email processing: classifier → prioritizer → responder
 """
 import os
+import time
 import logging
+import threading
 from typing import Dict, Any, List, Optional, Tuple
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 from pydantic import BaseModel, Field
-from services.embedding_store import EmbeddingStore
+from services.email_metadata import EmailFilter, sender_address
+from services.openai_scheduler import openai_scheduler, estimate_text_tokens, Priority
 
 # Load environment variables
 load_dotenv()
@@ -21,11 +23,74 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL_NAME", "gpt-4o"))
+# The OpenAI client and the embedding store are created on first use (or by warmup()), not at
+# import time: the embedding store connects to the vector database and may create its index
+_llm = None
+_embedding_store = None
+_init_lock = threading.Lock()
 
-# Initialize embedding store for memory-aware responses
-embedding_store = EmbeddingStore(provider=os.getenv("VECTOR_DB_PROVIDER", "pinecone"))
+def get_llm():
+    """
+    Returns the shared chat model, creating it on first use.
+    """
+    global _llm
+    if _llm is None:
+        with _init_lock:
+            if _llm is None:
+                from langchain_openai import ChatOpenAI
+                # Retries are handled by the shared scheduler
+                _llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL_NAME", "gpt-4o"), max_retries=0)
+    return _llm
+
+def get_embedding_store():
+    """
+    Returns the shared embedding store for memory-aware responses, connecting on first use.
+    """
+    global _embedding_store
+    if _embedding_store is None:
+        with _init_lock:
+            if _embedding_store is None:
+                from services.embedding_store import EmbeddingStore
+                _embedding_store = EmbeddingStore(provider=os.getenv("VECTOR_DB_PROVIDER", "pinecone"))
+    return _embedding_store
+
+def warmup() -> Dict[str, float]:
+    """
+    Creates the chat model and connects the embedding store ahead of the first email.
+
+    Call from worker start-up so connection and index set-up time is paid before
+    taking traffic rather than by the first request.
+
+    Returns:
+        Dict[str, float]: Seconds spent initializing each component
+    """
+    timings = {}
+    for name, init in (("llm", get_llm), ("embedding_store", get_embedding_store)):
+        started = time.perf_counter()
+        init()
+        timings[name] = time.perf_counter() - started
+    logger.info("Email agent warmed up in " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+    return timings
+
+def shutdown():
+    """
+    Closes the embedding store if it was created, persisting pending local memory changes.
+
+    Call from worker shutdown; the store is not created just to be closed.
+    """
+    if _embedding_store is not None:
+        _embedding_store.close()
+
+def __getattr__(name: str):
+    # Keeps `email_agent.llm` and `email_agent.embedding_store` working for existing callers
+    if name == "llm":
+        return get_llm()
+    if name == "embedding_store":
+        return get_embedding_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Memory retrieval looks at the sender's emails from this many days first (0 disables the filter)
+MEMORY_SENDER_WINDOW_DAYS = int(os.getenv("MEMORY_SENDER_WINDOW_DAYS", "90"))
 
 # Define state schema
 class EmailAgentState(BaseModel):
@@ -37,6 +102,18 @@ class EmailAgentState(BaseModel):
     response: Optional[str] = Field(default=None, description="Generated response")
     similar_emails: Optional[List[Dict[str, Any]]] = Field(default=None, description="Similar past emails")
     error: Optional[str] = Field(default=None, description="Error message if any")
+    priority_lane: Priority = Field(default=Priority.INTERACTIVE, description="OpenAI scheduling lane for this run")
+
+def invoke_chain(chain, inputs: Dict[str, Any], priority_lane: Priority) -> Any:
+    """
+    Invokes a LangChain chain through the shared OpenAI scheduler.
+    """
+    return openai_scheduler.submit(
+        chain.invoke,
+        inputs,
+        priority=priority_lane,
+        estimated_tokens=estimate_text_tokens(str(inputs)) + 1024
+    )
 
 # Define the classification node
 def classify_email(state: EmailAgentState) -> EmailAgentState:
@@ -71,12 +148,12 @@ def classify_email(state: EmailAgentState) -> EmailAgentState:
     
     # Parse the classification
     try:
-        chain = classification_prompt | llm | JsonOutputParser()
-        classification = chain.invoke({
+        chain = classification_prompt | get_llm() | JsonOutputParser()
+        classification = invoke_chain(chain, {
             "subject": email_subject,
             "sender": email_sender,
             "content": email_content
-        })
+        }, state.priority_lane)
         
         # Log classification results
         logger.info(f"Email classified as {classification.get('category')} with urgency {classification.get('urgency')}")
@@ -128,15 +205,15 @@ def prioritize_email(state: EmailAgentState) -> EmailAgentState:
     
     # Parse the prioritization
     try:
-        chain = priority_prompt | llm | JsonOutputParser()
-        priority = chain.invoke({
+        chain = priority_prompt | get_llm() | JsonOutputParser()
+        priority = invoke_chain(chain, {
             "subject": email_subject,
             "sender": email_sender,
             "category": category,
             "urgency": urgency,
             "contains_question": state.classification.get("contains_question", False),
             "action_items": state.classification.get("action_items", [])
-        })
+        }, state.priority_lane)
         
         # Log priority results
         logger.info(f"Email priority: {priority.get('priority_level')} with response timeframe {priority.get('response_timeframe')}")
@@ -153,6 +230,10 @@ def prioritize_email(state: EmailAgentState) -> EmailAgentState:
 def retrieve_similar_emails(state: EmailAgentState) -> EmailAgentState:
     """
     Retrieves similar past emails to provide context for the response.
+
+    Emails from the same sender in the last MEMORY_SENDER_WINDOW_DAYS are searched
+    first, filtered inside the vector database; if none are similar enough, all of
+    the user's emails are searched.
     """
     logger.info(f"Retrieving similar emails for user {state.user_id}")
     
@@ -162,14 +243,28 @@ def retrieve_similar_emails(state: EmailAgentState) -> EmailAgentState:
     # Combine subject and content for better similarity matching
     query = f"{email_subject} {email_content}"
     
+    sender = sender_address(state.email.get("sender", ""))
+    
     try:
-        # Query the embedding store
-        similar_emails = embedding_store.query_similar_emails(
-            query=query,
-            user_id=state.user_id,
-            limit=3,
-            score_threshold=0.7
-        )
+        similar_emails = []
+        if sender and MEMORY_SENDER_WINDOW_DAYS > 0:
+            since = datetime.now(timezone.utc) - timedelta(days=MEMORY_SENDER_WINDOW_DAYS)
+            similar_emails = get_embedding_store().query_similar_emails(
+                query=query,
+                user_id=state.user_id,
+                limit=3,
+                score_threshold=0.7,
+                filters=EmailFilter(senders=sender, since=since)
+            )
+        
+        if not similar_emails:
+            # Query the embedding store
+            similar_emails = get_embedding_store().query_similar_emails(
+                query=query,
+                user_id=state.user_id,
+                limit=3,
+                score_threshold=0.7
+            )
         
         # Log results
         logger.info(f"Found {len(similar_emails)} similar emails")
@@ -231,15 +326,15 @@ def generate_response(state: EmailAgentState) -> EmailAgentState:
     
     # Generate the response
     try:
-        chain = response_prompt | llm | StrOutputParser()
-        response = chain.invoke({
+        chain = response_prompt | get_llm() | StrOutputParser()
+        response = invoke_chain(chain, {
             "subject": email_subject,
             "sender": email_sender,
             "content": email_content,
             "classification": state.classification,
             "priority": state.priority,
             "similar_emails_context": similar_emails_context
-        })
+        }, state.priority_lane)
         
         # Log response generation
         logger.info("Response generated successfully")
@@ -249,7 +344,7 @@ def generate_response(state: EmailAgentState) -> EmailAgentState:
         
         # Store the email embedding for future reference
         email_id = state.email.get("email_id", f"email_{datetime.now().timestamp()}")
-        embedding_store.store_email_embedding(
+        get_embedding_store().store_email_embedding(
             email_id=email_id,
             content=email_content,
             metadata={
@@ -325,13 +420,14 @@ def build_email_workflow() -> StateGraph:
 # Create the compiled workflow
 email_workflow = build_email_workflow().compile()
 
-def process_email(email: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+def process_email(email: Dict[str, Any], user_id: str, priority_lane: Priority = Priority.INTERACTIVE) -> Dict[str, Any]:
     """
     Process an email through the LangGraph workflow.
     
     Args:
         email (Dict[str, Any]): The email to process
         user_id (str): ID of the user who owns the email
+        priority_lane (Priority): OpenAI scheduling lane (use BACKGROUND for batch jobs)
         
     Returns:
         Dict[str, Any]: The processing results
@@ -341,7 +437,8 @@ def process_email(email: Dict[str, Any], user_id: str) -> Dict[str, Any]:
     # Initialize the state
     initial_state = EmailAgentState(
         email=email,
-        user_id=user_id
+        user_id=user_id,
+        priority_lane=priority_lane
     )
     
     # Run the workflow
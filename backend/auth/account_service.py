@@ -1,23 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Request
-from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
-from collections import Counter
 from google.cloud import firestore
-from datetime import datetime, timedelta
-from .jwt_handler import decode_access_token
+from auth.current_user import get_current_user
 from utils.gmail_service import GmailService
 from pydantic import BaseModel
-from utils.firestore_client import get_firestore_client
+from utils.firestore_client import get_firestore_client, get_async_firestore_client
+from services.account_dashboard import UserNotFound, build_dashboard, parse_fields
+from services.draft_analytics import DraftAnalytics
+from services.draft_rollups import DraftRollups
+from services.draft_summaries import DEFAULT_PAGE_SIZE, DraftNotFound, get_draft_detail, list_recent_drafts
+from services.response_cache import account_cache, etag_response
 import re
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from services.rate_limits import limiter
 
 account_router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-
-limiter = Limiter(key_func=get_remote_address)
 
 class SaveDraftRequest(BaseModel):
     draft_id: str
@@ -34,15 +29,12 @@ def extract_email(email_string):
         # If no angle brackets, assume the whole string is an email
         return email_string.strip()
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = decode_access_token(token)
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        return user_id
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+def read_user_fields(user_id, field_paths):
+    # Reads only the given fields of a user document; raises 404 if the user does not exist
+    user_doc = get_firestore_client().collection("users").document(user_id).get(field_paths=field_paths)
+    if not user_doc.exists:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user_doc.to_dict() or {}
 
 @account_router.delete("/delete-account")
 @limiter.limit("5/hour")
@@ -56,6 +48,7 @@ async def delete_account(request: Request, current_user: str = Depends(get_curre
     
     # Delete the user document
     user_ref.delete()
+    account_cache.invalidate(current_user)
     
     return {"message": "Account deleted successfully"}
 
@@ -90,34 +83,18 @@ async def create_help_ticket(request: Request, name: str = Body(...), email: str
 @account_router.get("/remaining-drafts")
 @limiter.limit("20/minute")
 async def get_remaining_drafts(request: Request, current_user: str = Depends(get_current_user)):
-    db = get_firestore_client()
-    user_ref = db.collection("users").document(current_user)
-    user_doc = user_ref.get()
-
-    if not user_doc.exists:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    user_data = user_doc.to_dict()
-    user_data['id'] = current_user
-
-    remaining_drafts = user_data.get('drafts', 100)
-
-    return {"remaining_drafts": remaining_drafts}
+    body, etag = account_cache.get_or_load(current_user, "remaining-drafts", lambda: {
+        "remaining_drafts": read_user_fields(current_user, ["drafts"]).get("drafts", 100)
+    })
+    return etag_response(request, body, etag)
 
 @account_router.get("/subscription-status")
 @limiter.limit("20/minute")
 async def get_subscription_status(request: Request, current_user: str = Depends(get_current_user)):
-    db = get_firestore_client()
-    user_ref = db.collection("users").document(current_user)
-    user_doc = user_ref.get()
-
-    if not user_doc.exists:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    user_data = user_doc.to_dict()
-    user_data['id'] = current_user
-
-    return {"subscription_status": user_data.get("is_pro", False)}
+    body, etag = account_cache.get_or_load(current_user, "subscription-status", lambda: {
+        "subscription_status": read_user_fields(current_user, ["is_pro"]).get("is_pro", False)
+    })
+    return etag_response(request, body, etag)
 
 @account_router.put("/complete-onboarding")
 @limiter.limit("5/hour")
@@ -127,6 +104,7 @@ async def complete_onboarding(request: Request, responses: dict, current_user: s
     
     # Update the user's onboarding status
     user_ref.update({"onboarding_completed": True, "questions": responses})
+    account_cache.invalidate(current_user)
     
     return {"message": "Onboarding completed successfully"}
 
@@ -138,89 +116,58 @@ async def update_settings(request: Request, settings: dict, current_user: str =
     
     # Update the user's settings
     user_ref.update({"settings": settings})
+    account_cache.invalidate(current_user)
 
     return {"message": "Settings updated successfully"}
 
 @account_router.get("/drafts/count")
 @limiter.limit("20/minute")
 async def count_drafts(request: Request, current_user: str = Depends(get_current_user)):
-    db = get_firestore_client()
-    drafts_count = db.collection("drafts").where("user_id", "==", current_user).count().get()[0][0].value
-    return {"drafts_count": drafts_count}
+    def load():
+        db = get_firestore_client()
+        return {"drafts_count": db.collection("drafts").where("user_id", "==", current_user).count().get()[0][0].value}
+
+    body, etag = account_cache.get_or_load(current_user, "drafts-count", load)
+    return etag_response(request, body, etag)
 
 @account_router.get("/emails/top-senders")
 @limiter.limit("10/hour")
 async def top_senders(request: Request, current_user: str = Depends(get_current_user)):
-    db = get_firestore_client()
-    drafts = db.collection("drafts").where("user_id", "==", current_user).stream()
-    senders = [extract_email(draft.to_dict()['recipient_email']) for draft in drafts]
-    top_5_senders = Counter(senders).most_common(5)
-    return {"top_senders": top_5_senders}
+    analytics = DraftAnalytics(get_firestore_client())
+    return {"top_senders": analytics.top_senders(current_user, 5)}
 
 @account_router.get("/emails/high-priority")
 @limiter.limit("10/hour")
 async def highest_priority(request: Request, current_user: str = Depends(get_current_user)):
-    db = get_firestore_client()
-    drafts = db.collection("drafts").where("user_id", "==", current_user).stream()
-    highest_priority = [{'database_id': draft.id, 'priority': draft.to_dict()['priority'], 'email_subject': draft.to_dict()['email_subject'], 'sender_email': draft.to_dict()['recipient_email']} for draft in drafts if draft.to_dict()['priority'] <= 5]
-    return {"highest_priority": highest_priority}
+    analytics = DraftAnalytics(get_firestore_client())
+    return {"highest_priority": analytics.high_priority(current_user)}
 
 @account_router.get("/drafts/daily-count")
 @limiter.limit("10/hour")
 async def daily_draft_count(request: Request, current_user: str = Depends(get_current_user), days: int = 30):
-    db = get_firestore_client()
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    drafts = db.collection("drafts").where("user_id", "==", current_user).where("date_created", ">=", start_date).stream()
-    
-    daily_counts = Counter(draft.to_dict()['date_created'].date() for draft in drafts)
-    
-    result = [{"date": date.isoformat(), "count": count} for date, count in daily_counts.items()]
-    return {"daily_counts": result}
+    rollups = DraftRollups(get_firestore_client())
+    return {"daily_counts": rollups.daily_counts(current_user, days)}
 
 @account_router.get("/drafts/recent")
 @limiter.limit("20/minute")
-async def recent_drafts(request: Request, current_user: str = Depends(get_current_user)):
+async def recent_drafts(request: Request, current_user: str = Depends(get_current_user), limit: int = DEFAULT_PAGE_SIZE, start_after: str = None):
     db = get_firestore_client()
-    recent_drafts = db.collection("drafts").where("user_id", "==", current_user).order_by("date_created", direction=firestore.Query.DESCENDING).limit(10).stream()
-    
-    user_ref = db.collection("users").document(current_user)
-    user_doc = user_ref.get()
-    if user_doc.exists:
-        user_data = user_doc.to_dict()
-        if user_data.get("is_pro"):
-            result = [{"database_id": draft.id, "gmail_id": draft.to_dict()['gmail_draft_id'], "email_body": draft.to_dict()['email_body'], "recipient_email": draft.to_dict()['recipient_email'], "recipient_subject": draft.to_dict()['email_subject'], "draft_body": draft.to_dict()['draft_body'], "draft_subject": draft.to_dict()['draft_subject'], "date": draft.to_dict()['date_created'], "action_item": draft.to_dict()['action_item'], "priority": draft.to_dict()['priority']} for draft in recent_drafts]
-        else:
-            result = [{"database_id": draft.id, "gmail_id": draft.to_dict()['gmail_draft_id'], "email_body": draft.to_dict()['email_body'], "recipient_email": draft.to_dict()['recipient_email'], "recipient_subject": draft.to_dict()['email_subject'], "draft_body": draft.to_dict()['draft_body'], "draft_subject": draft.to_dict()['draft_subject'], "date": draft.to_dict()['date_created']} for draft in recent_drafts]
-        return {"recent_drafts": result}    
-    else:
+    user_doc = db.collection("users").document(current_user).get(field_paths=["is_pro"])
+    if not user_doc.exists:
         raise HTTPException(status_code=404, detail="User not found")
+    is_pro = bool(user_doc.get("is_pro"))
 
-@account_router.get("/drafts/recent")
-async def recent_drafts(current_user: str = Depends(get_current_user)):
-    db = get_firestore_client()
-    user_ref = db.collection("users").document(current_user)
-
-    recent_drafts = db.collection("drafts").where("user_id", "==", current_user).order_by("date_created", direction=firestore.Query.DESCENDING).limit(10).stream()
-    result = [{"database_id": draft.id, "gmail_id": draft.to_dict()['gmail_draft_id'], "email_body": draft.to_dict()['email_body'], "recipient_email": draft.to_dict()['recipient_email'], "recipient_subject": draft.to_dict()['email_subject'], "draft_body": draft.to_dict()['draft_body'], "draft_subject": draft.to_dict()['draft_subject'], "date": draft.to_dict()['date_created']} for draft in recent_drafts]
+    try:
+        drafts, next_cursor = list_recent_drafts(db, current_user, limit, start_after, include_pro_fields=is_pro)
+    except DraftNotFound:
+        raise HTTPException(status_code=400, detail="Invalid start_after cursor")
+    return {"recent_drafts": [draft.to_dict(is_pro) for draft in drafts], "next_cursor": next_cursor}
 
-    user_doc = user_ref.get()
-    if user_doc.exists:
-        user_data = user_doc.to_dict()
-        if user_data.get("is_pro"):
-            result = [{"database_id": draft.id, "gmail_id": draft.to_dict()['gmail_draft_id'], "email_body": draft.to_dict()['email_body'], "recipient_email": draft.to_dict()['recipient_email'], "recipient_subject": draft.to_dict()['email_subject'], "draft_body": draft.to_dict()['draft_body'], "draft_subject": draft.to_dict()['draft_subject'], "date": draft.to_dict()['date_created'], "action_item": draft.to_dict()['action_item'], "priority": draft.to_dict()['priority']} for draft in recent_drafts]
-        else:
-            result = [{"database_id": draft.id, "gmail_id": draft.to_dict()['gmail_draft_id'], "email_body": draft.to_dict()['email_body'], "recipient_email": draft.to_dict()['recipient_email'], "recipient_subject": draft.to_dict()['email_subject'], "draft_body": draft.to_dict()['draft_body'], "draft_subject": draft.to_dict()['draft_subject'], "date": draft.to_dict()['date_created']} for draft in recent_drafts]
-    return {"recent_drafts": result}
 @account_router.get("/emails/common-topics")
 @limiter.limit("10/hour")
 async def common_topics(request: Request, current_user: str = Depends(get_current_user)):
-    db = get_firestore_client()
-    drafts = db.collection("drafts").where("user_id", "==", current_user).stream()
-    topics = [draft.to_dict()['draft_body_topic'] for draft in drafts if 'draft_body_topic' in draft.to_dict()]
-    top_5_topics = Counter(topics).most_common(5)
-    return {"common_topics": top_5_topics}
+    analytics = DraftAnalytics(get_firestore_client())
+    return {"common_topics": analytics.common_topics(current_user, 5)}
 
 @account_router.post("/emails/send-draft")
 @limiter.limit("30/hour")
@@ -240,6 +187,7 @@ async def send_draft(request: Request, gmail_id: str = Body(...), database_id: s
 
     if result:
         user_ref.update({"messages_sent": firestore.Increment(1)})
+        account_cache.invalidate(current_user)
         return {"message": "Draft sent successfully", "message_id": result['id']}
     else:
         raise HTTPException(status_code=500, detail="Failed to send draft")
@@ -247,36 +195,31 @@ async def send_draft(request: Request, gmail_id: str = Body(...), database_id: s
 @account_router.get("/messages/count")
 @limiter.limit("20/minute")
 async def get_message_count(request: Request, current_user: str = Depends(get_current_user)):
-    db = get_firestore_client()
-    user_ref = db.collection("users").document(current_user)
-    user_doc = user_ref.get()
-
-    if not user_doc.exists:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    messages_sent = user_doc.to_dict().get("messages_sent", 0)
-    return {"user_id": current_user, "messages_sent": messages_sent}
+    body, etag = account_cache.get_or_load(current_user, "messages-count", lambda: {
+        "user_id": current_user,
+        "messages_sent": read_user_fields(current_user, ["messages_sent"]).get("messages_sent", 0)
+    })
+    return etag_response(request, body, etag)
 
 @account_router.get("/drafts/average-words")
 @limiter.limit("10/hour")
 async def get_average_draft_words(request: Request, current_user: str = Depends(get_current_user)):
-    db = get_firestore_client()
-    drafts = db.collection("drafts").where("user_id", "==", current_user).stream()
-
-    total_words = 0
-    draft_count = 0
+    analytics = DraftAnalytics(get_firestore_client())
+    return {"user_id": current_user, "average_words": analytics.average_words(current_user)}
 
-    for draft in drafts:
-        draft_data = draft.to_dict()
-        body = draft_data.get('draft_body', '')
-        total_words += len(body.split())
-        draft_count += 1
-
-    if draft_count == 0:
-        return {"user_id": current_user, "average_words": 0}
+@account_router.get("/dashboard")
+@limiter.limit("20/minute")
+async def dashboard(request: Request, current_user: str = Depends(get_current_user), fields: str = None, days: int = 30, limit: int = DEFAULT_PAGE_SIZE):
+    # Everything the dashboard shows in one round trip; `fields` is a comma-separated subset of DASHBOARD_FIELDS
+    try:
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    average_words = int(total_words / draft_count)
-    return {"user_id": current_user, "average_words": average_words}
+    try:
+        return await build_dashboard(get_async_firestore_client(), current_user, selected, days, limit)
+    except UserNotFound:
+        raise HTTPException(status_code=404, detail="User not found")
 
 @account_router.post("/emails/save-draft")
 @limiter.limit("30/hour")
@@ -302,3 +245,16 @@ async def save_draft(request: Request, database_id: str = Body(...), gmail_id: s
     else:
         raise HTTPException(status_code=500, detail="Failed to save draft")
 
+# Registered last so it does not shadow the fixed /drafts/... routes
+@account_router.get("/drafts/{database_id}")
+@limiter.limit("60/minute")
+async def draft_detail(request: Request, database_id: str, current_user: str = Depends(get_current_user)):
+    db = get_firestore_client()
+    user_doc = db.collection("users").document(current_user).get(field_paths=["is_pro"])
+    if not user_doc.exists:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    try:
+        return {"draft": get_draft_detail(db, current_user, database_id, include_pro_fields=bool(user_doc.get("is_pro")))}
+    except DraftNotFound:
+        raise HTTPException(status_code=404, detail="Draft not found")
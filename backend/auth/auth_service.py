@@ -2,10 +2,11 @@
 from fastapi import APIRouter, HTTPException, Body, Form, Request, Depends
 from typing import Optional
 from pydantic import BaseModel, EmailStr
-from passlib.context import CryptContext
 import datetime
 import secrets
 from utils.firestore_client import get_firestore_client
+from services.password_hasher import password_hasher
+from services.token_store import RESET_PASSWORD, VERIFY_EMAIL, ExpiredToken, InvalidToken, TokenStore
 from utils.email_service import EmailService
 from dependencies import get_email_service
 from google.cloud import firestore
@@ -17,13 +18,10 @@ import datetime
 import os
 import logging
 from google.cloud.firestore_v1.field_path import FieldPath
-from auth.jwt_handler import create_access_token, decode_access_token
-from fastapi.security import OAuth2PasswordBearer
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-
-limiter = Limiter(key_func=get_remote_address)
+from auth.jwt_handler import create_access_token
+from auth.current_user import Principal, get_principal
+from services.response_cache import account_cache, etag_response
+from services.rate_limits import limiter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -31,8 +29,6 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 auth_router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")  # Initialize password hashing
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 class RegisterForm(BaseModel):
     first_name: str
@@ -52,49 +48,27 @@ class WaitlistSignupRequest(BaseModel):
 
 @auth_router.get("/authenticate")
 @limiter.limit("60/minute")
-async def authenticate(request: Request, token: str = Depends(oauth2_scheme)):
-    try:
-        # Decode the JWT
-        payload = decode_access_token(token)
-        
-        if payload is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        # Check if the token has expired
-        exp = payload.get("exp")
-        if exp is None or datetime.datetime.now(datetime.timezone.utc).timestamp() > exp:
-            raise HTTPException(status_code=401, detail="Token has expired")
-        
-        # Get the user ID from the token
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-        
-        # Verify the user exists in the database
-        db = get_firestore_client()
-        user_doc = db.collection("users").document(user_id).get()
-        
+async def authenticate(request: Request, principal: Principal = Depends(get_principal)):
+    # The token is validated (and cached) by get_principal; the account fields are read
+    # through the account cache, so repeated checks skip Firestore until the user changes
+    def load():
+        user_doc = get_firestore_client().collection("users").document(principal.id).get(
+            field_paths=["email", "onboarding_completed", "google_access_token"]
+        )
         if not user_doc.exists:
             raise HTTPException(status_code=401, detail="User not found")
-        
+
         user_data = user_doc.to_dict()
-        
-        # Return user information
         return {
             "message": "Authenticated successfully",
-            "user_id": user_id,
+            "user_id": principal.id,
             "email": user_data.get("email"),
             "is_google_authorized": "google_access_token" in user_data,
             "onboarding_completed": user_data.get("onboarding_completed", False)
         }
-    
-    except HTTPException as he:
-        # Re-raise HTTP exceptions
-        raise he
-    except Exception as e:
-        # Log the error for debugging
-        print(f"Authentication error: {str(e)}")
-        raise HTTPException(status_code=401, detail="Authentication failed")
+
+    body, etag = account_cache.get_or_load(principal.id, "authenticate", load)
+    return etag_response(request, body, etag)
 
 @auth_router.post("/reset-password-request")
 @limiter.limit("5/hour")
@@ -104,31 +78,28 @@ async def reset_password_request(request: Request, email: str = Body(...), email
     user_doc = next(user_ref, None)
     if not user_doc:
         raise HTTPException(status_code=400, detail="User not found")
-    user_data = user_doc.to_dict()
-    reset_password_token = secrets.token_urlsafe(16)
-    user_data['reset_password_token'] = reset_password_token
-    db.collection("users").document(user_doc.id).update(user_data)
+    reset_password_token = TokenStore(db).issue(user_doc.id, RESET_PASSWORD)
 
     reset_password_link = f"https://www.notaic.site/reset-password?token={reset_password_token}"
     email_service.reset_password_email(email, reset_password_link)
-    return {"message": "Password reset email sent", "reset_password_link": reset_password_link}
-    if not user_data:
-        raise HTTPException(status_code=400, detail="User data is empty")
+    return {"message": "Password reset email sent"}
 
 @auth_router.post("/reset-password")
 @limiter.limit("5/hour")
 async def reset_password(request: Request, token: str = Body(...), new_password: str = Body(...)):
     db = get_firestore_client()
-    user_ref = db.collection("users").where("reset_password_token", "==", token).limit(1).stream()
-    user_doc = next(user_ref, None)
-    if not user_doc:
-        raise HTTPException(status_code=400, detail="User not found")
-    user_data = user_doc.to_dict()
-    user_data['password'] = pwd_context.hash(new_password)
-    db.collection("users").document(user_doc.id).update(user_data)
+    try:
+        user_id = TokenStore(db).consume(token, RESET_PASSWORD)
+    except ExpiredToken:
+        raise HTTPException(status_code=400, detail="Reset link has expired")
+    except InvalidToken:
+        raise HTTPException(status_code=400, detail="Invalid or expired reset link")
+
+    db.collection("users").document(user_id).update({
+        "password": await password_hasher.hash(new_password),
+        "updated_at": datetime.datetime.now(datetime.timezone.utc)
+    })
     return {"message": "Password reset successfully"}
-    if not user_data:
-        raise HTTPException(status_code=400, detail="User data is empty")
 
 @auth_router.post("/signin")
 @limiter.limit("10/minute")
@@ -144,8 +115,13 @@ async def signin(request: Request, form_data: SignInForm):
     if not user_data:
         raise HTTPException(status_code=400, detail="User data is empty")
     
-    if not pwd_context.verify(form_data.password, user_data['password']):
+    valid, new_hash = await password_hasher.verify_and_update(form_data.password, user_data['password'])
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
+
+    # Store the password again when it was hashed with an outdated cost
+    if new_hash:
+        user_doc.reference.update({"password": new_hash})
     
     # Create access token
     access_token = create_access_token(
@@ -169,9 +145,7 @@ async def register(request: Request, full_name: str = Body(...), email: str = Bo
     if any(user_ref):
         raise HTTPException(status_code=400, detail="User already exists")
 
-    # Generate a secure verification token
-    verification_token = secrets.token_urlsafe(16)
-    hashed_password = pwd_context.hash(password)  # Hash the password
+    hashed_password = await password_hasher.hash(password)  # Hash the password
 
     # Create user data
     user_data = {
@@ -179,14 +153,15 @@ async def register(request: Request, full_name: str = Body(...), email: str = Bo
         "email": email,
         "password": hashed_password,
         "verification_status": "pending",
-        "verification_token": verification_token,
-        "token_expiry": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=10),
         "created_at": datetime.datetime.now(datetime.timezone.utc),
         "updated_at": datetime.datetime.now(datetime.timezone.utc)
     }
 
     # Store user data in Firestore
     user_id = db.collection("users").add(user_data)[1].id
+
+    # Generate a secure verification token
+    verification_token = TokenStore(db).issue(user_id, VERIFY_EMAIL)
     
     # Generate verification link
     verification_link = f"https://www.notaic.site/verified-email?token={verification_token}"
@@ -208,32 +183,19 @@ async def verify_email(request: Request, token: str):
     try:
         db = get_firestore_client()
         
-        # Find the user document with the matching verification token
-        users = db.collection("users").where("verification_token", "==", token).limit(1).stream()
-        user_doc = next(users, None)
-
-        if not user_doc:
+        # Find the user the verification token was issued for; the token is used up
+        try:
+            user_id = TokenStore(db).consume(token, VERIFY_EMAIL)
+        except ExpiredToken:
+            raise HTTPException(status_code=400, detail="Verification link has expired")
+        except InvalidToken:
             raise HTTPException(status_code=400, detail="Invalid or expired verification token")
 
-        user_data = user_doc.to_dict()
-        if not user_data:
-            raise HTTPException(status_code=400, detail="User data is empty")
-
-        # Add the document ID to the user_data dictionary
-        user_data['id'] = user_doc.id
-
-        # Check if the token has expired
         current_time = datetime.datetime.now(datetime.timezone.utc)
-        token_expiry = user_data['token_expiry'].replace(tzinfo=datetime.timezone.utc)
-        
-        if current_time > token_expiry:
-            raise HTTPException(status_code=400, detail="Verification link has expired")
-        
+
         # Update the user's verification status
-        db.collection("users").document(user_data['id']).update({
+        db.collection("users").document(user_id).update({
             "verification_status": "verified",
-            "verification_token": None,
-            "token_expiry": None,
             "updated_at": current_time,
             "drafts": 100,
             "is_pro": False,
@@ -242,8 +204,11 @@ async def verify_email(request: Request, token: str):
                 "writing_style": "Professional"
             }
         })
+        account_cache.invalidate(user_id)
 
         return {"message": "Email verified. You can now proceed to authenticate with Gmail."}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to verify email: {e}")
         raise HTTPException(status_code=500, detail="Failed to verify email")
@@ -349,14 +314,8 @@ async def resend_verification(request: Request, email: str = Body(...), email_se
     if user_data.get("verification_status") == "verified":
         raise HTTPException(status_code=400, detail="User is already verified")
     
-    # Generate a new verification token
-    verification_token = secrets.token_urlsafe(16)
-    
-    # Update the user document with the new token
-    user_doc.reference.update({
-        "verification_token": verification_token,
-        "token_expiry": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=10)
-    })
+    # Generate a new verification token, revoking the previous one
+    verification_token = TokenStore(db).issue(user_doc.id, VERIFY_EMAIL)
     
     # Generate verification link
     verification_link = f"https://www.notaic.site/verified-email?token={verification_token}"
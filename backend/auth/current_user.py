@@ -0,0 +1,102 @@
+# auth/current_user.py
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
+
+from auth.jwt_handler import decode_access_token
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+# Validated access tokens kept in memory; each entry is dropped at its token's expiry
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+
+
+class Principal:
+    """The authenticated user of a request, built from the access token's claims"""
+
+    __slots__ = ("id", "email", "google_authorized", "expires_at")
+
+    def __init__(self, claims: Dict[str, Any]):
+        self.id = claims["sub"]
+        self.email = claims.get("email")
+        self.google_authorized = bool(claims.get("google_authorized"))
+        self.expires_at = float(claims["exp"])
+
+
+class TokenCache:
+    """LRU of validated tokens; an entry is never served past its token's `exp`"""
+
+    def __init__(self, max_entries: int = AUTH_TOKEN_CACHE_SIZE, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, Principal]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            principal = self._entries.get(token)
+            if principal is None or principal.expires_at <= self.clock():
+                self._entries.pop(token, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return principal
+
+    def put(self, token: str, principal: Principal):
+        with self._lock:
+            self._entries[token] = principal
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache()
+
+
+def validate_token(token: str) -> Principal:
+    """Principal of a valid access token; raises 401 for invalid, expired or subject-less tokens"""
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
+    # jose verifies the signature and rejects expired tokens
+    try:
+        claims = decode_access_token(token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    if claims.get("sub") is None or claims.get("exp") is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+    principal = Principal(claims)
+    token_cache.put(token, principal)
+    return principal
+
+
+def get_principal(request: Request, token: str = Depends(oauth2_scheme)) -> Principal:
+    # Stored on the request so middleware (e.g. request tracking) can see who made it
+    principal = getattr(request.state, "user", None)
+    if principal is None:
+        principal = validate_token(token)
+        request.state.user = principal
+    return principal
+
+
+def get_current_user(principal: Principal = Depends(get_principal)) -> str:
+    # ID of the authenticated user; the token alone is sufficient, Firestore is not read
+    return principal.id
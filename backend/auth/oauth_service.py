@@ -1,35 +1,21 @@
 # auth/oauth_service.py
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.security import OAuth2PasswordBearer
 from starlette.responses import RedirectResponse
 import requests
 import secrets
 from datetime import datetime, timedelta
-from jose import JWTError
 from config.settings import settings
 from utils.firestore_client import get_firestore_client
-from auth.jwt_handler import decode_access_token, create_access_token
+from google.cloud import firestore
+from auth.jwt_handler import create_access_token
+from auth.current_user import get_current_user
+from services.response_cache import account_cache
 from utils.gmail_service import GmailService
 from utils.openai_service import SentEmailProcessor
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from services.rate_limits import limiter
 
-limiter = Limiter(key_func=get_remote_address)
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 oauth_router = APIRouter()
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = decode_access_token(token)
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        return user_id
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-
 @oauth_router.get("/google-auth")
 @limiter.limit("10/minute")
 async def google_auth(request: Request, current_user: str = Depends(get_current_user)):
@@ -75,17 +61,16 @@ async def google_callback(request: Request, code: str, state: str):
         "token_expiry": datetime.utcnow() + timedelta(seconds=token_data['expires_in']),
         "updated_at": datetime.utcnow()
     })
+    account_cache.invalidate(user_id)
 
     # Fetch user data
     user_doc = user_ref.get()
     user_data = user_doc.to_dict()
     user_data['id'] = user_id
 
-    # Create and store the vector index
+    # Create the vector index, or bring an existing one up to date on reconnect
     processor = SentEmailProcessor(user_data)
-    df = processor.collect_sent_emails()
-    index = processor.create_vector_store_index(df)
-    processor.save_index_to_firestore(index)
+    processor.update_vector_store_index()
 
     # Create a new JWT with updated claims
     new_access_token = create_access_token({
@@ -168,6 +153,7 @@ async def revoke_access(request: Request, current_user: str = Depends(get_curren
             "token_expiry": firestore.DELETE_FIELD,
             "updated_at": datetime.utcnow()
         })
+        account_cache.invalidate(current_user)
         return {"message": "Access successfully revoked"}
     else:
         raise HTTPException(status_code=400, detail="Failed to revoke access")
@@ -1,35 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Request
 from pydantic import BaseModel
 from utils.stripe_service import StripeService
-from auth.jwt_handler import decode_access_token
-from fastapi.security import OAuth2PasswordBearer
+from auth.current_user import get_current_user
 from utils.firestore_client import get_firestore_client
 import stripe
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-
-limiter = Limiter(key_func=get_remote_address)
+from services.rate_limits import limiter
 
 subscription_router = APIRouter()
 stripe_service = StripeService()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # Subscription Request Model
 class SubscriptionRequest(BaseModel):
     payment_method_id: str
 
-# Helper function to get the current user from the token
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = decode_access_token(token)
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        return user_id
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-
 @subscription_router.post("/create")
 @limiter.limit("5/hour")
 async def create_subscription(request: Request, subscription_request: SubscriptionRequest, current_user: str = Depends(get_current_user)):
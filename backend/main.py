@@ -8,17 +8,18 @@ from auth.account_service import account_router
 from settings.settings_service import settings_router
 from auth.subscription_service import subscription_router
 from services.monitoring import monitoring_service
+from services.password_hasher import HasherBusy
+from services.mail_queue import mail_queue
+from agents import email_agent
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
+from services.rate_limits import limiter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-limiter = Limiter(key_func=get_remote_address)
-
 app = FastAPI(
     title="Notaic API",
     description="An API for user registration, email verification, OAuth2 authentication, and email automation.",
@@ -28,6 +29,26 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+@app.exception_handler(HasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: HasherBusy):
+    # Shed sign-in load instead of queueing it behind a full hashing pool
+    return JSONResponse(status_code=503, content={"detail": "Too many sign-in requests, please retry"}, headers={"Retry-After": "1"})
+
+@app.on_event("startup")
+def start_mail_queue():
+    # Creating the SES client and reading the send quota block, so do it before serving rather than on the first signup
+    mail_queue.start()
+
+@app.on_event("shutdown")
+def drain_mail_queue():
+    # Verification and reset emails still queued would otherwise be lost with the process
+    mail_queue.shutdown()
+
+@app.on_event("shutdown")
+def close_email_memory():
+    # Snapshots local email memories, so the next start does not replay their whole change logs
+    email_agent.shutdown()
+
 # Allow only https://www.notaic.site
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,154 @@
+"""
+Account Dashboard for Notaic
+Everything the dashboard page shows, read concurrently with the async Firestore client in one request
+"""
+import asyncio
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from services.draft_analytics import DraftAnalytics
+from services.draft_rollups import DraftRollups, counts_in_window, window
+from services.draft_summaries import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, recent_drafts_query, to_page
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# User document field behind each dashboard field
+USER_FIELDS = {
+    "remaining_drafts": "drafts",
+    "messages_sent": "messages_sent",
+    "subscription_status": "is_pro",
+}
+# Analytics document fields behind each dashboard field
+ANALYTICS_FIELDS = {
+    "top_senders": ["senders"],
+    "common_topics": ["topics"],
+    "average_words": ["draft_count", "total_words"],
+    "highest_priority": ["high_priority"],
+}
+DASHBOARD_FIELDS = [
+    "drafts_count", *USER_FIELDS, *ANALYTICS_FIELDS, "daily_counts", "recent_drafts"
+]
+
+
+class UserNotFound(LookupError):
+    """The user document does not exist"""
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """
+    Parse a comma-separated field selection.
+
+    Args:
+        fields (str, optional): e.g. "drafts_count,top_senders"; every field if omitted or empty
+
+    Returns:
+        List[str]: The selected fields
+
+    Raises:
+        ValueError: If a field is not a dashboard field
+    """
+    selected = [field.strip() for field in (fields or "").split(",") if field.strip()]
+    unknown = [field for field in selected if field not in DASHBOARD_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown dashboard fields: {', '.join(unknown)}")
+    return selected or list(DASHBOARD_FIELDS)
+
+
+async def _collect(stream) -> list:
+    return [snapshot async for snapshot in stream]
+
+
+async def build_dashboard(
+    db,
+    user_id: str,
+    fields: Iterable[str] = DASHBOARD_FIELDS,
+    days: int = 30,
+    limit: int = DEFAULT_PAGE_SIZE,
+    today: Optional[date] = None
+) -> Dict[str, Any]:
+    """
+    Read the selected dashboard fields of a user.
+
+    Every read is issued at once: the user document, the analytics document, the
+    rollup year documents, the drafts count aggregation and the first page of recent
+    drafts. Each document is read once however many fields come from it, projected to
+    the fields selected.
+
+    Args:
+        db: Async Firestore client
+        user_id (str): ID of the user
+        fields (Iterable[str]): Dashboard fields to return
+        days (int): Window of the daily counts
+        limit (int): Page size of the recent drafts, capped at MAX_PAGE_SIZE
+        today (date, optional): Last day of the daily counts; the current UTC day if omitted
+
+    Returns:
+        Dict[str, Any]: The selected fields, keyed like the individual endpoints' responses
+            (`recent_drafts` comes with its `next_cursor`)
+
+    Raises:
+        UserNotFound: If the user document does not exist
+    """
+    fields = list(fields)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    # The subscription status decides whether recent drafts show pro fields, so it is always read
+    user_paths = sorted({"is_pro", *(USER_FIELDS[field] for field in fields if field in USER_FIELDS)})
+    analytics_paths = sorted({path for field in fields for path in ANALYTICS_FIELDS.get(field, [])})
+
+    reads = {"user": db.collection("users").document(user_id).get(field_paths=user_paths)}
+    if analytics_paths:
+        reads["analytics"] = DraftAnalytics(db).document(user_id).get(field_paths=analytics_paths)
+    if "drafts_count" in fields:
+        reads["drafts_count"] = db.collection("drafts").where("user_id", "==", user_id).count().get()
+    if "daily_counts" in fields:
+        start, end = window(days, today)
+        rollups = DraftRollups(db)
+        reads["daily_counts"] = asyncio.gather(*(
+            rollups.year_document(user_id, year).get() for year in range(start.year, end.year + 1)
+        ))
+    if "recent_drafts" in fields:
+        # Pro fields are read for everyone and dropped below, so this read need not wait for the user's
+        reads["recent_drafts"] = _collect(
+            recent_drafts_query(db, user_id, include_pro_fields=True).limit(limit + 1).stream()
+        )
+
+    results = dict(zip(reads, await asyncio.gather(*reads.values())))
+
+    user_snapshot = results["user"]
+    if not user_snapshot.exists:
+        raise UserNotFound(user_id)
+    user = user_snapshot.to_dict() or {}
+    stats = {}
+    if "analytics" in results and results["analytics"].exists:
+        stats = results["analytics"].to_dict() or {}
+
+    dashboard: Dict[str, Any] = {}
+    for field in fields:
+        if field == "drafts_count":
+            dashboard[field] = results["drafts_count"][0][0].value
+        elif field == "remaining_drafts":
+            dashboard[field] = user.get("drafts", 100)
+        elif field == "messages_sent":
+            dashboard[field] = user.get("messages_sent", 0)
+        elif field == "subscription_status":
+            dashboard[field] = user.get("is_pro", False)
+        elif field == "top_senders":
+            dashboard[field] = DraftAnalytics.most_common(stats.get("senders"), 5)
+        elif field == "common_topics":
+            dashboard[field] = DraftAnalytics.most_common(stats.get("topics"), 5)
+        elif field == "average_words":
+            dashboard[field] = DraftAnalytics.average(stats)
+        elif field == "highest_priority":
+            dashboard[field] = DraftAnalytics.sorted_high_priority(stats.get("high_priority"))
+        elif field == "daily_counts":
+            dashboard[field] = counts_in_window(results["daily_counts"], start, end)
+        elif field == "recent_drafts":
+            drafts, next_cursor = to_page(results["recent_drafts"], limit)
+            is_pro = bool(user.get("is_pro"))
+            dashboard[field] = [draft.to_dict(is_pro) for draft in drafts]
+            dashboard["next_cursor"] = next_cursor
+    return dashboard
@@ -0,0 +1,348 @@
+"""
+Approximate Nearest-Neighbor Index for Notaic
+HNSW graph index (hnswlib) for large per-user email memories, with tombstone deletes and on-disk persistence
+of the graph and its documents (an append-only change log plus occasional snapshots)
+"""
+import os
+import json
+import base64
+import logging
+import threading
+from typing import Any, Collection, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # pragma: no cover - optional dependency
+    hnswlib = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Graph degree: higher M improves recall on large memories at the cost of memory and insert time
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+# Candidate list size while inserting; higher builds a better graph more slowly
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+# Candidate list size while searching; the main recall/latency knob
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+# Inserts and deletes appended to the change log before a persisted graph is rewritten as a new snapshot
+HNSW_SNAPSHOT_EVERY = int(os.getenv("HNSW_SNAPSHOT_EVERY", "10000"))
+# Filtered searches allowing at most this many documents scan them exactly instead of walking the graph
+HNSW_FILTER_BRUTE_FORCE = int(os.getenv("HNSW_FILTER_BRUTE_FORCE", "2000"))
+
+
+class HNSWIndex:
+    """
+    Cosine similarity search over an HNSW graph.
+
+    Drop-in replacement for `DenseIndex`. Document ids are mapped to integer
+    labels; deleting a document marks its label as a tombstone, which stops it
+    from being returned, and the slot is reused by a later insert.
+
+    With a path, every insert and delete is appended to a change log as it happens
+    (with the vector and the caller's entry in `documents`, e.g. content and
+    metadata), so nothing is lost on a restart. The graph, the id mapping and the
+    documents are rewritten as a snapshot only every `snapshot_every` changes and
+    on `close()`, which keeps the cost of a change independent of the index size.
+    Creating the index loads the snapshot and replays the log written after it.
+    """
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        m: int = HNSW_M,
+        ef_construction: int = HNSW_EF_CONSTRUCTION,
+        ef_search: int = HNSW_EF_SEARCH,
+        initial_capacity: int = 1024,
+        path: Optional[str] = None,
+        snapshot_every: int = HNSW_SNAPSHOT_EVERY
+    ):
+        """
+        Initialize the index.
+
+        Args:
+            dimension (int, optional): Vector dimension; taken from the first vector if omitted
+            m (int): Maximum neighbours per node
+            ef_construction (int): Candidate list size while inserting
+            ef_search (int): Candidate list size while searching (raised to k when smaller)
+            initial_capacity (int): Elements allocated up front; the graph doubles when full
+            path (str, optional): File the graph is persisted to (the id mapping, documents and change log go next to it)
+            snapshot_every (int): Logged changes between snapshots when a path is set (0 snapshots only on close)
+        """
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for the HNSW index (pip install hnswlib)")
+        self.dimension = dimension
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.labels = {}
+        self.ids = {}
+        self.documents: Dict[Hashable, Any] = {}
+        self.next_label = 0
+        self.tombstones = 0
+        self._capacity = initial_capacity
+        self._index = None
+        self.sequence = 0
+        self._unsaved = 0
+        self._log = None
+        self._lock = threading.RLock()
+
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def ids_path(self) -> str:
+        return f"{self.path}.ids.json"
+
+    @property
+    def documents_path(self) -> str:
+        return f"{self.path}.docs.jsonl"
+
+    @property
+    def log_path(self) -> str:
+        return f"{self.path}.log"
+
+    def _create(self, dimension: int):
+        self.dimension = self.dimension or dimension
+        self._index = hnswlib.Index(space="cosine", dim=self.dimension)
+        self._index.init_index(
+            max_elements=self._capacity,
+            ef_construction=self.ef_construction,
+            M=self.m,
+            allow_replace_deleted=True
+        )
+        self._index.set_ef(self.ef_search)
+
+    def set_ef(self, ef_search: int):
+        """Change the search candidate list size"""
+        self.ef_search = ef_search
+        if self._index is not None:
+            self._index.set_ef(ef_search)
+
+    def _append(self, entries: List[Dict[str, Any]]):
+        """Append changes to the log (one JSON line each), snapshotting once enough have accumulated"""
+        if not self.path:
+            return
+        if self._log is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._log = open(self.log_path, "a")
+        lines = []
+        for entry in entries:
+            self.sequence += 1
+            lines.append(json.dumps({"seq": self.sequence, **entry}, default=str))
+        # Flushed to the OS per change: survives a process restart (not fsynced against power loss)
+        self._log.write("\n".join(lines) + "\n")
+        self._log.flush()
+        self._unsaved += len(entries)
+        if self.snapshot_every and self._unsaved >= self.snapshot_every:
+            self.save()
+
+    def add(self, doc_id: Hashable, vector: Sequence[float]):
+        self.add_many([doc_id], [vector])
+
+    def add_many(self, doc_ids: Sequence[Hashable], vectors):
+        """Insert documents in one call, which lets hnswlib build with several threads"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(doc_ids), -1)
+        with self._lock:
+            self._insert(doc_ids, vectors)
+            self._append([
+                {
+                    "op": "add",
+                    "id": doc_id,
+                    "vector": base64.b64encode(vector.tobytes()).decode("ascii"),
+                    "document": self.documents.get(doc_id)
+                }
+                for doc_id, vector in zip(doc_ids, vectors)
+            ])
+
+    def _insert(self, doc_ids: Sequence[Hashable], vectors: np.ndarray):
+        with self._lock:
+            if self._index is None:
+                self._create(vectors.shape[1])
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected a {self.dimension}-dimensional vector, got {vectors.shape[1]}")
+
+            # Re-inserted documents tombstone their old vector first
+            for doc_id in doc_ids:
+                if doc_id in self.labels:
+                    self._delete(doc_id)
+
+            labels = []
+            for doc_id in doc_ids:
+                self.labels[doc_id] = self.next_label
+                self.ids[self.next_label] = doc_id
+                labels.append(self.next_label)
+                self.next_label += 1
+
+            reused = min(self.tombstones, len(labels))
+            needed = self._index.get_current_count() - reused + len(labels)
+            if needed > self._index.get_max_elements():
+                self._index.resize_index(max(needed, self._index.get_max_elements() * 2))
+            # Tombstoned slots are overwritten before the graph grows
+            self._index.add_items(vectors, np.asarray(labels), replace_deleted=self.tombstones > 0)
+            self.tombstones -= reused
+
+    def _delete(self, doc_id: Hashable):
+        label = self.labels.pop(doc_id)
+        del self.ids[label]
+        self._index.mark_deleted(label)
+        self.tombstones += 1
+
+    def remove(self, doc_id: Hashable):
+        with self._lock:
+            if doc_id not in self.labels:
+                return
+            self._delete(doc_id)
+            self._append([{"op": "remove", "id": doc_id}])
+
+    def _exact_search(self, vector: np.ndarray, labels: List[int], limit: int) -> List[Tuple[Hashable, float]]:
+        vectors = np.asarray(self._index.get_items(labels), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        scores = vectors @ (vector / max(np.linalg.norm(vector), 1e-12))
+        top = np.argsort(-scores)[:limit]
+        return [(self.ids[labels[i]], float(scores[i])) for i in top]
+
+    def search(
+        self,
+        vector: Sequence[float],
+        limit: int = 10,
+        allowed: Optional[Collection[Hashable]] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Find the stored vectors most similar to a query vector.
+
+        A small allowed set is scanned exactly; a larger one is applied as a filter
+        during the graph walk, so results are not over-fetched and discarded.
+
+        Args:
+            vector (Sequence[float]): Query vector
+            limit (int): Maximum number of results
+            allowed (Collection[Hashable], optional): Only documents with these ids are returned
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to `limit` document ids with their cosine similarity, best first
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            allowed_labels = None
+            if allowed is not None:
+                allowed_labels = [self.labels[doc_id] for doc_id in allowed if doc_id in self.labels]
+                if len(allowed_labels) <= HNSW_FILTER_BRUTE_FORCE:
+                    return self._exact_search(vector, allowed_labels, limit) if allowed_labels else []
+                allowed_labels = set(allowed_labels)
+
+            limit = min(limit, len(self.labels) if allowed_labels is None else len(allowed_labels))
+            if not limit:
+                return []
+            if limit > self.ef_search:
+                self._index.set_ef(limit)
+            try:
+                if allowed_labels is None:
+                    labels, distances = self._index.knn_query(vector, k=limit)
+                else:
+                    labels, distances = self._index.knn_query(vector, k=limit, filter=allowed_labels.__contains__)
+            except RuntimeError:
+                # The filtered graph walk can strand before finding `limit` matches
+                return self._exact_search(vector, list(allowed_labels or self.ids), limit)
+            finally:
+                if limit > self.ef_search:
+                    self._index.set_ef(self.ef_search)
+            return [(self.ids[int(label)], 1.0 - float(distance)) for label, distance in zip(labels[0], distances[0])]
+
+    def save(self):
+        """
+        Write a snapshot of the graph, the id mapping and the documents, then empty the change log.
+
+        Each file is written next to its target and renamed over it. The id mapping,
+        renamed last, records the log sequence the snapshot covers, so log entries that
+        were already applied are skipped if the process stops before the log is emptied.
+        """
+        with self._lock:
+            if not self.path or self._index is None:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._index.save_index(f"{self.path}.tmp")
+            with open(f"{self.documents_path}.tmp", "w") as handle:
+                for doc_id, document in self.documents.items():
+                    handle.write(json.dumps([doc_id, document], default=str) + "\n")
+            with open(f"{self.ids_path}.tmp", "w") as handle:
+                json.dump({
+                    "dimension": self.dimension,
+                    "next_label": self.next_label,
+                    "tombstones": self.tombstones,
+                    "sequence": self.sequence,
+                    "labels": [[label, doc_id] for label, doc_id in self.ids.items()]
+                }, handle)
+            os.replace(f"{self.path}.tmp", self.path)
+            os.replace(f"{self.documents_path}.tmp", self.documents_path)
+            os.replace(f"{self.ids_path}.tmp", self.ids_path)
+            if self._log is not None:
+                self._log.truncate(0)
+            elif os.path.exists(self.log_path):
+                os.truncate(self.log_path, 0)
+            self._unsaved = 0
+
+    def load(self):
+        """Load the snapshot saved at `path` (if any) and replay the change log written after it"""
+        with self._lock:
+            if os.path.exists(self.ids_path):
+                with open(self.ids_path) as handle:
+                    state = json.load(handle)
+                self.dimension = state["dimension"]
+                self._index = hnswlib.Index(space="cosine", dim=self.dimension)
+                self._index.load_index(self.path, allow_replace_deleted=True)
+                self._index.set_ef(self.ef_search)
+                self.next_label = state["next_label"]
+                self.tombstones = state["tombstones"]
+                self.sequence = state["sequence"]
+                self.ids = {label: doc_id for label, doc_id in state["labels"]}
+                self.labels = {doc_id: label for label, doc_id in self.ids.items()}
+                with open(self.documents_path) as handle:
+                    self.documents = dict(json.loads(line) for line in handle)
+
+            replayed = 0
+            if os.path.exists(self.log_path):
+                with open(self.log_path) as handle:
+                    for line in handle:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A write cut short by a crash; nothing after it was acknowledged
+                            logger.warning(f"Ignoring a truncated entry at the end of {self.log_path}")
+                            break
+                        if entry["seq"] <= self.sequence:
+                            continue
+                        self.sequence = entry["seq"]
+                        replayed += 1
+                        if entry["op"] == "add":
+                            vector = np.frombuffer(base64.b64decode(entry["vector"]), dtype=np.float32)
+                            self._insert([entry["id"]], vector.reshape(1, -1))
+                            self.documents[entry["id"]] = entry["document"]
+                        elif entry["id"] in self.labels:
+                            self._delete(entry["id"])
+                            self.documents.pop(entry["id"], None)
+            self._unsaved = replayed
+            if self.labels or replayed:
+                logger.info(f"Loaded HNSW index with {len(self.labels)} vectors from {self.path} ({replayed} logged changes)")
+
+    def close(self):
+        """Snapshot pending changes and close the change log; call on shutdown so the next start replays less"""
+        with self._lock:
+            if self._unsaved:
+                self.save()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held in RAM: vectors plus up to 2*M level-0 links per element"""
+        if self._index is None:
+            return 0
+        return self._index.get_max_elements() * (self.dimension * 4 + self.m * 2 * 4 + 8)
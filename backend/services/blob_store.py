@@ -0,0 +1,190 @@
+"""
+Content-addressed blob storage for Notaic
+Stores large binary payloads (serialized style indexes) outside user documents, keyed by their SHA-256
+"""
+import os
+import hashlib
+import logging
+import tempfile
+from typing import Optional
+
+from google.cloud import firestore
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Firestore documents are limited to 1 MiB; leave room for field names and metadata
+DEFAULT_CHUNK_SIZE = 900 * 1024
+# Chunks written per batch commit (Firestore caps a commit request at 10 MiB)
+CHUNKS_PER_BATCH = 8
+
+
+def content_hash(data: bytes) -> str:
+    """Return the SHA-256 hex digest used as the address of a blob"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class FirestoreBlobStore:
+    """
+    Blob store backed by Firestore.
+
+    A blob is split into chunks stored as `{collection}/{hash}/chunks/{n}`; the
+    manifest document `{collection}/{hash}` is written last, so a blob is only
+    visible once all of its chunks exist. Identical payloads share one blob.
+    """
+
+    def __init__(self, db, collection: str = "index_blobs", chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Initialize the blob store.
+
+        Args:
+            db: Firestore client
+            collection (str): Collection holding the blob manifests
+            chunk_size (int): Maximum bytes per chunk document
+        """
+        self.db = db
+        self.collection = collection
+        self.chunk_size = chunk_size
+
+    def _manifest_ref(self, blob_hash: str):
+        return self.db.collection(self.collection).document(blob_hash)
+
+    def exists(self, blob_hash: str) -> bool:
+        return self._manifest_ref(blob_hash).get().exists
+
+    def put(self, data: bytes) -> str:
+        """
+        Store a blob.
+
+        Returns:
+            str: The content hash addressing the blob
+        """
+        blob_hash = content_hash(data)
+        manifest_ref = self._manifest_ref(blob_hash)
+        if manifest_ref.get().exists:
+            return blob_hash
+
+        chunks_ref = manifest_ref.collection("chunks")
+        chunk_count = max(1, -(-len(data) // self.chunk_size))
+        batch = self.db.batch()
+        for number in range(chunk_count):
+            chunk = data[number * self.chunk_size:(number + 1) * self.chunk_size]
+            batch.set(chunks_ref.document(f"{number:05d}"), {"data": chunk})
+            if (number + 1) % CHUNKS_PER_BATCH == 0:
+                batch.commit()
+                batch = self.db.batch()
+        batch.commit()
+
+        manifest_ref.set({
+            "size": len(data),
+            "chunk_count": chunk_count,
+            "created_at": firestore.SERVER_TIMESTAMP
+        })
+        return blob_hash
+
+    def get(self, blob_hash: str) -> Optional[bytes]:
+        """Read a blob, or None if it does not exist"""
+        manifest = self._manifest_ref(blob_hash).get()
+        if not manifest.exists:
+            return None
+
+        chunks_ref = self._manifest_ref(blob_hash).collection("chunks")
+        chunk_count = manifest.to_dict()["chunk_count"]
+        data = b"".join(chunks_ref.document(f"{number:05d}").get().to_dict()["data"] for number in range(chunk_count))
+        if content_hash(data) != blob_hash:
+            raise ValueError(f"Blob {blob_hash} is corrupt")
+        return data
+
+    def delete(self, blob_hash: str):
+        """Delete a blob (the manifest first, so readers never see a partial blob)"""
+        manifest_ref = self._manifest_ref(blob_hash)
+        manifest = manifest_ref.get()
+        if not manifest.exists:
+            return
+        manifest_ref.delete()
+        chunks_ref = manifest_ref.collection("chunks")
+        for number in range(manifest.to_dict()["chunk_count"]):
+            chunks_ref.document(f"{number:05d}").delete()
+
+
+class LocalBlobStore:
+    """Blob store on the local filesystem (or a mounted volume), one file per blob"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, blob_hash: str) -> str:
+        return os.path.join(self.root, blob_hash[:2], blob_hash)
+
+    def exists(self, blob_hash: str) -> bool:
+        return os.path.exists(self._path(blob_hash))
+
+    def put(self, data: bytes) -> str:
+        blob_hash = content_hash(data)
+        path = self._path(blob_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so a crash never leaves a truncated blob
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as handle:
+                handle.write(data)
+            os.replace(handle.name, path)
+        return blob_hash
+
+    def get(self, blob_hash: str) -> Optional[bytes]:
+        try:
+            with open(self._path(blob_hash), "rb") as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            return None
+        if content_hash(data) != blob_hash:
+            raise ValueError(f"Blob {blob_hash} is corrupt")
+        return data
+
+    def delete(self, blob_hash: str):
+        try:
+            os.remove(self._path(blob_hash))
+        except FileNotFoundError:
+            pass
+
+
+def get_blob_store(db):
+    """
+    Create the blob store configured by INDEX_BLOB_STORE ('firestore' or 'local').
+
+    The local store keeps blobs under INDEX_BLOB_DIR and is only suitable when
+    every worker shares that directory.
+    """
+    backend = os.getenv("INDEX_BLOB_STORE", "firestore").lower()
+    if backend == "local":
+        return LocalBlobStore(os.getenv("INDEX_BLOB_DIR", os.path.join("data", "index_blobs")))
+    return FirestoreBlobStore(db)
+
+
+def migrate_inline_indexes(db, blob_store=None) -> int:
+    """
+    Move style indexes still stored inline on user documents into the blob store.
+
+    Returns:
+        int: Number of user documents migrated
+    """
+    blob_store = blob_store or get_blob_store(db)
+    migrated = 0
+    for user_doc in db.collection("users").select(["vector_store_index"]).stream():
+        serialized_index = user_doc.to_dict().get("vector_store_index")
+        if not serialized_index:
+            continue
+        blob_hash = blob_store.put(serialized_index)
+        user_doc.reference.update({
+            "vector_store_index_ref": blob_hash,
+            "vector_store_index": firestore.DELETE_FIELD
+        })
+        migrated += 1
+        logger.info(f"Moved style index of user {user_doc.id} to blob {blob_hash}")
+    return migrated
+
+
+if __name__ == "__main__":
+    from utils.firestore_client import get_firestore_client
+
+    print(f"Migrated {migrate_inline_indexes(get_firestore_client())} inline style indexes")
@@ -0,0 +1,282 @@
+"""
+Draft Analytics for Notaic
+Materialized per-user draft statistics, maintained incrementally as drafts are created, edited and sent
+"""
+import os
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote
+
+from google.cloud import firestore
+
+from services.email_metadata import sender_address
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ANALYTICS_COLLECTION = "draft_analytics"
+# Drafts at or above this priority (1 is the highest) are listed by /emails/high-priority
+HIGH_PRIORITY_THRESHOLD = 5
+# Draft fields the statistics are computed from
+DRAFT_FIELDS = ["user_id", "recipient_email", "email_subject", "draft_body", "draft_body_topic", "priority"]
+# Histograms of the statistics document; counts of keys beyond the cap go to `<histogram>_other`
+HISTOGRAMS = ("senders", "topics", "priorities")
+# Keys kept per histogram, and high-priority drafts listed, so a document stays far below Firestore's size limit
+DRAFT_ANALYTICS_MAX_KEYS = int(os.getenv("DRAFT_ANALYTICS_MAX_KEYS", "500"))
+DRAFT_ANALYTICS_MAX_HIGH_PRIORITY = int(os.getenv("DRAFT_ANALYTICS_MAX_HIGH_PRIORITY", "200"))
+
+
+def encode_key(value: str) -> str:
+    """Escape a map key so it is a single Firestore field path segment"""
+    return value.replace("%", "%25").replace(".", "%2E").replace("/", "%2F").replace("`", "%60")
+
+
+def decode_key(key: str) -> str:
+    return unquote(key)
+
+
+def contact_address(recipient: str) -> str:
+    """Address of a 'Name <address>' recipient, lowercased"""
+    return sender_address(recipient) or (recipient or "").strip().lower()
+
+
+def draft_counters(draft: Dict[str, Any]) -> Counter:
+    """
+    The contribution of one draft to its user's statistics.
+
+    Returns:
+        Counter: Counts keyed by field path tuples, e.g. ('senders', 'jane@acme%2Ecom')
+    """
+    counters = Counter({("draft_count",): 1, ("total_words",): len((draft.get("draft_body") or "").split())})
+    recipient = contact_address(draft.get("recipient_email"))
+    if recipient:
+        counters[("senders", encode_key(recipient))] += 1
+    if draft.get("draft_body_topic"):
+        counters[("topics", encode_key(draft["draft_body_topic"]))] += 1
+    if draft.get("priority") is not None:
+        counters[("priorities", encode_key(str(draft["priority"])))] += 1
+    return counters
+
+
+def high_priority_entry(draft: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    priority = draft.get("priority")
+    if priority is None or priority > HIGH_PRIORITY_THRESHOLD:
+        return None
+    return {
+        "priority": priority,
+        "email_subject": draft.get("email_subject"),
+        "sender_email": draft.get("recipient_email")
+    }
+
+
+def bounded(counters: Counter, current: Dict[str, Any], max_keys: int) -> Counter:
+    """
+    Send the histogram counts of keys without a slot in the statistics document to the overflow counters.
+
+    A key gets a slot while its histogram has fewer than `max_keys` keys; counts of a
+    key without one, including decrements of a key that was counted as overflow, go to
+    e.g. `senders_other`.
+
+    Args:
+        counters (Counter): Changes as returned by `draft_counters`
+        current (Dict[str, Any]): The histograms currently stored
+        max_keys (int): Keys allowed per histogram
+    """
+    sizes = {name: len(current.get(name) or {}) for name in HISTOGRAMS}
+    routed = Counter()
+    for path, delta in counters.items():
+        if len(path) == 2 and path[1] not in (current.get(path[0]) or {}):
+            if delta > 0 and sizes[path[0]] < max_keys:
+                sizes[path[0]] += 1
+            else:
+                path = (f"{path[0]}_other",)
+        routed[path] += delta
+    return routed
+
+
+def increments(counters: Counter, current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Nested `firestore.Increment` transforms for a set(merge=True), skipping zero deltas.
+
+    Histogram keys whose count `current` shows dropping to zero are deleted, so they
+    free their slot.
+    """
+    update: Dict[str, Any] = {}
+    for path, delta in counters.items():
+        if not delta:
+            continue
+        target = update
+        for part in path[:-1]:
+            target = target.setdefault(part, {})
+        stored = (current or {}).get(path[0]) if len(path) == 2 else None
+        if stored and path[1] in stored and stored[path[1]] + delta <= 0:
+            target[path[-1]] = firestore.DELETE_FIELD
+        else:
+            target[path[-1]] = firestore.Increment(delta)
+    return update
+
+
+class DraftAnalytics:
+    """
+    Per-user draft statistics materialized in `draft_analytics/{user_id}`.
+
+    The document holds the draft count, total draft words, and recipient, topic and
+    priority histograms, plus the currently stored high-priority drafts. Writers add
+    their changes to the transaction that writes the draft, so the statistics move
+    with the drafts, and the analytics endpoints read one document instead of
+    streaming every draft the user has had.
+
+    The histograms keep at most DRAFT_ANALYTICS_MAX_KEYS keys each and the
+    high-priority map at most DRAFT_ANALYTICS_MAX_HIGH_PRIORITY drafts; the recording
+    methods read the current document in the transaction to enforce this, so they
+    must run before the transaction's writes.
+    """
+
+    def __init__(self, db, collection: str = ANALYTICS_COLLECTION):
+        self.db = db
+        self.collection = collection
+
+    def document(self, user_id: str):
+        return self.db.collection(self.collection).document(user_id)
+
+    def current(self, transaction, user_id: str) -> Dict[str, Any]:
+        """The bounded maps of a statistics document, read in a transaction"""
+        snapshot = self.document(user_id).get(field_paths=[*HISTOGRAMS, "high_priority"], transaction=transaction)
+        return (snapshot.to_dict() or {}) if snapshot.exists else {}
+
+    def record_created(self, transaction, user_id: str, database_id: str, draft: Dict[str, Any]):
+        """Add a new draft's contribution to a transaction"""
+        self.record_updated(transaction, user_id, database_id, {}, draft)
+
+    def record_updated(self, transaction, user_id: str, database_id: str, before: Dict[str, Any], after: Dict[str, Any]):
+        """Add the change between two versions of a draft to a transaction; an empty version means none"""
+        counters = draft_counters(after) if after else Counter()
+        if before:
+            counters.subtract(draft_counters(before))
+        current = self.current(transaction, user_id)
+        update = increments(bounded(counters, current, DRAFT_ANALYTICS_MAX_KEYS), current)
+
+        entry = high_priority_entry(after) if after else None
+        if entry != (high_priority_entry(before) if before else None):
+            listed = current.get("high_priority") or {}
+            if not entry:
+                update["high_priority"] = {database_id: firestore.DELETE_FIELD}
+            elif database_id in listed or len(listed) < DRAFT_ANALYTICS_MAX_HIGH_PRIORITY:
+                update["high_priority"] = {database_id: entry}
+        if update:
+            transaction.set(self.document(user_id), update, merge=True)
+
+    def record_removed(self, transaction, user_id: str, database_id: str, draft: Dict[str, Any]):
+        """Add the removal of a draft's contribution to a transaction"""
+        self.record_updated(transaction, user_id, database_id, draft, {})
+
+    def get(self, user_id: str, field_paths: Optional[List[str]] = None) -> Dict[str, Any]:
+        snapshot = self.document(user_id).get(field_paths=field_paths)
+        if not snapshot.exists:
+            return {}
+        return snapshot.to_dict() or {}
+
+    def top_senders(self, user_id: str, limit: int = 5) -> List[Tuple[str, int]]:
+        return self.most_common(self.get(user_id, ["senders"]).get("senders"), limit)
+
+    def common_topics(self, user_id: str, limit: int = 5) -> List[Tuple[str, int]]:
+        return self.most_common(self.get(user_id, ["topics"]).get("topics"), limit)
+
+    def average_words(self, user_id: str) -> int:
+        return self.average(self.get(user_id, ["draft_count", "total_words"]))
+
+    def high_priority(self, user_id: str) -> List[Dict[str, Any]]:
+        """Stored high-priority drafts, most urgent first"""
+        return self.sorted_high_priority(self.get(user_id, ["high_priority"]).get("high_priority"))
+
+    # The helpers below turn a statistics document into responses, so readers that fetch
+    # the document themselves (e.g. with the async client) share the same presentation
+
+    @staticmethod
+    def most_common(counts: Optional[Dict[str, int]], limit: int) -> List[Tuple[str, int]]:
+        counts = Counter({decode_key(key): count for key, count in (counts or {}).items() if count > 0})
+        return counts.most_common(limit)
+
+    @staticmethod
+    def average(stats: Dict[str, Any]) -> int:
+        draft_count = stats.get("draft_count", 0)
+        return int(stats.get("total_words", 0) / draft_count) if draft_count > 0 else 0
+
+    @staticmethod
+    def sorted_high_priority(entries: Optional[Dict[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        drafts = [{"database_id": database_id, **entry} for database_id, entry in (entries or {}).items()]
+        return sorted(drafts, key=lambda draft: draft["priority"])
+
+
+def build_analytics(drafts: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Statistics document for a user's drafts, given as (database_id, draft) pairs.
+
+    Each histogram keeps its DRAFT_ANALYTICS_MAX_KEYS most common keys, and the most
+    urgent DRAFT_ANALYTICS_MAX_HIGH_PRIORITY high-priority drafts are listed.
+    """
+    counters = Counter()
+    high_priority = {}
+    for database_id, draft in drafts:
+        counters.update(draft_counters(draft))
+        entry = high_priority_entry(draft)
+        if entry:
+            high_priority[database_id] = entry
+
+    document: Dict[str, Any] = {"draft_count": 0, "total_words": 0, "senders": {}, "topics": {}, "priorities": {}}
+    histograms = defaultdict(Counter)
+    for path, count in counters.items():
+        if len(path) == 1:
+            document[path[0]] = count
+        else:
+            histograms[path[0]][path[1]] = count
+    for name, counts in histograms.items():
+        document[name] = dict(counts.most_common(DRAFT_ANALYTICS_MAX_KEYS))
+        overflow = sum(counts.values()) - sum(document[name].values())
+        if overflow:
+            document[f"{name}_other"] = overflow
+    document["high_priority"] = dict(
+        sorted(high_priority.items(), key=lambda item: item[1]["priority"])[:DRAFT_ANALYTICS_MAX_HIGH_PRIORITY]
+    )
+    return document
+
+
+def backfill_draft_analytics(db, user_ids: Optional[Iterable[str]] = None, analytics: Optional[DraftAnalytics] = None) -> int:
+    """
+    Rebuild the analytics documents from the stored drafts, replacing their contents.
+
+    Args:
+        db: Firestore client
+        user_ids (Iterable[str], optional): Users to rebuild; every user with drafts if omitted
+        analytics (DraftAnalytics, optional): Analytics store to write to
+
+    Returns:
+        int: Number of analytics documents written
+    """
+    analytics = analytics or DraftAnalytics(db)
+    user_ids = list(user_ids) if user_ids is not None else None
+    drafts_by_user = defaultdict(list)
+    queries = (
+        [db.collection("drafts").where("user_id", "==", user_id) for user_id in user_ids]
+        if user_ids is not None else [db.collection("drafts")]
+    )
+    for query in queries:
+        for draft in query.select(DRAFT_FIELDS).stream():
+            data = draft.to_dict()
+            drafts_by_user[data.get("user_id")].append((draft.id, data))
+
+    written = 0
+    for user_id in (user_ids if user_ids is not None else drafts_by_user):
+        analytics.document(user_id).set(build_analytics(drafts_by_user.get(user_id, [])))
+        written += 1
+        logger.info(f"Rebuilt draft analytics of user {user_id} from {len(drafts_by_user.get(user_id, []))} drafts")
+    return written
+
+
+if __name__ == "__main__":
+    import sys
+    from utils.firestore_client import get_firestore_client
+
+    print(f"Rebuilt {backfill_draft_analytics(get_firestore_client(), sys.argv[1:] or None)} draft analytics documents")
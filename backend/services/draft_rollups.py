@@ -0,0 +1,133 @@
+"""
+Draft Rollups for Notaic
+Per-user daily counts of created drafts, kept as one document per user and year
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from google.cloud import firestore
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "draft_rollups"
+
+
+def utc_day(value: datetime) -> date:
+    """UTC calendar day of a timestamp (naive timestamps are taken as UTC)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+class DraftRollups:
+    """
+    Daily draft counts stored as `draft_rollups/{user_id}/years/{year}`.
+
+    Each year document maps ISO dates to the number of drafts created that day, so a
+    window of up to a year is served from at most two document reads however many
+    drafts it covers. A year document holds at most 366 small counters.
+    """
+
+    def __init__(self, db, collection: str = ROLLUP_COLLECTION):
+        self.db = db
+        self.collection = collection
+
+    def year_document(self, user_id: str, year: int):
+        return self.db.collection(self.collection).document(user_id).collection("years").document(str(year))
+
+    def record_created(self, batch, user_id: str, created: datetime):
+        """Add a draft created at `created` to a write batch"""
+        day = utc_day(created)
+        batch.set(self.year_document(user_id, day.year), {"days": {day.isoformat(): firestore.Increment(1)}}, merge=True)
+
+    def daily_counts(self, user_id: str, days: int, today: Optional[date] = None) -> List[Dict[str, object]]:
+        """
+        Draft counts of the last `days` days (today included), oldest first; days without drafts are omitted.
+
+        Args:
+            user_id (str): ID of the user
+            days (int): Length of the window in days
+            today (date, optional): Last day of the window; the current UTC day if omitted
+
+        Returns:
+            List[Dict[str, object]]: Entries with an ISO `date` and its `count`
+        """
+        start, end = window(days, today)
+        snapshots = [self.year_document(user_id, year).get() for year in range(start.year, end.year + 1)]
+        return counts_in_window(snapshots, start, end)
+
+
+def window(days: int, today: Optional[date] = None) -> Tuple[date, date]:
+    """First and last day of a window of the last `days` days (today included)"""
+    today = today or datetime.now(timezone.utc).date()
+    return today - timedelta(days=max(days, 0)), today
+
+
+def counts_in_window(snapshots, start: date, end: date) -> List[Dict[str, object]]:
+    """Daily counts between `start` and `end` from the year documents covering them"""
+    counts = {}
+    for snapshot in snapshots:
+        if snapshot.exists:
+            counts.update((snapshot.to_dict() or {}).get("days") or {})
+    start_key, end_key = start.isoformat(), end.isoformat()
+    return [
+        {"date": day, "count": count}
+        for day, count in sorted(counts.items())
+        if start_key <= day <= end_key and count > 0
+    ]
+
+
+def rebuild_draft_rollups(db, user_ids: Optional[Iterable[str]] = None, rollups: Optional[DraftRollups] = None) -> int:
+    """
+    Recount daily drafts from the stored drafts.
+
+    Sent drafts are deleted from Firestore, so history can only be recovered for
+    drafts that still exist: a day's count is raised to the recount but never lowered,
+    keeping drafts the rollup already recorded before they were sent.
+
+    Args:
+        db: Firestore client
+        user_ids (Iterable[str], optional): Users to rebuild; every user with drafts if omitted
+        rollups (DraftRollups, optional): Rollup store to write to
+
+    Returns:
+        int: Number of year documents written
+    """
+    rollups = rollups or DraftRollups(db)
+    user_ids = list(user_ids) if user_ids is not None else None
+    queries = (
+        [db.collection("drafts").where("user_id", "==", user_id) for user_id in user_ids]
+        if user_ids is not None else [db.collection("drafts")]
+    )
+    counts = defaultdict(Counter)
+    for query in queries:
+        for draft in query.select(["user_id", "date_created"]).stream():
+            data = draft.to_dict()
+            if data.get("date_created"):
+                counts[data.get("user_id")][utc_day(data["date_created"])] += 1
+
+    written = 0
+    for user_id, day_counts in counts.items():
+        by_year = defaultdict(dict)
+        for day, count in day_counts.items():
+            by_year[day.year][day.isoformat()] = count
+        for year, recounted in by_year.items():
+            reference = rollups.year_document(user_id, year)
+            snapshot = reference.get()
+            current = ((snapshot.to_dict() or {}).get("days") or {}) if snapshot.exists else {}
+            merged = {**current, **{day: max(count, current.get(day, 0)) for day, count in recounted.items()}}
+            reference.set({"days": merged})
+            written += 1
+        logger.info(f"Rebuilt daily draft counts of user {user_id} over {len(day_counts)} days")
+    return written
+
+
+if __name__ == "__main__":
+    import sys
+    from utils.firestore_client import get_firestore_client
+
+    print(f"Rebuilt {rebuild_draft_rollups(get_firestore_client(), sys.argv[1:] or None)} draft rollup documents")
@@ -0,0 +1,134 @@
+"""
+Draft Summaries for Notaic
+Projected, cursor-paginated listing of a user's drafts; full email bodies are read per draft on demand
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.cloud import firestore
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+# Fields read for the listing; the original email body is deliberately left out
+SUMMARY_FIELDS = [
+    "user_id", "gmail_draft_id", "recipient_email", "email_subject",
+    "draft_subject", "draft_body", "date_created"
+]
+# Extra fields shown to pro users
+PRO_FIELDS = ["action_item", "priority"]
+
+
+class DraftNotFound(LookupError):
+    """The draft does not exist or belongs to another user"""
+
+
+class DraftSummary:
+    """A draft as listed on the dashboard, converted from one snapshot read"""
+
+    __slots__ = (
+        "database_id", "gmail_id", "recipient_email", "recipient_subject",
+        "draft_subject", "draft_body", "date", "action_item", "priority"
+    )
+
+    def __init__(self, database_id: str, data: Dict[str, Any]):
+        self.database_id = database_id
+        self.gmail_id = data.get("gmail_draft_id")
+        self.recipient_email = data.get("recipient_email")
+        self.recipient_subject = data.get("email_subject")
+        self.draft_subject = data.get("draft_subject")
+        self.draft_body = data.get("draft_body")
+        self.date = data.get("date_created")
+        self.action_item = data.get("action_item")
+        self.priority = data.get("priority")
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "DraftSummary":
+        return cls(snapshot.id, snapshot.to_dict() or {})
+
+    def to_dict(self, include_pro_fields: bool = False) -> Dict[str, Any]:
+        result = {
+            "database_id": self.database_id,
+            "gmail_id": self.gmail_id,
+            "recipient_email": self.recipient_email,
+            "recipient_subject": self.recipient_subject,
+            "draft_body": self.draft_body,
+            "draft_subject": self.draft_subject,
+            "date": self.date
+        }
+        if include_pro_fields:
+            result["action_item"] = self.action_item
+            result["priority"] = self.priority
+        return result
+
+
+def list_recent_drafts(
+    db,
+    user_id: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    start_after: Optional[str] = None,
+    include_pro_fields: bool = False
+) -> Tuple[List[DraftSummary], Optional[str]]:
+    """
+    List a page of a user's drafts, newest first.
+
+    Args:
+        db: Firestore client
+        user_id (str): ID of the user whose drafts are listed
+        limit (int): Page size, capped at MAX_PAGE_SIZE
+        start_after (str, optional): Database ID of the last draft of the previous page
+        include_pro_fields (bool): Also read the action item and priority
+
+    Returns:
+        Tuple[List[DraftSummary], Optional[str]]: The drafts and the cursor of the next page (None on the last page)
+
+    Raises:
+        DraftNotFound: If the cursor draft does not exist or belongs to another user
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = recent_drafts_query(db, user_id, include_pro_fields)
+    if start_after:
+        cursor = db.collection("drafts").document(start_after).get(field_paths=["user_id", "date_created"])
+        if not cursor.exists or cursor.get("user_id") != user_id:
+            raise DraftNotFound(start_after)
+        query = query.start_after(cursor)
+
+    # One extra draft tells whether another page exists
+    return to_page(list(query.limit(limit + 1).stream()), limit)
+
+
+def recent_drafts_query(db, user_id: str, include_pro_fields: bool = False):
+    """Projected query of a user's drafts, newest first (works with the sync and async clients)"""
+    fields = SUMMARY_FIELDS + (PRO_FIELDS if include_pro_fields else [])
+    return (
+        db.collection("drafts")
+        .where("user_id", "==", user_id)
+        .order_by("date_created", direction=firestore.Query.DESCENDING)
+        .select(fields)
+    )
+
+
+def to_page(snapshots, limit: int) -> Tuple[List[DraftSummary], Optional[str]]:
+    """Summaries of up to `limit` snapshots, and the next cursor if more than `limit` were read"""
+    drafts = [DraftSummary.from_snapshot(snapshot) for snapshot in snapshots[:limit]]
+    next_cursor = drafts[-1].database_id if len(snapshots) > limit else None
+    return drafts, next_cursor
+
+
+def get_draft_detail(db, user_id: str, database_id: str, include_pro_fields: bool = False) -> Dict[str, Any]:
+    """
+    Read one draft with the original email body.
+
+    Raises:
+        DraftNotFound: If the draft does not exist or belongs to another user
+    """
+    fields = SUMMARY_FIELDS + (PRO_FIELDS if include_pro_fields else []) + ["email_body"]
+    snapshot = db.collection("drafts").document(database_id).get(field_paths=fields)
+    if not snapshot.exists or snapshot.get("user_id") != user_id:
+        raise DraftNotFound(database_id)
+    data = snapshot.to_dict()
+    return {**DraftSummary(database_id, data).to_dict(include_pro_fields), "email_body": data.get("email_body")}
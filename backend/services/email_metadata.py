@@ -0,0 +1,221 @@
+"""
+Email Metadata Schema for Notaic
+Typed properties and JSON serialization for the metadata stored with email embeddings
+"""
+import ast
+import logging
+from datetime import datetime, timezone
+from email.utils import parseaddr, parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import orjson
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Priority levels produced by the email agent's prioritizer, ranked so they can be filtered and sorted
+PRIORITY_RANKS = {"Ignore": 0, "Low": 1, "Medium": 2, "High": 3, "Critical": 4}
+
+# Native (filterable, sortable) properties stored next to the serialized metadata
+WEAVIATE_PROPERTIES = [
+    {"name": "category", "dataType": ["text"], "tokenization": "field"},
+    {"name": "subcategory", "dataType": ["text"], "tokenization": "field"},
+    {"name": "urgency", "dataType": ["int"]},
+    {"name": "priority", "dataType": ["text"], "tokenization": "field"},
+    {"name": "priority_rank", "dataType": ["int"]},
+    {"name": "sender_domain", "dataType": ["text"], "tokenization": "field"},
+    {"name": "sender_address", "dataType": ["text"], "tokenization": "field"},
+    {"name": "timestamp_epoch", "dataType": ["number"]},
+]
+
+
+def sender_address(sender: str) -> str:
+    """Return the lowercased address of a sender such as 'Jane <jane@acme.com>'"""
+    address = parseaddr(sender or "")[1].lower()
+    return address if "@" in address else ""
+
+
+def sender_domain(sender: str) -> str:
+    """Return the lowercased domain of a sender such as 'Jane <jane@acme.com>'"""
+    return sender_address(sender).rpartition("@")[2]
+
+
+def epoch_seconds(value: Union[str, int, float, datetime, None]) -> Optional[float]:
+    """Convert an ISO 8601 or RFC 2822 timestamp, datetime or epoch seconds to epoch seconds (naive means UTC)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            try:
+                value = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def priority_rank(priority_level: str) -> int:
+    return PRIORITY_RANKS.get((priority_level or "").capitalize(), 0)
+
+
+def encode_metadata(metadata: Dict[str, Any]) -> str:
+    """Serialize metadata to JSON; values JSON cannot represent are stored as strings"""
+    return orjson.dumps(metadata, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def decode_metadata(value: str) -> Dict[str, Any]:
+    """
+    Deserialize metadata written by `encode_metadata`.
+
+    Objects stored before JSON serialization hold `str(dict)`; those are parsed as
+    Python literals (never evaluated).
+    """
+    if not value:
+        return {}
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            logger.warning("Could not decode stored email metadata")
+            return {}
+
+
+def to_properties(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flatten email metadata into native properties.
+
+    The classification and priority dicts produced by the email agent are reduced to
+    scalar fields that vector databases can filter and sort on; the full metadata is
+    kept as JSON under `metadata`.
+    """
+    classification = metadata.get("classification") or {}
+    priority = metadata.get("priority") or {}
+    try:
+        urgency = int(classification.get("urgency") or 0)
+    except (TypeError, ValueError):
+        urgency = 0
+
+    properties = {
+        "subject": metadata.get("subject", ""),
+        "sender": metadata.get("sender", ""),
+        "sender_domain": sender_domain(metadata.get("sender", "")),
+        "sender_address": sender_address(metadata.get("sender", "")),
+        "timestamp": metadata.get("timestamp", ""),
+        "timestamp_epoch": epoch_seconds(metadata.get("timestamp")),
+        "category": classification.get("category") or "",
+        "subcategory": classification.get("subcategory") or "",
+        "urgency": urgency,
+        "priority": priority.get("priority_level") or "",
+        "priority_rank": priority_rank(priority.get("priority_level")),
+        "metadata": encode_metadata(metadata)
+    }
+    # Vector databases reject null property values
+    return {key: value for key, value in properties.items() if value is not None}
+
+
+def _as_list(name: str, values: Union[str, Iterable[str], None]) -> Optional[List[str]]:
+    if values is None:
+        return None
+    values = [values] if isinstance(values, str) else list(values)
+    if not values:
+        # "Any of no values" has no form in every backend (an empty Weaviate Or is invalid)
+        raise ValueError(f"{name} must not be empty; omit it to match every email")
+    return values
+
+
+class EmailFilter:
+    """
+    Predicates for similarity search over stored emails.
+
+    A filter is translated into each backend's native form (a Pinecone metadata
+    filter, a Weaviate where clause, or a pre-filter bitmap for the local index) so
+    that only matching emails are ranked, instead of over-fetching and discarding.
+    All given predicates must hold; list-valued predicates match any of their values.
+    """
+
+    def __init__(
+        self,
+        categories: Union[str, Iterable[str], None] = None,
+        senders: Union[str, Iterable[str], None] = None,
+        sender_domains: Union[str, Iterable[str], None] = None,
+        since: Union[str, int, float, datetime, None] = None,
+        until: Union[str, int, float, datetime, None] = None,
+        min_priority: Optional[str] = None
+    ):
+        """
+        Initialize the filter.
+
+        Args:
+            categories (str | Iterable[str], optional): Classification categories to match
+            senders (str | Iterable[str], optional): Sender addresses (or 'Name <address>' strings) to match
+            sender_domains (str | Iterable[str], optional): Sender domains to match
+            since (str | float | datetime, optional): Earliest email timestamp, inclusive
+            until (str | float | datetime, optional): Latest email timestamp, inclusive
+            min_priority (str, optional): Lowest priority level to match (e.g. 'High')
+
+        Raises:
+            ValueError: If a list predicate is empty or the priority level is unknown
+        """
+        self.categories = _as_list("categories", categories)
+        senders = _as_list("senders", senders)
+        self.senders = [sender_address(sender) or sender.lower() for sender in senders] if senders is not None else None
+        domains = _as_list("sender_domains", sender_domains)
+        self.sender_domains = [domain.lower() for domain in domains] if domains is not None else None
+        self.since = epoch_seconds(since)
+        self.until = epoch_seconds(until)
+        if min_priority is not None and priority_rank(min_priority) == 0 and min_priority.capitalize() != "Ignore":
+            raise ValueError(f"Unknown priority level: {min_priority}")
+        self.min_priority_rank = priority_rank(min_priority) if min_priority is not None else None
+
+    def __repr__(self):
+        fields = ", ".join(f"{key}={value!r}" for key, value in vars(self).items() if value is not None)
+        return f"EmailFilter({fields})"
+
+    def to_pinecone(self, user_id: str) -> Dict[str, Any]:
+        """Pinecone metadata filter (implicitly a conjunction of its keys)"""
+        filter_dict: Dict[str, Any] = {"user_id": user_id}
+        if self.categories is not None:
+            filter_dict["category"] = {"$in": self.categories}
+        if self.senders is not None:
+            filter_dict["sender_address"] = {"$in": self.senders}
+        if self.sender_domains is not None:
+            filter_dict["sender_domain"] = {"$in": self.sender_domains}
+        timestamp_range = {}
+        if self.since is not None:
+            timestamp_range["$gte"] = self.since
+        if self.until is not None:
+            timestamp_range["$lte"] = self.until
+        if timestamp_range:
+            filter_dict["timestamp_epoch"] = timestamp_range
+        if self.min_priority_rank is not None:
+            filter_dict["priority_rank"] = {"$gte": self.min_priority_rank}
+        return filter_dict
+
+    def to_weaviate(self, user_id: str) -> Dict[str, Any]:
+        """Weaviate where clause"""
+        def any_of(path, values):
+            operands = [{"path": [path], "operator": "Equal", "valueText": value} for value in values]
+            return operands[0] if len(operands) == 1 else {"operator": "Or", "operands": operands}
+
+        operands = [{"path": ["user_id"], "operator": "Equal", "valueString": user_id}]
+        if self.categories is not None:
+            operands.append(any_of("category", self.categories))
+        if self.senders is not None:
+            operands.append(any_of("sender_address", self.senders))
+        if self.sender_domains is not None:
+            operands.append(any_of("sender_domain", self.sender_domains))
+        if self.since is not None:
+            operands.append({"path": ["timestamp_epoch"], "operator": "GreaterThanEqual", "valueNumber": self.since})
+        if self.until is not None:
+            operands.append({"path": ["timestamp_epoch"], "operator": "LessThanEqual", "valueNumber": self.until})
+        if self.min_priority_rank is not None:
+            operands.append({"path": ["priority_rank"], "operator": "GreaterThanEqual", "valueInt": self.min_priority_rank})
+        return operands[0] if len(operands) == 1 else {"operator": "And", "operands": operands}
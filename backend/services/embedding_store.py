@@ -11,6 +11,8 @@ from weaviate import Client, WeaviateAuthClientCredentials
 from langchain_pinecone import PineconeVectorStore
 from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.schema import Document
+from services.hybrid_retriever import HybridRetriever, HYBRID_MIN_TERM_SCORE
+from services.email_metadata import WEAVIATE_PROPERTIES, EmailFilter, to_properties, decode_metadata
 
 # Load environment variables
 load_dotenv()
@@ -19,10 +21,23 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Properties returned for every Weaviate Email object
+WEAVIATE_RESULT_FIELDS = [
+    "content", "subject", "sender", "timestamp", "email_id", "metadata",
+    "category", "subcategory", "urgency", "priority", "priority_rank", "sender_domain"
+]
+
+
+def result_metadata(stored: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge the native properties of a stored email with its serialized metadata"""
+    native = {key: value for key, value in stored.items() if key not in ("metadata", "content", "_additional")}
+    return {**native, **decode_metadata(stored.get("metadata"))}
+
 class EmbeddingStore:
     """
     A service for storing and querying vector embeddings.
-    Supports both Pinecone and Weaviate as backend vector databases.
+    Supports Pinecone and Weaviate as backend vector databases, and a local
+    in-process hybrid (BM25 + vector) index.
     """
     
     def __init__(self, provider: str = "pinecone"):
@@ -30,7 +45,7 @@ class EmbeddingStore:
         Initialize the embedding store with the specified vector database provider.
         
         Args:
-            provider (str): The vector database provider to use ('pinecone' or 'weaviate')
+            provider (str): The vector database provider to use ('pinecone', 'weaviate' or 'local')
         """
         self.provider = provider.lower()
         self.embeddings = OpenAIEmbeddings()
@@ -39,6 +54,8 @@ class EmbeddingStore:
             self._init_pinecone()
         elif self.provider == "weaviate":
             self._init_weaviate()
+        elif self.provider == "local":
+            self._init_local()
         else:
             raise ValueError(f"Unsupported vector database provider: {provider}")
         
@@ -98,11 +115,25 @@ class EmbeddingStore:
                     {"name": "timestamp", "dataType": ["date"]},
                     {"name": "user_id", "dataType": ["string"]},
                     {"name": "email_id", "dataType": ["string"]},
-                    {"name": "metadata", "dataType": ["text"]}
+                    # JSON blob, only read back; never filtered or searched
+                    {"name": "metadata", "dataType": ["text"], "indexFilterable": False, "indexSearchable": False},
+                    *WEAVIATE_PROPERTIES
                 ]
             })
+        else:
+            # Classes created before classification and priority were native properties get them added
+            existing = {prop["name"] for prop in self.client.schema.get("Email").get("properties", [])}
+            for prop in WEAVIATE_PROPERTIES:
+                if prop["name"] not in existing:
+                    logger.info(f"Adding Weaviate property Email.{prop['name']}")
+                    self.client.schema.property.create("Email", prop)
         
         logger.info("Connected to Weaviate")
+
+    def _init_local(self):
+        """Initialize the in-process hybrid index"""
+        self.retriever = HybridRetriever()
+        logger.info("Using local hybrid BM25 + vector index")
     
     def store_email_embedding(
         self, 
@@ -129,6 +160,8 @@ class EmbeddingStore:
             return self._store_in_pinecone(email_id, content, metadata, user_id)
         elif self.provider == "weaviate":
             return self._store_in_weaviate(email_id, content, metadata, user_id)
+        elif self.provider == "local":
+            return self._store_in_local(email_id, content, metadata, user_id)
     
     def _store_in_pinecone(
         self, 
@@ -138,8 +171,9 @@ class EmbeddingStore:
         user_id: str
     ) -> str:
         """Store an embedding in Pinecone"""
-        # Add user_id to metadata for filtering
-        metadata_with_user = {**metadata, "user_id": user_id, "email_id": email_id}
+        # Pinecone metadata must be flat: store the native properties plus the JSON-encoded metadata,
+        # and add user_id for filtering
+        metadata_with_user = {**to_properties(metadata), "user_id": user_id, "email_id": email_id}
         
         # Create document for LangChain
         document = Document(
@@ -160,22 +194,20 @@ class EmbeddingStore:
         user_id: str
     ) -> str:
         """Store an embedding in Weaviate"""
-        # Extract common fields from metadata
-        subject = metadata.get("subject", "")
-        sender = metadata.get("sender", "")
-        timestamp = metadata.get("timestamp", "")
+        # Classification and priority become native properties; the full metadata is stored as JSON
+        properties = to_properties(metadata)
+        if not properties["timestamp"]:
+            # Empty strings are not valid dates
+            del properties["timestamp"]
         
         # Create the object in Weaviate
         with self.client.batch as batch:
             batch.add_data_object(
                 data_object={
                     "content": content,
-                    "subject": subject,
-                    "sender": sender,
-                    "timestamp": timestamp,
+                    **properties,
                     "user_id": user_id,
-                    "email_id": email_id,
-                    "metadata": str(metadata)  # Convert dict to string for storage
+                    "email_id": email_id
                 },
                 class_name="Email",
                 uuid=email_id
@@ -183,12 +215,25 @@ class EmbeddingStore:
         
         return email_id
     
+    def _store_in_local(
+        self,
+        email_id: str,
+        content: str,
+        metadata: Dict[str, Any],
+        user_id: str
+    ) -> str:
+        """Store an embedding and its BM25 terms in the local hybrid index"""
+        embedding = self.embeddings.embed_documents([content])[0]
+        self.retriever.add(user_id, email_id, content, embedding, {**metadata, "email_id": email_id})
+        return email_id
+
     def query_similar_emails(
         self, 
         query: str, 
         user_id: str, 
         limit: int = 5,
-        score_threshold: float = 0.7
+        score_threshold: float = 0.7,
+        filters: Optional[EmailFilter] = None
     ) -> List[Dict[str, Any]]:
         """
         Query for emails similar to the given query.
@@ -198,27 +243,32 @@ class EmbeddingStore:
             user_id (str): ID of the user to filter results
             limit (int): Maximum number of results to return
             score_threshold (float): Minimum similarity score (0-1)
+            filters (EmailFilter, optional): Category, sender, time range and priority predicates,
+                applied by the vector database before ranking
             
         Returns:
             List[Dict[str, Any]]: List of similar emails with their metadata
         """
-        logger.info(f"Querying similar emails for user {user_id}")
+        logger.info(f"Querying similar emails for user {user_id}" + (f" with {filters}" if filters else ""))
         
         if self.provider == "pinecone":
-            return self._query_pinecone(query, user_id, limit, score_threshold)
+            return self._query_pinecone(query, user_id, limit, score_threshold, filters)
         elif self.provider == "weaviate":
-            return self._query_weaviate(query, user_id, limit, score_threshold)
+            return self._query_weaviate(query, user_id, limit, score_threshold, filters)
+        elif self.provider == "local":
+            return self._query_local(query, user_id, limit, score_threshold, filters)
     
     def _query_pinecone(
         self, 
         query: str, 
         user_id: str, 
         limit: int = 5,
-        score_threshold: float = 0.7
+        score_threshold: float = 0.7,
+        filters: Optional[EmailFilter] = None
     ) -> List[Dict[str, Any]]:
         """Query for similar emails in Pinecone"""
         # Use LangChain to query with metadata filtering
-        filter_dict = {"user_id": user_id}
+        filter_dict = filters.to_pinecone(user_id) if filters else {"user_id": user_id}
         
         results = self.vector_store.similarity_search_with_score(
             query=query,
@@ -232,7 +282,7 @@ class EmbeddingStore:
             if score >= score_threshold:
                 similar_emails.append({
                     "content": doc.page_content,
-                    "metadata": doc.metadata,
+                    "metadata": result_metadata(doc.metadata),
                     "similarity_score": score
                 })
         
@@ -243,7 +293,8 @@ class EmbeddingStore:
         query: str, 
         user_id: str, 
         limit: int = 5,
-        score_threshold: float = 0.7
+        score_threshold: float = 0.7,
+        filters: Optional[EmailFilter] = None
     ) -> List[Dict[str, Any]]:
         """Query for similar emails in Weaviate"""
         # Generate embedding for the query
@@ -252,16 +303,13 @@ class EmbeddingStore:
         # Query Weaviate
         result = (
             self.client.query
-            .get("Email", ["content", "subject", "sender", "timestamp", "email_id", "metadata"])
-            .with_where({
-                "path": ["user_id"],
-                "operator": "Equal",
-                "valueString": user_id
-            })
+            .get("Email", WEAVIATE_RESULT_FIELDS)
+            .with_where((filters or EmailFilter()).to_weaviate(user_id))
             .with_near_vector({
                 "vector": query_embedding,
                 "certainty": score_threshold
             })
+            .with_additional(["certainty"])
             .with_limit(limit)
             .do()
         )
@@ -272,27 +320,80 @@ class EmbeddingStore:
             for item in result["data"]["Get"]["Email"]:
                 similar_emails.append({
                     "content": item["content"],
-                    "metadata": {
-                        "subject": item["subject"],
-                        "sender": item["sender"],
-                        "timestamp": item["timestamp"],
-                        "email_id": item["email_id"],
-                        **eval(item["metadata"])  # Convert string back to dict
-                    },
+                    "metadata": result_metadata(item),
                     "similarity_score": item.get("_additional", {}).get("certainty", 0)
                 })
         
         return similar_emails
     
-    def delete_email_embedding(self, email_id: str) -> bool:
+    def get_emails_by_priority(
+        self,
+        user_id: str,
+        category: Optional[str] = None,
+        min_priority: Optional[str] = None,
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        List a user's stored emails, most important and most recent first (Weaviate only).
+
+        Filtering and sorting run in Weaviate on the native category and priority_rank
+        properties, so only the requested page of results is transferred.
+
+        Args:
+            user_id (str): ID of the user whose emails are listed
+            category (str, optional): Only emails classified in this category
+            min_priority (str, optional): Only emails at or above this priority level (e.g. 'High')
+            limit (int): Maximum number of results to return
+
+        Returns:
+            List[Dict[str, Any]]: Emails with their content and metadata
+        """
+        if self.provider != "weaviate":
+            raise ValueError("Listing emails by priority requires the weaviate provider")
+
+        where = EmailFilter(categories=category or None, min_priority=min_priority or None).to_weaviate(user_id)
+
+        result = (
+            self.client.query
+            .get("Email", WEAVIATE_RESULT_FIELDS)
+            .with_where(where)
+            .with_sort([{"path": ["priority_rank"], "order": "desc"}, {"path": ["timestamp"], "order": "desc"}])
+            .with_limit(limit)
+            .do()
+        )
+
+        items = result.get("data", {}).get("Get", {}).get("Email") or []
+        return [{"content": item["content"], "metadata": result_metadata(item)} for item in items]
+
+    def _query_local(
+        self,
+        query: str,
+        user_id: str,
+        limit: int = 5,
+        score_threshold: float = 0.7,
+        filters: Optional[EmailFilter] = None
+    ) -> List[Dict[str, Any]]:
+        """Query the local hybrid index, fusing BM25 and vector rankings over the emails matching the filters"""
+        query_embedding = self.embeddings.embed_query(query)
+        results = self.retriever.search(user_id, query, query_embedding, limit, filters)
+
+        # Strong term matches (an invoice number, a name) are kept even when their embedding is not
+        # similar enough; sharing a single common word with the query is not enough
+        return [
+            result for result in results
+            if result["similarity_score"] >= score_threshold or result["bm25_normalized"] >= HYBRID_MIN_TERM_SCORE
+        ]
+
+    def delete_email_embedding(self, email_id: str, user_id: str) -> bool:
         """
         Delete an email embedding from the vector database.
         
         Args:
             email_id (str): ID of the email embedding to delete
+            user_id (str): ID of the user who owns the email
             
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if successful, False otherwise (for the local index: if the user had no such email)
         """
         logger.info(f"Deleting embedding for email {email_id}")
         
@@ -301,7 +402,14 @@ class EmbeddingStore:
                 self.index.delete(ids=[email_id])
             elif self.provider == "weaviate":
                 self.client.data_object.delete(email_id, "Email")
+            elif self.provider == "local":
+                return self.retriever.remove(email_id, user_id)
             return True
         except Exception as e:
             logger.error(f"Error deleting embedding: {str(e)}")
             return False
+
+    def close(self):
+        """Persist pending local index changes; a no-op for the hosted providers"""
+        if self.provider == "local":
+            self.retriever.close()
@@ -0,0 +1,172 @@
+"""
+Gmail API quota accounting for Notaic
+Executes Gmail API requests with per-user quota throttling, retries and usage reporting
+"""
+import os
+import time
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from googleapiclient.errors import HttpError
+
+from services.monitoring import monitoring_service
+from services.openai_scheduler import TokenBucket
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Quota units charged per Gmail API method
+# See https://developers.google.com/gmail/api/reference/quota
+GMAIL_QUOTA_UNITS = {
+    "getProfile": 1,
+    "labels.list": 1,
+    "history.list": 2,
+    "messages.list": 5,
+    "messages.get": 5,
+    "messages.modify": 5,
+    "messages.trash": 5,
+    "messages.send": 100,
+    "drafts.list": 5,
+    "drafts.get": 5,
+    "drafts.create": 10,
+    "drafts.delete": 10,
+    "drafts.update": 15,
+    "drafts.send": 100,
+    "threads.list": 10,
+    "threads.get": 10,
+}
+DEFAULT_QUOTA_UNITS = 5
+
+# Error reasons Gmail uses for per-user and per-project rate limiting
+RATE_LIMIT_REASONS = {"userRateLimitExceeded", "rateLimitExceeded"}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def gmail_method_name(request) -> str:
+    """Return the short Gmail method name of a request, e.g. 'messages.list'"""
+    method_id = getattr(request, "methodId", None) or ""
+    return method_id.replace("gmail.users.", "", 1) or "unknown"
+
+
+class GmailRequestExecutor:
+    """
+    Executes Gmail API requests on behalf of users.
+
+    Each user gets a token bucket of quota units (Gmail enforces a per-user
+    moving average of 250 units per second), so requests are delayed before
+    they would exceed the limit instead of failing with 429. Requests that
+    are rate limited anyway, or hit a 5xx, are retried with jittered
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        units_per_second: int = 250,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 32.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize the executor.
+
+        Args:
+            units_per_second (int): Per-user quota units allowed per second
+            max_retries (int): Retries per request before the error is re-raised
+            base_delay (float): First backoff delay in seconds
+            max_delay (float): Upper bound for a single backoff delay in seconds
+        """
+        self.units_per_second = units_per_second
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._sleep = sleep
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.units_per_second * 60, burst_seconds=1.0, clock=self._clock)
+            self._buckets[user_id] = bucket
+        return bucket
+
+    def throttle(self, user_id: str, units: int) -> float:
+        """
+        Wait until the user has `units` of quota available, then charge them.
+
+        Returns:
+            float: Time spent waiting in seconds
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                bucket = self._bucket(user_id)
+                delay = bucket.time_until(units)
+                if delay <= 0:
+                    bucket.consume(units)
+                    return waited
+            self._sleep(delay)
+            waited += delay
+
+    @staticmethod
+    def _error_reasons(error: HttpError):
+        details = error.error_details if isinstance(error.error_details, list) else []
+        return {detail.get("reason") for detail in details if isinstance(detail, dict)}
+
+    def _is_retryable(self, error: HttpError) -> bool:
+        if error.resp.status in RETRYABLE_STATUSES:
+            return True
+        return error.resp.status == 403 and bool(self._error_reasons(error) & RATE_LIMIT_REASONS)
+
+    def _retry_delay(self, error: HttpError, attempt: int) -> float:
+        retry_after = error.resp.get("retry-after") if hasattr(error.resp, "get") else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def execute(self, request, user_id: str, method: Optional[str] = None) -> Any:
+        """
+        Execute a Gmail API request with throttling, retries and quota accounting.
+
+        Args:
+            request: A googleapiclient HttpRequest (anything with `.execute()`)
+            user_id (str): ID of the user whose quota the request consumes
+            method (str, optional): Gmail method name (derived from the request if omitted)
+
+        Returns:
+            Any: The decoded API response
+        """
+        method = method or gmail_method_name(request)
+        units = GMAIL_QUOTA_UNITS.get(method, DEFAULT_QUOTA_UNITS)
+
+        attempt = 0
+        while True:
+            self.throttle(user_id, units)
+            # Gmail charges quota for every attempt, including failed ones
+            monitoring_service.track_gmail_quota(user_id, method, units)
+            try:
+                return request.execute()
+            except HttpError as e:
+                if not self._is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                logger.warning(f"Gmail {method} failed with {e.resp.status}, retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+                attempt += 1
+                self._sleep(delay)
+
+
+# Create the process-wide executor so per-user quotas are shared by all GmailService instances
+gmail_executor = GmailRequestExecutor(
+    units_per_second=int(os.getenv("GMAIL_QUOTA_UNITS_PER_SECOND", "250")),
+    max_retries=int(os.getenv("GMAIL_MAX_RETRIES", "5"))
+)
@@ -0,0 +1,538 @@
+"""
+Hybrid Retrieval for Notaic
+In-process BM25 + dense vector search over a user's emails, fused with reciprocal rank fusion
+"""
+import os
+import re
+import math
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Collection, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.quantization import (
+    QuantizedDenseIndex, EMBEDDING_QUANTIZATION, EMBEDDING_RERANK_DIR, QUANTIZATION_NONE
+)
+from services.ann_index import HNSWIndex
+from services.email_metadata import EmailFilter, to_properties
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constant of reciprocal rank fusion; 60 is the value from the original paper and rarely needs tuning
+RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Candidates taken from each ranking before fusion, as a multiple of the requested results
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "4"))
+# Normalized BM25 score (see BM25Index.reference_score) at which a term match counts without a similar embedding
+HYBRID_MIN_TERM_SCORE = float(os.getenv("HYBRID_MIN_TERM_SCORE", "0.5"))
+# Approximate nearest-neighbor index for dense search: 'none' (exact) or 'hnsw'
+EMBEDDING_ANN = os.getenv("EMBEDDING_ANN", "none").lower()
+# Directory HNSW graphs are persisted to, one file per user; kept in memory only when unset
+EMBEDDING_INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR")
+
+# Keeps identifiers such as "INV-2024-0042", "v2.3" or "jane.doe@acme.com" as single terms
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._@#/-][a-z0-9]+)*")
+_STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have i if in is it its me my of on or our so that the "
+    "their them they this to us was we were will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into BM25 terms.
+
+    Compound identifiers are indexed both whole and split into their parts, so
+    "INV-2024-0042" matches a query for the full number as well as for "0042".
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in _STOP_WORDS:
+            continue
+        terms.append(token)
+        parts = re.split(r"[._@#/-]", token)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part and part not in _STOP_WORDS)
+    return terms
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Hashable]],
+    k: int = RRF_K,
+    weights: Optional[Sequence[float]] = None
+) -> List[Tuple[Hashable, float]]:
+    """
+    Fuse several rankings of document ids.
+
+    Each document scores sum(weight / (k + rank)) over the rankings it appears in,
+    which needs no score normalization between BM25 and cosine similarity.
+
+    Returns:
+        List[Tuple[Hashable, float]]: Document ids with their fused score, best first
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[Hashable, float] = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """Inverted index scoring documents with Okapi BM25"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: Hashable, text: str):
+        """Index a document, replacing an earlier version with the same id"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        terms = tokenize(text)
+        for term, frequency in Counter(terms).items():
+            self.postings[term][doc_id] = frequency
+        self.doc_lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+
+    def remove(self, doc_id: Hashable, text: Optional[str] = None):
+        """Remove a document; passing its text avoids scanning every posting list"""
+        if doc_id not in self.doc_lengths:
+            return
+        terms = set(tokenize(text)) if text is not None else list(self.postings)
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings and postings.pop(doc_id, None) is not None and not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def idf(self, term: str) -> float:
+        """Inverse document frequency of a term"""
+        document_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_lengths) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def reference_score(self, query: str) -> float:
+        """
+        BM25 score of an average-length document containing every indexed query term once.
+
+        Dividing by it puts scores of different queries on one scale: a document
+        matching only a common word of a longer query scores a small fraction of
+        it, while one matching the query's rare terms (an invoice number) scores
+        close to or above 1.
+        """
+        return sum(self.idf(term) for term in set(tokenize(query)) if term in self.postings)
+
+    def search(self, query: str, limit: int = 10, allowed: Optional[Collection[Hashable]] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Score documents against a query.
+
+        Args:
+            query (str): Query text
+            limit (int): Maximum number of results
+            allowed (Collection[Hashable], optional): Only documents with these ids are scored
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to `limit` document ids with their BM25 score, best first
+        """
+        if not self.doc_lengths:
+            return []
+        doc_count = len(self.doc_lengths)
+        average_length = self.total_length / doc_count or 1.0
+        scores: Dict[Hashable, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, frequency in postings.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / average_length
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+class DenseIndex:
+    """
+    Exact cosine similarity search over a growable embedding matrix.
+
+    Vectors are normalized on insert so a query is a single matrix-vector product.
+    Removed rows are swapped with the last row to keep the matrix dense.
+    """
+
+    def __init__(self, dimension: Optional[int] = None, initial_capacity: int = 64):
+        self.dimension = dimension
+        self.ids: List[Hashable] = []
+        self.rows: Dict[Hashable, int] = {}
+        self._capacity = initial_capacity
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The normalized embeddings currently stored, one row per document"""
+        if self._matrix is None:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        return self._matrix[:len(self.ids)]
+
+    def add(self, doc_id: Hashable, vector: Sequence[float]):
+        vector = self.normalize(vector)
+        if self._matrix is None:
+            self.dimension = self.dimension or vector.shape[0]
+            self._matrix = np.zeros((self._capacity, self.dimension), dtype=np.float32)
+        if vector.shape[0] != self.dimension:
+            raise ValueError(f"Expected a {self.dimension}-dimensional vector, got {vector.shape[0]}")
+
+        if doc_id in self.rows:
+            self._matrix[self.rows[doc_id]] = vector
+            return
+        if len(self.ids) == self._matrix.shape[0]:
+            self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+        self.rows[doc_id] = len(self.ids)
+        self._matrix[len(self.ids)] = vector
+        self.ids.append(doc_id)
+
+    def remove(self, doc_id: Hashable):
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self.ids[row] = self.ids[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+
+    def memory_bytes(self) -> int:
+        """Bytes held in RAM for the stored vectors"""
+        return self.matrix.nbytes
+
+    def search(
+        self,
+        vector: Sequence[float],
+        limit: int = 10,
+        allowed: Optional[Collection[Hashable]] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Find the stored vectors most similar to a query vector.
+
+        Args:
+            vector (Sequence[float]): Query vector
+            limit (int): Maximum number of results
+            allowed (Collection[Hashable], optional): Only documents with these ids are scored
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to `limit` document ids with their cosine similarity, best first
+        """
+        if allowed is None:
+            rows = np.arange(len(self.ids))
+            scores = self.matrix @ self.normalize(vector)
+        else:
+            rows = np.fromiter((self.rows[doc_id] for doc_id in allowed if doc_id in self.rows), dtype=np.int64)
+            scores = self._matrix[rows] @ self.normalize(vector) if len(rows) else np.empty(0, dtype=np.float32)
+        if not len(rows):
+            return []
+        limit = min(limit, len(rows))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[rows[i]], float(scores[i])) for i in top]
+
+
+def make_dense_index(user_id: Optional[str] = None, quantization: Optional[str] = None, ann: Optional[str] = None):
+    """
+    Create the dense index for a user.
+
+    With EMBEDDING_ANN=hnsw an HNSW graph is used (persisted with the user's documents to
+    EMBEDDING_INDEX_DIR/{user_id}.hnsw when that directory is set). Otherwise search is exact, over vectors stored as configured by
+    EMBEDDING_QUANTIZATION ('none', 'int8' or 'pq'); quantized indexes keep their float32
+    re-ranking vectors on disk, in an unnamed file of their own under EMBEDDING_RERANK_DIR (or the
+    system temp dir).
+    """
+    if (ann or EMBEDDING_ANN).lower() == "hnsw":
+        path = os.path.join(EMBEDDING_INDEX_DIR, f"{user_id}.hnsw") if EMBEDDING_INDEX_DIR and user_id else None
+        try:
+            return HNSWIndex(path=path)
+        except ImportError as e:
+            logger.warning(f"{e}; falling back to exact search")
+
+    quantization = (quantization or EMBEDDING_QUANTIZATION).lower()
+    if quantization == QUANTIZATION_NONE:
+        return DenseIndex()
+    return QuantizedDenseIndex(mode=quantization, rerank_dir=EMBEDDING_RERANK_DIR)
+
+
+class MetadataColumns:
+    """
+    Columnar copy of the filterable properties of a user's documents.
+
+    An `EmailFilter` is evaluated with vectorized comparisons into a boolean bitmap
+    over all documents; the matching ids then restrict both rankings, so a filtered
+    search never has to over-fetch and discard.
+    """
+
+    CODED = ("category", "sender_address", "sender_domain")
+
+    def __init__(self, initial_capacity: int = 64):
+        self.slots: Dict[Hashable, int] = {}
+        self.ids: List[Optional[Hashable]] = []
+        self._free: List[int] = []
+        self.vocabularies: Dict[str, Dict[str, int]] = {name: {} for name in self.CODED}
+        self.codes = {name: np.full(initial_capacity, -1, dtype=np.int32) for name in self.CODED}
+        self.priority_rank = np.zeros(initial_capacity, dtype=np.int8)
+        self.timestamp = np.full(initial_capacity, np.nan)
+        self.alive = np.zeros(initial_capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _grow(self):
+        for name in self.CODED:
+            self.codes[name] = np.concatenate([self.codes[name], np.full_like(self.codes[name], -1)])
+        self.priority_rank = np.concatenate([self.priority_rank, np.zeros_like(self.priority_rank)])
+        self.timestamp = np.concatenate([self.timestamp, np.full_like(self.timestamp, np.nan)])
+        self.alive = np.concatenate([self.alive, np.zeros_like(self.alive)])
+
+    def set(self, doc_id: Hashable, properties: Dict[str, Any]):
+        """Store (or overwrite) the filterable properties of a document"""
+        slot = self.slots.get(doc_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self.ids[slot] = doc_id
+            else:
+                slot = len(self.ids)
+                if slot == len(self.alive):
+                    self._grow()
+                self.ids.append(doc_id)
+            self.slots[doc_id] = slot
+        for name in self.CODED:
+            vocabulary = self.vocabularies[name]
+            self.codes[name][slot] = vocabulary.setdefault(properties.get(name) or "", len(vocabulary))
+        self.priority_rank[slot] = properties.get("priority_rank") or 0
+        timestamp = properties.get("timestamp_epoch")
+        self.timestamp[slot] = np.nan if timestamp is None else timestamp
+        self.alive[slot] = True
+
+    def remove(self, doc_id: Hashable):
+        slot = self.slots.pop(doc_id, None)
+        if slot is not None:
+            self.alive[slot] = False
+            self.ids[slot] = None
+            self._free.append(slot)
+
+    def mask(self, email_filter: EmailFilter) -> np.ndarray:
+        """Boolean bitmap over slots of the documents matching the filter"""
+        count = len(self.ids)
+        mask = self.alive[:count].copy()
+        for name, values in (
+            ("category", email_filter.categories),
+            ("sender_address", email_filter.senders),
+            ("sender_domain", email_filter.sender_domains)
+        ):
+            if values is not None:
+                vocabulary = self.vocabularies[name]
+                mask &= np.isin(self.codes[name][:count], [vocabulary[value] for value in values if value in vocabulary])
+        # Documents without a timestamp never match a time range (NaN comparisons are false)
+        with np.errstate(invalid="ignore"):
+            if email_filter.since is not None:
+                mask &= self.timestamp[:count] >= email_filter.since
+            if email_filter.until is not None:
+                mask &= self.timestamp[:count] <= email_filter.until
+        if email_filter.min_priority_rank is not None:
+            mask &= self.priority_rank[:count] >= email_filter.min_priority_rank
+        return mask
+
+    def matching_ids(self, email_filter: EmailFilter) -> set:
+        """Ids of the documents matching the filter"""
+        return {self.ids[slot] for slot in np.flatnonzero(self.mask(email_filter))}
+
+
+class UserMemory:
+    """
+    The BM25 and dense indexes, filterable properties and stored documents of one user.
+
+    With an HNSW dense index the documents are kept in (and persisted with) the
+    graph; documents loaded from disk are re-indexed for BM25 and filtering here.
+    """
+
+    def __init__(self, dense=None):
+        self.bm25 = BM25Index()
+        self.dense = dense if dense is not None else DenseIndex()
+        self.columns = MetadataColumns()
+        self.documents: Dict[Hashable, Dict[str, Any]] = {}
+        if isinstance(self.dense, HNSWIndex):
+            self.documents = self.dense.documents
+            for doc_id, document in self.documents.items():
+                self.bm25.add(doc_id, document["content"])
+                self.columns.set(doc_id, document["properties"])
+
+
+class HybridRetriever:
+    """
+    Per-user hybrid retriever.
+
+    Every document is indexed twice: as BM25 terms, which catch exact matches on
+    invoice numbers, product names and people, and as an embedding, which catches
+    paraphrases. The two rankings are fused with reciprocal rank fusion.
+    """
+
+    def __init__(
+        self,
+        rrf_k: int = RRF_K,
+        candidate_multiplier: int = HYBRID_CANDIDATE_MULTIPLIER,
+        quantization: Optional[str] = None,
+        ann: Optional[str] = None
+    ):
+        """
+        Initialize the retriever.
+
+        Args:
+            rrf_k (int): Reciprocal rank fusion constant
+            candidate_multiplier (int): Candidates taken from each ranking per requested result
+            quantization (str, optional): Embedding quantization ('none', 'int8' or 'pq'); EMBEDDING_QUANTIZATION if omitted
+            ann (str, optional): Approximate nearest-neighbor index ('none' or 'hnsw'); EMBEDDING_ANN if omitted
+        """
+        self.rrf_k = rrf_k
+        self.candidate_multiplier = candidate_multiplier
+        self.quantization = quantization
+        self.ann = ann
+        self._users: Dict[str, UserMemory] = {}
+        self._lock = threading.RLock()
+
+    def user_memory(self, user_id: str) -> UserMemory:
+        with self._lock:
+            if user_id not in self._users:
+                self._users[user_id] = UserMemory(make_dense_index(user_id, self.quantization, self.ann))
+            return self._users[user_id]
+
+    def add(
+        self,
+        user_id: str,
+        doc_id: Hashable,
+        content: str,
+        embedding: Sequence[float],
+        metadata: Optional[Dict[str, Any]] = None,
+        properties: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Index a document for a user, replacing an earlier version with the same id.
+
+        `properties` are the filterable fields produced by `to_properties`; they are
+        derived from the email metadata when omitted.
+        """
+        if properties is None:
+            properties = to_properties(metadata or {})
+        with self._lock:
+            memory = self.user_memory(user_id)
+            previous = memory.documents.get(doc_id)
+            if previous is not None:
+                memory.bm25.remove(doc_id, previous["content"])
+            # Stored before the dense insert, which may autosave the graph with the documents
+            memory.documents[doc_id] = {"content": content, "metadata": metadata or {}, "properties": properties}
+            memory.bm25.add(doc_id, content)
+            memory.dense.add(doc_id, embedding)
+            memory.columns.set(doc_id, properties)
+
+    def add_many(self, user_id: str, documents: Iterable[Tuple[Hashable, str, Sequence[float], Optional[Dict[str, Any]]]]):
+        for doc_id, content, embedding, metadata in documents:
+            self.add(user_id, doc_id, content, embedding, metadata)
+
+    def remove(self, doc_id: Hashable, user_id: str) -> bool:
+        """
+        Remove a document from a user's memory.
+
+        The user is required: a persisted memory is only loaded when its user is
+        named, so a document of a user not loaded yet could not be found otherwise.
+
+        Returns:
+            bool: Whether the user had the document
+        """
+        with self._lock:
+            memory = self.user_memory(user_id)
+            if doc_id not in memory.documents:
+                return False
+            document = memory.documents.pop(doc_id)
+            memory.bm25.remove(doc_id, document["content"])
+            memory.dense.remove(doc_id)
+            memory.columns.remove(doc_id)
+            return True
+
+    def close(self):
+        """Close the users' dense indexes, snapshotting persisted HNSW graphs; call on shutdown"""
+        with self._lock:
+            for memory in self._users.values():
+                if isinstance(memory.dense, HNSWIndex):
+                    memory.dense.close()
+
+    def search(
+        self,
+        user_id: str,
+        query: str,
+        query_embedding: Optional[Sequence[float]] = None,
+        limit: int = 5,
+        filters: Optional[EmailFilter] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search a user's documents.
+
+        Args:
+            user_id (str): ID of the user whose documents are searched
+            query (str): Query text for BM25
+            query_embedding (Sequence[float], optional): Query embedding for dense search; BM25 only if omitted
+            limit (int): Maximum number of results
+            filters (EmailFilter, optional): Only documents matching the filter are ranked
+
+        Returns:
+            List[Dict[str, Any]]: Documents with content, metadata, similarity_score (cosine, 0 if
+            only matched by terms), bm25_score, bm25_normalized (bm25_score over the query's
+            reference score) and fusion_score, best first
+        """
+        with self._lock:
+            memory = self.user_memory(user_id)
+            if not memory.documents:
+                return []
+
+            allowed = memory.columns.matching_ids(filters) if filters is not None else None
+            if allowed is not None and not allowed:
+                return []
+
+            candidates = max(limit, limit * self.candidate_multiplier)
+            lexical = memory.bm25.search(query, candidates, allowed)
+            dense = memory.dense.search(query_embedding, candidates, allowed) if query_embedding is not None else []
+            # Only documents that are still stored are returned
+            dense = [(doc_id, score) for doc_id, score in dense if doc_id in memory.documents]
+            fused = reciprocal_rank_fusion(
+                [[doc_id for doc_id, _ in dense], [doc_id for doc_id, _ in lexical]],
+                k=self.rrf_k
+            )[:limit]
+
+            dense_scores, lexical_scores = dict(dense), dict(lexical)
+            reference = memory.bm25.reference_score(query) or 1.0
+            return [
+                {
+                    "content": memory.documents[doc_id]["content"],
+                    "metadata": memory.documents[doc_id]["metadata"],
+                    "similarity_score": dense_scores.get(doc_id, 0.0),
+                    "bm25_score": lexical_scores.get(doc_id, 0.0),
+                    "bm25_normalized": lexical_scores.get(doc_id, 0.0) / reference,
+                    "fusion_score": score
+                }
+                for doc_id, score in fused
+            ]
@@ -0,0 +1,253 @@
+"""
+Outbound Mail Queue for Notaic
+Sends transactional email through SES from a background worker pool, paced to the account's send rate
+"""
+import os
+import time
+import queue
+import random
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+from config.settings import settings
+from services.monitoring import monitoring_service
+from services.openai_scheduler import TokenBucket
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Threads sending mail at once (each SES call is a blocking HTTPS round trip)
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", "4"))
+# Messages allowed to wait for a worker before new ones are refused
+MAIL_MAX_QUEUE = int(os.getenv("MAIL_MAX_QUEUE", "1000"))
+# Send attempts per message before it is given up on
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+# Messages per second; 0 reads the account's MaxSendRate from SES (1/s in the sandbox)
+SES_MAX_SEND_RATE = float(os.getenv("SES_MAX_SEND_RATE", "0"))
+# Seconds to keep sending queued mail when the app shuts down
+MAIL_SHUTDOWN_TIMEOUT = float(os.getenv("MAIL_SHUTDOWN_TIMEOUT", "10"))
+
+# SES error codes worth retrying; anything else (e.g. MessageRejected) fails the message
+RETRYABLE_ERRORS = {"Throttling", "ThrottlingException", "ServiceUnavailable", "InternalFailure", "RequestTimeout"}
+
+
+def make_ses_client():
+    return boto3.client(
+        'ses',
+        region_name=settings.aws_region,
+        aws_access_key_id=settings.aws_access_key_id,
+        aws_secret_access_key=settings.aws_secret_access_key
+    )
+
+
+class OutboundMail:
+    """A queued SES SendEmail request"""
+
+    __slots__ = ("message", "description", "attempts", "queued_at")
+
+    def __init__(self, message: Dict[str, Any], description: str, queued_at: float):
+        self.message = message
+        self.description = description
+        self.attempts = 0
+        self.queued_at = queued_at
+
+
+class MailQueue:
+    """
+    Background delivery of SES SendEmail requests.
+
+    Request handlers enqueue a message and return; `workers` threads send it.
+    Every send first takes a token from a bucket refilled at the SES send rate
+    shared by all workers, so bursts of signups queue up here instead of being
+    throttled by SES. Throttling and transient errors are retried with
+    full-jitter exponential backoff, and a throttle also empties the bucket so
+    the other workers slow down too. The queue lives in memory: mail still
+    waiting when the process is killed is lost, which is why shutdown() drains it.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any] = make_ses_client,
+        workers: int = MAIL_WORKERS,
+        max_queue: int = MAIL_MAX_QUEUE,
+        max_attempts: int = MAIL_MAX_ATTEMPTS,
+        max_send_rate: float = SES_MAX_SEND_RATE,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.client_factory = client_factory
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.max_send_rate = max_send_rate
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._sleep = sleep
+
+        self.client = None
+        self._queue: "queue.Queue[Optional[OutboundMail]]" = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._bucket = None
+        self._bucket_lock = threading.Lock()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._start_lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """Messages waiting for a worker"""
+        return self._queue.qsize()
+
+    def start(self):
+        """Create the SES client and start the workers; called at application startup, else by the first enqueue"""
+        with self._start_lock:
+            if self._threads:
+                return
+            self.client = self.client_factory()
+            rate = self.max_send_rate or self._account_send_rate()
+            # No burst: sends are spaced 1/rate apart, so no one-second window SES looks at exceeds the rate
+            self._bucket = TokenBucket(rate * 60, burst_seconds=1.0 / rate, clock=self._clock)
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"mail-queue-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Mail queue started with {self.workers} workers at {rate:g} messages/s")
+
+    def _account_send_rate(self) -> float:
+        try:
+            return float(self.client.get_send_quota()["MaxSendRate"])
+        except (BotoCoreError, ClientError, KeyError) as e:
+            logger.warning(f"Could not read the SES send quota, assuming the sandbox rate: {e}")
+            return 1.0
+
+    def enqueue(self, message: Dict[str, Any], description: str) -> bool:
+        """
+        Queue an SES SendEmail request for delivery.
+
+        Args:
+            message (Dict[str, Any]): Keyword arguments for `send_email`
+            description (str): What the message is, for logs (e.g. "Verification email to jane@acme.com")
+
+        Returns:
+            bool: Whether the message was accepted; False when the queue is full
+        """
+        if not self._threads:
+            self.start()
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(OutboundMail(message, description, self._clock()))
+        except queue.Full:
+            self._done()
+            logger.error(f"Mail queue is full, dropping {description}")
+            monitoring_service.track_outbound_mail("rejected", self.queue_depth)
+            return False
+        monitoring_service.track_outbound_mail("queued", self.queue_depth)
+        return True
+
+    def _done(self):
+        with self._idle:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def _work(self):
+        while True:
+            mail = self._queue.get()
+            if mail is None:
+                return
+            try:
+                self._deliver(mail)
+            except Exception as e:
+                logger.error(f"Unexpected error sending {mail.description}: {e}")
+            finally:
+                self._done()
+
+    def _acquire_send(self):
+        """Block until the shared send rate allows one more message"""
+        while True:
+            with self._bucket_lock:
+                delay = self._bucket.time_until(1)
+                if delay <= 0:
+                    self._bucket.consume(1)
+                    return
+            self._sleep(delay)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, ClientError):
+            details = error.response.get("Error", {})
+            # SES also reports an exhausted daily quota as Throttling; retrying will not help
+            if "daily message quota" in details.get("Message", "").lower():
+                return False
+            return details.get("Code") in RETRYABLE_ERRORS
+        # Connection errors and timeouts from botocore
+        return isinstance(error, BotoCoreError)
+
+    def _deliver(self, mail: OutboundMail) -> bool:
+        while True:
+            self._acquire_send()
+            mail.attempts += 1
+            try:
+                response = self.client.send_email(**mail.message)
+            except (BotoCoreError, ClientError) as e:
+                if not self._is_retryable(e) or mail.attempts >= self.max_attempts:
+                    logger.error(f"Error sending {mail.description} after {mail.attempts} attempts: {e}")
+                    monitoring_service.track_outbound_mail("failed", self.queue_depth, retries=mail.attempts - 1)
+                    return False
+                if isinstance(e, ClientError) and e.response.get("Error", {}).get("Code", "").startswith("Throttling"):
+                    # The send rate is per account, so every worker has to slow down
+                    with self._bucket_lock:
+                        self._bucket.drain()
+                delay = self._backoff_delay(mail.attempts - 1)
+                logger.warning(f"Sending {mail.description} failed ({e}), retrying in {delay:.2f}s (attempt {mail.attempts}/{self.max_attempts})")
+                self._sleep(delay)
+                continue
+
+            delivery_ms = int((self._clock() - mail.queued_at) * 1000)
+            logger.info(f"{mail.description} sent! Message ID: {response['MessageId']}")
+            monitoring_service.track_outbound_mail("sent", self.queue_depth, delivery_ms, mail.attempts - 1)
+            return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued message has been sent or given up on.
+
+        Returns:
+            bool: False if messages were still pending after `timeout` seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: float = MAIL_SHUTDOWN_TIMEOUT):
+        """Send what is queued (for up to `timeout` seconds) and stop the workers"""
+        if not self._threads:
+            return
+        if not self.flush(timeout):
+            logger.error(f"Shutting down with {self._pending} messages still queued")
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+
+
+# Global mail queue instance
+mail_queue = MailQueue()
@@ -62,6 +62,53 @@ class MonitoringService:
             "api_calls": defaultdict(int)
         }
         
+        # OpenAI scheduler metrics per priority lane
+        self.openai_requests = defaultdict(lambda: {
+            "requests": 0,
+            "retries": 0,
+            "failed": 0,
+            "total_wait_ms": 0
+        })
+        
+        # Gmail API quota units, overall and for the current/last processing run
+        self.gmail_quota = {
+            "total_units": 0,
+            "by_method": defaultdict(int),
+            "current_run": None,
+            "last_run": None
+        }
+        
+        # Gmail message reads per fetch profile (bytes transferred and parse time)
+        self.gmail_fetch = defaultdict(lambda: {
+            "requests": 0,
+            "bytes": 0,
+            "parse_ms": 0.0
+        })
+        
+        # Password hashing pool: calls per operation, time queued for a thread, and queue depth
+        self.password_hashing = {
+            "operations": defaultdict(lambda: {
+                "requests": 0,
+                "rejected": 0,
+                "total_wait_ms": 0
+            }),
+            "rehashes": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0
+        }
+        
+        # Outbound mail queue: messages by outcome, send retries, time from enqueue to SES accepting it
+        self.outbound_mail = {
+            "queued": 0,
+            "sent": 0,
+            "failed": 0,
+            "rejected": 0,
+            "retries": 0,
+            "total_delivery_ms": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0
+        }
+        
         # Current minute for rate tracking
         self.current_minute = datetime.now().strftime("%Y-%m-%d %H:%M")
         
@@ -150,6 +197,122 @@ class MonitoringService:
         if user_id:
             self.user_activity[user_id] += 1
     
+    def track_openai_request(self, lane: str, wait_ms: int, retries: int = 0, error: str = None):
+        """
+        Track an OpenAI call made through the request scheduler
+        
+        Args:
+            lane (str): Priority lane of the call (e.g., 'interactive', 'background')
+            wait_ms (int): Time spent waiting for admission in milliseconds
+            retries (int): Number of retries before the call finished
+            error (str, optional): Error message if the call ultimately failed
+        """
+        stats = self.openai_requests[lane]
+        stats["requests"] += 1
+        stats["retries"] += retries
+        stats["total_wait_ms"] += wait_ms
+        
+        if error:
+            stats["failed"] += 1
+            self.errors.append({
+                "timestamp": datetime.now().isoformat(),
+                "stage": f"openai:{lane}",
+                "error": error
+            })
+    
+    def track_gmail_quota(self, user_id: str, method: str, units: int):
+        """
+        Track Gmail API quota units consumed by a request
+        
+        Args:
+            user_id (str): User whose quota was charged
+            method (str): Gmail API method (e.g., 'messages.list', 'drafts.create')
+            units (int): Quota units charged for the request
+        """
+        self.gmail_quota["total_units"] += units
+        self.gmail_quota["by_method"][method] += units
+        
+        run = self.gmail_quota["current_run"]
+        if run is not None:
+            run["units"] += units
+            run["by_method"][method] = run["by_method"].get(method, 0) + units
+            run["by_user"][user_id] = run["by_user"].get(user_id, 0) + units
+    
+    def track_gmail_fetch(self, profile: str, requests: int, bytes_transferred: int, parse_ms: float):
+        """
+        Track Gmail message reads for a mailbox
+        
+        Args:
+            profile (str): Fetch profile used (e.g., 'full', 'partial', 'metadata', 'body')
+            requests (int): Number of message reads
+            bytes_transferred (int): Response bytes received
+            parse_ms (float): Time spent decoding and parsing the responses in milliseconds
+        """
+        stats = self.gmail_fetch[profile]
+        stats["requests"] += requests
+        stats["bytes"] += bytes_transferred
+        stats["parse_ms"] += parse_ms
+    
+    def track_password_hash(self, operation: str, wait_ms: int, queue_depth: int, rejected: bool = False):
+        """
+        Track a call to the password hashing pool
+        
+        Args:
+            operation (str): 'hash' or 'verify'
+            wait_ms (int): Time the call waited for a thread in milliseconds
+            queue_depth (int): Calls waiting for a thread when this one was submitted
+            rejected (bool): Whether the call was refused because the queue was full
+        """
+        stats = self.password_hashing["operations"][operation]
+        stats["requests"] += 1
+        stats["total_wait_ms"] += wait_ms
+        if rejected:
+            stats["rejected"] += 1
+        self.password_hashing["queue_depth"] = queue_depth
+        self.password_hashing["max_queue_depth"] = max(self.password_hashing["max_queue_depth"], queue_depth)
+    
+    def track_password_rehash(self):
+        """Track a stored password hash upgraded to the current cost at sign-in"""
+        self.password_hashing["rehashes"] += 1
+    
+    def track_outbound_mail(self, status: str, queue_depth: int, delivery_ms: int = 0, retries: int = 0):
+        """
+        Track a message going through the outbound mail queue
+        
+        Args:
+            status (str): 'queued', 'sent', 'failed' or 'rejected' (queue full)
+            queue_depth (int): Messages waiting for a worker
+            delivery_ms (int): Time from enqueue until SES accepted the message in milliseconds
+            retries (int): Send attempts that failed before this outcome
+        """
+        self.outbound_mail[status] += 1
+        self.outbound_mail["retries"] += retries
+        self.outbound_mail["total_delivery_ms"] += delivery_ms
+        self.outbound_mail["queue_depth"] = queue_depth
+        self.outbound_mail["max_queue_depth"] = max(self.outbound_mail["max_queue_depth"], queue_depth)
+    
+    def start_gmail_quota_run(self):
+        """Start accounting Gmail quota for a new processing run"""
+        self.gmail_quota["current_run"] = {
+            "started_at": datetime.now().isoformat(),
+            "units": 0,
+            "by_method": {},
+            "by_user": {}
+        }
+    
+    def finish_gmail_quota_run(self) -> Dict[str, Any]:
+        """
+        Finish the current Gmail quota run
+        
+        Returns:
+            Dict[str, Any]: Quota consumed during the run
+        """
+        run = self.gmail_quota["current_run"] or {"started_at": None, "units": 0, "by_method": {}, "by_user": {}}
+        run["finished_at"] = datetime.now().isoformat()
+        self.gmail_quota["last_run"] = run
+        self.gmail_quota["current_run"] = None
+        return run
+    
     def get_metrics(self) -> Dict[str, Any]:
         """
         Get all metrics as a dictionary
@@ -187,6 +350,45 @@ class MonitoringService:
                     "per_minute": api_rates
                 }
             },
+            "openai": {
+                lane: {
+                    **stats,
+                    "avg_wait_ms": stats["total_wait_ms"] / stats["requests"] if stats["requests"] else 0
+                }
+                for lane, stats in self.openai_requests.items()
+            },
+            "gmail_quota": {
+                "total_units": self.gmail_quota["total_units"],
+                "by_method": dict(self.gmail_quota["by_method"]),
+                "current_run": self.gmail_quota["current_run"],
+                "last_run": self.gmail_quota["last_run"]
+            },
+            "gmail_fetch": {
+                profile: {
+                    **stats,
+                    "avg_bytes": stats["bytes"] / stats["requests"] if stats["requests"] else 0
+                }
+                for profile, stats in self.gmail_fetch.items()
+            },
+            "password_hashing": {
+                "operations": {
+                    operation: {
+                        **stats,
+                        "avg_wait_ms": stats["total_wait_ms"] / stats["requests"] if stats["requests"] else 0
+                    }
+                    for operation, stats in self.password_hashing["operations"].items()
+                },
+                "rehashes": self.password_hashing["rehashes"],
+                "queue_depth": self.password_hashing["queue_depth"],
+                "max_queue_depth": self.password_hashing["max_queue_depth"]
+            },
+            "outbound_mail": {
+                **self.outbound_mail,
+                "avg_delivery_ms": (
+                    self.outbound_mail["total_delivery_ms"] / self.outbound_mail["sent"]
+                    if self.outbound_mail["sent"] else 0
+                )
+            },
             "errors": list(self.errors),
             "users": {
                 "active_count": len(self.user_activity),
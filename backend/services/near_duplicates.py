@@ -0,0 +1,269 @@
+"""
+Near-duplicate detection for Notaic
+MinHash signatures with locality-sensitive hashing to collapse near-identical texts before embedding
+"""
+import os
+import re
+import zlib
+import hashlib
+import logging
+from typing import Hashable, Optional, Tuple
+
+import numpy as np
+
+from services.openai_scheduler import estimate_text_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Mersenne prime used for the universal hash family (fits the products in uint64)
+_PRIME = np.uint64((1 << 31) - 1)
+
+DEFAULT_JACCARD_THRESHOLD = float(os.getenv("STYLE_INDEX_DEDUP_THRESHOLD", "0.8"))
+
+# np.trapz was renamed in NumPy 2.0 and is deprecated there
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz
+
+# Kept signatures per allocation (128 KiB at 128 permutations)
+_SIGNATURE_CHUNK = 1024
+
+# Two different MinHash values agree in their low byte with probability 1/256
+_CHANCE_MATCH = 1 / 256
+
+
+def shingles(text: str, size: int = 5) -> set:
+    """
+    Split text into overlapping character shingles after normalizing case and whitespace.
+
+    Character shingles suit short emails: changing a name or a date in a templated
+    reply only touches a handful of shingles, so the Jaccard similarity stays high.
+    """
+    normalized = re.sub(r"\s+", " ", text.lower()).strip()
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def optimal_bands(threshold: float, num_perm: int, false_negative_weight: float = 0.7) -> Tuple[int, int]:
+    """
+    Pick the LSH band count and rows per band for a Jaccard threshold.
+
+    Two texts with similarity s share a bucket with probability 1 - (1 - s^r)^b.
+    The split minimizing the weighted area of false positives (below the threshold)
+    and false negatives (above it) is used. Candidates are verified against the
+    threshold afterwards, so false negatives are weighted more heavily.
+    """
+    below = np.linspace(0, threshold, 50)
+    above = np.linspace(threshold, 1, 50)
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_positive = _trapezoid(1 - (1 - below ** rows) ** bands, below)
+            false_negative = _trapezoid((1 - above ** rows) ** bands, above)
+            error = (1 - false_negative_weight) * false_positive + false_negative_weight * false_negative
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+class CompactHashSet:
+    """
+    Set of 64-bit hashes kept in a sorted numpy array (8 bytes each).
+
+    New hashes collect in a small Python set and are merged into the array once
+    `merge_every` have accumulated, so adding stays cheap and the bulk of the set
+    carries no per-entry object overhead.
+    """
+
+    def __init__(self, merge_every: int = 4096):
+        self.merge_every = merge_every
+        self._sorted = np.empty(0, dtype=np.uint64)
+        self._recent = set()
+
+    def contains_any(self, hashes: np.ndarray) -> bool:
+        if any(int(value) in self._recent for value in hashes):
+            return True
+        if not len(self._sorted):
+            return False
+        positions = np.minimum(np.searchsorted(self._sorted, hashes), len(self._sorted) - 1)
+        return bool(np.any(self._sorted[positions] == hashes))
+
+    def update(self, hashes: np.ndarray):
+        self._recent.update(int(value) for value in hashes)
+        if len(self._recent) >= self.merge_every:
+            recent = np.fromiter(self._recent, dtype=np.uint64, count=len(self._recent))
+            self._sorted = np.union1d(self._sorted, recent)
+            self._recent.clear()
+
+    def __len__(self):
+        return len(self._sorted) + len(self._recent)
+
+
+class CompactHashIndex:
+    """
+    Multimap from 64-bit hashes to row numbers, kept in two parallel numpy arrays
+    sorted by hash (12 bytes per entry).
+
+    New entries collect in a small dict and are merged into the arrays once
+    `merge_every` have accumulated, as in `CompactHashSet`.
+    """
+
+    def __init__(self, merge_every: int = 1024):
+        self.merge_every = merge_every
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._rows = np.empty(0, dtype=np.uint32)
+        self._recent = {}
+        self._pending = 0
+
+    def lookup(self, hashes: np.ndarray) -> set:
+        """Rows stored under any of the hashes"""
+        rows = set()
+        for value in hashes:
+            rows.update(self._recent.get(int(value), ()))
+        if len(self._hashes):
+            starts = np.searchsorted(self._hashes, hashes, side="left")
+            ends = np.searchsorted(self._hashes, hashes, side="right")
+            for start, end in zip(starts, ends):
+                rows.update(self._rows[start:end].tolist())
+        return rows
+
+    def add(self, hashes: np.ndarray, row: int):
+        for value in hashes:
+            self._recent.setdefault(int(value), []).append(row)
+        self._pending += len(hashes)
+        if self._pending >= self.merge_every:
+            hashes = np.fromiter((value for value, rows in self._recent.items() for _ in rows), dtype=np.uint64, count=self._pending)
+            rows = np.fromiter((row for rows in self._recent.values() for row in rows), dtype=np.uint32, count=self._pending)
+            order = np.argsort(hashes, kind="stable")
+            positions = np.searchsorted(self._hashes, hashes[order], side="right")
+            self._hashes = np.insert(self._hashes, positions, hashes[order])
+            self._rows = np.insert(self._rows, positions, rows[order])
+            self._recent.clear()
+            self._pending = 0
+
+    def __len__(self):
+        return len(self._hashes) + self._pending
+
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate filter.
+
+    Texts are added one at a time. A text sharing an LSH band with an earlier kept
+    text is a candidate; it is collapsed only if the Jaccard similarity estimated
+    from the two MinHash signatures is at least the threshold, so band collisions
+    between merely similar texts never drop a reply. The estimate from 128
+    permutations has a standard deviation of about 0.035, so pairs right at the
+    threshold go either way, but pairs clearly below it are kept.
+
+    Each kept text leaves the low byte of every MinHash value (b-bit MinHash, with
+    the estimate corrected for chance agreement of the low bytes) and one 64-bit
+    hash per band: about 220 bytes at the default settings. Exact duplicates are
+    caught by a content hash before any MinHash work is done.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_JACCARD_THRESHOLD,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        seed: int = 1
+    ):
+        """
+        Initialize the filter.
+
+        Args:
+            threshold (float): Jaccard similarity at or above which texts count as duplicates
+            num_perm (int): Number of MinHash permutations (signature length)
+            shingle_size (int): Characters per shingle
+            seed (int): Seed for the hash permutations (fixed so signatures are reproducible)
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, int(_PRIME), size=(num_perm, 1)).astype(np.uint64)
+        self._b = generator.randint(0, int(_PRIME), size=(num_perm, 1)).astype(np.uint64)
+
+        self._exact = CompactHashSet()
+        self._band_index = CompactHashIndex()
+        # Fixed-size chunks, so growing never copies the signatures kept so far
+        self._signatures = []
+        self._kept = 0
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the kept/collapsed counters, e.g. after seeding the filter with already indexed texts"""
+        self.stats = {"kept": 0, "collapsed": 0, "tokens_saved": 0}
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a text"""
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text, self.shingle_size)),
+            dtype=np.uint64
+        )
+        # In place, so a long text allocates one num_perm x shingles matrix rather than three
+        products = self._a * hashes
+        products += self._b
+        products %= _PRIME
+        return products.min(axis=1)
+
+    def band_hashes(self, signature: np.ndarray) -> np.ndarray:
+        """Hash each LSH band of a signature, together with its band number, to 64 bits"""
+        # Signature values are below 2^31, so uint32 holds them exactly
+        bands = signature[:self.bands * self.rows].astype(np.uint32).reshape(self.bands, self.rows)
+        return np.array([
+            int.from_bytes(hashlib.blake2b(bytes([band]) + rows.tobytes(), digest_size=8).digest(), "big")
+            for band, rows in enumerate(bands)
+        ], dtype=np.uint64)
+
+    def similarity(self, signature: np.ndarray, row: int) -> float:
+        """Jaccard similarity estimated between a signature and a kept text's signature"""
+        chunk, offset = divmod(row, _SIGNATURE_CHUNK)
+        agreement = np.mean(self._signatures[chunk][offset] == signature.astype(np.uint8))
+        return float((agreement - _CHANCE_MATCH) / (1 - _CHANCE_MATCH))
+
+    def is_duplicate(self, text: str, signature: Optional[np.ndarray] = None,
+                     band_hashes: Optional[np.ndarray] = None) -> bool:
+        """Whether the text shares an LSH band with a kept text that it is at least `threshold` similar to"""
+        signature = self.signature(text) if signature is None else signature
+        band_hashes = self.band_hashes(signature) if band_hashes is None else band_hashes
+        return any(self.similarity(signature, row) >= self.threshold for row in self._band_index.lookup(band_hashes))
+
+    def add(self, key: Hashable, text: str) -> bool:
+        """
+        Offer a text to the filter.
+
+        Args:
+            key (Hashable): Identifier of the text (e.g. the email ID), used for logging only
+
+        Returns:
+            bool: True if the text was kept, False if it duplicates an earlier text
+        """
+        # 8 bytes of the content hash are plenty to tell a mailbox's replies apart
+        digest = np.array([int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")], dtype=np.uint64)
+        duplicate = self._exact.contains_any(digest)
+        if not duplicate:
+            signature = self.signature(text)
+            band_hashes = self.band_hashes(signature)
+            duplicate = self.is_duplicate(text, signature, band_hashes)
+
+        if duplicate:
+            logger.debug(f"Collapsed near-duplicate text {key}")
+            self.stats["collapsed"] += 1
+            self.stats["tokens_saved"] += estimate_text_tokens(text)
+            return False
+
+        chunk, offset = divmod(self._kept, _SIGNATURE_CHUNK)
+        if chunk == len(self._signatures):
+            self._signatures.append(np.empty((_SIGNATURE_CHUNK, self.num_perm), dtype=np.uint8))
+        self._signatures[chunk][offset] = signature.astype(np.uint8)
+        self._band_index.add(band_hashes, self._kept)
+        self._kept += 1
+        self._exact.update(digest)
+        self.stats["kept"] += 1
+        return True
@@ -0,0 +1,148 @@
+"""
+OpenAI Batch API support for Notaic
+Collects chat completion requests into a JSONL batch job, submits it and reads back the results
+"""
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from openai import OpenAI
+
+from config.settings import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Batch statuses after which the job will not change anymore
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class OpenAIBatchJob:
+    """
+    A single OpenAI Batch API job.
+
+    Requests are added with a caller-chosen `custom_id`, which is how results
+    are matched back to their requests once the batch completes.
+    """
+
+    def __init__(
+        self,
+        client: Optional[OpenAI] = None,
+        endpoint: str = "/v1/chat/completions",
+        completion_window: str = "24h",
+        batch_id: Optional[str] = None
+    ):
+        """
+        Initialize the batch job.
+
+        Args:
+            client (OpenAI, optional): OpenAI client to use (a client with the configured API key is created otherwise)
+            endpoint (str): API endpoint every request in the batch targets
+            completion_window (str): Completion window requested from the Batch API
+            batch_id (str, optional): ID of an already submitted batch to attach to
+        """
+        self.client = client or OpenAI(api_key=settings.openai_api_key)
+        self.endpoint = endpoint
+        self.completion_window = completion_window
+        self.batch_id = batch_id
+        self.requests: List[Dict[str, Any]] = []
+
+    def __len__(self):
+        return len(self.requests)
+
+    def add(self, custom_id: str, body: Dict[str, Any]):
+        """
+        Add a request to the batch.
+
+        Args:
+            custom_id (str): Unique ID used to match the result to this request
+            body (Dict[str, Any]): Request body, e.g. chat completion arguments
+        """
+        if self.batch_id:
+            raise ValueError("Cannot add requests to a batch that was already submitted")
+        self.requests.append({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": self.endpoint,
+            "body": body
+        })
+
+    def to_jsonl(self) -> bytes:
+        """Serialize the batch input file"""
+        return "\n".join(json.dumps(request) for request in self.requests).encode("utf-8")
+
+    def submit(self, metadata: Optional[Dict[str, str]] = None) -> str:
+        """
+        Upload the input file and create the batch.
+
+        Returns:
+            str: ID of the created batch
+        """
+        if not self.requests:
+            raise ValueError("Cannot submit an empty batch")
+
+        input_file = self.client.files.create(
+            file=("batch_input.jsonl", self.to_jsonl()),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=self.endpoint,
+            completion_window=self.completion_window,
+            metadata=metadata
+        )
+        self.batch_id = batch.id
+        logger.info(f"Submitted batch {batch.id} with {len(self.requests)} requests")
+        return batch.id
+
+    def retrieve(self):
+        """Fetch the current state of the batch"""
+        return self.client.batches.retrieve(self.batch_id)
+
+    def wait(self, poll_interval: float = 30.0, timeout: Optional[float] = None):
+        """
+        Poll the batch until it reaches a terminal status or the timeout elapses.
+
+        Args:
+            poll_interval (float): Seconds between polls
+            timeout (float, optional): Maximum seconds to wait (wait forever if None)
+
+        Returns:
+            The last retrieved batch object
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            batch = self.retrieve()
+            if batch.status in TERMINAL_STATUSES:
+                logger.info(f"Batch {self.batch_id} finished with status {batch.status}")
+                return batch
+            if deadline is not None and time.monotonic() + poll_interval > deadline:
+                logger.info(f"Batch {self.batch_id} still {batch.status} after waiting; leaving it for later")
+                return batch
+            time.sleep(poll_interval)
+
+    def _read_file(self, file_id: Optional[str]) -> List[Dict[str, Any]]:
+        if not file_id:
+            return []
+        content = self.client.files.content(file_id).text
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    def results(self, batch=None) -> Dict[str, Dict[str, Any]]:
+        """
+        Read the results of a finished batch.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Mapping of custom_id to either
+            {"response": <response body>} or {"error": <error details>}
+        """
+        batch = batch or self.retrieve()
+        results = {}
+        for line in self._read_file(batch.output_file_id) + self._read_file(batch.error_file_id):
+            response = line.get("response") or {}
+            if line.get("error") or response.get("status_code", 200) >= 400:
+                results[line["custom_id"]] = {"error": line.get("error") or response.get("body")}
+            else:
+                results[line["custom_id"]] = {"response": response.get("body")}
+        return results
@@ -0,0 +1,328 @@
+"""
+OpenAI request scheduler for Notaic
+Coordinates OpenAI usage across services with shared rate limits, retries and priority lanes
+"""
+import os
+import time
+import heapq
+import random
+import logging
+import itertools
+import threading
+from enum import IntEnum
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import openai
+
+from services.monitoring import monitoring_service
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tokens reserved for the completion when the caller does not pass max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+class Priority(IntEnum):
+    """Scheduling lanes; lower values are served first"""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+def estimate_text_tokens(text: str) -> int:
+    """
+    Cheaply estimate the number of tokens in a piece of text.
+
+    Uses the ~4 characters per token rule of thumb for OpenAI models. The
+    scheduler reconciles the estimate against reported usage afterwards.
+    """
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+def estimate_chat_tokens(messages: List[Dict[str, Any]], functions: Optional[List[Dict[str, Any]]] = None,
+                         max_tokens: Optional[int] = None) -> int:
+    """
+    Estimate the total tokens (prompt + completion) of a chat completion request.
+
+    Args:
+        messages (List[Dict[str, Any]]): Chat messages
+        functions (List[Dict[str, Any]], optional): Function definitions sent with the request
+        max_tokens (int, optional): Completion limit requested by the caller
+
+    Returns:
+        int: Estimated token count
+    """
+    prompt_tokens = sum(estimate_text_tokens(str(message.get("content", ""))) + 4 for message in messages)
+    if functions:
+        prompt_tokens += estimate_text_tokens(str(functions))
+    return prompt_tokens + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate.
+    Not thread-safe on its own; the scheduler guards it with its lock.
+    """
+
+    def __init__(self, per_minute: int, burst_seconds: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they already are)"""
+        self._refill()
+        # Requests larger than the bucket are admitted once it is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def adjust(self, delta: float):
+        """Return (positive) or charge (negative) tokens after the fact"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+    def drain(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class OpenAIScheduler:
+    """
+    Shared scheduler for OpenAI calls.
+
+    Admission is controlled by two token buckets (requests per minute and
+    tokens per minute). Waiting callers are served strictly by priority lane
+    and then FIFO, and background callers must leave `background_reserve` of
+    each bucket untouched so interactive requests are never starved by the
+    batch processor. Rate-limited and transient failures are retried with
+    jittered exponential backoff, honoring `Retry-After` when the API sends it.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 500,
+        tokens_per_minute: int = 30000,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        background_reserve: float = 0.1,
+        burst_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            requests_per_minute (int): Request budget shared by all callers
+            tokens_per_minute (int): Token budget shared by all callers
+            max_retries (int): Retries per call before the error is re-raised
+            base_delay (float): First backoff delay in seconds
+            max_delay (float): Upper bound for a single backoff delay in seconds
+            background_reserve (float): Fraction of each bucket background calls may not use
+            burst_seconds (float): How many seconds of budget may be spent in a single burst
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.background_reserve = background_reserve
+        self._clock = clock
+        self._sleep = sleep
+
+        self._requests = TokenBucket(requests_per_minute, burst_seconds, clock)
+        self._tokens = TokenBucket(tokens_per_minute, burst_seconds, clock)
+        self._paused_until = 0.0
+
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def _admission_delay(self, estimated_tokens: int, priority: Priority) -> float:
+        """Seconds the head waiter must still wait before it can be admitted"""
+        reserve = self.background_reserve if priority >= Priority.BACKGROUND else 0.0
+        delays = [
+            self._paused_until - self._clock(),
+            self._requests.time_until(1 + reserve * self._requests.capacity),
+            self._tokens.time_until(estimated_tokens + reserve * self._tokens.capacity),
+        ]
+        return max(0.0, *delays)
+
+    def acquire(self, estimated_tokens: int, priority: Priority = Priority.INTERACTIVE) -> float:
+        """
+        Block until the call may be sent, then charge it against both buckets.
+
+        Returns:
+            float: Time spent waiting in seconds
+        """
+        started = self._clock()
+        with self._condition:
+            ticket = (int(priority), next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        delay = self._admission_delay(estimated_tokens, priority)
+                        if delay <= 0:
+                            self._requests.consume(1)
+                            self._tokens.consume(estimated_tokens)
+                            break
+                        # Cap the wait so a newly arrived higher-priority caller is noticed
+                        self._condition.wait(timeout=min(delay, 1.0))
+                    else:
+                        self._condition.wait(timeout=1.0)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+        return self._clock() - started
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the real usage of a call is known"""
+        if actual_tokens is None:
+            return
+        with self._condition:
+            self._tokens.adjust(estimated_tokens - actual_tokens)
+            self._condition.notify_all()
+
+    def pause(self, seconds: float):
+        """Stop admitting new calls for `seconds` (e.g. after a 429 with Retry-After)"""
+        with self._condition:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            self._requests.drain()
+            self._condition.notify_all()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Read Retry-After / retry-after-ms from an OpenAI API error, if present"""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return False
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        priority: Priority = Priority.INTERACTIVE,
+        estimated_tokens: int = DEFAULT_COMPLETION_TOKENS,
+        **kwargs
+    ) -> Any:
+        """
+        Run `fn(*args, **kwargs)` under the scheduler.
+
+        Args:
+            fn (Callable): The function performing the OpenAI call
+            priority (Priority): Scheduling lane of the caller
+            estimated_tokens (int): Estimated total tokens of the call
+
+        Returns:
+            Any: Whatever `fn` returns
+        """
+        attempt = 0
+        while True:
+            waited = self.acquire(estimated_tokens, priority)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not self._is_retryable(e) or attempt >= self.max_retries:
+                    monitoring_service.track_openai_request(priority.name.lower(), int(waited * 1000), attempt, error=str(e))
+                    raise
+
+                retry_after = self._retry_after(e)
+                delay = retry_after if retry_after is not None else self._backoff_delay(attempt)
+                delay = min(delay, self.max_delay)
+                if isinstance(e, openai.RateLimitError) or getattr(e, "status_code", None) == 429:
+                    # The limit is shared, so every caller has to back off, not just this one
+                    self.pause(delay)
+                logger.warning(f"OpenAI call failed ({type(e).__name__}), retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+                attempt += 1
+                self._sleep(delay)
+                continue
+
+            usage = getattr(result, "usage", None)
+            self.reconcile(estimated_tokens, getattr(usage, "total_tokens", None))
+            monitoring_service.track_openai_request(priority.name.lower(), int(waited * 1000), attempt)
+            return result
+
+    def chat_completion(self, client, priority: Priority = Priority.INTERACTIVE, **create_kwargs) -> Any:
+        """
+        Convenience wrapper around `client.chat.completions.create`.
+
+        Args:
+            client: An `openai.OpenAI` client
+            priority (Priority): Scheduling lane of the caller
+            **create_kwargs: Arguments for `chat.completions.create`
+
+        Returns:
+            The chat completion response
+        """
+        estimated_tokens = estimate_chat_tokens(
+            create_kwargs.get("messages", []),
+            create_kwargs.get("functions"),
+            create_kwargs.get("max_tokens")
+        )
+        return self.submit(
+            client.chat.completions.create,
+            priority=priority,
+            estimated_tokens=estimated_tokens,
+            **create_kwargs
+        )
+
+
+# Create the process-wide scheduler shared by every OpenAI caller
+openai_scheduler = OpenAIScheduler(
+    requests_per_minute=int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500")),
+    tokens_per_minute=int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "30000")),
+    max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "6"))
+)
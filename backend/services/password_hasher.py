@@ -0,0 +1,120 @@
+"""
+Password Hasher for Notaic
+Runs bcrypt off the event loop in a bounded thread pool and upgrades hashes when the cost changes
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from services.monitoring import monitoring_service
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# bcrypt cost factor; raising it upgrades existing hashes as their users sign in
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads hashing at once (bcrypt releases the GIL, so threads use every core)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Hashes allowed to wait for a thread before new ones are refused
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+
+class HasherBusy(RuntimeError):
+    """The hashing queue is full; the request should be retried later"""
+
+
+def make_password_context(rounds: int = BCRYPT_ROUNDS) -> CryptContext:
+    """bcrypt context hashing with `rounds`; hashes with fewer rounds need an update"""
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+class PasswordHasher:
+    """
+    Async password hashing on a bounded thread pool.
+
+    Each bcrypt call takes 100-300 ms of CPU; running it in the request handler
+    would stall every other request on the worker. Calls are queued to
+    `workers` threads instead, and once `max_queue` calls are waiting new ones
+    fail fast with HasherBusy rather than piling up latency for everyone.
+    """
+
+    def __init__(
+        self,
+        context: Optional[CryptContext] = None,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE
+    ):
+        self.context = context or make_password_context()
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls waiting for a thread"""
+        return max(0, self.pending - self.workers)
+
+    async def _run(self, operation: str, function: Callable, *args):
+        with self._lock:
+            if self.queue_depth >= self.max_queue:
+                depth = self.queue_depth
+                rejected = True
+            else:
+                self.pending += 1
+                depth = self.queue_depth
+                rejected = False
+        if rejected:
+            monitoring_service.track_password_hash(operation, 0, depth, rejected=True)
+            raise HasherBusy(f"{depth} password hashes are already waiting")
+
+        submitted = time.monotonic()
+
+        def timed():
+            return time.monotonic() - submitted, function(*args)
+
+        try:
+            waited, result = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            with self._lock:
+                self.pending -= 1
+        monitoring_service.track_password_hash(operation, int(waited * 1000), depth)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run("verify", self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password and rehash it if its hash uses outdated parameters.
+
+        Args:
+            password (str): Password given by the user
+            hashed (str): Stored hash
+
+        Returns:
+            Tuple[bool, Optional[str]]: Whether the password matches, and a new hash to
+                store when it does and the stored one is outdated (None otherwise)
+        """
+        valid, new_hash = await self._run("verify", self.context.verify_and_update, password, hashed)
+        if new_hash:
+            monitoring_service.track_password_rehash()
+        return valid, new_hash
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+# Global password hasher instance
+password_hasher = PasswordHasher()
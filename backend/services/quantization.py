@@ -0,0 +1,334 @@
+"""
+Embedding Quantization for Notaic
+Int8 scalar and product quantization of stored embeddings, with exact float32 re-ranking of the top candidates
+"""
+import os
+import logging
+import tempfile
+from typing import Collection, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_NONE = "none"
+QUANTIZATION_INT8 = "int8"
+QUANTIZATION_PQ = "pq"
+
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", QUANTIZATION_NONE).lower()
+# Bytes per vector with product quantization (one byte per subspace)
+EMBEDDING_PQ_SUBSPACES = int(os.getenv("EMBEDDING_PQ_SUBSPACES", "96"))
+# Candidates re-ranked in float32 per requested result
+EMBEDDING_RERANK_FACTOR = int(os.getenv("EMBEDDING_RERANK_FACTOR", "10"))
+# Directory for the float32 vectors used for re-ranking (one unnamed file per index); the system temp dir when unset
+EMBEDDING_RERANK_DIR = os.getenv("EMBEDDING_RERANK_DIR")
+
+PQ_CENTROIDS = 256
+# Rows scored (or encoded) per step, bounding temporary float32 buffers
+SCORE_CHUNK_ROWS = 4096
+# Vectors collected before the product quantizer codebooks are trained
+PQ_TRAIN_SIZE = int(os.getenv("EMBEDDING_PQ_TRAIN_SIZE", "2048"))
+
+
+def normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def kmeans(data: np.ndarray, clusters: int, iterations: int = 12, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means; returns the centroids"""
+    generator = np.random.RandomState(seed)
+    clusters = min(clusters, len(data))
+    centroids = data[generator.choice(len(data), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        distances = (data ** 2).sum(axis=1, keepdims=True) - 2 * data @ centroids.T + (centroids ** 2).sum(axis=1)
+        assignment = distances.argmin(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        counts = np.bincount(assignment, minlength=clusters)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters with random points
+        centroids[empty] = data[generator.randint(len(data), size=int(empty.sum()))]
+    return centroids
+
+
+def pq_subspaces(dimension: int, requested: int = EMBEDDING_PQ_SUBSPACES) -> int:
+    """Largest subspace count not above `requested` that divides the dimension"""
+    for subspaces in range(min(requested, dimension), 0, -1):
+        if dimension % subspaces == 0:
+            return subspaces
+    return 1
+
+
+class Int8Quantizer:
+    """Symmetric per-vector int8 scalar quantization (4x smaller than float32)"""
+
+    code_dtype = np.int8
+    trained = True
+
+    def code_shape(self, dimension: int) -> Tuple[int, ...]:
+        return (dimension,)
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return int8 codes and the per-vector scale that maps them back to floats"""
+        scales = np.abs(vectors).max(axis=-1) / 127
+        scales = np.where(scales == 0, 1, scales).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[..., None]), -127, 127).astype(np.int8)
+        return codes, scales
+
+    def scores(self, query: np.ndarray, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        # Codes are widened in chunks so a query never materializes a float32 copy of the whole matrix
+        result = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK_ROWS):
+            result[start:start + SCORE_CHUNK_ROWS] = codes[start:start + SCORE_CHUNK_ROWS].astype(np.float32) @ query
+        return result * scales
+
+    def memory_bytes(self) -> int:
+        return 0
+
+
+class ProductQuantizer:
+    """
+    Product quantization: each vector is split into subspaces and every subspace is
+    replaced by the index of its nearest of 256 centroids (one byte per subspace).
+    Inner products are computed from per-query lookup tables.
+    """
+
+    code_dtype = np.uint8
+
+    def __init__(self, dimension: int, subspaces: int = EMBEDDING_PQ_SUBSPACES):
+        self.subspaces = pq_subspaces(dimension, subspaces)
+        self.sub_dimension = dimension // self.subspaces
+        self.codebooks: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def code_shape(self, dimension: int) -> Tuple[int, ...]:
+        return (self.subspaces,)
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.reshape(len(vectors), self.subspaces, self.sub_dimension)
+
+    def train(self, vectors: np.ndarray):
+        parts = self._split(vectors)
+        self.codebooks = np.stack([kmeans(parts[:, part], PQ_CENTROIDS, seed=part) for part in range(self.subspaces)])
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, None]:
+        parts = self._split(vectors)
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        centroid_norms = (self.codebooks ** 2).sum(axis=2)
+        for start in range(0, len(vectors), SCORE_CHUNK_ROWS // PQ_CENTROIDS):
+            chunk = parts[start:start + SCORE_CHUNK_ROWS // PQ_CENTROIDS]
+            distances = centroid_norms - 2 * np.einsum("nps,pcs->npc", chunk, self.codebooks)
+            codes[start:start + len(chunk)] = distances.argmin(axis=2)
+        return codes, None
+
+    def scores(self, query: np.ndarray, codes: np.ndarray, scales=None) -> np.ndarray:
+        # lookup[part, centroid] = query_part . centroid
+        lookup = np.einsum("pd,pcd->pc", query.reshape(self.subspaces, self.sub_dimension), self.codebooks)
+        return lookup[np.arange(self.subspaces), codes].sum(axis=1)
+
+    def memory_bytes(self) -> int:
+        return self.codebooks.nbytes if self.codebooks is not None else 0
+
+
+class FullPrecisionStore:
+    """
+    Growable float32 row store holding the original vectors for re-ranking.
+
+    Rows live in an unnamed temporary file of their own (in `directory`, or the
+    system temp dir when omitted) and are written and read with positioned I/O, so
+    the process only holds the few rows read while re-ranking; the rest stays on
+    disk or in the OS page cache. The file is removed when the store is closed or
+    collected, and no two stores can share it.
+    """
+
+    def __init__(self, dimension: int, directory: Optional[str] = None):
+        self.dimension = dimension
+        self.row_bytes = dimension * 4
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = tempfile.TemporaryFile(dir=directory or None)
+        self._fd = self._file.fileno()
+
+    def set(self, row: int, vector: np.ndarray):
+        os.pwrite(self._fd, np.ascontiguousarray(vector, dtype=np.float32).tobytes(), row * self.row_bytes)
+
+    def get(self, rows) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        flat = rows.reshape(-1)
+        result = np.empty((len(flat), self.dimension), dtype=np.float32)
+        # One read per run of consecutive rows
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(flat) != 1) + 1, [len(flat)]])
+        for start, end in zip(starts[:-1], starts[1:]):
+            data = os.pread(self._fd, (end - start) * self.row_bytes, int(flat[start]) * self.row_bytes)
+            result[start:end] = np.frombuffer(data, dtype=np.float32).reshape(end - start, self.dimension)
+        return result.reshape(rows.shape + (self.dimension,))
+
+
+class QuantizedDenseIndex:
+    """
+    Cosine similarity search over quantized embeddings.
+
+    Candidates are ranked by their approximate (quantized) score; the best
+    `limit * rerank_factor` of them are then re-scored exactly against the float32
+    vectors. Drop-in replacement for `DenseIndex`.
+    """
+
+    def __init__(
+        self,
+        mode: str = QUANTIZATION_INT8,
+        dimension: Optional[int] = None,
+        rerank_factor: int = EMBEDDING_RERANK_FACTOR,
+        rerank_dir: Optional[str] = EMBEDDING_RERANK_DIR,
+        pq_subspaces: int = EMBEDDING_PQ_SUBSPACES,
+        pq_train_size: int = PQ_TRAIN_SIZE,
+        initial_capacity: int = 64
+    ):
+        """
+        Initialize the index.
+
+        Args:
+            mode (str): 'int8' or 'pq'
+            dimension (int, optional): Vector dimension; taken from the first vector if omitted
+            rerank_factor (int): Candidates re-ranked in float32 per requested result (0 disables re-ranking)
+            rerank_dir (str, optional): Directory for the float32 re-ranking vectors (an unnamed file per index);
+                the system temp dir if None
+            pq_subspaces (int): Bytes per vector with product quantization
+            pq_train_size (int): Vectors collected before the product quantizer is trained
+        """
+        if mode not in (QUANTIZATION_INT8, QUANTIZATION_PQ):
+            raise ValueError(f"Unsupported quantization: {mode}")
+        self.mode = mode
+        self.dimension = dimension
+        self.rerank_factor = rerank_factor
+        self.rerank_dir = rerank_dir
+        self.pq_subspaces = pq_subspaces
+        self.pq_train_size = pq_train_size
+        self.ids: List[Hashable] = []
+        self.rows = {}
+        self._capacity = initial_capacity
+        self.quantizer = None
+        self.full_precision: Optional[FullPrecisionStore] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _setup(self, dimension: int):
+        self.dimension = self.dimension or dimension
+        if self.mode == QUANTIZATION_INT8:
+            self.quantizer = Int8Quantizer()
+        else:
+            self.quantizer = ProductQuantizer(self.dimension, self.pq_subspaces)
+        self.full_precision = FullPrecisionStore(self.dimension, self.rerank_dir)
+        self._codes = np.zeros((self._capacity,) + self.quantizer.code_shape(self.dimension), dtype=self.quantizer.code_dtype)
+        self._scales = np.ones(self._capacity, dtype=np.float32)
+
+    def _grow(self):
+        self._codes = np.concatenate([self._codes, np.zeros_like(self._codes)])
+        self._scales = np.concatenate([self._scales, np.ones_like(self._scales)])
+
+    def _encode_rows(self, rows):
+        codes, scales = self.quantizer.encode(self.full_precision.get(rows))
+        self._codes[rows] = codes
+        if scales is not None:
+            self._scales[rows] = scales
+
+    def add(self, doc_id: Hashable, vector: Sequence[float]):
+        vector = normalize(vector)
+        if self.quantizer is None:
+            self._setup(vector.shape[0])
+        if vector.shape[0] != self.dimension:
+            raise ValueError(f"Expected a {self.dimension}-dimensional vector, got {vector.shape[0]}")
+
+        row = self.rows.get(doc_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self._codes):
+                self._grow()
+            self.rows[doc_id] = row
+            self.ids.append(doc_id)
+        self.full_precision.set(row, vector)
+
+        if self.quantizer.trained:
+            self._encode_rows([row])
+        elif len(self.ids) >= self.pq_train_size:
+            rows = np.arange(len(self.ids))
+            self.quantizer.train(self.full_precision.get(rows))
+            self._encode_rows(rows)
+            logger.info(f"Trained product quantizer on {len(rows)} vectors")
+
+    def remove(self, doc_id: Hashable):
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            self._codes[row] = self._codes[last]
+            self._scales[row] = self._scales[last]
+            self.full_precision.set(row, self.full_precision.get(last))
+            self.ids[row] = self.ids[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+
+    def approximate_scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate scores of the given rows, or of every row when omitted"""
+        if rows is None:
+            rows = slice(0, len(self.ids))
+        if not self.quantizer.trained:
+            # Too few vectors to train codebooks yet; they are small enough to scan exactly
+            return self.full_precision.get(np.arange(len(self.ids))[rows]) @ query
+        return self.quantizer.scores(query, self._codes[rows], self._scales[rows])
+
+    def search(
+        self,
+        vector: Sequence[float],
+        limit: int = 10,
+        allowed: Optional[Collection[Hashable]] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Find the stored vectors most similar to a query vector.
+
+        Args:
+            vector (Sequence[float]): Query vector
+            limit (int): Maximum number of results
+            allowed (Collection[Hashable], optional): Only documents with these ids are scored
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to `limit` document ids with their cosine similarity, best first
+        """
+        if allowed is None:
+            rows = np.arange(len(self.ids))
+        else:
+            rows = np.fromiter((self.rows[doc_id] for doc_id in allowed if doc_id in self.rows), dtype=np.int64)
+        if not len(rows):
+            return []
+        query = normalize(vector)
+        scores = self.approximate_scores(query, rows if allowed is not None else None)
+        limit = min(limit, len(rows))
+        candidates = min(len(rows), max(limit, limit * self.rerank_factor))
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        if self.rerank_factor:
+            # Read the float32 rows in storage order
+            top = top[np.argsort(rows[top])]
+            scores = np.zeros_like(scores)
+            scores[top] = self.full_precision.get(rows[top]) @ query
+        top = top[np.argsort(-scores[top])][:limit]
+        return [(self.ids[rows[i]], float(scores[i])) for i in top]
+
+    def memory_bytes(self) -> int:
+        """Bytes held in RAM for the stored vectors (codes, scales and codebooks; float32 rows are on disk)"""
+        if self.quantizer is None:
+            return 0
+        count = len(self.ids)
+        scales = self._scales[:count].nbytes if self.mode == QUANTIZATION_INT8 else 0
+        return self._codes[:count].nbytes + scales + self.quantizer.memory_bytes()
+
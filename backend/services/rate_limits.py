@@ -0,0 +1,66 @@
+"""
+Rate Limits for Notaic
+The one slowapi limiter every router uses, keyed by user and backed by storage shared between workers
+"""
+import os
+import logging
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from auth.current_user import validate_token
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Where counters live: memory:// is per process; a shared server (e.g. redis://host:6379/1)
+# makes every limit hold across all uvicorn workers and instances
+RATE_LIMIT_STORAGE_URL = os.getenv("RATE_LIMIT_STORAGE_URL", "memory://")
+# Two counters per key and window (current and previous), weighted by the elapsed time
+RATE_LIMIT_STRATEGY = "sliding-window-counter"
+
+
+def rate_limit_key(request: Request) -> str:
+    """
+    Key requests by the JWT subject, falling back to the client address.
+
+    A valid bearer token gives the user one budget whatever address they come from
+    (and users behind a shared address do not share one); requests without a valid
+    token, such as signin and register, are limited per address.
+    """
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{validate_token(token).id}"
+        except HTTPException:
+            pass
+    return f"ip:{get_remote_address(request)}"
+
+
+def make_limiter(storage_uri: Optional[str] = None, **storage_options) -> Limiter:
+    """
+    Build a limiter on the shared storage.
+
+    Args:
+        storage_uri (str, optional): limits storage URI; RATE_LIMIT_STORAGE_URL if omitted
+        **storage_options: Options passed to the storage backend
+
+    Returns:
+        Limiter: A slowapi limiter keyed by rate_limit_key
+    """
+    storage_uri = storage_uri or RATE_LIMIT_STORAGE_URL
+    logger.info(f"Rate limits stored in {storage_uri.split('://', 1)[0]}://")
+    return Limiter(
+        key_func=rate_limit_key,
+        strategy=RATE_LIMIT_STRATEGY,
+        storage_uri=storage_uri,
+        storage_options=storage_options
+    )
+
+
+# Global limiter shared by main.py and every router
+limiter = make_limiter()
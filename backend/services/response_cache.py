@@ -0,0 +1,197 @@
+"""
+Response Cache for Notaic
+Per-user read-through cache for polled account endpoints, with writer invalidation and ETag revalidation
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds a cached response is served before it is read again
+ACCOUNT_CACHE_TTL = float(os.getenv("ACCOUNT_CACHE_TTL", "30"))
+# Entries kept by the in-process cache
+ACCOUNT_CACHE_MAX_ENTRIES = int(os.getenv("ACCOUNT_CACHE_MAX_ENTRIES", "10000"))
+# Shared cache (e.g. redis://host:6379/0) so every worker sees the same entries and invalidations
+ACCOUNT_CACHE_URL = os.getenv("ACCOUNT_CACHE_URL", "")
+# How long a user's invalidation generation is kept in the shared cache
+GENERATION_TTL = 24 * 3600
+
+
+class LocalCacheBackend:
+    """In-process LRU with per-entry expiry"""
+
+    def __init__(self, max_entries: int = ACCOUNT_CACHE_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        # Counters are kept apart from the LRU: evicting one would resurrect stale entries
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key]).encode()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Shared cache on a Redis-compatible server"""
+
+    def __init__(self, url: Optional[str] = None, client=None):
+        """
+        Initialize the backend.
+
+        Args:
+            url (str, optional): Server URL; ACCOUNT_CACHE_URL if omitted
+            client: Client with redis-py's get/set/incr/expire (used instead of connecting to `url`)
+        """
+        if client is None:
+            if redis is None:
+                raise ImportError("redis is required for a shared account cache (pip install redis)")
+            client = redis.Redis.from_url(url or ACCOUNT_CACHE_URL)
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.client.set(key, value, ex=max(1, int(ttl)))
+
+    def incr(self, key: str) -> int:
+        value = self.client.incr(key)
+        self.client.expire(key, GENERATION_TTL)
+        return value
+
+
+def get_cache_backend():
+    """Shared backend when ACCOUNT_CACHE_URL is set and reachable by redis-py, otherwise an in-process LRU"""
+    if ACCOUNT_CACHE_URL:
+        try:
+            return RedisCacheBackend(ACCOUNT_CACHE_URL)
+        except ImportError as e:
+            logger.warning(f"{e}; falling back to an in-process account cache")
+    return LocalCacheBackend()
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class ResponseCache:
+    """
+    Read-through cache of per-user JSON responses.
+
+    Keys include a per-user generation number; `invalidate` bumps the generation,
+    which orphans every cached response of that user at once (orphans expire with
+    their TTL). Cache failures never fail a request: the loader is called instead.
+    """
+
+    def __init__(self, backend=None, ttl: float = ACCOUNT_CACHE_TTL):
+        self.backend = backend if backend is not None else get_cache_backend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _generation_key(user_id: str) -> str:
+        return f"account:{user_id}:generation"
+
+    def _key(self, user_id: str, name: str) -> Optional[str]:
+        try:
+            generation = self.backend.get(self._generation_key(user_id)) or b"0"
+        except Exception as e:
+            logger.warning(f"Account cache unavailable: {e}")
+            return None
+        return f"account:{user_id}:{int(generation)}:{name}"
+
+    def get_or_load(self, user_id: str, name: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Tuple[bytes, str]:
+        """
+        Return a user's cached response, calling `loader` on a miss.
+
+        Args:
+            user_id (str): ID of the user the response belongs to
+            name (str): Name of the response (e.g. the endpoint)
+            loader (Callable[[], Any]): Produces the JSON-serializable response; exceptions are not cached
+            ttl (float, optional): Seconds to cache the response; the cache TTL if omitted
+
+        Returns:
+            Tuple[bytes, str]: The JSON body and its ETag
+        """
+        key = self._key(user_id, name)
+        if key is not None:
+            try:
+                body = self.backend.get(key)
+            except Exception as e:
+                logger.warning(f"Account cache unavailable: {e}")
+                body = None
+            if body is not None:
+                self.hits += 1
+                return body, make_etag(body)
+
+        self.misses += 1
+        body = orjson.dumps(loader())
+        if key is not None:
+            try:
+                self.backend.set(key, body, ttl or self.ttl)
+            except Exception as e:
+                logger.warning(f"Account cache unavailable: {e}")
+        return body, make_etag(body)
+
+    def invalidate(self, user_id: str):
+        """Drop every cached response of a user; call after writing data the responses are built from"""
+        try:
+            self.backend.incr(self._generation_key(user_id))
+        except Exception as e:
+            logger.warning(f"Could not invalidate the account cache of user {user_id}: {e}")
+
+
+def etag_response(request: Request, body: bytes, etag: str) -> Response:
+    """JSON response carrying an ETag, or 304 Not Modified when the client already has it"""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Global cache instance for account endpoints
+account_cache = ResponseCache()
@@ -0,0 +1,198 @@
+"""
+Token Store for Notaic
+Single-use email verification and password reset tokens, stored by hash with an expiry
+"""
+import os
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from google.cloud import firestore
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TOKEN_COLLECTION = "tokens"
+VERIFY_EMAIL = "verify_email"
+RESET_PASSWORD = "reset_password"
+# Minutes a token can be used after it is issued
+VERIFICATION_TOKEN_TTL_MINUTES = int(os.getenv("VERIFICATION_TOKEN_TTL_MINUTES", "10"))
+RESET_PASSWORD_TOKEN_TTL_MINUTES = int(os.getenv("RESET_PASSWORD_TOKEN_TTL_MINUTES", "60"))
+TOKEN_TTLS = {
+    VERIFY_EMAIL: timedelta(minutes=VERIFICATION_TOKEN_TTL_MINUTES),
+    RESET_PASSWORD: timedelta(minutes=RESET_PASSWORD_TOKEN_TTL_MINUTES),
+}
+
+
+class InvalidToken(LookupError):
+    """The token was never issued for this purpose, or has already been used"""
+
+
+class ExpiredToken(InvalidToken):
+    """The token was issued but its expiry has passed"""
+
+
+def hash_token(token: str) -> str:
+    """Document ID of a token; the token itself is never stored"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenStore:
+    """
+    Tokens stored as `tokens/{sha256(token)}` with the user, purpose and expiry.
+
+    Looking a token up is a point read by document ID, so no index over the users
+    collection is needed, and a leaked database does not leak usable links. Firestore's
+    TTL policy on `expires_at` deletes expired tokens; until it runs, `consume` rejects
+    them itself, and `purge_expired` can delete them where no TTL policy is configured.
+    """
+
+    def __init__(self, db, collection: str = TOKEN_COLLECTION, clock=None):
+        self.db = db
+        self.collection = collection
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+
+    def document(self, token: str):
+        return self.db.collection(self.collection).document(hash_token(token))
+
+    def issue(self, user_id: str, purpose: str, ttl: Optional[timedelta] = None) -> str:
+        """
+        Issue a token, revoking the user's earlier tokens for the same purpose.
+
+        Args:
+            user_id (str): ID of the user the token acts for
+            purpose (str): VERIFY_EMAIL or RESET_PASSWORD
+            ttl (timedelta, optional): Lifetime; the purpose's default if omitted
+
+        Returns:
+            str: The token to send to the user
+        """
+        token = secrets.token_urlsafe(32)
+        now = self.clock()
+        batch = self.db.batch()
+        for previous in self._issued(user_id, purpose):
+            batch.delete(previous.reference)
+        batch.set(self.document(token), {
+            "user_id": user_id,
+            "purpose": purpose,
+            "created_at": now,
+            "expires_at": now + (ttl or TOKEN_TTLS[purpose]),
+        })
+        batch.commit()
+        return token
+
+    def consume(self, token: str, purpose: str) -> str:
+        """
+        Use a token once.
+
+        Args:
+            token (str): Token from the link
+            purpose (str): Purpose the token must have been issued for
+
+        Returns:
+            str: ID of the user the token was issued for
+
+        Raises:
+            InvalidToken: If the token is unknown, used, or issued for another purpose
+            ExpiredToken: If the token has expired
+        """
+        reference = self.document(token)
+
+        # Read and delete in one transaction, so two concurrent requests cannot both use the token
+        @firestore.transactional
+        def take(transaction):
+            snapshot = reference.get(transaction=transaction)
+            if not snapshot.exists or snapshot.get("purpose") != purpose:
+                return None
+            transaction.delete(reference)
+            return snapshot
+
+        snapshot = take(self.db.transaction())
+        if snapshot is None:
+            raise InvalidToken(purpose)
+        # Raised after the commit: an exception inside `take` would roll the delete back
+        if snapshot.get("expires_at") <= self.clock():
+            raise ExpiredToken(purpose)
+        return snapshot.get("user_id")
+
+    def revoke(self, user_id: str, purpose: str):
+        """Delete every outstanding token of a user for a purpose"""
+        batch = self.db.batch()
+        for previous in self._issued(user_id, purpose):
+            batch.delete(previous.reference)
+        batch.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired tokens; returns how many were deleted"""
+        deleted = 0
+        expired = self.db.collection(self.collection).where("expires_at", "<=", self.clock()).stream()
+        batch = self.db.batch()
+        for snapshot in expired:
+            batch.delete(snapshot.reference)
+            deleted += 1
+            if deleted % 500 == 0:
+                batch.commit()
+                batch = self.db.batch()
+        batch.commit()
+        return deleted
+
+    def _issued(self, user_id: str, purpose: str) -> Iterable:
+        return (
+            self.db.collection(self.collection)
+            .where("user_id", "==", user_id)
+            .where("purpose", "==", purpose)
+            .select(["user_id"])
+            .stream()
+        )
+
+
+def migrate_user_tokens(db, store: Optional[TokenStore] = None) -> int:
+    """
+    Move tokens kept on user documents into the token store and delete the user fields.
+
+    Outstanding verification links keep working until their original expiry; reset
+    tokens never had one and get the default reset lifetime from now.
+
+    Returns:
+        int: Number of tokens moved
+    """
+    store = store or TokenStore(db)
+    now = store.clock()
+    moved = 0
+    legacy = [
+        ("verification_token", VERIFY_EMAIL),
+        ("reset_password_token", RESET_PASSWORD),
+    ]
+    for field, purpose in legacy:
+        for user in db.collection("users").where(field, ">", "").stream():
+            data = user.to_dict()
+            expires_at = now + TOKEN_TTLS[purpose]
+            if purpose == VERIFY_EMAIL and data.get("token_expiry"):
+                expires_at = data["token_expiry"].replace(tzinfo=data["token_expiry"].tzinfo or timezone.utc)
+
+            batch = db.batch()
+            batch.set(store.document(data[field]), {
+                "user_id": user.id, "purpose": purpose, "created_at": now, "expires_at": expires_at
+            })
+            cleared = {field: firestore.DELETE_FIELD}
+            if purpose == VERIFY_EMAIL:
+                cleared["token_expiry"] = firestore.DELETE_FIELD
+            batch.update(user.reference, cleared)
+            batch.commit()
+            moved += 1
+    logger.info(f"Moved {moved} tokens from user documents to the token store")
+    return moved
+
+
+if __name__ == "__main__":
+    import sys
+    from utils.firestore_client import get_firestore_client
+
+    db = get_firestore_client()
+    if sys.argv[1:] == ["migrate"]:
+        print(f"Moved {migrate_user_tokens(db)} tokens to the token store")
+    else:
+        print(f"Deleted {TokenStore(db).purge_expired()} expired tokens")
@@ -0,0 +1,17 @@
+import os
+import sys
+
+# Make the backend packages (auth, services, utils, ...) importable regardless of the working directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# config.settings requires these; unit and load tests never talk to the real services
+for name in (
+    "GOOGLE_CLIENT_ID",
+    "GOOGLE_CLIENT_SECRET",
+    "AWS_REGION",
+    "AWS_ACCESS_KEY_ID",
+    "AWS_SECRET_ACCESS_KEY",
+    "JWT_SECRET_KEY",
+    "OPENAI_API_KEY",
+):
+    os.environ.setdefault(name, "test")
@@ -0,0 +1,85 @@
+"""
+Async view of the in-memory fake Firestore, mirroring google-cloud-firestore's AsyncClient.
+Reads await `delay` seconds each and record how many overlapped, so tests can assert concurrency.
+"""
+import asyncio
+
+from google.cloud.firestore_v1.aggregation import AggregationResult
+
+from tests.fakes.fake_firestore import FakeFirestore
+
+
+class FakeAsyncDocumentReference:
+    def __init__(self, client, reference):
+        self._client = client
+        self._reference = reference
+        self.id = reference.id
+
+    def collection(self, name):
+        return FakeAsyncQuery(self._client, self._reference.collection(name))
+
+    async def get(self, field_paths=None):
+        async with self._client.reading():
+            return self._reference.get(field_paths=field_paths)
+
+
+class FakeAsyncAggregationQuery:
+    def __init__(self, client, query):
+        self._client = client
+        self._query = query
+
+    async def get(self):
+        async with self._client.reading():
+            return [[AggregationResult(alias="count", value=len(self._query.get()))]]
+
+
+class FakeAsyncQuery:
+    def __init__(self, client, query):
+        self._client = client
+        self._query = query
+
+    def __getattr__(self, name):
+        # where/order_by/limit/select/start_after build a new query; wrap it again
+        method = getattr(self._query, name)
+        return lambda *args, **kwargs: FakeAsyncQuery(self._client, method(*args, **kwargs))
+
+    def document(self, document_id=None):
+        return FakeAsyncDocumentReference(self._client, self._query.document(document_id))
+
+    def count(self):
+        return FakeAsyncAggregationQuery(self._client, self._query)
+
+    async def stream(self):
+        async with self._client.reading():
+            snapshots = self._query.get()
+        for snapshot in snapshots:
+            yield snapshot
+
+
+class _Reading:
+    def __init__(self, client):
+        self._client = client
+
+    async def __aenter__(self):
+        self._client.in_flight += 1
+        self._client.max_in_flight = max(self._client.max_in_flight, self._client.in_flight)
+        await asyncio.sleep(self._client.delay)
+
+    async def __aexit__(self, *exc_info):
+        self._client.in_flight -= 1
+
+
+class FakeAsyncFirestore:
+    """Async client over a FakeFirestore; `sync` shares its documents"""
+
+    def __init__(self, sync=None, delay=0.0):
+        self.sync = sync or FakeFirestore()
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def reading(self):
+        return _Reading(self)
+
+    def collection(self, name):
+        return FakeAsyncQuery(self, self.sync.collection(name))
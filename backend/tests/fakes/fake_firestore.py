@@ -0,0 +1,286 @@
+"""
+In-memory fake of the google-cloud-firestore client for unit and load tests.
+Covers the subset the backend uses: documents, subcollections, queries with where/order_by/limit/
+start_after, field transforms (Increment, ArrayUnion, SERVER_TIMESTAMP, DELETE_FIELD), batches and
+transactions (for firestore.transactional).
+"""
+import copy
+import uuid
+import threading
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1 import transforms
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+def _get_path(data, path):
+    for part in path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+def _set_path(data, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        data = data.setdefault(part, {})
+    current = data.get(parts[-1])
+    if value is firestore.DELETE_FIELD:
+        data.pop(parts[-1], None)
+    elif value is firestore.SERVER_TIMESTAMP:
+        data[parts[-1]] = datetime.now(timezone.utc)
+    elif isinstance(value, transforms.Increment):
+        data[parts[-1]] = (current or 0) + value.value
+    elif isinstance(value, transforms.ArrayUnion):
+        data[parts[-1]] = list(current or []) + [item for item in value.values if item not in (current or [])]
+    elif isinstance(value, transforms.ArrayRemove):
+        data[parts[-1]] = [item for item in (current or []) if item not in value.values]
+    else:
+        data[parts[-1]] = copy.deepcopy(value)
+
+
+def _merge(current, data):
+    # set(merge=True) merges nested maps key by key, applying transforms at any depth
+    for key, value in data.items():
+        if isinstance(value, dict):
+            if not isinstance(current.get(key), dict):
+                current[key] = {}
+            _merge(current[key], value)
+        else:
+            _set_path(current, key, value)
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return _get_path(self._data or {}, field)
+
+
+class FakeDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths=None, transaction=None):
+        with self._client.lock:
+            self._client.reads += 1
+            data = self._client.docs.get(self.path)
+            if data is not None and field_paths is not None:
+                selected = {}
+                for field in field_paths:
+                    value = _get_path(data, field)
+                    if value is not None:
+                        _set_path(selected, field, value)
+                data = selected
+            return FakeSnapshot(self, copy.deepcopy(data) if data is not None else None)
+
+    def set(self, data, merge=False):
+        with self._client.lock:
+            self._client.writes += 1
+            current = copy.deepcopy(self._client.docs.get(self.path) or {}) if merge else {}
+            if merge:
+                _merge(current, data)
+            else:
+                for key, value in data.items():
+                    _set_path(current, key, value)
+            self._client.docs[self.path] = current
+
+    def update(self, data):
+        with self._client.lock:
+            self._client.writes += 1
+            if self.path not in self._client.docs:
+                raise NotFound(f"No document to update: {self.path}")
+            current = self._client.docs[self.path]
+            for key, value in data.items():
+                _set_path(current, key, value)
+
+    def delete(self):
+        with self._client.lock:
+            self._client.writes += 1
+            self._client.docs.pop(self.path, None)
+
+
+class FakeQuery:
+    def __init__(self, client, path, filters=(), orders=(), limit=None, start_after=None, fields=None):
+        self._client = client
+        self._path = path
+        self._filters = list(filters)
+        self._orders = list(orders)
+        self._limit = limit
+        self._start_after = start_after
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit,
+                     start_after=self._start_after, fields=self._fields)
+        state.update(changes)
+        return FakeQuery(self._client, self._path, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + [(field_path, op_string, value)])
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self._orders + [(field_path, direction)])
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields):
+        if isinstance(document_fields, FakeSnapshot):
+            document_fields = document_fields.to_dict()
+        return self._copy(start_after=document_fields)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def stream(self):
+        prefix = self._path + "/"
+        with self._client.lock:
+            items = [
+                (path, copy.deepcopy(data)) for path, data in self._client.docs.items()
+                if path.startswith(prefix) and "/" not in path[len(prefix):]
+            ]
+        items = [item for item in items if all(_OPS[op](_get_path(item[1], field), value) for field, op, value in self._filters)]
+        for field, direction in reversed(self._orders):
+            items.sort(key=lambda item: (_get_path(item[1], field) is None, _get_path(item[1], field)),
+                       reverse=direction == firestore.Query.DESCENDING)
+        if self._start_after is not None and self._orders:
+            cursor = tuple(_get_path(self._start_after, field) for field, _ in self._orders)
+            values = [tuple(_get_path(item[1], field) for field, _ in self._orders) for item in items]
+            position = next((i for i, value in enumerate(values) if value == cursor), None)
+            if position is not None:
+                items = items[position + 1:]
+        if self._limit is not None:
+            items = items[:self._limit]
+        with self._client.lock:
+            self._client.reads += max(1, len(items))
+        for path, data in items:
+            if self._fields is not None:
+                selected = {}
+                for field in self._fields:
+                    value = _get_path(data, field)
+                    if value is not None:
+                        _set_path(selected, field, value)
+                data = selected
+            yield FakeSnapshot(FakeDocumentReference(self._client, path), data)
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id=None):
+        return FakeDocumentReference(self._client, f"{self._path}/{document_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, data, document_id=None):
+        reference = self.document(document_id)
+        reference.set(data)
+        return datetime.now(timezone.utc), reference
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._operations = []
+
+    def set(self, reference, data, merge=False):
+        self._operations.append(lambda: reference.set(data, merge=merge))
+
+    def update(self, reference, data):
+        self._operations.append(lambda: reference.update(data))
+
+    def delete(self, reference):
+        self._operations.append(reference.delete)
+
+    def commit(self):
+        for operation in self._operations:
+            operation()
+        self._operations = []
+
+
+class FakeTransaction(FakeWriteBatch):
+    """
+    Transaction driven by `firestore.transactional`. It holds the client lock from begin
+    to commit or rollback, so its reads and writes are atomic with respect to other threads.
+    """
+
+    def __init__(self, client, max_attempts=5, read_only=False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+
+    def _clean_up(self):
+        self._operations = []
+
+    def _begin(self, retry_id=None):
+        self._client.lock.acquire()
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        try:
+            self.commit()
+        finally:
+            self._release()
+
+    def _rollback(self):
+        self._operations = []
+        self._release()
+
+    def _release(self):
+        if self._id is not None:
+            self._id = None
+            self._client.lock.release()
+
+
+class FakeFirestore:
+    """In-memory Firestore client; `docs` maps document paths to their data"""
+
+    def __init__(self):
+        self.docs = {}
+        self.lock = threading.RLock()
+        self.reads = 0
+        self.writes = 0
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def document(self, path):
+        return FakeDocumentReference(self, path)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self, max_attempts=5, read_only=False):
+        return FakeTransaction(self, max_attempts, read_only)
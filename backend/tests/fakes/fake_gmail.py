@@ -0,0 +1,214 @@
+"""
+In-process fake of the Gmail API for unit and load tests.
+Plugs into googleapiclient as the `http` object, so requests are built and parsed by the real client.
+Honours `format`, `metadataHeaders`, `fields` partial-response masks and list pagination.
+"""
+import re
+import json
+import base64
+import threading
+from urllib.parse import urlparse, parse_qs
+
+import httplib2
+from googleapiclient.discovery import build
+
+MESSAGES_PATH = "/gmail/v1/users/me/messages"
+
+
+def parse_fields(mask):
+    """Parse a partial-response mask like 'id,payload(headers,parts/body)' into a nested dict"""
+    tree = {}
+    stack = [tree]
+    token = ""
+
+    def add(name):
+        node = stack[-1]
+        for part in filter(None, name.split("/")):
+            node = node.setdefault(part, {})
+        return node
+
+    for char in mask:
+        if char == ",":
+            add(token)
+            token = ""
+        elif char == "(":
+            stack.append(add(token))
+            token = ""
+        elif char == ")":
+            add(token)
+            token = ""
+            stack.pop()
+        else:
+            token += char.strip()
+    add(token)
+    return tree
+
+
+def apply_fields(value, tree):
+    """Trim a response to the fields selected by a parsed mask"""
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: apply_fields(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def _encode(text):
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+def make_message(message_id, subject="Hello", sender="alice@example.com", to="me@example.com",
+                 body="Hi there", labels=("INBOX", "UNREAD"), html_size=20000, extra_headers=20,
+                 internal_date=1792411200000):
+    """Build a realistic multipart/alternative Gmail message resource"""
+    headers = [{"name": "Received", "value": f"from relay{i}.example.com by mx.google.com; {i}"} for i in range(extra_headers)]
+    headers += [
+        {"name": "Subject", "value": subject},
+        {"name": "From", "value": sender},
+        {"name": "To", "value": to},
+        {"name": "Date", "value": "Mon, 19 Oct 2026 12:00:00 +0000"},
+        {"name": "Message-ID", "value": f"<{message_id}@example.com>"},
+    ]
+    html = f"<html><body><p>{body}</p>{'<div>padding</div>' * (html_size // 18)}</body></html>"
+    return {
+        "id": message_id,
+        "threadId": f"thread-{message_id}",
+        "labelIds": list(labels),
+        "snippet": body[:100],
+        "historyId": "1000",
+        "internalDate": str(internal_date),
+        "sizeEstimate": len(body) + len(html),
+        "payload": {
+            "partId": "",
+            "mimeType": "multipart/alternative",
+            "filename": "",
+            "headers": headers,
+            "body": {"size": 0},
+            "parts": [
+                {"partId": "0", "mimeType": "text/plain", "filename": "",
+                 "headers": [{"name": "Content-Type", "value": "text/plain; charset=UTF-8"}],
+                 "body": {"size": len(body), "data": _encode(body)}},
+                {"partId": "1", "mimeType": "text/html", "filename": "",
+                 "headers": [{"name": "Content-Type", "value": "text/html; charset=UTF-8"}],
+                 "body": {"size": len(html), "data": _encode(html)}},
+            ]
+        }
+    }
+
+
+class FakeGmail:
+    """
+    Fake Gmail mailbox.
+
+    Args:
+        messages (list): Message resources, newest first (see make_message)
+        page_size (int): Default page size for messages.list
+        record_requests (bool): Keep a log of (method, uri) for assertions
+    """
+
+    def __init__(self, messages=None, page_size=100, record_requests=True):
+        self.messages = {message["id"]: message for message in messages or []}
+        self.order = [message["id"] for message in messages or []]
+        self.page_size = page_size
+        self.record_requests = record_requests
+        self.lock = threading.Lock()
+        self.requests = []
+        self.bytes_sent = 0
+        # Optional hook(method, uri) returning (status, payload) to inject errors
+        self.fail = None
+
+    def add_message(self, message):
+        """Deliver a new message; it is listed first, like Gmail's newest-first order"""
+        with self.lock:
+            self.messages[message["id"]] = message
+            self.order.insert(0, message["id"])
+
+    def service(self):
+        """Build a real googleapiclient Gmail service backed by this fake"""
+        return build("gmail", "v1", http=self, cache_discovery=False)
+
+    # httplib2.Http interface used by googleapiclient
+    def request(self, uri, method="GET", body=None, headers=None, redirections=None, connection_type=None):
+        if self.record_requests:
+            with self.lock:
+                self.requests.append((method, uri))
+        if self.fail:
+            injected = self.fail(method, uri)
+            if injected:
+                return self._respond(*injected)
+
+        parsed = urlparse(uri)
+        query = parse_qs(parsed.query)
+        path = parsed.path
+
+        if path == MESSAGES_PATH and method == "GET":
+            payload = self._list(query)
+        elif path.startswith(MESSAGES_PATH + "/") and path.endswith("/modify"):
+            message_id = path[len(MESSAGES_PATH) + 1:-len("/modify")]
+            payload = self._modify(message_id, json.loads(body or "{}"))
+        elif path.startswith(MESSAGES_PATH + "/") and method == "GET":
+            message_id = path[len(MESSAGES_PATH) + 1:]
+            if message_id not in self.messages:
+                return self._respond(404, {"error": {"code": 404, "message": "Not Found", "errors": [{"reason": "notFound"}]}})
+            payload = self._get(message_id, query)
+        else:
+            return self._respond(404, {"error": {"code": 404, "message": f"Unknown path {path}"}})
+
+        if "fields" in query:
+            payload = apply_fields(payload, parse_fields(query["fields"][0]))
+        return self._respond(200, payload)
+
+    def _respond(self, status, payload):
+        content = json.dumps(payload).encode()
+        with self.lock:
+            self.bytes_sent += len(content)
+        return httplib2.Response({"status": str(status), "content-type": "application/json"}), content
+
+    def _matches(self, message, q):
+        labels = set(message["labelIds"])
+        if "is:unread" in q and "UNREAD" not in labels:
+            return False
+        if "in:sent" in q and "SENT" not in labels:
+            return False
+        # Only epoch-second `after:` filters are applied; date-formatted ones match everything
+        after = re.search(r"after:(\d+)(\s|$)", q)
+        if after and int(message["internalDate"]) // 1000 <= int(after.group(1)):
+            return False
+        return True
+
+    def _list(self, query):
+        q = query.get("q", [""])[0]
+        ids = [message_id for message_id in self.order if self._matches(self.messages[message_id], q)]
+        start = int(query.get("pageToken", ["0"])[0])
+        size = int(query.get("maxResults", [self.page_size])[0])
+        page = ids[start:start + size]
+        payload = {
+            "messages": [{"id": message_id, "threadId": self.messages[message_id]["threadId"]} for message_id in page],
+            "resultSizeEstimate": len(ids)
+        }
+        if start + size < len(ids):
+            payload["nextPageToken"] = str(start + size)
+        if not page:
+            payload.pop("messages")
+        return payload
+
+    def _get(self, message_id, query):
+        message = self.messages[message_id]
+        message_format = query.get("format", ["full"])[0]
+        if message_format == "metadata":
+            wanted = {name.lower() for name in query.get("metadataHeaders", [])}
+            headers = [header for header in message["payload"]["headers"] if not wanted or header["name"].lower() in wanted]
+            resource = {key: value for key, value in message.items() if key != "payload"}
+            resource["payload"] = {"mimeType": message["payload"]["mimeType"], "headers": headers}
+            return resource
+        if message_format == "minimal":
+            return {key: value for key, value in message.items() if key != "payload"}
+        return message
+
+    def _modify(self, message_id, body):
+        message = self.messages[message_id]
+        labels = [label for label in message["labelIds"] if label not in body.get("removeLabelIds", [])]
+        message["labelIds"] = labels + [label for label in body.get("addLabelIds", []) if label not in labels]
+        return {"id": message_id, "threadId": message["threadId"], "labelIds": message["labelIds"]}
@@ -0,0 +1,233 @@
+"""
+Local fake of the OpenAI HTTP API for load and integration tests.
+Enforces its own request/token limits per window and answers 429 with Retry-After when exceeded.
+Also implements the Files and Batch endpoints used by the Batch API mode of the email processor.
+"""
+import json
+import time
+import threading
+from collections import deque
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIServer:
+    """
+    Minimal OpenAI-compatible server.
+
+    Args:
+        requests_per_window (int): Requests accepted per window before answering 429
+        tokens_per_window (int): Tokens accepted per window before answering 429
+        window_seconds (float): Length of the rate-limit window
+        latency (float): Artificial latency added to every successful completion
+        batch_polls_until_complete (int): Batch retrievals answered "in_progress" before completing
+    """
+
+    def __init__(self, requests_per_window=10, tokens_per_window=100000, window_seconds=1.0, latency=0.0,
+                 batch_polls_until_complete=1):
+        self.requests_per_window = requests_per_window
+        self.tokens_per_window = tokens_per_window
+        self.window_seconds = window_seconds
+        self.latency = latency
+        # Number of batch retrievals answered with "in_progress" before a batch completes
+        self.batch_polls_until_complete = batch_polls_until_complete
+
+        self.files = {}
+        self.batches = {}
+
+        self.lock = threading.Lock()
+        self.history = deque()
+        self.stats = {"completions": 0, "rate_limited": 0}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                if self.path.endswith("/chat/completions"):
+                    status, body, headers = server.handle_chat_completion(json.loads(raw or b"{}"))
+                    self._send_json(status, body, headers)
+                elif self.path.endswith("/files"):
+                    self._send_json(200, server.handle_file_upload(self.headers.get("Content-Type"), raw))
+                elif self.path.endswith("/batches"):
+                    self._send_json(200, server.handle_batch_create(json.loads(raw or b"{}")))
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if len(parts) == 3 and parts[1] == "batches" and parts[2] in server.batches:
+                    self._send_json(200, server.handle_batch_retrieve(parts[2]))
+                elif len(parts) == 4 and parts[1] == "files" and parts[3] == "content" and parts[2] in server.files:
+                    body = server.files[parts[2]]["content"]
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @staticmethod
+    def count_tokens(payload):
+        text = "".join(str(message.get("content", "")) for message in payload.get("messages", []))
+        return max(1, len(text) // 4)
+
+    def _admit(self, tokens):
+        """Return None if admitted, otherwise the number of seconds to wait"""
+        now = time.monotonic()
+        with self.lock:
+            while self.history and now - self.history[0][0] >= self.window_seconds:
+                self.history.popleft()
+            used_tokens = sum(entry[1] for entry in self.history)
+            if len(self.history) >= self.requests_per_window or used_tokens + tokens > self.tokens_per_window:
+                self.stats["rate_limited"] += 1
+                return self.window_seconds - (now - self.history[0][0]) if self.history else self.window_seconds
+            self.history.append((now, tokens))
+            self.stats["completions"] += 1
+            return None
+
+    def handle_chat_completion(self, payload):
+        prompt_tokens = self.count_tokens(payload)
+        retry_after = self._admit(prompt_tokens)
+        if retry_after is not None:
+            error = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+            return 429, error, {"retry-after-ms": str(int(retry_after * 1000) + 1)}
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        return 200, self.complete(payload), {}
+
+    def complete(self, payload):
+        """Build a chat completion for the payload (no rate limiting)"""
+        prompt_tokens = self.count_tokens(payload)
+        message = {"role": "assistant", "content": "Fake response"}
+        function_call = payload.get("function_call")
+        if isinstance(function_call, dict):
+            message = {
+                "role": "assistant",
+                "content": None,
+                "function_call": {
+                    "name": function_call["name"],
+                    "arguments": json.dumps({"subject": "Re: Fake", "body": "Fake response", "topic": "Professional", "priority": 3})
+                }
+            }
+
+        completion_tokens = 8
+        return {
+            "id": f"chatcmpl-fake-{self.stats['completions']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def _store_file(self, filename, content, purpose):
+        with self.lock:
+            file_id = f"file-fake-{len(self.files) + 1}"
+            self.files[file_id] = {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(content),
+                "created_at": int(time.time()),
+                "filename": filename,
+                "purpose": purpose,
+                "status": "processed",
+                "content": content
+            }
+        return {key: value for key, value in self.files[file_id].items() if key != "content"}
+
+    def handle_file_upload(self, content_type, raw):
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + raw)
+        fields = {}
+        for part in message.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = (part.get_filename(), part.get_payload(decode=True))
+        filename, content = fields["file"]
+        return self._store_file(filename, content, fields["purpose"][1].decode())
+
+    def handle_batch_create(self, payload):
+        input_file = self.files[payload["input_file_id"]]
+        output_lines = []
+        for line in input_file["content"].decode().splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            output_lines.append(json.dumps({
+                "id": f"batch_req_{request['custom_id']}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": "fake", "body": self.complete(request["body"])},
+                "error": None
+            }))
+        output_file = self._store_file("batch_output.jsonl", "\n".join(output_lines).encode(), "batch_output")
+
+        with self.lock:
+            batch_id = f"batch_fake_{len(self.batches) + 1}"
+            self.batches[batch_id] = {
+                "batch": {
+                    "id": batch_id,
+                    "object": "batch",
+                    "endpoint": payload["endpoint"],
+                    "input_file_id": payload["input_file_id"],
+                    "completion_window": payload["completion_window"],
+                    "created_at": int(time.time()),
+                    "metadata": payload.get("metadata"),
+                    "status": "validating",
+                    "request_counts": {"total": len(output_lines), "completed": 0, "failed": 0}
+                },
+                "output_file_id": output_file["id"],
+                "polls": 0
+            }
+        return self.batches[batch_id]["batch"]
+
+    def handle_batch_retrieve(self, batch_id):
+        with self.lock:
+            entry = self.batches[batch_id]
+            entry["polls"] += 1
+            batch = entry["batch"]
+            if entry["polls"] > self.batch_polls_until_complete:
+                batch.update({
+                    "status": "completed",
+                    "output_file_id": entry["output_file_id"],
+                    "completed_at": int(time.time()),
+                    "request_counts": {**batch["request_counts"], "completed": batch["request_counts"]["total"]}
+                })
+            else:
+                batch["status"] = "in_progress"
+            return batch
@@ -0,0 +1,119 @@
+"""
+Rate limit storage for the `limits` library on top of FakeRedis, registered as the `fakeredis://` scheme.
+
+`fakeredis://` with a `client` storage option uses that client directly (one process);
+`fakeredis://host:port` connects to a FakeRedisServer, a FakeRedis served from its own
+process, so separate worker processes share counters like they would on a Redis server.
+"""
+import time
+from math import floor
+from multiprocessing.managers import BaseManager
+from urllib.parse import urlparse
+
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport, TimestampedSlidingWindow
+
+from tests.fakes.fake_redis import FakeRedis
+
+AUTHKEY = b"notaic-fake-redis"
+_served = FakeRedis()
+
+
+class FakeRedisManager(BaseManager):
+    pass
+
+
+FakeRedisManager.register("redis", callable=lambda: _served)
+
+
+class FakeRedisServer:
+    """A FakeRedis in a separate process, reachable by any process through its `uri`"""
+
+    def __init__(self):
+        self.manager = FakeRedisManager(address=("127.0.0.1", 0), authkey=AUTHKEY)
+
+    def start(self):
+        self.manager.start()
+        return self
+
+    @property
+    def uri(self):
+        host, port = self.manager.address
+        return f"fakeredis://{host}:{port}"
+
+    def client(self):
+        return self.manager.redis()
+
+    def stop(self):
+        self.manager.shutdown()
+
+
+def connect(uri):
+    address = urlparse(uri)
+    manager = FakeRedisManager(address=(address.hostname, address.port), authkey=AUTHKEY)
+    manager.connect()
+    return manager.redis()
+
+
+class FakeRedisStorage(Storage, TimestampedSlidingWindow, SlidingWindowCounterSupport):
+    STORAGE_SCHEME = ["fakeredis"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, client=None, **options):
+        self.client = client if client is not None else connect(uri)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return (ConnectionError, EOFError)
+
+    def incr(self, key, expiry, amount=1):
+        value = self.client.incr(key, amount)
+        if value == amount:
+            self.client.expire(key, expiry)
+        return value
+
+    def decr(self, key, amount=1):
+        return self.client.decr(key, amount)
+
+    def get(self, key):
+        return int(self.client.get(key) or 0)
+
+    def get_expiry(self, key):
+        return time.time() + max(self.client.ttl(key), 0)
+
+    def check(self):
+        self.client.get("ping")
+        return True
+
+    def reset(self):
+        return None
+
+    def clear(self, key):
+        self.client.delete(key)
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        # Same algorithm as limits' memory storage, with the counters on the shared client
+        if amount > limit:
+            return False
+        previous_count, previous_ttl, current_count, _ = self.get_sliding_window(key, expiry)
+        if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+            return False
+        now = time.time()
+        current_count = self.incr(self.sliding_window_keys(key, expiry, now)[1], 2 * expiry, amount)
+        if floor(previous_count * previous_ttl / expiry + current_count) > limit:
+            self.decr(self.sliding_window_keys(key, expiry, now)[1], amount)
+            return False
+        return True
+
+    def get_sliding_window(self, key, expiry):
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self.get(previous_key)
+        current_count = self.get(current_key)
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def clear_sliding_window(self, key, expiry):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self.client.delete(previous_key, current_key)
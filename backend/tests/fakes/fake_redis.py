@@ -0,0 +1,77 @@
+"""
+In-memory fake of the redis-py client for unit and load tests.
+Covers the commands the shared caches and rate limits use: get, set with expiry, incr, decr,
+expire, ttl and delete.
+"""
+import threading
+import time
+
+
+class FakeRedis:
+    """Single-process stand-in for a Redis server; `clock` lets tests move time forward"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.data = {}
+        self.expires = {}
+        self.commands = 0
+        self.lock = threading.Lock()
+
+    def _alive(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= self.clock():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def get(self, key):
+        with self.lock:
+            self.commands += 1
+            return self.data[key] if self._alive(key) else None
+
+    def set(self, key, value, ex=None):
+        with self.lock:
+            self.commands += 1
+            self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+            if ex is not None:
+                self.expires[key] = self.clock() + ex
+            else:
+                self.expires.pop(key, None)
+            return True
+
+    def incr(self, key, amount=1):
+        with self.lock:
+            self.commands += 1
+            value = int(self.data[key]) + amount if self._alive(key) else amount
+            self.data[key] = str(value).encode()
+            return value
+
+    def decr(self, key, amount=1):
+        return self.incr(key, -amount)
+
+    def expire(self, key, seconds):
+        with self.lock:
+            self.commands += 1
+            if not self._alive(key):
+                return False
+            self.expires[key] = self.clock() + seconds
+            return True
+
+    def ttl(self, key):
+        with self.lock:
+            self.commands += 1
+            if not self._alive(key):
+                return -2
+            expires_at = self.expires.get(key)
+            return -1 if expires_at is None else max(0, int(expires_at - self.clock()))
+
+    def delete(self, *keys):
+        with self.lock:
+            self.commands += 1
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    del self.data[key]
+                    self.expires.pop(key, None)
+                    removed += 1
+            return removed
@@ -0,0 +1,53 @@
+"""
+In-process fake of the boto3 SES client for unit and load tests.
+Implements send_email and get_send_quota, with per-call latency, SES-style Throttling once
+more than `max_send_rate` messages arrive within a second, and injectable failures.
+"""
+import time
+import threading
+import itertools
+from collections import deque
+
+from botocore.exceptions import ClientError
+
+
+class FakeSES:
+    """Records every accepted message in `sent`; `calls` and `throttled` count the attempts"""
+
+    def __init__(self, latency=0.0, max_send_rate=14.0, clock=time.monotonic, sleep=time.sleep):
+        self.latency = latency
+        self.max_send_rate = max_send_rate
+        self.clock = clock
+        self.sleep = sleep
+        self.sent = []
+        self.calls = 0
+        self.throttled = 0
+        self.failures = deque()
+        self.recent = deque()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def fail_next(self, code, message="Injected failure", times=1):
+        """Make the next `times` send_email calls raise a ClientError with `code`"""
+        self.failures.extend([(code, message)] * times)
+
+    def get_send_quota(self):
+        return {"Max24HourSend": 200.0, "MaxSendRate": self.max_send_rate, "SentLast24Hours": float(len(self.sent))}
+
+    def send_email(self, **message):
+        if self.latency:
+            self.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            if self.failures:
+                code, text = self.failures.popleft()
+                raise ClientError({"Error": {"Code": code, "Message": text}}, "SendEmail")
+            now = self.clock()
+            while self.recent and self.recent[0] <= now - 1.0:
+                self.recent.popleft()
+            if len(self.recent) >= self.max_send_rate:
+                self.throttled += 1
+                raise ClientError({"Error": {"Code": "Throttling", "Message": "Maximum sending rate exceeded."}}, "SendEmail")
+            self.recent.append(now)
+            self.sent.append(message)
+            return {"MessageId": f"fake-{next(self.ids)}"}
@@ -0,0 +1,73 @@
+"""
+HNSW versus exact search: recall@k and query latency for a large per-user memory.
+
+Run with: python -m pytest tests/load/ann_index_load_test.py -s
+Scale with LOAD_TEST_USER_EMAILS (default 50000; use 300000 for a power user) and
+LOAD_TEST_EMBEDDING_DIM (default 768). Requires hnswlib.
+"""
+import os
+import time
+import unittest
+
+import numpy as np
+
+from services import ann_index
+from services.ann_index import HNSWIndex
+from services.hybrid_retriever import DenseIndex
+
+USER_EMAILS = int(os.getenv("LOAD_TEST_USER_EMAILS", "50000"))
+EMBEDDING_DIM = int(os.getenv("LOAD_TEST_EMBEDDING_DIM", "768"))
+QUERIES = 200
+K = 10
+
+
+def embedding_like(count, dimension, seed):
+    # Topics, sub-topics and noise: closer to real text embeddings than isotropic noise
+    structure = np.random.RandomState(0)
+    topics = structure.standard_normal((64, dimension))
+    subtopics = structure.standard_normal((2048, dimension))
+    generator = np.random.RandomState(seed)
+    return (topics[generator.randint(64, size=count)] + 0.7 * subtopics[generator.randint(2048, size=count)]
+            + 0.3 * generator.standard_normal((count, dimension))).astype(np.float32)
+
+
+def timed_queries(index, queries):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append({doc_id for doc_id, _ in index.search(query, K)})
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, np.percentile(latencies, [50, 99])
+
+
+@unittest.skipUnless(ann_index.hnswlib, "hnswlib is not installed")
+class TestANNIndexLoad(unittest.TestCase):
+    def setUp(self):
+        self.vectors = embedding_like(USER_EMAILS, EMBEDDING_DIM, seed=1)
+        self.queries = embedding_like(QUERIES, EMBEDDING_DIM, seed=2)
+
+    def test_recall_and_latency_versus_exact(self):
+        exact = DenseIndex(initial_capacity=USER_EMAILS)
+        for i, vector in enumerate(self.vectors):
+            exact.add(i, vector)
+        truth, (exact_p50, exact_p99) = timed_queries(exact, self.queries)
+        print(f"\n{USER_EMAILS} vectors x {EMBEDDING_DIM} dims")
+        print(f"exact             p50 {exact_p50:7.2f} ms  p99 {exact_p99:7.2f} ms")
+
+        for m in (8, 16, 32):
+            index = HNSWIndex(m=m, initial_capacity=USER_EMAILS)
+            started = time.perf_counter()
+            index.add_many(list(range(USER_EMAILS)), self.vectors)
+            build_s = time.perf_counter() - started
+            for ef in (16, 64, 256):
+                index.set_ef(ef)
+                found, (p50, p99) = timed_queries(index, self.queries)
+                recall = sum(len(f & t) for f, t in zip(found, truth)) / (K * QUERIES)
+                print(f"hnsw M={m:<2} ef={ef:<3}  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  recall@{K} {recall:.3f}  "
+                      f"build {build_s:.1f} s  ~{index.memory_bytes() / 2 ** 20:.0f} MiB")
+                if m == 16 and ef == 256:
+                    self.assertGreaterEqual(recall, 0.95)
+                    self.assertLess(p50, exact_p50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Import time of agents.email_agent, profiled with `python -X importtime`.
+
+Run with: python -m pytest tests/load/email_agent_import_load_test.py -s
+Scale with LOAD_TEST_IMPORT_RUNS (default 5); LOAD_TEST_IMPORT_BUDGET_MS fails the run when the
+median import exceeds it (default 0, report only).
+"""
+import os
+import statistics
+import subprocess
+import sys
+import unittest
+
+RUNS = int(os.getenv("LOAD_TEST_IMPORT_RUNS", "5"))
+BUDGET_MS = float(os.getenv("LOAD_TEST_IMPORT_BUDGET_MS", "0"))
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+PROBE = (
+    "import sys, agents.email_agent; "
+    "print(','.join(name for name in ('services.embedding_store', 'pinecone', 'weaviate', 'langchain_openai') "
+    "if name in sys.modules))"
+)
+
+
+def profile_import():
+    """Run the import in a fresh interpreter; returns the modules it loaded and importtime rows"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return result.stdout.strip(), rows
+
+
+class TestEmailAgentImportLoad(unittest.TestCase):
+    def test_import_time(self):
+        totals = []
+        for _ in range(RUNS):
+            loaded, rows = profile_import()
+            self.assertEqual(loaded, "", f"Importing the agent loaded client modules: {loaded}")
+            totals.append(next(cumulative for cumulative, _, name in rows if name == "agents.email_agent") / 1000)
+
+        median_ms = statistics.median(totals)
+        print(f"\nagents.email_agent import over {RUNS} runs: median {median_ms:.0f} ms, max {max(totals):.0f} ms")
+        print("slowest imports (cumulative ms):")
+        for cumulative, _, name in sorted(rows, reverse=True)[:10]:
+            print(f"  {cumulative / 1000:8.1f}  {name}")
+        if BUDGET_MS:
+            self.assertLessEqual(median_ms, BUDGET_MS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Measures bytes transferred and parse time per mailbox for each Gmail fetch profile.
+
+Run with: python -m pytest tests/load/gmail_fetch_profile_load_test.py -s
+Scale with LOAD_TEST_MESSAGES (default 200).
+"""
+import os
+import unittest
+
+from tests.fakes.fake_gmail import FakeGmail, make_message
+from tests.unit.gmail_fetch_profile_test import make_gmail_service
+from utils.gmail_service import FETCH_PROFILE_FULL, FETCH_PROFILE_PARTIAL, FETCH_PROFILE_METADATA
+
+MESSAGES = int(os.getenv("LOAD_TEST_MESSAGES", "200"))
+
+
+class TestGmailFetchProfileLoad(unittest.TestCase):
+    def setUp(self):
+        # Roughly a third of an inbox is promotional, as in a typical consumer mailbox
+        self.fake = FakeGmail([
+            make_message(
+                f"m{i}",
+                body="Could you send me the report by Friday? " * 5,
+                labels=("INBOX", "UNREAD", "CATEGORY_PROMOTIONS") if i % 3 == 0 else ("INBOX", "UNREAD")
+            )
+            for i in range(MESSAGES)
+        ], page_size=500)
+
+    def _measure(self, fetch_profile):
+        service = make_gmail_service(self.fake)
+        emails = service.get_unread_emails(fetch_profile=fetch_profile)
+        if fetch_profile == FETCH_PROFILE_METADATA:
+            service.load_email_bodies([email for email in emails if "CATEGORY_PROMOTIONS" not in email["labelIds"]])
+        stats = service.report_fetch_stats()
+        return (
+            sum(values["bytes"] for values in stats.values()),
+            sum(values["parse_ms"] for values in stats.values())
+        )
+
+    def test_masks_reduce_bytes_and_parse_time(self):
+        results = {profile: self._measure(profile) for profile in (FETCH_PROFILE_FULL, FETCH_PROFILE_PARTIAL, FETCH_PROFILE_METADATA)}
+
+        print(f"\n{MESSAGES} messages per mailbox")
+        for profile, (transferred, parse_ms) in results.items():
+            print(f"  {profile:<9} {transferred / 1024:>10.1f} KiB {parse_ms:>9.1f} ms parsing")
+
+        self.assertLess(results[FETCH_PROFILE_PARTIAL][0], results[FETCH_PROFILE_FULL][0])
+        self.assertLess(results[FETCH_PROFILE_METADATA][0], results[FETCH_PROFILE_PARTIAL][0])
+
+if __name__ == '__main__':
+    unittest.main()
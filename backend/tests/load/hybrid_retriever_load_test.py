@@ -0,0 +1,54 @@
+"""
+In-process hybrid (BM25 + vector) query latency over one user's mail.
+
+Run with: python -m pytest tests/load/hybrid_retriever_load_test.py -s
+Scale with LOAD_TEST_USER_EMAILS (default 5000) and LOAD_TEST_EMBEDDING_DIM (default 1536).
+"""
+import os
+import time
+import random
+import unittest
+
+import numpy as np
+
+from services.hybrid_retriever import HybridRetriever
+
+USER_EMAILS = int(os.getenv("LOAD_TEST_USER_EMAILS", "5000"))
+EMBEDDING_DIM = int(os.getenv("LOAD_TEST_EMBEDDING_DIM", "1536"))
+QUERIES = 200
+
+WORDS = ("budget", "meeting", "launch", "invoice", "design", "review", "travel", "hiring", "roadmap", "contract",
+         "feedback", "schedule", "report", "client", "deadline", "priority", "workshop", "release", "pricing", "survey")
+
+
+class TestHybridRetrieverLoad(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        vectors = np.random.RandomState(7).standard_normal((USER_EMAILS, EMBEDDING_DIM)).astype(np.float32)
+        self.retriever = HybridRetriever()
+        self.texts = []
+        for i in range(USER_EMAILS):
+            text = " ".join(rng.choices(WORDS, k=40)) + f" INV-{i:06d}"
+            self.texts.append(text)
+            self.retriever.add("u1", f"e{i}", text, vectors[i])
+        self.vectors = vectors
+
+    def test_query_latency(self):
+        latencies = []
+        hits = 0
+        for q in range(QUERIES):
+            target = (q * 7919) % USER_EMAILS
+            started = time.perf_counter()
+            results = self.retriever.search("u1", f"what about INV-{target:06d} {WORDS[q % len(WORDS)]}", self.vectors[(target + 1) % USER_EMAILS], limit=5)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += any(result["content"] == self.texts[target] for result in results)
+
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"\n{USER_EMAILS} emails x {EMBEDDING_DIM} dims: hybrid query p50 {p50:.2f} ms, p99 {p99:.2f} ms, "
+              f"exact-term hit rate {hits / QUERIES:.0%}")
+
+        self.assertEqual(hits, QUERIES)
+        self.assertLess(p50, 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Load test of /auth/register latency with SES sends in the handler vs the outbound mail queue.
+
+SES is a FakeSES with a fixed per-call latency and the production send rate, so a burst of
+signups both waits on SES round trips and runs into Throttling when sent inline.
+
+Run with: python -m pytest tests/load/mail_queue_load_test.py -s
+Scale with LOAD_TEST_SIGNUPS (default 40), LOAD_TEST_SES_LATENCY_MS (default 80) and
+LOAD_TEST_SES_RATE (default 14 messages/s).
+"""
+import os
+import time
+import asyncio
+import statistics
+import unittest
+from unittest.mock import patch
+
+import httpx
+from botocore.exceptions import ClientError
+from fastapi import FastAPI
+
+import auth.auth_service as auth_service
+from services.mail_queue import MailQueue
+from services.password_hasher import PasswordHasher, make_password_context
+from tests.fakes.fake_firestore import FakeFirestore
+from tests.fakes.fake_ses import FakeSES
+
+SIGNUPS = int(os.getenv("LOAD_TEST_SIGNUPS", "40"))
+SES_LATENCY = int(os.getenv("LOAD_TEST_SES_LATENCY_MS", "80")) / 1000
+SES_RATE = float(os.getenv("LOAD_TEST_SES_RATE", "14"))
+
+
+class InlineMailQueue(MailQueue):
+    """Sends on the handler's thread without pacing or retries, as EmailService did before the queue"""
+
+    def enqueue(self, message, description):
+        try:
+            self.client.send_email(**message)
+            return True
+        except ClientError:
+            return False
+
+
+def p99(latencies):
+    return statistics.quantiles(latencies, n=100)[98]
+
+
+class TestMailQueueLoad(unittest.TestCase):
+    def setUp(self):
+        self.app = FastAPI()
+        self.app.include_router(auth_service.auth_router, prefix="/auth")
+        self.hasher = PasswordHasher(make_password_context(rounds=4))
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    async def _scenario(self):
+        transport = httpx.ASGITransport(app=self.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def register(i):
+                started = time.perf_counter()
+                response = await client.post(
+                    "/auth/register",
+                    json={"full_name": f"User {i}", "email": f"user{i}@acme.com", "password": "hunter2"}
+                )
+                self.assertEqual(response.status_code, 200)
+                return time.perf_counter() - started, "access_token" in response.json()
+
+            return await asyncio.gather(*(register(i) for i in range(SIGNUPS)))
+
+    def _measure(self, queue):
+        with patch.object(auth_service, "get_firestore_client", return_value=FakeFirestore()), \
+                patch.object(auth_service, "password_hasher", self.hasher), \
+                patch("utils.email_service.mail_queue", queue), \
+                patch.object(auth_service.limiter, "enabled", False):
+            started = time.perf_counter()
+            results = asyncio.run(self._scenario())
+            responded = time.perf_counter() - started
+            queue.shutdown(timeout=60)
+            delivered = time.perf_counter() - started
+        latencies = [latency for latency, _ in results]
+        accepted = sum(ok for _, ok in results)
+        return latencies, accepted, responded, delivered
+
+    def test_signup_latency_excludes_ses(self):
+        inline_ses = FakeSES(latency=SES_LATENCY, max_send_rate=SES_RATE)
+        inline = InlineMailQueue(lambda: inline_ses, max_send_rate=SES_RATE)
+        inline.client = inline_ses
+        inline_latencies, inline_accepted, inline_elapsed, _ = self._measure(inline)
+
+        queued_ses = FakeSES(latency=SES_LATENCY, max_send_rate=SES_RATE)
+        queued = MailQueue(lambda: queued_ses, max_send_rate=SES_RATE)
+        queued_latencies, queued_accepted, queued_elapsed, delivered = self._measure(queued)
+
+        print(
+            f"\n{SIGNUPS} concurrent signups, SES {SES_LATENCY * 1000:.0f}ms per call at {SES_RATE:g} messages/s:\n"
+            f"  SES in the handler: p50={statistics.median(inline_latencies) * 1000:.1f}ms "
+            f"p99={p99(inline_latencies) * 1000:.1f}ms total={inline_elapsed:.2f}s "
+            f"emails sent={len(inline_ses.sent)} throttled={inline_ses.throttled}\n"
+            f"  mail queue:         p50={statistics.median(queued_latencies) * 1000:.1f}ms "
+            f"p99={p99(queued_latencies) * 1000:.1f}ms total={queued_elapsed:.2f}s "
+            f"emails sent={len(queued_ses.sent)} throttled={queued_ses.throttled} (all delivered after {delivered:.2f}s)"
+        )
+        self.assertEqual((queued_accepted, len(queued_ses.sent), queued_ses.throttled), (SIGNUPS, SIGNUPS, 0))
+        self.assertLess(p99(queued_latencies), p99(inline_latencies))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Decoding cost of stored email metadata: legacy str()/eval() versus JSON.
+
+Run with: python -m pytest tests/load/metadata_serialization_load_test.py -s
+Scale with LOAD_TEST_RESULTS (default 20000).
+"""
+import os
+import time
+import unittest
+
+from services.email_metadata import decode_metadata, encode_metadata
+
+RESULTS = int(os.getenv("LOAD_TEST_RESULTS", "20000"))
+
+METADATA = {
+    "subject": "Quarterly planning",
+    "sender": "Jane Doe <jane@acme.com>",
+    "timestamp": "2026-10-01T09:30:00",
+    "classification": {
+        "category": "Work", "subcategory": "Planning", "urgency": 3, "contains_question": True,
+        "key_entities": ["Acme", "Q4 roadmap", "Jane Doe"], "action_items": ["Review the draft", "Book a room"],
+        "sentiment": "Neutral"
+    },
+    "priority": {"priority_level": "Medium", "response_timeframe": "This Week", "reasoning": "Planning request " * 5}
+}
+
+
+class TestMetadataSerializationLoad(unittest.TestCase):
+    def _time(self, decode, values):
+        started = time.perf_counter()
+        for value in values:
+            decode(value)
+        return (time.perf_counter() - started) * 1000
+
+    def test_json_decoding_is_faster_than_eval(self):
+        legacy = [str(METADATA)] * RESULTS
+        encoded = [encode_metadata(METADATA)] * RESULTS
+
+        eval_ms = self._time(eval, legacy)
+        json_ms = self._time(decode_metadata, encoded)
+        print(f"\n{RESULTS} results: eval(str) {eval_ms:.0f} ms, orjson {json_ms:.0f} ms ({eval_ms / json_ms:.0f}x faster)")
+
+        self.assertEqual(decode_metadata(encoded[0]), eval(legacy[0]))
+        self.assertLess(json_ms * 5, eval_ms)
+
+if __name__ == '__main__':
+    unittest.main()
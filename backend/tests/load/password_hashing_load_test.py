@@ -0,0 +1,103 @@
+"""
+Load test of /auth/authenticate latency while signins hash passwords.
+
+Compares bcrypt on the event loop (the old behavior) with the bounded hashing pool.
+
+Run with: python -m pytest tests/load/password_hashing_load_test.py -s
+Scale with LOAD_TEST_SIGNINS (default 16), LOAD_TEST_AUTH_REQUESTS (default 200) and
+LOAD_TEST_BCRYPT_ROUNDS (default 10).
+"""
+import os
+import time
+import asyncio
+import statistics
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+import auth.auth_service as auth_service
+from auth.jwt_handler import create_access_token
+from services.password_hasher import PasswordHasher, make_password_context
+from tests.fakes.fake_firestore import FakeFirestore
+
+SIGNINS = int(os.getenv("LOAD_TEST_SIGNINS", "16"))
+AUTH_REQUESTS = int(os.getenv("LOAD_TEST_AUTH_REQUESTS", "200"))
+ROUNDS = int(os.getenv("LOAD_TEST_BCRYPT_ROUNDS", "10"))
+# Seconds between authenticate requests; signins are spread over the same period
+INTERVAL = 0.005
+
+
+class InlineHasher(PasswordHasher):
+    """Hashes on the calling thread, as the handlers did before the pool"""
+
+    async def _run(self, operation, function, *args):
+        return function(*args)
+
+
+def p99(latencies):
+    return statistics.quantiles(latencies, n=100)[98]
+
+
+class TestPasswordHashingLoad(unittest.TestCase):
+    def setUp(self):
+        self.context = make_password_context(rounds=ROUNDS)
+        self.db = FakeFirestore()
+        for i in range(SIGNINS):
+            self.db.docs[f"users/user{i}"] = {"email": f"user{i}@acme.com", "password": self.context.hash("hunter2")}
+        self.token = create_access_token({"sub": "user0"})
+        self.app = FastAPI()
+        self.app.include_router(auth_service.auth_router, prefix="/auth")
+
+    async def _scenario(self):
+        transport = httpx.ASGITransport(app=self.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            loop = asyncio.get_running_loop()
+            begin = loop.time()
+
+            async def signin(i):
+                await asyncio.sleep(i * INTERVAL * AUTH_REQUESTS / SIGNINS)
+                response = await client.post("/auth/signin", json={"email": f"user{i}@acme.com", "password": "hunter2"})
+                self.assertEqual(response.status_code, 200)
+
+            async def authenticate(k):
+                # Open loop: latency counts from when the request was due, so time spent
+                # waiting for a blocked event loop to send it is included
+                scheduled = begin + k * INTERVAL
+                await asyncio.sleep(max(0.0, scheduled - loop.time()))
+                response = await client.get("/auth/authenticate", headers={"Authorization": f"Bearer {self.token}"})
+                self.assertEqual(response.status_code, 200)
+                return loop.time() - scheduled
+
+            results = await asyncio.gather(
+                *(authenticate(k) for k in range(AUTH_REQUESTS)),
+                *(signin(i) for i in range(SIGNINS))
+            )
+            return results[:AUTH_REQUESTS]
+
+    def _measure(self, hasher):
+        with patch.object(auth_service, "get_firestore_client", return_value=self.db), \
+                patch.object(auth_service, "password_hasher", hasher), \
+                patch.object(auth_service.limiter, "enabled", False):
+            started = time.perf_counter()
+            latencies = asyncio.run(self._scenario())
+            return latencies, time.perf_counter() - started
+
+    def test_authenticate_p99_under_concurrent_signins(self):
+        inline, inline_elapsed = self._measure(InlineHasher(self.context, workers=1))
+        pooled_hasher = PasswordHasher(self.context)
+        pooled, pooled_elapsed = self._measure(pooled_hasher)
+        pooled_hasher.shutdown()
+
+        print(
+            f"\n{SIGNINS} signins (bcrypt rounds={ROUNDS}) alongside {len(pooled)} authenticate requests:\n"
+            f"  on the event loop: p50={statistics.median(inline) * 1000:.1f}ms "
+            f"p99={p99(inline) * 1000:.1f}ms total={inline_elapsed:.2f}s\n"
+            f"  hashing pool:      p50={statistics.median(pooled) * 1000:.1f}ms "
+            f"p99={p99(pooled) * 1000:.1f}ms total={pooled_elapsed:.2f}s"
+        )
+        self.assertLess(p99(pooled), p99(inline))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Recall@k versus resident memory for float32, int8 and product quantized embeddings.
+
+Resident size is the growth of the process RSS while an index is built and queried
+(Linux, read from /proc/self/statm), next to the size the index reports for its codes.
+
+Run with: python -m pytest tests/load/quantization_load_test.py -s
+Scale with LOAD_TEST_USER_EMAILS (default 10000) and LOAD_TEST_EMBEDDING_DIM (default 1536).
+"""
+import os
+import time
+import multiprocessing
+import unittest
+
+import numpy as np
+
+from services.hybrid_retriever import DenseIndex
+from services.quantization import QuantizedDenseIndex, normalize
+
+USER_EMAILS = int(os.getenv("LOAD_TEST_USER_EMAILS", "10000"))
+EMBEDDING_DIM = int(os.getenv("LOAD_TEST_EMBEDDING_DIM", "1536"))
+QUERIES = 100
+K = 10
+
+
+def resident_bytes():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def embedding_like(count, dimension, seed):
+    # Topics, sub-topics and noise: closer to real text embeddings than isotropic noise
+    structure = np.random.RandomState(0)
+    topics = structure.standard_normal((64, dimension))
+    subtopics = structure.standard_normal((2048, dimension))
+    generator = np.random.RandomState(seed)
+    return (topics[generator.randint(64, size=count)] + 0.7 * subtopics[generator.randint(2048, size=count)]
+            + 0.3 * generator.standard_normal((count, dimension))).astype(np.float32)
+
+
+class TestQuantizationLoad(unittest.TestCase):
+    def setUp(self):
+        self.vectors = embedding_like(USER_EMAILS, EMBEDDING_DIM, seed=1)
+        self.queries = embedding_like(QUERIES, EMBEDDING_DIM, seed=2)
+        scores = normalize(self.queries) @ normalize(self.vectors).T
+        self.truth = [set(row) for row in np.argsort(-scores, axis=1)[:, :K]]
+
+    def _measure(self, name, make_index):
+        # Each index is built in a forked child, so heap freed by an earlier index cannot hide its growth
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        child = multiprocessing.get_context("fork").Process(target=lambda: sender.send(self._build(name, make_index)))
+        child.start()
+        result = receiver.recv()
+        child.join()
+        return result
+
+    def _build(self, name, make_index):
+        baseline = resident_bytes()
+        index = make_index()
+        started = time.perf_counter()
+        for i, vector in enumerate(self.vectors):
+            index.add(i, vector)
+        build_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        hits = sum(len({doc_id for doc_id, _ in index.search(query, K)} & truth) for query, truth in zip(self.queries, self.truth))
+        query_ms = (time.perf_counter() - started) * 1000 / QUERIES
+
+        recall = hits / (K * QUERIES)
+        resident = max(resident_bytes() - baseline, 0)
+        per_vector = index.memory_bytes() / USER_EMAILS
+        print(f"{name:<22} {per_vector:>8.0f} B/vector {index.memory_bytes() / 2 ** 20:>8.1f} MiB "
+              f"resident {resident / 2 ** 20:>8.1f} MiB  recall@{K} {recall:.3f}  query {query_ms:.2f} ms  build {build_s:.1f} s")
+        return recall, index.memory_bytes(), resident
+
+    def test_recall_versus_memory(self):
+        print(f"\n{USER_EMAILS} vectors x {EMBEDDING_DIM} dims (re-rank vectors on disk by default)")
+        float32 = self._measure("float32", DenseIndex)
+        int8 = self._measure("int8", lambda: QuantizedDenseIndex("int8", rerank_factor=0))
+        int8_rerank = self._measure("int8 + rerank", lambda: QuantizedDenseIndex("int8"))
+        pq = self._measure("pq96", lambda: QuantizedDenseIndex("pq", rerank_factor=0, pq_subspaces=96))
+        pq_rerank = self._measure("pq96 + rerank", lambda: QuantizedDenseIndex("pq", pq_subspaces=96))
+        pq_deep_rerank = self._measure("pq96 + rerank x50", lambda: QuantizedDenseIndex("pq", pq_subspaces=96, rerank_factor=50))
+
+        # Ties between equal float32 scores can swap the last neighbour
+        self.assertGreaterEqual(float32[0], 0.99)
+        self.assertGreaterEqual(int8[0], 0.95)
+        self.assertGreaterEqual(int8_rerank[0], 0.99)
+        self.assertGreater(pq_rerank[0], pq[0])
+        self.assertGreaterEqual(pq_deep_rerank[0], pq_rerank[0])
+        self.assertGreaterEqual(pq_deep_rerank[0], 0.9)
+        self.assertLess(int8_rerank[1], float32[1] * 0.27)
+        self.assertLess(pq_rerank[1], int8_rerank[1])
+        # Re-ranking must not keep the float32 rows in the process
+        self.assertGreaterEqual(float32[2], float32[1])
+        self.assertLess(int8_rerank[2] - int8[2], float32[1] * 0.1)
+        self.assertLess(pq_rerank[2] - pq[2], float32[1] * 0.1)
+        self.assertLess(int8_rerank[2], float32[2] * 0.5)
+        self.assertLess(pq_rerank[2], int8_rerank[2])
+
+if __name__ == '__main__':
+    unittest.main()
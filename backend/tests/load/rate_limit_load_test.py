@@ -0,0 +1,93 @@
+"""
+Load test of rate limits across uvicorn-style worker processes.
+
+Each of the workers is a separate process with its own limiter, like `uvicorn --workers 4`,
+hammering the same users' limited endpoint. With per-process memory storage every worker
+admits its own budget; with the shared storage the whole fleet admits exactly the limit.
+The shared storage here is a FakeRedis served from its own process, standing in for Redis.
+
+Run with: python -m pytest tests/load/rate_limit_load_test.py -s
+Scale with LOAD_TEST_WORKERS (default 4), LOAD_TEST_USERS (default 8) and
+LOAD_TEST_REQUESTS_PER_USER (default 50, per worker).
+"""
+import os
+import time
+import unittest
+import multiprocessing
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from auth.jwt_handler import create_access_token
+from services.rate_limits import make_limiter
+from tests.fakes.fake_rate_limit_storage import FakeRedisServer
+
+WORKERS = int(os.getenv("LOAD_TEST_WORKERS", "4"))
+USERS = int(os.getenv("LOAD_TEST_USERS", "8"))
+REQUESTS_PER_USER = int(os.getenv("LOAD_TEST_REQUESTS_PER_USER", "50"))
+LIMIT = 20
+
+
+def worker(storage_uri, tokens, start, results):
+    limiter = make_limiter(storage_uri)
+    app = FastAPI()
+    app.state.limiter = limiter
+
+    @app.get("/limited")
+    @limiter.limit(f"{LIMIT}/minute")
+    async def limited(request: Request):
+        return {"ok": True}
+
+    client = TestClient(app, raise_server_exceptions=False)
+    start.wait()
+    admitted = {}
+    began = time.perf_counter()
+    for _ in range(REQUESTS_PER_USER):
+        for user_id, token in tokens.items():
+            response = client.get("/limited", headers={"Authorization": f"Bearer {token}"})
+            admitted[user_id] = admitted.get(user_id, 0) + (response.status_code == 200)
+    results.put((admitted, time.perf_counter() - began))
+
+
+class TestRateLimitLoad(unittest.TestCase):
+    def _run(self, storage_uri):
+        context = multiprocessing.get_context("fork")
+        tokens = {f"user{i}": create_access_token({"sub": f"user{i}"}) for i in range(USERS)}
+        start = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(storage_uri, tokens, start, results))
+            for _ in range(WORKERS)
+        ]
+        for process in processes:
+            process.start()
+        start.set()
+        outcomes = [results.get(timeout=120) for _ in processes]
+        for process in processes:
+            process.join()
+
+        admitted = {user_id: sum(counts[user_id] for counts, _ in outcomes) for user_id in tokens}
+        elapsed = max(seconds for _, seconds in outcomes)
+        return admitted, WORKERS * USERS * REQUESTS_PER_USER / elapsed
+
+    def test_limits_hold_across_workers(self):
+        per_process, per_process_rate = self._run("memory://")
+        server = FakeRedisServer().start()
+        try:
+            shared, shared_rate = self._run(server.uri)
+        finally:
+            server.stop()
+
+        print(
+            f"\n{WORKERS} workers x {USERS} users x {REQUESTS_PER_USER} requests, limit {LIMIT}/minute per user:\n"
+            f"  per-process memory: admitted per user {sorted(set(per_process.values()))} "
+            f"({per_process_rate:.0f} req/s)\n"
+            f"  shared storage:     admitted per user {sorted(set(shared.values()))} "
+            f"({shared_rate:.0f} req/s)"
+        )
+        self.assertEqual(set(shared.values()), {LIMIT})
+        self.assertEqual(set(per_process.values()), {LIMIT * WORKERS})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Peak memory of streaming sent-mail collection versus building the full list.
+
+Run with: python -m pytest tests/load/sent_mail_streaming_load_test.py -s
+Scale with LOAD_TEST_SENT_EMAILS (default 5000; use 50000 for a large mailbox).
+"""
+import os
+import gc
+import random
+import unittest
+import tracemalloc
+from unittest.mock import patch
+
+from services.gmail_quota import gmail_executor
+from tests.fakes.fake_gmail import FakeGmail, make_message
+from tests.unit.gmail_fetch_profile_test import make_gmail_service
+from utils.openai_service import SentEmailProcessor
+
+SENT_EMAILS = int(os.getenv("LOAD_TEST_SENT_EMAILS", "5000"))
+
+
+def sent_reply(i):
+    # Distinct ~700 character replies: near-duplicates would be collapsed before indexing
+    rng = random.Random(i)
+    return f"Reply number {i}. " + " ".join(f"{rng.getrandbits(32):08x}" for _ in range(80))
+
+
+class TestSentMailStreamingLoad(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeGmail([
+            make_message(f"s{i}", body=sent_reply(i), labels=("SENT",), html_size=2000, extra_headers=5)
+            for i in range(SENT_EMAILS)
+        ], page_size=500, record_requests=False)
+        self.processor = make_gmail_service(self.fake, service_class=SentEmailProcessor)
+        # Quota throttling is not what is measured here
+        self.throttle = patch.object(gmail_executor, "throttle", lambda user_id, units: 0.0)
+        self.throttle.start()
+
+    def tearDown(self):
+        self.throttle.stop()
+
+    def _peak(self, collect):
+        gc.collect()
+        tracemalloc.start()
+        count = collect()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return count, peak
+
+    def test_streaming_memory_stays_flat(self):
+        def stream():
+            count = 0
+            reply_filter = self.processor.reply_filter()
+            for emails, _ in self.processor.iter_sent_email_pages():
+                count += len(self.processor.reply_documents(emails, reply_filter))
+            return count
+
+        streamed, stream_peak = self._peak(stream)
+        listed, list_peak = self._peak(lambda: len(self.processor.collect_sent_emails()))
+
+        print(f"\n{SENT_EMAILS} sent emails: streaming peak {stream_peak / 2 ** 20:.1f} MiB, "
+              f"full list peak {list_peak / 2 ** 20:.1f} MiB")
+
+        self.assertEqual(streamed, SENT_EMAILS)
+        self.assertEqual(listed, SENT_EMAILS)
+        self.assertLess(stream_peak * 2, list_peak)
+
+if __name__ == '__main__':
+    unittest.main()
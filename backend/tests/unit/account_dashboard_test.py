@@ -0,0 +1,98 @@
+import asyncio
+import time
+import unittest
+from datetime import date, datetime, timedelta, timezone
+
+from services.account_dashboard import DASHBOARD_FIELDS, UserNotFound, build_dashboard, parse_fields
+from services.draft_analytics import DraftAnalytics, build_analytics
+from services.draft_rollups import DraftRollups
+from services.draft_summaries import list_recent_drafts
+from tests.fakes.fake_async_firestore import FakeAsyncFirestore
+
+TODAY = date(2026, 10, 19)
+
+
+class TestAccountDashboard(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeAsyncFirestore(delay=0.05)
+        sync = self.db.sync
+        sync.docs["users/user1"] = {"drafts": 42, "messages_sent": 7, "is_pro": False, "settings": {"tone": "warm"}}
+        drafts = []
+        batch = sync.batch()
+        for i in range(12):
+            created = datetime(2026, 10, 19, tzinfo=timezone.utc) - timedelta(days=i % 4, hours=i)
+            draft = {
+                "user_id": "user1", "gmail_draft_id": f"g{i}", "recipient_email": f"Jane <jane{i % 3}@acme.com>",
+                "email_subject": f"Subject {i}", "email_body": "long original", "draft_subject": f"Re: Subject {i}",
+                "draft_body": "Thanks for the note " * (i + 1), "draft_body_topic": "billing" if i % 2 else "hiring",
+                "date_created": created, "priority": i % 7, "action_item": "Reply"
+            }
+            sync.docs[f"drafts/d{i:02d}"] = draft
+            drafts.append((f"d{i:02d}", draft))
+            DraftRollups(sync).record_created(batch, "user1", created)
+        batch.commit()
+        sync.docs["draft_analytics/user1"] = build_analytics(drafts)
+        sync.docs["drafts/other"] = {"user_id": "user2", "date_created": datetime(2026, 10, 19)}
+
+    def _build(self, **kwargs):
+        return asyncio.run(build_dashboard(self.db, "user1", today=TODAY, **kwargs))
+
+    def test_matches_the_individual_endpoints(self):
+        """Test every field equals what its individual endpoint computes."""
+        sync = self.db.sync
+        analytics = DraftAnalytics(sync)
+        recent, next_cursor = list_recent_drafts(sync, "user1", limit=5)
+        dashboard = self._build(limit=5)
+
+        self.assertEqual(dashboard, {
+            "drafts_count": 12,
+            "remaining_drafts": 42,
+            "messages_sent": 7,
+            "subscription_status": False,
+            "top_senders": analytics.top_senders("user1", 5),
+            "common_topics": analytics.common_topics("user1", 5),
+            "average_words": analytics.average_words("user1"),
+            "highest_priority": analytics.high_priority("user1"),
+            "daily_counts": DraftRollups(sync).daily_counts("user1", 30, today=TODAY),
+            "recent_drafts": [draft.to_dict() for draft in recent],
+            "next_cursor": next_cursor,
+        })
+        self.assertNotIn("priority", dashboard["recent_drafts"][0])
+
+    def test_reads_run_concurrently(self):
+        """Test the reads overlap instead of running one after another."""
+        started = time.perf_counter()
+        self._build()
+        elapsed = time.perf_counter() - started
+        self.assertGreaterEqual(self.db.max_in_flight, 5)
+        self.assertLess(elapsed, 0.05 * 3)
+
+    def test_field_selection_limits_the_reads(self):
+        """Test only the selected fields are returned and only their documents are read."""
+        reads = self.db.sync.reads
+        dashboard = self._build(fields=parse_fields("remaining_drafts, top_senders"))
+        self.assertEqual(list(dashboard), ["remaining_drafts", "top_senders"])
+        self.assertEqual(self.db.sync.reads - reads, 2)
+
+    def test_pro_users_get_pro_fields(self):
+        """Test recent drafts include priorities for pro users."""
+        self.db.sync.docs["users/user1"]["is_pro"] = True
+        dashboard = self._build(fields=["recent_drafts"], limit=3)
+        self.assertEqual(dashboard["recent_drafts"][0]["priority"], 0)
+        self.assertEqual(dashboard["next_cursor"], "d08")
+
+    def test_parse_fields(self):
+        """Test an empty selection means every field and unknown fields are rejected."""
+        self.assertEqual(parse_fields(None), DASHBOARD_FIELDS)
+        self.assertEqual(parse_fields(" ,"), DASHBOARD_FIELDS)
+        with self.assertRaises(ValueError):
+            parse_fields("drafts_count,email_body")
+
+    def test_missing_user(self):
+        """Test a missing user document is reported."""
+        with self.assertRaises(UserNotFound):
+            asyncio.run(build_dashboard(self.db, "nobody", fields=["top_senders"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
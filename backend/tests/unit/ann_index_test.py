@@ -0,0 +1,166 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from services import ann_index, hybrid_retriever
+from services.ann_index import HNSWIndex
+from services.email_metadata import EmailFilter
+from services.hybrid_retriever import DenseIndex, HybridRetriever, make_dense_index
+
+
+def random_vectors(count, dimension=32, seed=5):
+    return np.random.RandomState(seed).standard_normal((count, dimension)).astype(np.float32)
+
+
+class TestHNSWFallback(unittest.TestCase):
+    def test_missing_hnswlib_falls_back_to_exact_search(self):
+        """Test the HNSW option degrades to exact search when hnswlib is not installed."""
+        with patch.object(ann_index, "hnswlib", None):
+            with self.assertRaises(ImportError):
+                HNSWIndex()
+            self.assertIsInstance(make_dense_index("u1", ann="hnsw"), DenseIndex)
+
+
+@unittest.skipUnless(ann_index.hnswlib, "hnswlib is not installed")
+class TestHNSWIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.vectors = random_vectors(500)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_incremental_inserts_grow_the_graph(self):
+        """Test single inserts beyond the initial capacity are all searchable."""
+        index = HNSWIndex(initial_capacity=16, ef_search=100)
+        for i, vector in enumerate(self.vectors):
+            index.add(f"e{i}", vector)
+        self.assertEqual(len(index), 500)
+        doc_id, score = index.search(self.vectors[123], 1)[0]
+        self.assertEqual(doc_id, "e123")
+        self.assertAlmostEqual(score, 1.0, places=4)
+
+    def test_deleted_documents_are_tombstoned_and_slots_reused(self):
+        """Test deleted documents are never returned and their slots are reused by new inserts."""
+        index = HNSWIndex(initial_capacity=500)
+        index.add_many([f"e{i}" for i in range(500)], self.vectors)
+        index.remove("e7")
+        self.assertNotIn("e7", [doc_id for doc_id, _ in index.search(self.vectors[7], 10)])
+        self.assertEqual(index.tombstones, 1)
+
+        index.add("new", self.vectors[7])
+        self.assertEqual(index.tombstones, 0)
+        self.assertEqual(index.search(self.vectors[7], 1)[0][0], "new")
+        self.assertEqual(index._index.get_max_elements(), 500)
+
+    def test_reinserting_replaces_the_vector(self):
+        """Test adding an existing id replaces its vector."""
+        index = HNSWIndex()
+        index.add("e1", self.vectors[0])
+        index.add("e1", self.vectors[1])
+        self.assertEqual(len(index), 1)
+        self.assertAlmostEqual(index.search(self.vectors[1], 1)[0][1], 1.0, places=4)
+
+    def test_persistence(self):
+        """Test a saved graph is loaded with its ids and tombstones."""
+        path = os.path.join(self.tmp.name, "u1.hnsw")
+        index = HNSWIndex(path=path, snapshot_every=0)
+        index.add_many([f"e{i}" for i in range(500)], self.vectors)
+        index.remove("e3")
+        index.save()
+        self.assertEqual(os.path.getsize(index.log_path), 0)
+
+        loaded = HNSWIndex(path=path)
+        self.assertEqual(len(loaded), 499)
+        self.assertEqual(loaded.tombstones, 1)
+        self.assertEqual(loaded.search(self.vectors[42], 1)[0][0], "e42")
+        self.assertNotIn("e3", [doc_id for doc_id, _ in loaded.search(self.vectors[3], 5)])
+
+    def test_documents_survive_a_restart(self):
+        """Test a retriever restarted without any snapshot replays its log and rebuilds BM25 and filters."""
+        with patch.object(hybrid_retriever, "EMBEDDING_INDEX_DIR", self.tmp.name):
+            retriever = HybridRetriever(ann="hnsw")
+            for i in range(20):
+                category = "billing" if i % 2 else "support"
+                retriever.add("u1", f"e{i}", f"Invoice INV-{1000 + i} for order {i}", self.vectors[i],
+                              {"classification": {"category": category}})
+            retriever.remove("e4", "u1")
+            self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "u1.hnsw")))
+
+            restarted = HybridRetriever(ann="hnsw")
+            results = restarted.search("u1", "INV-1007", self.vectors[7], limit=3)
+            self.assertEqual(results[0]["content"], "Invoice INV-1007 for order 7")
+            self.assertEqual(results[0]["metadata"]["classification"]["category"], "billing")
+            self.assertGreater(results[0]["bm25_score"], 0)
+            self.assertNotIn("Invoice INV-1004 for order 4", [result["content"] for result in restarted.search("u1", "INV-1004", limit=20)])
+            filtered = restarted.search("u1", "invoice", self.vectors[2], limit=20, filters=EmailFilter(categories=["support"]))
+            self.assertEqual(len(filtered), 9)
+
+    def test_snapshot_after_configured_changes(self):
+        """Test changes go to the log until enough accumulate for a snapshot, which empties the log."""
+        path = os.path.join(self.tmp.name, "u2.hnsw")
+        index = HNSWIndex(path=path, snapshot_every=2)
+        index.add("e1", self.vectors[0])
+        self.assertFalse(os.path.exists(path))
+        self.assertGreater(os.path.getsize(index.log_path), 0)
+        index.add("e2", self.vectors[1])
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.exists(index.ids_path))
+        self.assertEqual(os.path.getsize(index.log_path), 0)
+
+    def test_changes_after_a_snapshot_are_replayed(self):
+        """Test a restart applies logged inserts and deletes made after the last snapshot, once."""
+        path = os.path.join(self.tmp.name, "u3.hnsw")
+        index = HNSWIndex(path=path)
+        index.add_many([f"e{i}" for i in range(100)], self.vectors[:100])
+        index.documents["e1"] = {"content": "first"}
+        index.close()
+
+        index = HNSWIndex(path=path)
+        index.remove("e7")
+        index.documents["e100"] = {"content": "new"}
+        index.add("e100", self.vectors[100])
+        # Not closed: the process stopped without a snapshot, with a write cut short at the end of the log
+        with open(index.log_path, "a") as handle:
+            handle.write('{"seq": 999, "op": "add", "id": "e1')
+
+        loaded = HNSWIndex(path=path)
+        self.assertEqual(len(loaded), 100)
+        # e100 reused the slot e7 was tombstoned in
+        self.assertEqual(loaded.tombstones, 0)
+        self.assertNotIn("e7", [doc_id for doc_id, _ in loaded.search(self.vectors[7], 5)])
+        self.assertEqual(loaded.search(self.vectors[100], 1)[0][0], "e100")
+        self.assertEqual(loaded.documents["e100"], {"content": "new"})
+
+        # Entries a snapshot already covers are skipped if the log was not emptied after it
+        with open(loaded.log_path) as handle:
+            logged = handle.read()
+        loaded.save()
+        with open(loaded.log_path, "w") as handle:
+            handle.write(logged)
+        reloaded = HNSWIndex(path=path)
+        self.assertEqual((len(reloaded), reloaded.tombstones), (100, 0))
+
+    def test_filtered_search(self):
+        """Test small allowed sets are scanned exactly and large ones filter the graph walk."""
+        index = HNSWIndex(ef_search=100)
+        index.add_many([f"e{i}" for i in range(500)], self.vectors)
+        query = self.vectors[3]
+        scores = self.vectors @ query / np.linalg.norm(self.vectors, axis=1)
+
+        small = {f"e{i}" for i in range(0, 500, 50)}
+        expected = [f"e{i}" for i in sorted(range(0, 500, 50), key=lambda i: -scores[i])[:3]]
+        self.assertEqual([doc_id for doc_id, _ in index.search(query, 3, small)], expected)
+
+        large = {f"e{i}" for i in range(0, 500, 2)}
+        with patch.object(ann_index, "HNSW_FILTER_BRUTE_FORCE", 10):
+            results = index.search(query, 10, large)
+        self.assertEqual(len(results), 10)
+        self.assertTrue({doc_id for doc_id, _ in results} <= large)
+        self.assertEqual(index.search(query, 3, set()), [])
+
+if __name__ == '__main__':
+    unittest.main()
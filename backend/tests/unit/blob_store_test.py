@@ -0,0 +1,103 @@
+import os
+import pickle
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from services.blob_store import FirestoreBlobStore, LocalBlobStore, content_hash, migrate_inline_indexes
+from tests.fakes.fake_firestore import FakeFirestore
+from tests.unit.gmail_fetch_profile_test import make_gmail_service
+from tests.fakes.fake_gmail import FakeGmail
+from utils.openai_service import SentEmailProcessor
+
+PAYLOAD = os.urandom(2500)
+
+
+class TestFirestoreBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeFirestore()
+        self.store = FirestoreBlobStore(self.db, chunk_size=1000)
+
+    def test_roundtrip_is_chunked(self):
+        """Test a blob is split into chunk documents and read back intact."""
+        blob_hash = self.store.put(PAYLOAD)
+        self.assertEqual(blob_hash, content_hash(PAYLOAD))
+        self.assertEqual(self.store.get(blob_hash), PAYLOAD)
+        chunks = [path for path in self.db.docs if path.startswith(f"index_blobs/{blob_hash}/chunks/")]
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(self.db.docs[f"index_blobs/{blob_hash}"]["chunk_count"], 3)
+
+    def test_identical_payloads_are_stored_once(self):
+        """Test content addressing skips writing a blob that already exists."""
+        self.store.put(PAYLOAD)
+        writes = self.db.writes
+        self.store.put(PAYLOAD)
+        self.assertEqual(self.db.writes, writes)
+
+    def test_corrupt_blob_is_rejected(self):
+        """Test a blob whose chunks no longer match its hash is not returned."""
+        blob_hash = self.store.put(PAYLOAD)
+        self.db.docs[f"index_blobs/{blob_hash}/chunks/00001"]["data"] = b"x" * 1000
+        with self.assertRaises(ValueError):
+            self.store.get(blob_hash)
+
+    def test_delete_removes_manifest_and_chunks(self):
+        """Test deleting a blob removes every document belonging to it."""
+        blob_hash = self.store.put(PAYLOAD)
+        self.store.delete(blob_hash)
+        self.assertIsNone(self.store.get(blob_hash))
+        self.assertFalse([path for path in self.db.docs if blob_hash in path])
+
+
+class TestLocalBlobStore(unittest.TestCase):
+    def test_roundtrip(self):
+        """Test the local store writes one file per blob and reads it back."""
+        with tempfile.TemporaryDirectory() as root:
+            store = LocalBlobStore(root)
+            blob_hash = store.put(PAYLOAD)
+            self.assertTrue(store.exists(blob_hash))
+            self.assertEqual(store.get(blob_hash), PAYLOAD)
+            store.delete(blob_hash)
+            self.assertIsNone(store.get(blob_hash))
+
+
+class TestIndexBlobs(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeFirestore()
+        self.db.collection("users").document("user1").set({"email": "me@example.com", "credentials": "x" * 200})
+        self.processor = make_gmail_service(FakeGmail([]), service_class=SentEmailProcessor, db=self.db)
+        self.index = {"nodes": list(range(50000))}
+
+    def test_user_document_only_holds_the_blob_reference(self):
+        """Test saving an index keeps the payload out of the user's document."""
+        self.processor.save_index_to_firestore(self.index)
+        user = self.db.docs["users/user1"]
+        self.assertNotIn("vector_store_index", user)
+        self.assertLess(len(pickle.dumps(user)), 4096)
+        self.assertEqual(self.processor.load_index_from_firestore(), self.index)
+
+    def test_replaced_index_blob_is_deleted(self):
+        """Test saving a new index removes the blob of the previous one."""
+        self.processor.save_index_to_firestore(self.index)
+        old_hash = self.db.docs["users/user1"]["vector_store_index_ref"]
+        self.processor.save_index_to_firestore({"nodes": [1, 2, 3]})
+        self.assertNotIn(f"index_blobs/{old_hash}", self.db.docs)
+
+    def test_inline_index_is_migrated_on_load(self):
+        """Test an index stored inline by older versions is moved to the blob store when loaded."""
+        self.db.docs["users/user1"]["vector_store_index"] = pickle.dumps(self.index)
+        self.assertEqual(self.processor.load_index_from_firestore(), self.index)
+        user = self.db.docs["users/user1"]
+        self.assertNotIn("vector_store_index", user)
+        self.assertEqual(user["vector_store_index_ref"], content_hash(pickle.dumps(self.index)))
+
+    def test_migrate_inline_indexes(self):
+        """Test the migration job moves every inline index and skips users without one."""
+        self.db.docs["users/user1"]["vector_store_index"] = pickle.dumps(self.index)
+        self.db.collection("users").document("u2").set({"email": "other@example.com"})
+        with patch.dict(os.environ, {"INDEX_BLOB_STORE": "firestore"}):
+            self.assertEqual(migrate_inline_indexes(self.db), 1)
+        self.assertEqual(self.processor.load_index_from_firestore(), self.index)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from jose import jwt
+
+import auth.auth_service as auth_service
+import auth.current_user as current_user
+from auth.current_user import Principal, TokenCache, get_current_user, get_principal, validate_token
+from auth.jwt_handler import create_access_token, decode_access_token
+from config.settings import settings
+from services.response_cache import LocalCacheBackend, ResponseCache
+from tests.fakes.fake_firestore import FakeFirestore
+
+
+def make_token(**claims):
+    claims.setdefault("exp", datetime.now(timezone.utc) + timedelta(minutes=5))
+    return jwt.encode(claims, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+
+
+class TestValidateToken(unittest.TestCase):
+    def setUp(self):
+        self.cache = TokenCache(max_entries=2)
+        patcher = patch.object(current_user, "token_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        decode = patch.object(current_user, "decode_access_token", wraps=decode_access_token)
+        self.decode = decode.start()
+        self.addCleanup(decode.stop)
+
+    def test_tokens_are_decoded_once(self):
+        """Test a valid token is verified once and then served from the cache."""
+        token = create_access_token({"sub": "user1", "email": "jane@acme.com"})
+        first = validate_token(token)
+        second = validate_token(token)
+        self.assertIs(first, second)
+        self.assertEqual((first.id, first.email), ("user1", "jane@acme.com"))
+        self.assertEqual(self.decode.call_count, 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_entries_expire_with_the_token(self):
+        """Test a cached token is verified again once its exp has passed, and then rejected."""
+        token = make_token(sub="user1", exp=datetime.now(timezone.utc) + timedelta(seconds=30))
+        principal = validate_token(token)
+        self.cache.clock = lambda: principal.expires_at + 1
+        with patch.object(current_user, "decode_access_token", side_effect=jwt.ExpiredSignatureError("expired")):
+            with self.assertRaises(HTTPException) as raised:
+                validate_token(token)
+        self.assertEqual(raised.exception.status_code, 401)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_cache_is_bounded(self):
+        """Test the least recently used token is evicted first."""
+        tokens = [create_access_token({"sub": f"user{i}"}) for i in range(3)]
+        validate_token(tokens[0])
+        validate_token(tokens[1])
+        validate_token(tokens[0])
+        validate_token(tokens[2])
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get(tokens[1]))
+        self.assertIsNotNone(self.cache.get(tokens[0]))
+
+    def test_invalid_tokens_are_rejected(self):
+        """Test bad signatures and tokens without a subject are 401s and never cached."""
+        forged = jwt.encode({"sub": "user1", "exp": 4102444800}, "not-the-key", algorithm="HS256")
+        for token in (forged, make_token(email="jane@acme.com"), "garbage"):
+            with self.assertRaises(HTTPException) as raised:
+                validate_token(token)
+            self.assertEqual(raised.exception.status_code, 401)
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestRequestPrincipal(unittest.TestCase):
+    def test_principal_is_resolved_once_and_visible_to_middleware(self):
+        """Test dependencies share one principal that middleware reads from request.state.user."""
+        app = FastAPI()
+        seen = []
+
+        @app.middleware("http")
+        async def track(request: Request, call_next):
+            response = await call_next(request)
+            seen.append(getattr(request.state, "user", None))
+            return response
+
+        @app.get("/whoami")
+        async def whoami(user_id: str = Depends(get_current_user), principal: Principal = Depends(get_principal)):
+            return {"user_id": user_id, "same": principal.id == user_id}
+
+        client = TestClient(app)
+        token = create_access_token({"sub": "user1"})
+        with patch.object(current_user, "validate_token", wraps=validate_token) as validate:
+            response = client.get("/whoami", headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(response.json(), {"user_id": "user1", "same": True})
+        self.assertEqual(validate.call_count, 1)
+        self.assertEqual(seen[0].id, "user1")
+
+        self.assertEqual(client.get("/whoami").status_code, 401)
+
+
+class TestAuthenticate(unittest.TestCase):
+    def test_repeated_checks_skip_firestore(self):
+        """Test /authenticate reads the user once until the account cache is invalidated."""
+        db = FakeFirestore()
+        db.docs["users/user1"] = {"email": "jane@acme.com", "onboarding_completed": True, "google_access_token": "g"}
+        cache = ResponseCache(LocalCacheBackend(), ttl=30)
+        app = FastAPI()
+        app.include_router(auth_service.auth_router, prefix="/auth")
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': 'user1'})}"}
+
+        with patch.object(auth_service, "get_firestore_client", return_value=db), \
+                patch.object(auth_service, "account_cache", cache), \
+                patch.object(auth_service.limiter, "enabled", False):
+            client = TestClient(app)
+            first = client.get("/auth/authenticate", headers=headers)
+            reads = db.reads
+            second = client.get("/auth/authenticate", headers=headers)
+            self.assertEqual(db.reads, reads)
+            self.assertEqual(first.json(), second.json())
+            self.assertTrue(first.json()["is_google_authorized"])
+
+            db.docs["users/user1"]["onboarding_completed"] = False
+            cache.invalidate("user1")
+            self.assertFalse(client.get("/auth/authenticate", headers=headers).json()["onboarding_completed"])
+
+            del db.docs["users/user1"]
+            cache.invalidate("user1")
+            self.assertEqual(client.get("/auth/authenticate", headers=headers).status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from services import draft_analytics
+from services.draft_analytics import DraftAnalytics, backfill_draft_analytics, decode_key, encode_key
+from tests.fakes.fake_firestore import FakeFirestore
+from tests.fakes.fake_gmail import FakeGmail
+from tests.unit.gmail_fetch_profile_test import make_gmail_service
+from utils.gmail_service import Draft
+
+
+def make_draft(recipient="Jane <jane@acme.com>", body="Thanks for the update", topic="Scheduling"):
+    draft = Draft(
+        user_id="user1", draft_id="d", thread_id="t", message_id="m",
+        recipient_email=recipient, sender_email="me@example.com",
+        email_subject="Hello", email_body="Original email", draft_subject="Re: Hello",
+        draft_body=body
+    )
+    draft.draft_body_topic = topic
+    return draft
+
+
+class TestDraftAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeFirestore()
+        self.db.docs["users/user1"] = {"drafts": 10}
+        self.service = make_gmail_service(FakeGmail(), db=self.db)
+        self.analytics = DraftAnalytics(self.db)
+        patch.object(self.service, "extract_to_do_item", return_value="Reply").start()
+        self.priority = patch.object(self.service, "extract_email_priority", return_value=2).start()
+        patch.object(self.service, "_execute", return_value={"id": "sent"}).start()
+        self.addCleanup(patch.stopall)
+
+    def _stored_ids(self):
+        return [self.service.store_draft(make_draft()),
+                self.service.store_draft(make_draft("bob@other.org", "One two three four five six", "Billing"))]
+
+    def test_keys_are_single_path_segments(self):
+        """Test map keys with dots and slashes round-trip through the escaping."""
+        key = encode_key("jane.doe@acme.co.uk/x%")
+        self.assertNotIn(".", key)
+        self.assertNotIn("/", key)
+        self.assertEqual(decode_key(key), "jane.doe@acme.co.uk/x%")
+
+    def test_store_draft_updates_statistics(self):
+        """Test creating drafts maintains counts, words, histograms and high-priority drafts."""
+        first, _ = self._stored_ids()
+        self.service.store_draft(make_draft(recipient="jane@acme.com"))
+
+        self.assertEqual(self.analytics.top_senders("user1"), [("jane@acme.com", 2), ("bob@other.org", 1)])
+        self.assertEqual(self.analytics.common_topics("user1")[0], ("Scheduling", 2))
+        self.assertEqual(self.analytics.average_words("user1"), 4)
+        self.assertEqual(self.db.docs["draft_analytics/user1"]["priorities"], {"2": 3})
+        self.assertEqual(len(self.analytics.high_priority("user1")), 3)
+        self.assertEqual(self.analytics.high_priority("user1")[0]["email_subject"], "Hello")
+        self.assertEqual(self.db.docs["users/user1"]["drafts"], 7)
+
+    def test_save_and_send_adjust_statistics(self):
+        """Test editing a draft moves its counts and sending it removes them."""
+        first, second = self._stored_ids()
+        self.service.save_draft(first, "g1", "carol@acme.com", "Re: Hello", "Short")
+        self.assertEqual(dict(self.analytics.top_senders("user1")), {"carol@acme.com": 1, "bob@other.org": 1})
+        self.assertEqual(self.analytics.average_words("user1"), 3)
+
+        self.service.send_draft(second, "g2")
+        self.assertEqual(self.analytics.top_senders("user1"), [("carol@acme.com", 1)])
+        self.assertEqual(self.analytics.common_topics("user1"), [("Scheduling", 1)])
+        self.assertEqual([draft["database_id"] for draft in self.analytics.high_priority("user1")], [first])
+
+    def test_maps_are_bounded(self):
+        """Test recipients beyond the cap are counted as overflow, and a key dropping to zero frees its slot."""
+        with patch.object(draft_analytics, "DRAFT_ANALYTICS_MAX_KEYS", 2), \
+                patch.object(draft_analytics, "DRAFT_ANALYTICS_MAX_HIGH_PRIORITY", 2):
+            first, second = self._stored_ids()
+            third = self.service.store_draft(make_draft("carol@acme.com"))
+            stats = self.db.docs["draft_analytics/user1"]
+            self.assertEqual(set(stats["senders"]), {"jane@acme%2Ecom", "bob@other%2Eorg"})
+            self.assertEqual(stats["senders_other"], 1)
+            self.assertEqual(len(stats["high_priority"]), 2)
+
+            self.service.delete_draft(third)
+            self.service.delete_draft(first)
+            stats = self.db.docs["draft_analytics/user1"]
+            self.assertEqual(stats["senders_other"], 0)
+            self.assertEqual(set(stats["senders"]), {"bob@other%2Eorg"})
+            self.service.store_draft(make_draft("carol@acme.com"))
+            self.assertEqual(dict(self.analytics.top_senders("user1")), {"bob@other.org": 1, "carol@acme.com": 1})
+
+    def test_concurrent_removals_are_counted_once(self):
+        """Test a draft sent and deleted at the same time is taken out of the statistics once."""
+        first, _ = self._stored_ids()
+        threads = [threading.Thread(target=self.service.delete_draft, args=(first,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.db.docs["draft_analytics/user1"]["draft_count"], 1)
+        self.assertEqual(self.analytics.top_senders("user1"), [("bob@other.org", 1)])
+
+    def test_endpoints_read_one_document(self):
+        """Test the statistics are served without reading any draft."""
+        self._stored_ids()
+        reads = self.db.reads
+        self.analytics.top_senders("user1")
+        self.analytics.average_words("user1")
+        self.assertEqual(self.db.reads - reads, 2)
+
+    def test_backfill_matches_incremental_statistics(self):
+        """Test rebuilding from the drafts reproduces the incrementally maintained document."""
+        first, second = self._stored_ids()
+        self.priority.return_value = 7
+        self.service.store_draft(make_draft(topic=None))
+        self.service.save_draft(first, "g1", "carol@acme.com", "Re: Hello", "Short reply")
+        incremental = self.db.docs.pop("draft_analytics/user1")
+
+        self.assertEqual(backfill_draft_analytics(self.db), 1)
+        rebuilt = self.db.docs["draft_analytics/user1"]
+        for field in ("draft_count", "total_words", "topics", "priorities", "high_priority"):
+            self.assertEqual(rebuilt[field], incremental[field], field)
+        self.assertEqual({k: v for k, v in incremental["senders"].items() if v}, rebuilt["senders"])
+
+    def test_backfill_keeps_the_most_common_keys(self):
+        """Test a rebuilt histogram keeps its most common keys and counts the rest as overflow."""
+        self._stored_ids()
+        self.service.store_draft(make_draft())
+        with patch.object(draft_analytics, "DRAFT_ANALYTICS_MAX_KEYS", 1):
+            backfill_draft_analytics(self.db, ["user1"])
+        rebuilt = self.db.docs["draft_analytics/user1"]
+        self.assertEqual(rebuilt["senders"], {"jane@acme%2Ecom": 2})
+        self.assertEqual(rebuilt["senders_other"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from datetime import date, datetime, timezone
+from unittest.mock import patch
+
+from services.draft_rollups import DraftRollups, rebuild_draft_rollups
+from tests.fakes.fake_firestore import FakeFirestore
+from tests.fakes.fake_gmail import FakeGmail
+from tests.unit.draft_analytics_test import make_draft
+from tests.unit.gmail_fetch_profile_test import make_gmail_service
+
+
+class TestDraftRollups(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeFirestore()
+        self.db.docs["users/user1"] = {"unlimited_drafts": True}
+        self.rollups = DraftRollups(self.db)
+
+    def _record(self, *timestamps):
+        batch = self.db.batch()
+        for timestamp in timestamps:
+            self.rollups.record_created(batch, "user1", timestamp)
+        batch.commit()
+
+    def test_counts_are_bucketed_by_utc_day(self):
+        """Test drafts are counted on their UTC day and the window spans a year boundary."""
+        self._record(
+            datetime(2025, 12, 31, 23, 30),
+            datetime(2026, 1, 1, 0, 30, tzinfo=timezone.utc),
+            datetime(2026, 1, 1, 22, 0, tzinfo=timezone.utc),
+            datetime(2025, 6, 1, 12, 0)
+        )
+        counts = self.rollups.daily_counts("user1", 30, today=date(2026, 1, 10))
+        self.assertEqual(counts, [{"date": "2025-12-31", "count": 1}, {"date": "2026-01-01", "count": 2}])
+        self.assertEqual(self.rollups.daily_counts("user1", 3, today=date(2026, 1, 10)), [])
+
+    def test_window_reads_at_most_two_documents(self):
+        """Test the daily counts are served without reading drafts."""
+        self._record(*[datetime(2026, 3, day % 28 + 1, 9) for day in range(200)])
+        reads = self.db.reads
+        counts = self.rollups.daily_counts("user1", 365, today=date(2026, 3, 31))
+        self.assertEqual(sum(entry["count"] for entry in counts), 200)
+        self.assertEqual(self.db.reads - reads, 2)
+
+    def test_store_draft_records_the_day(self):
+        """Test store_draft counts the draft in the same batch as the draft write."""
+        service = make_gmail_service(FakeGmail(), db=self.db)
+        with patch.object(service, "extract_to_do_item", return_value=""), \
+                patch.object(service, "extract_email_priority", return_value=3):
+            draft = make_draft()
+            draft.date_created = datetime(2026, 10, 19, 8)
+            service.store_draft(draft)
+        self.assertEqual(self.db.docs["draft_rollups/user1/years/2026"], {"days": {"2026-10-19": 1}})
+
+    def test_rebuild_never_lowers_recorded_days(self):
+        """Test rebuilding recounts stored drafts but keeps counts of drafts already sent."""
+        self._record(datetime(2026, 2, 1, 9), datetime(2026, 2, 1, 10))
+        self.db.docs["drafts/a"] = {"user_id": "user1", "date_created": datetime(2026, 2, 1, 9, tzinfo=timezone.utc)}
+        self.db.docs["drafts/b"] = {"user_id": "user1", "date_created": datetime(2025, 7, 4, 9, tzinfo=timezone.utc)}
+        self.db.docs["drafts/c"] = {"user_id": "user1", "date_created": datetime(2025, 7, 4, 18, tzinfo=timezone.utc)}
+
+        self.assertEqual(rebuild_draft_rollups(self.db), 2)
+        self.assertEqual(self.db.docs["draft_rollups/user1/years/2026"], {"days": {"2026-02-01": 2}})
+        self.assertEqual(self.db.docs["draft_rollups/user1/years/2025"], {"days": {"2025-07-04": 2}})
+
+
+if __name__ == '__main__':
+    unittest.main()
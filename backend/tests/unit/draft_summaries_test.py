@@ -0,0 +1,62 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from services.draft_summaries import DraftNotFound, DraftSummary, get_draft_detail, list_recent_drafts
+from tests.fakes.fake_firestore import FakeFirestore
+
+START = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+class TestDraftSummaries(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeFirestore()
+        for i in range(25):
+            self.db.docs[f"drafts/d{i:02d}"] = {
+                "user_id": "user1", "gmail_draft_id": f"g{i}", "recipient_email": "jane@acme.com",
+                "email_subject": f"Subject {i}", "email_body": "x" * 5000, "draft_subject": f"Re: Subject {i}",
+                "draft_body": "Thanks", "date_created": START + timedelta(hours=i), "action_item": "Reply", "priority": 2
+            }
+        self.db.docs["drafts/other"] = {"user_id": "user2", "date_created": START, "email_body": "secret"}
+
+    def test_pages_follow_the_cursor(self):
+        """Test pages are newest first, contiguous, and end with a null cursor."""
+        seen, cursor = [], None
+        while True:
+            drafts, cursor = list_recent_drafts(self.db, "user1", limit=10, start_after=cursor)
+            seen.extend(draft.database_id for draft in drafts)
+            if cursor is None:
+                break
+        self.assertEqual(seen, [f"d{i:02d}" for i in reversed(range(25))])
+
+    def test_listing_leaves_out_the_email_body(self):
+        """Test the field mask drops the original email and pro-only fields."""
+        drafts, _ = list_recent_drafts(self.db, "user1", limit=3)
+        summary = drafts[0].to_dict()
+        self.assertNotIn("email_body", summary)
+        self.assertNotIn("priority", summary)
+        self.assertEqual(summary["recipient_subject"], "Subject 24")
+        self.assertEqual(drafts[0].to_dict(include_pro_fields=True)["priority"], None)
+
+        drafts, _ = list_recent_drafts(self.db, "user1", limit=3, include_pro_fields=True)
+        self.assertEqual(drafts[0].to_dict(True)["action_item"], "Reply")
+        self.assertFalse(hasattr(drafts[0], "__dict__"))
+        self.assertIsInstance(drafts[0], DraftSummary)
+
+    def test_cursor_of_another_user_is_rejected(self):
+        """Test a cursor naming someone else's draft cannot be used to page."""
+        with self.assertRaises(DraftNotFound):
+            list_recent_drafts(self.db, "user1", start_after="other")
+        with self.assertRaises(DraftNotFound):
+            list_recent_drafts(self.db, "user1", start_after="missing")
+
+    def test_detail_returns_the_body_to_its_owner(self):
+        """Test the per-draft endpoint returns the body only to the draft's owner."""
+        detail = get_draft_detail(self.db, "user1", "d03")
+        self.assertEqual(len(detail["email_body"]), 5000)
+        self.assertEqual(detail["gmail_id"], "g3")
+        with self.assertRaises(DraftNotFound):
+            get_draft_detail(self.db, "user1", "other")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import threading
+import types
+import unittest
+from unittest.mock import patch
+
+from agents import email_agent
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# Importing in this process would see the agent already imported (and its clients patched out)
+IMPORT_PROBE = (
+    "import sys, agents.email_agent as agent; "
+    "print(agent._llm is None, agent._embedding_store is None, "
+    "[name for name in ('services.embedding_store', 'pinecone', 'weaviate', 'langchain_openai') if name in sys.modules])"
+)
+
+
+class CountingEmbeddingStore:
+    created = 0
+
+    def __init__(self, provider):
+        type(self).created += 1
+        self.provider = provider
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+class TestEmailAgentInitialization(unittest.TestCase):
+    def setUp(self):
+        CountingEmbeddingStore.created = 0
+        self.fake_module = types.ModuleType("services.embedding_store")
+        self.fake_module.EmbeddingStore = CountingEmbeddingStore
+        patcher = patch.dict(sys.modules, {"services.embedding_store": self.fake_module})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ("_llm", "_embedding_store"):
+            patcher = patch.object(email_agent, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_import_creates_no_clients(self):
+        """Test importing the agent in a fresh interpreter neither creates the chat model nor loads the embedding store."""
+        result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "True True []")
+
+    def test_concurrent_first_use_creates_one_store(self):
+        """Test threads racing on first use share a single embedding store."""
+        stores = []
+        barrier = threading.Barrier(8)
+
+        def use():
+            barrier.wait()
+            stores.append(email_agent.get_embedding_store())
+
+        threads = [threading.Thread(target=use) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(CountingEmbeddingStore.created, 1)
+        self.assertTrue(all(store is stores[0] for store in stores))
+        self.assertIs(email_agent.embedding_store, stores[0])
+
+    def test_warmup_initializes_everything_once(self):
+        """Test warmup creates both clients and later calls reuse them."""
+        with patch("langchain_openai.ChatOpenAI") as chat_model:
+            timings = email_agent.warmup()
+            email_agent.warmup()
+            self.assertEqual(set(timings), {"llm", "embedding_store"})
+            chat_model.assert_called_once()
+            self.assertIs(email_agent.get_llm(), chat_model.return_value)
+        self.assertEqual(CountingEmbeddingStore.created, 1)
+
+    def test_shutdown_closes_only_a_created_store(self):
+        """Test shutdown persists the embedding store once it exists and never creates one."""
+        email_agent.shutdown()
+        self.assertEqual(CountingEmbeddingStore.created, 0)
+        store = email_agent.get_embedding_store()
+        email_agent.shutdown()
+        self.assertEqual(store.closed, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
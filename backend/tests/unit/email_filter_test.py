@@ -0,0 +1,130 @@
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+
+from services.email_metadata import EmailFilter, epoch_seconds, to_properties
+from services.hybrid_retriever import DenseIndex, HybridRetriever, MetadataColumns
+from services.quantization import QuantizedDenseIndex
+
+
+def email(sender, timestamp, category="Work", priority="Medium"):
+    return {
+        "sender": sender,
+        "timestamp": timestamp,
+        "classification": {"category": category},
+        "priority": {"priority_level": priority}
+    }
+
+
+class TestEmailFilter(unittest.TestCase):
+    def test_epoch_seconds_formats(self):
+        """Test ISO, RFC 2822, datetime and naive timestamps convert to the same epoch seconds."""
+        expected = datetime(2024, 3, 1, 12, tzinfo=timezone.utc).timestamp()
+        self.assertEqual(epoch_seconds("2024-03-01T12:00:00Z"), expected)
+        self.assertEqual(epoch_seconds("2024-03-01T12:00:00"), expected)
+        self.assertEqual(epoch_seconds("Fri, 01 Mar 2024 12:00:00 +0000"), expected)
+        self.assertEqual(epoch_seconds(datetime(2024, 3, 1, 12, tzinfo=timezone.utc)), expected)
+        self.assertIsNone(epoch_seconds("not a date"))
+
+    def test_pinecone_filter(self):
+        """Test every predicate is translated into the Pinecone metadata filter."""
+        email_filter = EmailFilter(
+            categories="Work",
+            senders="Jane <Jane@Acme.com>",
+            sender_domains=["ACME.com"],
+            since=100,
+            until=200,
+            min_priority="High"
+        )
+        self.assertEqual(email_filter.to_pinecone("u1"), {
+            "user_id": "u1",
+            "category": {"$in": ["Work"]},
+            "sender_address": {"$in": ["jane@acme.com"]},
+            "sender_domain": {"$in": ["acme.com"]},
+            "timestamp_epoch": {"$gte": 100.0, "$lte": 200.0},
+            "priority_rank": {"$gte": 3}
+        })
+
+    def test_weaviate_where(self):
+        """Test predicates become one And clause and list values an Or clause."""
+        where = EmailFilter(categories=["Work", "Finance"], since=100).to_weaviate("u1")
+        self.assertEqual(where["operator"], "And")
+        user, categories, since = where["operands"]
+        self.assertEqual(user, {"path": ["user_id"], "operator": "Equal", "valueString": "u1"})
+        self.assertEqual(categories["operator"], "Or")
+        self.assertEqual([operand["valueText"] for operand in categories["operands"]], ["Work", "Finance"])
+        self.assertEqual(since, {"path": ["timestamp_epoch"], "operator": "GreaterThanEqual", "valueNumber": 100.0})
+        self.assertEqual(EmailFilter().to_weaviate("u1"), user)
+
+    def test_unknown_priority_is_rejected(self):
+        """Test a misspelled priority level raises instead of matching everything."""
+        with self.assertRaises(ValueError):
+            EmailFilter(min_priority="Urgent")
+
+    def test_empty_lists_are_rejected(self):
+        """Test an empty list predicate raises instead of producing an Or clause without operands."""
+        for field in ("categories", "senders", "sender_domains"):
+            with self.assertRaises(ValueError):
+                EmailFilter(**{field: []})
+
+
+class TestMetadataColumns(unittest.TestCase):
+    def test_mask_combines_predicates(self):
+        """Test the bitmap holds only documents matching every predicate."""
+        columns = MetadataColumns(initial_capacity=2)
+        columns.set("a", to_properties(email("jane@acme.com", "2024-03-01T00:00:00Z", priority="High")))
+        columns.set("b", to_properties(email("jane@acme.com", "2023-01-01T00:00:00Z", priority="High")))
+        columns.set("c", to_properties(email("bob@other.org", "2024-03-02T00:00:00Z", priority="Critical")))
+        columns.set("d", to_properties(email("jane@acme.com", "", priority="Low")))
+
+        self.assertEqual(columns.matching_ids(EmailFilter(senders="jane@acme.com")), {"a", "b", "d"})
+        self.assertEqual(columns.matching_ids(EmailFilter(senders="jane@acme.com", since="2024-01-01")), {"a"})
+        self.assertEqual(columns.matching_ids(EmailFilter(min_priority="High")), {"a", "b", "c"})
+        self.assertEqual(columns.matching_ids(EmailFilter(sender_domains="nowhere.com")), set())
+
+        columns.remove("a")
+        columns.set("e", to_properties(email("bob@other.org", "2024-03-03T00:00:00Z")))
+        self.assertEqual(columns.matching_ids(EmailFilter(sender_domains="other.org")), {"c", "e"})
+        self.assertEqual(len(columns), 4)
+
+
+class TestFilteredSearch(unittest.TestCase):
+    def setUp(self):
+        generator = np.random.RandomState(11)
+        self.vectors = generator.standard_normal((300, 32)).astype(np.float32)
+        self.senders = ["jane@acme.com" if i % 10 == 0 else f"user{i}@example.com" for i in range(300)]
+
+    def test_dense_indexes_score_only_allowed_rows(self):
+        """Test exact and quantized indexes return the best allowed documents."""
+        allowed = {f"e{i}" for i in range(0, 300, 10)}
+        query = self.vectors[7]
+        scores = self.vectors @ query / np.linalg.norm(self.vectors, axis=1)
+        expected = [f"e{i}" for i in sorted(range(0, 300, 10), key=lambda i: -scores[i])[:5]]
+
+        for index in (DenseIndex(), QuantizedDenseIndex(mode="int8", rerank_factor=4)):
+            for i, vector in enumerate(self.vectors):
+                index.add(f"e{i}", vector)
+            results = index.search(query, 5, allowed)
+            self.assertEqual([doc_id for doc_id, _ in results], expected)
+            self.assertEqual(index.search(query, 5, set()), [])
+
+    def test_hybrid_search_with_filters(self):
+        """Test a same-sender filter is applied before both rankings are fused."""
+        retriever = HybridRetriever(quantization="none", ann="none")
+        for i, vector in enumerate(self.vectors):
+            retriever.add("u1", f"e{i}", f"message {i} about invoices", vector, email(self.senders[i], f"2024-01-{i % 28 + 1:02d}"))
+
+        results = retriever.search("u1", "invoices", self.vectors[7], limit=5, filters=EmailFilter(senders="jane@acme.com"))
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result["metadata"]["sender"] == "jane@acme.com" for result in results))
+
+        self.assertEqual(retriever.search("u1", "invoices", self.vectors[7], filters=EmailFilter(senders="nobody@acme.com")), [])
+
+        retriever.remove("e0", "u1")
+        results = retriever.search("u1", "invoices", self.vectors[0], limit=50, filters=EmailFilter(senders="jane@acme.com"))
+        self.assertEqual(len(results), 29)
+
+
+if __name__ == '__main__':
+    unittest.main()
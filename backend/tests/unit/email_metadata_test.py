@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime
+
+from services.email_metadata import decode_metadata, encode_metadata, priority_rank, sender_domain, to_properties
+
+METADATA = {
+    "subject": "Invoice overdue",
+    "sender": "Jane Doe <Jane@Acme.com>",
+    "timestamp": "2026-10-01T09:30:00",
+    "classification": {"category": "Work", "subcategory": "Billing", "urgency": "4", "key_entities": ["Acme"]},
+    "priority": {"priority_level": "High", "response_timeframe": "Today"}
+}
+
+
+class TestEmailMetadata(unittest.TestCase):
+    def test_native_properties(self):
+        """Test classification and priority are flattened into filterable scalar properties."""
+        properties = to_properties(METADATA)
+        self.assertEqual(properties["category"], "Work")
+        self.assertEqual(properties["urgency"], 4)
+        self.assertEqual(properties["priority"], "High")
+        self.assertEqual(properties["priority_rank"], 3)
+        self.assertEqual(properties["sender_domain"], "acme.com")
+        self.assertEqual(decode_metadata(properties["metadata"]), METADATA)
+
+    def test_missing_classification(self):
+        """Test emails stored without classification get empty defaults."""
+        properties = to_properties({"subject": "Hi", "classification": None, "priority": {"priority_level": "whatever"}})
+        self.assertEqual(properties["category"], "")
+        self.assertEqual(properties["urgency"], 0)
+        self.assertEqual(properties["priority_rank"], 0)
+        self.assertEqual(sender_domain("not an address"), "")
+        self.assertEqual(priority_rank("critical"), 4)
+
+    def test_unserializable_values_become_strings(self):
+        """Test values JSON cannot represent are stored as strings instead of failing."""
+        encoded = encode_metadata({"received": datetime(2026, 10, 1, 9, 30)})
+        self.assertEqual(decode_metadata(encoded)["received"], "2026-10-01T09:30:00")
+
+    def test_legacy_repr_is_parsed_without_eval(self):
+        """Test metadata stored as str(dict) is read back as a literal, never evaluated."""
+        self.assertEqual(decode_metadata(str(METADATA)), METADATA)
+        self.assertEqual(decode_metadata("__import__('os').system('true')"), {})
+        self.assertEqual(decode_metadata(""), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+from urllib.parse import parse_qs, urlparse
+
+from tests.fakes.fake_gmail import FakeGmail, make_message, parse_fields, apply_fields
+from utils import gmail_service as gmail_module
+from utils.gmail_service import GmailService, FETCH_PROFILE_FULL, FETCH_PROFILE_PARTIAL, FETCH_PROFILE_METADATA
+
+
+def make_gmail_service(fake, service_class=GmailService, db=None):
+    with patch.object(gmail_module, "build", return_value=fake.service()), \
+            patch.object(gmail_module, "get_firestore_client", return_value=db or MagicMock()):
+        return service_class({"id": "user1", "email": "me@example.com", "google_refresh_token": "refresh"})
+
+
+class TestGmailFetchProfiles(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeGmail([
+            make_message("m1", subject="Meeting", body="Can we meet tomorrow?"),
+            make_message("m2", subject="Sale", body="50% off", labels=("INBOX", "UNREAD", "CATEGORY_PROMOTIONS")),
+            make_message("m3", subject="Sent", body="Thanks!", labels=("SENT",)),
+        ])
+        self.service = make_gmail_service(self.fake)
+
+    def test_fields_mask_parsing(self):
+        """Test the fake applies partial-response masks like the Gmail API."""
+        tree = parse_fields("id,payload(headers,parts(mimeType,body/data))")
+        trimmed = apply_fields({"id": "1", "snippet": "x", "payload": {"headers": [], "parts": [{"mimeType": "a", "partId": "0", "body": {"data": "d", "size": 1}}]}}, tree)
+        self.assertEqual(trimmed, {"id": "1", "payload": {"headers": [], "parts": [{"mimeType": "a", "body": {"data": "d"}}]}})
+
+    def test_profiles_return_the_same_emails(self):
+        """Test the partial profile parses exactly what the full profile does."""
+        full = self.service.get_unread_emails(fetch_profile=FETCH_PROFILE_FULL)
+        partial = self.service.get_unread_emails(fetch_profile=FETCH_PROFILE_PARTIAL)
+        self.assertEqual(full, partial)
+        self.assertEqual(full[0]["body"], "Can we meet tomorrow?")
+        self.assertEqual(full[0]["subject"], "Meeting")
+
+    def test_metadata_profile_loads_bodies_lazily(self):
+        """Test metadata listing omits bodies until load_email_body is called."""
+        emails = self.service.get_unread_emails(fetch_profile=FETCH_PROFILE_METADATA)
+        self.assertEqual([email["id"] for email in emails], ["m1", "m2"])
+        self.assertNotIn("body", emails[0])
+        self.assertIn("CATEGORY_PROMOTIONS", emails[1]["labelIds"])
+
+        self.assertEqual(self.service.load_email_body(emails[0]), "Can we meet tomorrow?")
+        requests_before = len(self.fake.requests)
+        self.service.load_email_body(emails[0])
+        self.assertEqual(len(self.fake.requests), requests_before)
+
+    def test_sent_emails_with_partial_profile(self):
+        """Test sent emails keep their headers and body under the partial mask."""
+        sent = self.service.get_sent_emails()
+        self.assertEqual(sent[0]["recipient"], "me@example.com")
+        self.assertEqual(sent[0]["body"], "Thanks!")
+
+    def test_fetch_stats_measure_bytes_per_profile(self):
+        """Test bytes transferred and parse time are recorded per profile and reset on report."""
+        self.service.get_unread_emails(fetch_profile=FETCH_PROFILE_FULL)
+        self.service.get_unread_emails(fetch_profile=FETCH_PROFILE_METADATA)
+        stats = self.service.report_fetch_stats()
+
+        self.assertEqual(stats[FETCH_PROFILE_FULL]["requests"], 2)
+        self.assertLess(stats[FETCH_PROFILE_METADATA]["bytes"] * 10, stats[FETCH_PROFILE_FULL]["bytes"])
+        self.assertGreater(stats[FETCH_PROFILE_FULL]["parse_ms"], 0)
+        self.assertEqual(dict(self.service.fetch_stats), {})
+
+
+class TestEmailProcessorPromotions(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeGmail([
+            make_message("m1", subject="Meeting", body="Can we meet tomorrow?"),
+            make_message("m2", subject="Sale", body="50% off", labels=("INBOX", "UNREAD", "CATEGORY_PROMOTIONS")),
+            make_message("m3", subject="Deal", body="Buy now and save"),
+            make_message("m4", subject="Later", body="Not processed in this run"),
+        ])
+        self.service = make_gmail_service(self.fake)
+
+        from utils import email_processor_service
+        self.model = Mock()
+        self.model.predict.side_effect = lambda texts: ["Buy now" in texts[0]]
+        for patcher in (
+            patch.object(email_processor_service, "get_firestore_client", return_value=MagicMock()),
+            patch.object(email_processor_service.os.path, "exists", return_value=True),
+            patch.object(email_processor_service.joblib, "load", return_value=self.model),
+            patch.object(email_processor_service, "GmailService", return_value=self.service),
+            patch.object(self.service, "can_create_draft", return_value=False)
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.processor = email_processor_service.EmailProcessor()
+        self.processor.users_ref.document.return_value.get.return_value.to_dict.return_value = {
+            "email": "me@example.com", "google_refresh_token": "refresh"
+        }
+
+    def _fetched(self, message_format):
+        fetched = []
+        for method, uri in self.fake.requests:
+            parsed = urlparse(uri)
+            if method == "GET" and parse_qs(parsed.query).get("format") == [message_format]:
+                fetched.append(parsed.path.rsplit("/", 1)[-1])
+        return fetched
+
+    def test_label_is_checked_before_bodies_and_classifier_checks_the_rest(self):
+        """Test labelled promotions never have their body fetched and unlabelled mail still goes through the classifier."""
+        asyncio.run(self.processor.process_user_emails("user1", limit=3))
+
+        self.assertEqual(self._fetched("metadata"), ["m1", "m2", "m3"])
+        self.assertEqual(self._fetched("full"), ["m1", "m3"])
+        self.assertEqual([call.args[0] for call in self.model.predict.call_args_list],
+                         [["Can we meet tomorrow?"], ["Buy now and save"]])
+        # Only m1 passed the classifier and reached the drafts check
+        self.assertEqual(self.service.can_create_draft.call_count, 1)
+        self.assertEqual(sorted(message_id for message_id, message in self.fake.messages.items()
+                                if "UNREAD" not in message["labelIds"]), ["m1", "m2", "m3"])
+
+if __name__ == '__main__':
+    unittest.main()
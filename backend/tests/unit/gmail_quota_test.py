@@ -0,0 +1,104 @@
+import json
+import unittest
+from unittest.mock import Mock
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from services.gmail_quota import GmailRequestExecutor, gmail_method_name
+from services.monitoring import monitoring_service
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_error(status, reason=None, retry_after=None):
+    headers = {"status": str(status)}
+    if retry_after is not None:
+        headers["retry-after"] = str(retry_after)
+    errors = [{"reason": reason, "message": reason}] if reason else []
+    content = json.dumps({"error": {"code": status, "message": "error", "errors": errors}}).encode()
+    return HttpError(httplib2.Response(headers), content)
+
+
+def gmail_request(method_id, *outcomes):
+    request = Mock(methodId=method_id)
+    request.execute.side_effect = list(outcomes)
+    return request
+
+
+class TestGmailRequestExecutor(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.executor = GmailRequestExecutor(units_per_second=10, max_retries=3, clock=self.clock, sleep=self.clock.sleep)
+        monitoring_service.start_gmail_quota_run()
+
+    def tearDown(self):
+        monitoring_service.finish_gmail_quota_run()
+
+    def test_method_name_from_request(self):
+        """Test the Gmail method name is derived from the discovery method ID."""
+        self.assertEqual(gmail_method_name(Mock(methodId="gmail.users.drafts.create")), "drafts.create")
+
+    def test_quota_units_are_reported_per_method(self):
+        """Test each call charges the method's quota units to the current run."""
+        self.executor.execute(gmail_request("gmail.users.messages.list", {"messages": []}), user_id="user1")
+        self.executor.execute(gmail_request("gmail.users.drafts.create", {"id": "d1"}), user_id="user1")
+        run = monitoring_service.finish_gmail_quota_run()
+        self.assertEqual(run["units"], 15)
+        self.assertEqual(run["by_method"], {"messages.list": 5, "drafts.create": 10})
+        self.assertEqual(run["by_user"], {"user1": 15})
+
+    def test_throttles_before_exceeding_user_quota(self):
+        """Test requests wait for quota instead of exceeding the per-user rate."""
+        for _ in range(3):
+            self.executor.execute(gmail_request("gmail.users.messages.get", {}), user_id="user1")
+        # 10 units/second burst: the third 5-unit call must wait half a second
+        self.assertAlmostEqual(sum(self.clock.sleeps), 0.5)
+
+    def test_users_have_separate_quota(self):
+        """Test one user's usage does not throttle another user."""
+        self.executor.execute(gmail_request("gmail.users.drafts.create", {}), user_id="user1")
+        self.executor.execute(gmail_request("gmail.users.drafts.create", {}), user_id="user2")
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_retries_rate_limit_errors(self):
+        """Test 429, 5xx and userRateLimitExceeded responses are retried until success."""
+        request = gmail_request(
+            "gmail.users.drafts.create",
+            http_error(429, retry_after=2),
+            http_error(403, reason="userRateLimitExceeded"),
+            http_error(503),
+            {"id": "d1"}
+        )
+        self.assertEqual(self.executor.execute(request, user_id="user1"), {"id": "d1"})
+        self.assertEqual(request.execute.call_count, 4)
+        self.assertIn(2.0, self.clock.sleeps)
+        self.assertEqual(monitoring_service.finish_gmail_quota_run()["units"], 40)
+
+    def test_does_not_retry_other_errors(self):
+        """Test non rate-limit errors are raised immediately."""
+        request = gmail_request("gmail.users.drafts.get", http_error(403, reason="insufficientPermissions"))
+        with self.assertRaises(HttpError):
+            self.executor.execute(request, user_id="user1")
+        self.assertEqual(request.execute.call_count, 1)
+
+    def test_gives_up_after_max_retries(self):
+        """Test the last error is raised once retries are exhausted."""
+        request = gmail_request("gmail.users.messages.list", *[http_error(500)] * 4)
+        with self.assertRaises(HttpError):
+            self.executor.execute(request, user_id="user1")
+        self.assertEqual(request.execute.call_count, 4)
+
+if __name__ == '__main__':
+    unittest.main()
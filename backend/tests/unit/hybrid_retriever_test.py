@@ -0,0 +1,106 @@
+import unittest
+
+import numpy as np
+
+from services.hybrid_retriever import BM25Index, DenseIndex, HybridRetriever, reciprocal_rank_fusion, tokenize
+
+
+def unit(*values):
+    return np.array(values, dtype=np.float32)
+
+
+class TestBM25Index(unittest.TestCase):
+    def test_tokenize_keeps_identifiers(self):
+        """Test identifiers are indexed whole and by their parts, without stop words."""
+        terms = tokenize("The invoice INV-2024-0042 is for jane.doe@acme.com")
+        self.assertIn("inv-2024-0042", terms)
+        self.assertIn("0042", terms)
+        self.assertIn("jane.doe@acme.com", terms)
+        self.assertNotIn("the", terms)
+
+    def test_rare_terms_rank_first(self):
+        """Test a document matching a rare query term outranks ones matching common terms."""
+        bm25 = BM25Index()
+        bm25.add("a", "meeting notes for the meeting tomorrow")
+        bm25.add("b", "meeting about invoice INV-77 tomorrow")
+        bm25.add("c", "tomorrow works for me")
+        self.assertEqual(bm25.search("INV-77 meeting tomorrow")[0][0], "b")
+
+    def test_reference_score_normalizes_across_queries(self):
+        """Test a document matching a query's rare identifier scores near the reference and one sharing a common word far below it."""
+        bm25 = BM25Index()
+        for i in range(8):
+            bm25.add(f"m{i}", f"project update number {i}")
+        bm25.add("inv", "invoice INV-77 attached")
+        query = "project update for INV-77"
+        scores = dict(bm25.search(query))
+        reference = bm25.reference_score(query)
+        self.assertGreater(scores["inv"] / reference, 0.5)
+        self.assertLess(scores["m0"] / reference, 0.5)
+        self.assertEqual(bm25.reference_score("unknown words"), 0)
+
+    def test_remove_and_replace(self):
+        """Test removed documents are no longer found and re-adding replaces the old text."""
+        bm25 = BM25Index()
+        bm25.add("a", "quarterly budget")
+        bm25.add("a", "hiring plan")
+        self.assertEqual(bm25.search("budget"), [])
+        bm25.remove("a", "hiring plan")
+        self.assertEqual(bm25.search("hiring"), [])
+        self.assertEqual(bm25.total_length, 0)
+
+
+class TestDenseIndex(unittest.TestCase):
+    def test_search_after_growth_and_removal(self):
+        """Test cosine search stays correct as the matrix grows and rows are swapped out."""
+        dense = DenseIndex(initial_capacity=2)
+        dense.add("x", unit(1, 0, 0))
+        dense.add("y", unit(0, 1, 0))
+        dense.add("z", unit(0, 0, 5))
+        dense.remove("x")
+        self.assertEqual([doc_id for doc_id, _ in dense.search(unit(0, 0.1, 1), 2)], ["z", "y"])
+        self.assertAlmostEqual(dense.search(unit(0, 0, 1), 1)[0][1], 1.0, places=5)
+
+    def test_dimension_is_checked(self):
+        """Test vectors of a different dimension are rejected."""
+        dense = DenseIndex()
+        dense.add("x", unit(1, 0))
+        with self.assertRaises(ValueError):
+            dense.add("y", unit(1, 0, 0))
+
+
+class TestHybridRetriever(unittest.TestCase):
+    def test_reciprocal_rank_fusion(self):
+        """Test documents ranked well by both rankings win the fusion."""
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+        self.assertEqual(fused[0][0], "b")
+        self.assertAlmostEqual(fused[0][1], 1 / 62 + 1 / 61)
+
+    def test_exact_term_match_is_fused_into_results(self):
+        """Test an exact invoice number match is returned even when its embedding is not the closest."""
+        retriever = HybridRetriever()
+        retriever.add("u1", "e1", "Payment for the annual contract is done", unit(1, 0, 0), {"subject": "Payment"})
+        retriever.add("u1", "e2", "Invoice INV-2024-0042 was paid yesterday", unit(0, 1, 0), {"subject": "Invoice"})
+        retriever.add("u1", "e3", "Lunch on Friday?", unit(0, 0, 1))
+        retriever.add("u2", "e4", "INV-2024-0042 duplicate from another account", unit(0, 1, 0))
+
+        results = retriever.search("u1", "status of INV-2024-0042 payment", unit(1, 0, 0), limit=2)
+        self.assertEqual({result["metadata"].get("subject") for result in results}, {"Payment", "Invoice"})
+        self.assertTrue(all("another account" not in result["content"] for result in results))
+        invoice = next(result for result in results if result["metadata"].get("subject") == "Invoice")
+        self.assertGreater(invoice["bm25_score"], 0)
+        self.assertGreater(invoice["bm25_normalized"], 0.5)
+        payment = next(result for result in results if result["metadata"].get("subject") == "Payment")
+        self.assertLess(payment["bm25_normalized"], 0.5)
+
+    def test_remove_reports_whether_the_user_had_the_document(self):
+        """Test removing a document from its owner's memory returns True once and never touches other users."""
+        retriever = HybridRetriever()
+        retriever.add("u1", "e1", "hello there", unit(1, 0))
+        self.assertFalse(retriever.remove("e1", "u2"))
+        self.assertTrue(retriever.remove("e1", "u1"))
+        self.assertFalse(retriever.remove("e1", "u1"))
+        self.assertEqual(retriever.search("u1", "hello", unit(1, 0)), [])
+
+if __name__ == '__main__':
+    unittest.main()
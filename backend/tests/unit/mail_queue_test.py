@@ -0,0 +1,140 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth.auth_service as auth_service
+from services.mail_queue import MailQueue
+from services.monitoring import monitoring_service
+from services.password_hasher import PasswordHasher, make_password_context
+from tests.fakes.fake_firestore import FakeFirestore
+from tests.fakes.fake_ses import FakeSES
+
+
+def message(recipient):
+    return {
+        "Source": "support@notaic.com",
+        "Destination": {"ToAddresses": [recipient]},
+        "Message": {"Subject": {"Data": "Hi"}, "Body": {"Text": {"Data": "Hello"}}}
+    }
+
+
+class TestMailQueue(unittest.TestCase):
+    def setUp(self):
+        self.ses = FakeSES(max_send_rate=1000)
+        self.queue = MailQueue(lambda: self.ses, workers=2, max_send_rate=1000, sleep=lambda seconds: None)
+        self.stats = dict(monitoring_service.outbound_mail)
+
+    def tearDown(self):
+        self.queue.shutdown(timeout=5)
+
+    def delta(self, status):
+        return monitoring_service.outbound_mail[status] - self.stats[status]
+
+    def test_enqueued_mail_is_sent_in_the_background(self):
+        """Test enqueue accepts messages and the workers send each one once."""
+        for i in range(10):
+            self.assertTrue(self.queue.enqueue(message(f"user{i}@acme.com"), f"Test email {i}"))
+        self.assertTrue(self.queue.flush(timeout=5))
+        recipients = sorted(sent["Destination"]["ToAddresses"][0] for sent in self.ses.sent)
+        self.assertEqual(recipients, sorted(f"user{i}@acme.com" for i in range(10)))
+        self.assertEqual(self.delta("sent"), 10)
+
+    def test_transient_errors_are_retried(self):
+        """Test throttling and service errors are retried with backoff until the message is sent."""
+        self.ses.fail_next("Throttling", "Maximum sending rate exceeded.", times=2)
+        self.ses.fail_next("ServiceUnavailable")
+        self.queue.enqueue(message("jane@acme.com"), "Test email")
+        self.assertTrue(self.queue.flush(timeout=5))
+        self.assertEqual(len(self.ses.sent), 1)
+        self.assertEqual(self.ses.calls, 4)
+        self.assertEqual(self.delta("retries"), 3)
+
+    def test_permanent_errors_are_not_retried(self):
+        """Test rejected messages and an exhausted daily quota fail without retrying."""
+        self.ses.fail_next("MessageRejected", "Email address is not verified.")
+        self.ses.fail_next("Throttling", "Daily message quota exceeded.")
+        self.queue.enqueue(message("jane@acme.com"), "Test email")
+        self.queue.enqueue(message("john@acme.com"), "Test email")
+        self.assertTrue(self.queue.flush(timeout=5))
+        self.assertEqual((self.ses.calls, len(self.ses.sent)), (2, 0))
+        self.assertEqual(self.delta("failed"), 2)
+
+    def test_attempts_are_bounded(self):
+        """Test a message that keeps failing is given up on after max_attempts."""
+        self.queue.max_attempts = 3
+        self.ses.fail_next("InternalFailure", times=5)
+        self.queue.enqueue(message("jane@acme.com"), "Test email")
+        self.assertTrue(self.queue.flush(timeout=5))
+        self.assertEqual(self.ses.calls, 3)
+        self.assertEqual(self.delta("failed"), 1)
+
+    def test_full_queue_refuses_new_mail(self):
+        """Test enqueue returns False instead of blocking once max_queue messages are waiting."""
+        gate = threading.Event()
+        ses = FakeSES(latency=1, sleep=lambda seconds: gate.wait())
+        queue = MailQueue(lambda: ses, workers=1, max_queue=1, max_send_rate=1000)
+        self.assertTrue(queue.enqueue(message("a@acme.com"), "Test email"))
+        while queue.queue_depth:
+            time.sleep(0.001)
+        self.assertTrue(queue.enqueue(message("b@acme.com"), "Test email"))
+        self.assertFalse(queue.enqueue(message("c@acme.com"), "Test email"))
+        self.assertEqual(self.delta("rejected"), 1)
+        gate.set()
+        queue.shutdown(timeout=5)
+        self.assertEqual(len(ses.sent), 2)
+
+    def test_sends_are_paced_to_the_send_rate(self):
+        """Test many workers together never exceed the SES send rate."""
+        ses = FakeSES(max_send_rate=50)
+        queue = MailQueue(lambda: ses, workers=8)
+        started = time.monotonic()
+        for i in range(60):
+            queue.enqueue(message(f"user{i}@acme.com"), "Test email")
+        queue.shutdown(timeout=10)
+        self.assertEqual((len(ses.sent), ses.throttled), (60, 0))
+        self.assertGreaterEqual(time.monotonic() - started, 1.0)
+
+    def test_send_rate_is_read_from_the_account_quota(self):
+        """Test the rate defaults to the MaxSendRate SES reports."""
+        queue = MailQueue(lambda: FakeSES(max_send_rate=7), workers=1, max_send_rate=0)
+        queue.start()
+        self.assertAlmostEqual(queue._bucket.rate, 7)
+        queue.shutdown()
+
+
+class TestSignupEmail(unittest.TestCase):
+    def test_register_does_not_wait_for_ses(self):
+        """Test /auth/register responds before the verification email is sent."""
+        gate = threading.Event()
+        ses = FakeSES(latency=1, sleep=lambda seconds: gate.wait())
+        queue = MailQueue(lambda: ses, workers=1, max_send_rate=1000)
+        db = FakeFirestore()
+        hasher = PasswordHasher(make_password_context(rounds=4), workers=1)
+        app = FastAPI()
+        app.include_router(auth_service.auth_router, prefix="/auth")
+
+        with patch.object(auth_service, "get_firestore_client", return_value=db), \
+                patch.object(auth_service, "password_hasher", hasher), \
+                patch("utils.email_service.mail_queue", queue), \
+                patch.object(auth_service.limiter, "enabled", False):
+            response = TestClient(app).post(
+                "/auth/register",
+                json={"full_name": "Jane", "email": "jane@acme.com", "password": "hunter2"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access_token", response.json())
+        self.assertEqual(ses.sent, [])
+
+        gate.set()
+        queue.shutdown(timeout=5)
+        hasher.shutdown()
+        self.assertEqual(ses.sent[0]["Destination"]["ToAddresses"], ["jane@acme.com"])
+        self.assertIn("verified-email?token=", ses.sent[0]["Message"]["Body"]["Html"]["Data"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from services.near_duplicates import CompactHashIndex, CompactHashSet, NearDuplicateFilter, optimal_bands, shingles
+
+TEMPLATE = ("Hi {name}, thanks for reaching out about the invoice. I have forwarded it to our accounts team "
+            "and they will get back to you within two business days. Best regards, Sam")
+
+
+class TestNearDuplicateFilter(unittest.TestCase):
+    def test_shingles_normalize_case_and_whitespace(self):
+        """Test shingling ignores case and whitespace differences."""
+        self.assertEqual(shingles("Hello   World"), shingles("hello world"))
+
+    def test_band_split_matches_threshold(self):
+        """Test the LSH split puts the bucket collision midpoint near the threshold."""
+        bands, rows = optimal_bands(0.8, 128)
+        self.assertLessEqual(bands * rows, 128)
+        self.assertAlmostEqual((1 / bands) ** (1 / rows), 0.8, delta=0.05)
+
+    def test_exact_and_templated_replies_are_collapsed(self):
+        """Test exact copies and templated replies that differ only in a name are collapsed."""
+        reply_filter = NearDuplicateFilter(threshold=0.8)
+        self.assertTrue(reply_filter.add("m1", TEMPLATE.format(name="Alice")))
+        self.assertFalse(reply_filter.add("m2", TEMPLATE.format(name="Alice")))
+        self.assertFalse(reply_filter.add("m3", TEMPLATE.format(name="Bob")))
+        self.assertTrue(reply_filter.add("m4", "Sounds good, let's move the meeting to Thursday afternoon and invite the design team."))
+
+        self.assertEqual(reply_filter.stats["kept"], 2)
+        self.assertEqual(reply_filter.stats["collapsed"], 2)
+        self.assertEqual(reply_filter.stats["tokens_saved"], len(TEMPLATE.format(name="Alice")) // 4 + len(TEMPLATE.format(name="Bob")) // 4)
+
+    def test_threshold_is_configurable(self):
+        """Test a stricter threshold keeps replies that are only similar."""
+        reply_filter = NearDuplicateFilter(threshold=0.99)
+        self.assertTrue(reply_filter.add("m1", TEMPLATE.format(name="Alice")))
+        self.assertTrue(reply_filter.add("m2", TEMPLATE.format(name="Christopher")))
+
+    def test_reset_stats_after_seeding(self):
+        """Test counters can be reset after seeding the filter with indexed texts."""
+        reply_filter = NearDuplicateFilter()
+        reply_filter.add("n1", TEMPLATE.format(name="Alice"))
+        reply_filter.reset_stats()
+        self.assertFalse(reply_filter.add("m1", TEMPLATE.format(name="Bob")))
+        self.assertEqual(reply_filter.stats, {"kept": 0, "collapsed": 1, "tokens_saved": len(TEMPLATE.format(name="Bob")) // 4})
+
+    def test_band_collisions_below_the_threshold_are_kept(self):
+        """Test a text sharing a band with a kept text is only collapsed if their signatures are similar enough."""
+        reply_filter = NearDuplicateFilter(threshold=0.8)
+        with patch.object(reply_filter, "band_hashes", return_value=np.array([42], dtype=np.uint64)):
+            self.assertTrue(reply_filter.add("m1", TEMPLATE.format(name="Alice")))
+            self.assertTrue(reply_filter.add("m2", "Sounds good, let's move the meeting to Thursday afternoon."))
+            self.assertFalse(reply_filter.add("m3", TEMPLATE.format(name="Bob")))
+        self.assertEqual(reply_filter.stats["kept"], 2)
+
+    def test_only_signatures_and_band_hashes_are_kept(self):
+        """Test distinct texts are all kept and each leaves a one-byte-per-permutation signature and one hash per band behind."""
+        reply_filter = NearDuplicateFilter()
+        reply_filter._band_index.merge_every = 16
+        for i in range(50):
+            self.assertTrue(reply_filter.add(f"m{i}", f"Reply {i}: " + " ".join(f"{i * 97 + j:x}" for j in range(40))))
+        self.assertEqual(len(reply_filter._band_index), 50 * reply_filter.bands)
+        self.assertEqual(reply_filter._signatures[0].dtype, np.uint8)
+        self.assertEqual(reply_filter._kept, 50)
+        self.assertFalse(reply_filter.add("again", "Reply 7: " + " ".join(f"{7 * 97 + j:x}" for j in range(40))))
+
+
+class TestCompactHashSet(unittest.TestCase):
+    def test_lookups_span_recent_and_merged_hashes(self):
+        """Test hashes are found before and after being merged into the sorted array."""
+        hashes = CompactHashSet(merge_every=4)
+        hashes.update(np.array([5, 2 ** 64 - 1, 9], dtype=np.uint64))
+        self.assertTrue(hashes.contains_any(np.array([9], dtype=np.uint64)))
+        hashes.update(np.array([1, 3], dtype=np.uint64))
+        self.assertEqual(len(hashes._recent), 0)
+        self.assertTrue(hashes.contains_any(np.array([4, 2 ** 64 - 1], dtype=np.uint64)))
+        self.assertFalse(hashes.contains_any(np.array([0, 4, 10], dtype=np.uint64)))
+        self.assertEqual(len(hashes), 5)
+
+
+class TestCompactHashIndex(unittest.TestCase):
+    def test_lookups_span_recent_and_merged_entries(self):
+        """Test every row stored under a hash is found before and after being merged."""
+        index = CompactHashIndex(merge_every=4)
+        index.add(np.array([5, 9], dtype=np.uint64), 0)
+        self.assertEqual(index.lookup(np.array([9], dtype=np.uint64)), {0})
+        index.add(np.array([9, 2 ** 64 - 1], dtype=np.uint64), 1)
+        self.assertEqual(len(index._recent), 0)
+        index.add(np.array([5], dtype=np.uint64), 2)
+        self.assertEqual(index.lookup(np.array([5, 2 ** 64 - 1], dtype=np.uint64)), {0, 1, 2})
+        self.assertEqual(index.lookup(np.array([0, 6], dtype=np.uint64)), set())
+        self.assertEqual(len(index), 5)
+
+if __name__ == '__main__':
+    unittest.main()
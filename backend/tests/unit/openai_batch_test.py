@@ -0,0 +1,129 @@
+import os
+import unittest
+from unittest.mock import Mock, MagicMock, patch
+
+from openai import OpenAI
+
+from services.openai_batch import OpenAIBatchJob
+from tests.fakes.fake_openai_server import FakeOpenAIServer
+
+GENERATE_EMAIL_REQUEST = {
+    "model": "gpt-4o",
+    "messages": [{"role": "user", "content": "Reply to: can we meet tomorrow?"}],
+    "functions": [{"name": "generate_email", "parameters": {"type": "object", "properties": {}}}],
+    "function_call": {"name": "generate_email"}
+}
+
+
+class TestOpenAIBatchJob(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeOpenAIServer(batch_polls_until_complete=2).start()
+        self.client = OpenAI(api_key="test", base_url=self.server.base_url)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_default_client_uses_the_configured_key(self):
+        """Test the default client takes the key from settings, which may come from .env rather than the environment."""
+        with patch.dict(os.environ, {}, clear=True), \
+                patch("services.openai_batch.settings.openai_api_key", "sk-from-dotenv"):
+            job = OpenAIBatchJob()
+        self.assertEqual(job.client.api_key, "sk-from-dotenv")
+
+    def test_jsonl_contains_one_request_per_line(self):
+        """Test the batch input file has one request line per added request."""
+        job = OpenAIBatchJob(client=self.client)
+        job.add("user1:msg1", GENERATE_EMAIL_REQUEST)
+        job.add("user1:msg2", GENERATE_EMAIL_REQUEST)
+        lines = job.to_jsonl().decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('"custom_id": "user1:msg1"', lines[0])
+
+    def test_submit_poll_and_read_results(self):
+        """Test a batch is submitted, polled until completed and its results matched by custom_id."""
+        job = OpenAIBatchJob(client=self.client)
+        for i in range(3):
+            job.add(f"user1:msg{i}", GENERATE_EMAIL_REQUEST)
+
+        batch_id = job.submit()
+        batch = job.wait(poll_interval=0)
+        results = job.results(batch)
+
+        self.assertEqual(batch.status, "completed")
+        self.assertEqual(self.server.batches[batch_id]["polls"], 3)
+        self.assertEqual(set(results), {"user1:msg0", "user1:msg1", "user1:msg2"})
+        message = results["user1:msg0"]["response"]["choices"][0]["message"]
+        self.assertEqual(message["function_call"]["name"], "generate_email")
+
+    def test_wait_returns_unfinished_batch_after_timeout(self):
+        """Test waiting gives up once the timeout elapses, leaving the batch to a later run."""
+        job = OpenAIBatchJob(client=self.client)
+        job.add("user1:msg1", GENERATE_EMAIL_REQUEST)
+        job.submit()
+        batch = job.wait(poll_interval=10, timeout=1)
+        self.assertEqual(batch.status, "in_progress")
+
+    def test_cannot_add_after_submit(self):
+        """Test a submitted batch is immutable."""
+        job = OpenAIBatchJob(client=self.client)
+        job.add("user1:msg1", GENERATE_EMAIL_REQUEST)
+        job.submit()
+        with self.assertRaises(ValueError):
+            job.add("user1:msg2", GENERATE_EMAIL_REQUEST)
+
+
+class TestEmailProcessorBatchMode(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeOpenAIServer(batch_polls_until_complete=1).start()
+        self.env_patcher = patch.dict(os.environ, {"OPENAI_BASE_URL": self.server.base_url, "OPENAI_API_KEY": "test"})
+        self.env_patcher.start()
+
+        from utils import email_processor_service
+        self.module = email_processor_service
+        self.patchers = [
+            patch.object(email_processor_service, "get_firestore_client", return_value=MagicMock()),
+            patch.object(email_processor_service.os.path, "exists", return_value=True),
+            patch.object(email_processor_service.joblib, "load", return_value=Mock()),
+            patch.object(email_processor_service, "GmailService")
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.gmail_service = self.module.GmailService.return_value
+        self.gmail_service.create_draft_reply.return_value = ("draft1", "https://mail.google.com", "compose1")
+        self.gmail_service.store_draft.return_value = "db1"
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.env_patcher.stop()
+        self.server.stop()
+
+    def test_batch_results_become_drafts(self):
+        """Test drafts are created and stored from the results of a submitted batch."""
+        processor = self.module.EmailProcessor(batch_mode=True, batch_poll_interval=0)
+        processor.users_ref.document.return_value.get.return_value.to_dict.return_value = {
+            "email": "user@example.com",
+            "google_refresh_token": "refresh"
+        }
+
+        emails = [
+            {"id": f"msg{i}", "threadId": f"thread{i}", "sender": "a@example.com", "subject": "Hello", "body": "Hi there"}
+            for i in range(2)
+        ]
+        for email in emails:
+            processor.add_to_batch("user1", email, GENERATE_EMAIL_REQUEST)
+
+        batch_id = processor.submit_batch()
+
+        entries_ref = processor.batches_ref.document.return_value.collection.return_value
+        entries = [call.args[0] for call in entries_ref.document.return_value.set.call_args_list]
+        entries_ref.stream.return_value = [Mock(to_dict=Mock(return_value=entry)) for entry in entries]
+
+        self.assertTrue(processor.collect_batch(batch_id, wait=True))
+        self.assertEqual(self.gmail_service.create_draft_reply.call_count, 2)
+        self.assertEqual(self.gmail_service.store_draft.call_count, 2)
+        stored = self.gmail_service.store_draft.call_args.args[0]
+        self.assertEqual(stored.draft_body, "Fake response")
+
+if __name__ == '__main__':
+    unittest.main()
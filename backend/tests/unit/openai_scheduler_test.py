@@ -0,0 +1,120 @@
+import unittest
+import threading
+import time
+from unittest.mock import Mock
+
+import httpx
+import openai
+
+from services.openai_scheduler import OpenAIScheduler, TokenBucket, Priority, estimate_chat_tokens
+
+
+def make_rate_limit_error(headers=None):
+    request = httpx.Request("POST", "http://fake/v1/chat/completions")
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refills_at_per_minute_rate(self):
+        """Test the bucket refills continuously and never exceeds its capacity."""
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock=clock)
+        bucket.consume(60)
+        self.assertEqual(bucket.time_until(1), 1.0)
+
+        clock.now += 30
+        self.assertEqual(bucket.available(), 30)
+
+        clock.now += 300
+        self.assertEqual(bucket.available(), 60)
+
+    def test_oversized_requests_wait_for_full_bucket(self):
+        """Test a request larger than the bucket is admitted once the bucket is full."""
+        bucket = TokenBucket(60, clock=FakeClock())
+        self.assertEqual(bucket.time_until(1000), 0.0)
+
+
+class TestOpenAIScheduler(unittest.TestCase):
+    def test_honors_retry_after(self):
+        """Test a 429 with retry-after-ms is retried after exactly that delay."""
+        clock = FakeClock()
+        scheduler = OpenAIScheduler(clock=clock, sleep=clock.sleep)
+        fn = Mock(side_effect=[make_rate_limit_error({"retry-after-ms": "2500"}), "ok"])
+
+        result = scheduler.submit(fn, estimated_tokens=10)
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(clock.now, 2.5)
+
+    def test_backoff_is_bounded(self):
+        """Test jittered backoff never exceeds the configured maximum delay."""
+        scheduler = OpenAIScheduler(base_delay=1.0, max_delay=8.0)
+        for attempt in range(10):
+            self.assertLessEqual(scheduler._backoff_delay(attempt), 8.0)
+
+    def test_gives_up_after_max_retries(self):
+        """Test the last error is re-raised once retries are exhausted."""
+        clock = FakeClock()
+        scheduler = OpenAIScheduler(max_retries=2, clock=clock, sleep=clock.sleep)
+        fn = Mock(side_effect=make_rate_limit_error({"retry-after": "1"}))
+
+        with self.assertRaises(openai.RateLimitError):
+            scheduler.submit(fn, estimated_tokens=10)
+        self.assertEqual(fn.call_count, 3)
+
+    def test_non_retryable_errors_are_raised(self):
+        """Test errors that are not rate limits or transient failures are not retried."""
+        scheduler = OpenAIScheduler()
+        fn = Mock(side_effect=ValueError("bad request"))
+
+        with self.assertRaises(ValueError):
+            scheduler.submit(fn)
+        fn.assert_called_once()
+
+    def test_reconciles_actual_usage(self):
+        """Test the token bucket is corrected with the usage reported by the API."""
+        clock = FakeClock()
+        scheduler = OpenAIScheduler(tokens_per_minute=1000, clock=clock, sleep=clock.sleep)
+        scheduler.submit(lambda: Mock(usage=Mock(total_tokens=100)), estimated_tokens=500)
+        self.assertAlmostEqual(scheduler._tokens.available(), 900)
+
+    def test_interactive_lane_is_served_first(self):
+        """Test queued interactive callers are admitted before queued background callers."""
+        scheduler = OpenAIScheduler(requests_per_minute=600, burst_seconds=0.1, background_reserve=0.0)
+        scheduler.acquire(1)  # Empty the single-request bucket
+        order = []
+
+        def call(lane, label):
+            scheduler.acquire(1, lane)
+            order.append(label)
+
+        background = threading.Thread(target=call, args=(Priority.BACKGROUND, "background"))
+        background.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=call, args=(Priority.INTERACTIVE, "interactive"))
+        interactive.start()
+        background.join()
+        interactive.join()
+
+        self.assertEqual(order, ["interactive", "background"])
+
+    def test_estimate_chat_tokens_includes_completion(self):
+        """Test the estimate covers both the prompt and the requested completion."""
+        messages = [{"role": "user", "content": "x" * 400}]
+        self.assertEqual(estimate_chat_tokens(messages, max_tokens=50), 100 + 4 + 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,7 @@ class TestOpenAIService(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures before each test method."""
         self.mock_vector_store = Mock(spec=VectorStoreIndex)
-        self.openai_service = OpenAIService(self.mock_vector_store)
+        self.openai_service = OpenAIService(self.mock_vector_store, context_mode="query_engine")
 
     def test_preprocess_email_html(self):
         """Test preprocessing of HTML email content."""
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth.auth_service as auth_service
+from services.monitoring import monitoring_service
+from services.password_hasher import HasherBusy, PasswordHasher, make_password_context
+from tests.fakes.fake_firestore import FakeFirestore
+
+
+class TestPasswordHasher(unittest.TestCase):
+    def setUp(self):
+        self.hasher = PasswordHasher(make_password_context(rounds=4), workers=2)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    def test_hashing_does_not_block_the_event_loop(self):
+        """Test the loop keeps serving other tasks while a hash is computed."""
+        hasher = PasswordHasher(make_password_context(rounds=10), workers=1)
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.005)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            hashed = await hasher.hash("hunter2")
+            task.cancel()
+            return hashed, ticks
+
+        hashed, ticks = asyncio.run(scenario())
+        hasher.shutdown()
+        self.assertTrue(hashed.startswith("$2b$10$"))
+        self.assertGreater(ticks, 3)
+
+    def test_verify(self):
+        """Test passwords are verified against their hash."""
+        hashed = asyncio.run(self.hasher.hash("hunter2"))
+        self.assertTrue(asyncio.run(self.hasher.verify("hunter2", hashed)))
+        self.assertFalse(asyncio.run(self.hasher.verify("hunter3", hashed)))
+
+    def test_outdated_hashes_are_upgraded(self):
+        """Test a hash with fewer rounds than configured is replaced on a successful verify only."""
+        old_hash = asyncio.run(self.hasher.hash("hunter2"))
+        upgraded = PasswordHasher(make_password_context(rounds=5), workers=1)
+        rehashes = monitoring_service.password_hashing["rehashes"]
+
+        self.assertEqual(asyncio.run(upgraded.verify_and_update("hunter3", old_hash)), (False, None))
+        valid, new_hash = asyncio.run(upgraded.verify_and_update("hunter2", old_hash))
+        self.assertTrue(valid)
+        self.assertTrue(new_hash.startswith("$2b$05$"))
+        self.assertEqual(asyncio.run(upgraded.verify_and_update("hunter2", new_hash)), (True, None))
+        self.assertEqual(monitoring_service.password_hashing["rehashes"], rehashes + 1)
+        upgraded.shutdown()
+
+    def test_full_queue_is_refused(self):
+        """Test calls beyond the queue bound fail fast and are counted."""
+        hasher = PasswordHasher(make_password_context(rounds=4), workers=1, max_queue=1)
+        release = threading.Event()
+        stats = monitoring_service.password_hashing["operations"]["blocked"]
+        rejected = stats["rejected"]
+
+        async def scenario():
+            running = asyncio.ensure_future(hasher._run("blocked", release.wait))
+            queued = asyncio.ensure_future(hasher._run("blocked", release.wait))
+            await asyncio.sleep(0.05)
+            self.assertEqual(hasher.queue_depth, 1)
+            with self.assertRaises(HasherBusy):
+                await hasher._run("blocked", release.wait)
+            release.set()
+            await asyncio.gather(running, queued)
+
+        asyncio.run(scenario())
+        hasher.shutdown()
+        self.assertEqual(hasher.pending, 0)
+        self.assertEqual(stats["rejected"], rejected + 1)
+        self.assertGreaterEqual(monitoring_service.password_hashing["max_queue_depth"], 1)
+
+
+class TestSigninRehash(unittest.TestCase):
+    def test_signin_stores_an_upgraded_hash(self):
+        """Test signing in with an outdated hash stores a hash at the current cost."""
+        db = FakeFirestore()
+        old_hash = make_password_context(rounds=4).hash("hunter2")
+        db.docs["users/user1"] = {"email": "jane@acme.com", "password": old_hash}
+        hasher = PasswordHasher(make_password_context(rounds=5), workers=1)
+
+        app = FastAPI()
+        app.include_router(auth_service.auth_router, prefix="/auth")
+        with patch.object(auth_service, "get_firestore_client", return_value=db), \
+                patch.object(auth_service, "password_hasher", hasher), \
+                patch.object(auth_service.limiter, "enabled", False):
+            client = TestClient(app)
+            wrong = client.post("/auth/signin", json={"email": "jane@acme.com", "password": "nope"})
+            self.assertEqual(wrong.status_code, 400)
+            self.assertEqual(db.docs["users/user1"]["password"], old_hash)
+
+            response = client.post("/auth/signin", json={"email": "jane@acme.com", "password": "hunter2"})
+        hasher.shutdown()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(db.docs["users/user1"]["password"].startswith("$2b$05$"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from services.hybrid_retriever import DenseIndex, HybridRetriever, make_dense_index
+from services.quantization import FullPrecisionStore, Int8Quantizer, ProductQuantizer, QuantizedDenseIndex, normalize, pq_subspaces
+
+
+def clustered_vectors(count, dimension=64, clusters=20, seed=3):
+    generator = np.random.RandomState(seed)
+    centers = generator.standard_normal((clusters, dimension))
+    return (centers[generator.randint(clusters, size=count)] + 0.4 * generator.standard_normal((count, dimension))).astype(np.float32)
+
+
+def exact_top(vectors, query, k):
+    scores = normalize(vectors) @ normalize(query)
+    return set(np.argsort(-scores)[:k])
+
+
+class TestQuantizers(unittest.TestCase):
+    def test_int8_scores_approximate_float32(self):
+        """Test int8 codes reproduce inner products to within quantization error."""
+        vectors = normalize(clustered_vectors(50))
+        codes, scales = Int8Quantizer().encode(vectors)
+        self.assertEqual(codes.dtype, np.int8)
+        approximate = Int8Quantizer().scores(vectors[0], codes, scales)
+        np.testing.assert_allclose(approximate, vectors @ vectors[0], atol=0.02)
+
+    def test_pq_subspaces_divide_dimension(self):
+        """Test the subspace count is adjusted to divide the vector dimension."""
+        self.assertEqual(pq_subspaces(1536, 96), 96)
+        self.assertEqual(pq_subspaces(100, 96), 50)
+
+    def test_pq_codes_are_one_byte_per_subspace(self):
+        """Test product quantization stores one byte per subspace."""
+        vectors = normalize(clustered_vectors(600))
+        quantizer = ProductQuantizer(64, subspaces=8)
+        quantizer.train(vectors)
+        codes, _ = quantizer.encode(vectors)
+        self.assertEqual(codes.shape, (600, 8))
+        self.assertEqual(codes.dtype, np.uint8)
+
+
+class TestQuantizedDenseIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.tmp = cls._tmp.name
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp.cleanup()
+
+    def setUp(self):
+        self.vectors = clustered_vectors(1000)
+        self.queries = clustered_vectors(20, seed=11)
+
+    def _recall(self, index, k=10):
+        for i, vector in enumerate(self.vectors):
+            index.add(i, vector)
+        hits = sum(len({doc_id for doc_id, _ in index.search(query, k)} & exact_top(self.vectors, query, k)) for query in self.queries)
+        return hits / (k * len(self.queries))
+
+    def test_int8_with_rerank_matches_exact_search(self):
+        """Test int8 candidates re-ranked in float32 give the exact top-k."""
+        self.assertEqual(self._recall(QuantizedDenseIndex("int8", rerank_factor=5)), 1.0)
+
+    def test_pq_with_rerank_has_high_recall(self):
+        """Test product quantized candidates re-ranked in float32 keep recall high."""
+        index = QuantizedDenseIndex("pq", pq_subspaces=16, pq_train_size=500, rerank_factor=10)
+        self.assertGreaterEqual(self._recall(index), 0.95)
+        self.assertTrue(index.quantizer.trained)
+
+    def test_pq_codes_use_less_memory(self):
+        """Test the resident size of quantized indexes relative to float32."""
+        dense = DenseIndex()
+        int8 = QuantizedDenseIndex("int8")
+        pq = QuantizedDenseIndex("pq", pq_subspaces=8, pq_train_size=500)
+        for i, vector in enumerate(self.vectors):
+            for index in (dense, int8, pq):
+                index.add(i, vector)
+        self.assertLess(int8.memory_bytes(), dense.memory_bytes() * 0.27)
+        # Codebooks dominate at this size; per vector PQ stores 8 bytes against 64 for int8
+        self.assertLess(pq.memory_bytes(), dense.memory_bytes() * 0.3)
+        self.assertEqual(pq._codes[:len(pq)].nbytes, 8 * len(pq))
+
+    def test_remove_and_on_disk_rerank(self):
+        """Test removals keep codes and the float32 rows in the re-rank file aligned."""
+        index = QuantizedDenseIndex("int8", rerank_dir=self.tmp, initial_capacity=4)
+        for i, vector in enumerate(self.vectors[:10]):
+            index.add(i, vector)
+        index.remove(0)
+        doc_id, score = index.search(self.vectors[9], 1)[0]
+        self.assertEqual(doc_id, 9)
+        self.assertAlmostEqual(score, 1.0, places=5)
+
+    def test_indexes_sharing_a_rerank_dir_keep_their_own_vectors(self):
+        """Test two indexes re-ranking from the same directory never overwrite each other's rows."""
+        first = QuantizedDenseIndex("int8", rerank_dir=self.tmp)
+        second = QuantizedDenseIndex("int8", rerank_dir=self.tmp)
+        for i in range(10):
+            first.add(f"a{i}", self.vectors[i])
+            second.add(f"b{i}", self.vectors[100 + i])
+        for i in range(10):
+            doc_id, score = first.search(self.vectors[i], 1)[0]
+            self.assertEqual(doc_id, f"a{i}")
+            self.assertAlmostEqual(score, 1.0, places=5)
+            self.assertEqual(second.search(self.vectors[100 + i], 1)[0][0], f"b{i}")
+
+    def test_full_precision_rows_are_read_back_from_disk(self):
+        """Test the default re-rank store keeps rows in a temporary file and reads any row order back."""
+        store = FullPrecisionStore(64)
+        for row, vector in enumerate(self.vectors[:20]):
+            store.set(row, vector)
+        rows = np.array([3, 4, 5, 17, 0, 1])
+        np.testing.assert_array_equal(store.get(rows), self.vectors[rows])
+        np.testing.assert_array_equal(store.get(7), self.vectors[7])
+        self.assertEqual(os.fstat(store._fd).st_size, 20 * 64 * 4)
+
+    def test_hybrid_retriever_uses_configured_quantization(self):
+        """Test the hybrid retriever builds quantized dense indexes when asked to."""
+        retriever = HybridRetriever(quantization="int8")
+        retriever.add("u1", "e1", "hello", self.vectors[0])
+        self.assertIsInstance(retriever.user_memory("u1").dense, QuantizedDenseIndex)
+        self.assertIsInstance(make_dense_index("u1", "none"), DenseIndex)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from limits import parse
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+
+from auth.jwt_handler import create_access_token
+from services.rate_limits import make_limiter, rate_limit_key
+from tests.fakes.fake_rate_limit_storage import FakeRedisStorage
+from tests.fakes.fake_redis import FakeRedis
+
+
+def make_app(limiter):
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    @app.get("/limited")
+    @limiter.limit("3/minute")
+    async def limited(request: Request):
+        return {"ok": True}
+
+    return app
+
+
+def bearer(user_id):
+    return {"Authorization": f"Bearer {create_access_token({'sub': user_id})}"}
+
+
+class TestRateLimitKey(unittest.TestCase):
+    def test_requests_are_keyed_by_user_then_address(self):
+        """Test a valid token keys by subject and anything else falls back to the client address."""
+        app = FastAPI()
+
+        @app.get("/key")
+        async def key(request: Request):
+            return {"key": rate_limit_key(request)}
+
+        client = TestClient(app)
+        self.assertEqual(client.get("/key", headers=bearer("user1")).json()["key"], "user:user1")
+        self.assertEqual(client.get("/key").json()["key"], "ip:testclient")
+        invalid = {"Authorization": "Bearer garbage"}
+        self.assertEqual(client.get("/key", headers=invalid).json()["key"], "ip:testclient")
+
+
+class TestSharedLimiter(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+
+    def test_users_have_separate_budgets(self):
+        """Test one user's requests do not use up another user's budget from the same address."""
+        client = TestClient(make_app(make_limiter("fakeredis://", client=self.redis)))
+        codes = [client.get("/limited", headers=bearer("user1")).status_code for _ in range(4)]
+        self.assertEqual(codes, [200, 200, 200, 429])
+        self.assertEqual(client.get("/limited", headers=bearer("user2")).status_code, 200)
+
+    def test_workers_share_counters(self):
+        """Test two limiters on the same storage, like two workers, enforce one budget between them."""
+        first = TestClient(make_app(make_limiter("fakeredis://", client=self.redis)))
+        second = TestClient(make_app(make_limiter("fakeredis://", client=self.redis)))
+        headers = bearer("user1")
+        codes = [(first if i % 2 else second).get("/limited", headers=headers).status_code for i in range(6)]
+        self.assertEqual(codes.count(200), 3)
+
+    def test_memory_storage_is_per_worker(self):
+        """Test per-process memory storage lets each worker admit its own full budget."""
+        headers = bearer("user1")
+        admitted = 0
+        for _ in range(2):
+            client = TestClient(make_app(make_limiter("memory://")))
+            admitted += sum(client.get("/limited", headers=headers).status_code == 200 for _ in range(4))
+        self.assertEqual(admitted, 6)
+
+
+class TestSlidingWindow(unittest.TestCase):
+    def setUp(self):
+        self.now = 1_000_000.0
+        clock = patch("tests.fakes.fake_rate_limit_storage.time.time", side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.redis = FakeRedis(clock=lambda: self.now)
+        self.storage = FakeRedisStorage("fakeredis://", client=self.redis)
+        self.limit = parse("10/minute")
+
+    def hit(self):
+        return self.storage.acquire_sliding_window_entry("user:user1", self.limit.amount, 60)
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        """Test requests from the previous window count in proportion to how much of it still overlaps."""
+        self.assertEqual(sum(self.hit() for _ in range(12)), 10)
+        # A quarter into the next window, 75% of the previous 10 still counts
+        self.now += 60 - (self.now % 60) + 15
+        self.assertEqual(sum(self.hit() for _ in range(5)), 3)
+        # Two windows later nothing from the first remains
+        self.now += 120
+        self.assertEqual(sum(self.hit() for _ in range(12)), 10)
+
+    def test_memory_per_key_is_two_counters(self):
+        """Test each key keeps at most its current and previous window counters."""
+        for _ in range(10):
+            self.now += 60
+            self.hit()
+            live = [key for key in list(self.redis.data) if self.redis._alive(key)]
+            self.assertLessEqual(len(live), 2)
+
+    def test_rejected_requests_are_not_counted(self):
+        """Test requests over the limit leave the counter at the limit."""
+        for _ in range(15):
+            self.hit()
+        previous, _, current, _ = self.storage.get_sliding_window("user:user1", 60)
+        self.assertEqual(previous + current, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from services.response_cache import LocalCacheBackend, RedisCacheBackend, ResponseCache, etag_response
+from tests.fakes.fake_redis import FakeRedis
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingLoader:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return dict(self.value)
+
+
+class ResponseCacheContract:
+    """Behaviour every backend must provide"""
+
+    def make_backend(self, clock):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = ResponseCache(self.make_backend(self.clock), ttl=30)
+        self.loader = CountingLoader({"remaining_drafts": 7})
+
+    def test_read_through_until_expiry(self):
+        """Test a response is loaded once per TTL and its ETag is stable."""
+        body, etag = self.cache.get_or_load("u1", "remaining-drafts", self.loader)
+        again, same_etag = self.cache.get_or_load("u1", "remaining-drafts", self.loader)
+        self.assertEqual((body, etag), (again, same_etag))
+        self.assertEqual(body, b'{"remaining_drafts":7}')
+        self.assertEqual(self.loader.calls, 1)
+
+        self.clock.now += 31
+        self.cache.get_or_load("u1", "remaining-drafts", self.loader)
+        self.assertEqual(self.loader.calls, 2)
+
+    def test_invalidation_is_per_user(self):
+        """Test invalidating a user reloads their responses only."""
+        other = CountingLoader({"remaining_drafts": 1})
+        self.cache.get_or_load("u1", "remaining-drafts", self.loader)
+        self.cache.get_or_load("u2", "remaining-drafts", other)
+
+        self.loader.value = {"remaining_drafts": 6}
+        self.cache.invalidate("u1")
+        body, _ = self.cache.get_or_load("u1", "remaining-drafts", self.loader)
+        self.cache.get_or_load("u2", "remaining-drafts", other)
+        self.assertEqual(body, b'{"remaining_drafts":6}')
+        self.assertEqual((self.loader.calls, other.calls), (2, 1))
+
+    def test_loader_errors_are_not_cached(self):
+        """Test a failing loader propagates and the next call retries it."""
+        def failing():
+            raise LookupError("User not found")
+
+        with self.assertRaises(LookupError):
+            self.cache.get_or_load("u1", "remaining-drafts", failing)
+        self.cache.get_or_load("u1", "remaining-drafts", self.loader)
+        self.assertEqual(self.loader.calls, 1)
+
+
+class TestLocalCache(ResponseCacheContract, unittest.TestCase):
+    def make_backend(self, clock):
+        return LocalCacheBackend(max_entries=3, clock=clock)
+
+    def test_lru_eviction_keeps_generations(self):
+        """Test evicting entries never forgets an invalidation."""
+        self.cache.get_or_load("u1", "a", self.loader)
+        self.cache.invalidate("u1")
+        for name in "bcdef":
+            self.cache.get_or_load("u2", name, self.loader)
+        self.assertEqual(len(self.cache.backend), 3)
+        self.assertEqual(self.cache.backend.get("account:u1:generation"), b"1")
+
+
+class TestSharedCache(ResponseCacheContract, unittest.TestCase):
+    def make_backend(self, clock):
+        self.redis = FakeRedis(clock=clock)
+        return RedisCacheBackend(client=self.redis)
+
+    def test_workers_share_invalidations(self):
+        """Test an invalidation by one worker is seen by another worker's cache."""
+        worker = ResponseCache(RedisCacheBackend(client=self.redis), ttl=30)
+        self.cache.get_or_load("u1", "remaining-drafts", self.loader)
+        worker.get_or_load("u1", "remaining-drafts", self.loader)
+        self.assertEqual(self.loader.calls, 1)
+
+        worker.invalidate("u1")
+        self.cache.get_or_load("u1", "remaining-drafts", self.loader)
+        self.assertEqual(self.loader.calls, 2)
+
+    def test_backend_outage_falls_back_to_the_loader(self):
+        """Test requests are still served when the shared cache is down."""
+        with patch.object(self.redis, "get", side_effect=ConnectionError("down")):
+            body, _ = self.cache.get_or_load("u1", "remaining-drafts", self.loader)
+            self.cache.invalidate("u1")
+        self.assertEqual(body, b'{"remaining_drafts":7}')
+
+
+class TestETag(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(LocalCacheBackend(), ttl=30)
+        app = FastAPI()
+
+        @app.get("/remaining-drafts")
+        async def remaining_drafts(request: Request):
+            body, etag = self.cache.get_or_load("u1", "remaining-drafts", lambda: {"remaining_drafts": 7})
+            return etag_response(request, body, etag)
+
+        self.client = TestClient(app)
+
+    def test_unchanged_response_is_not_modified(self):
+        """Test a matching If-None-Match gets an empty 304 and a changed one the full body."""
+        first = self.client.get("/remaining-drafts")
+        self.assertEqual(first.json(), {"remaining_drafts": 7})
+        etag = first.headers["etag"]
+
+        revalidated = self.client.get("/remaining-drafts", headers={"If-None-Match": f'W/"other", {etag}'})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b"")
+        self.assertEqual(revalidated.headers["etag"], etag)
+
+        changed = self.client.get("/remaining-drafts", headers={"If-None-Match": '"stale"'})
+        self.assertEqual(changed.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
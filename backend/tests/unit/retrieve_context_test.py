@@ -0,0 +1,120 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from llama_index.core import Document, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+
+import utils.openai_service as openai_service
+from services.blob_store import FirestoreBlobStore
+from tests.fakes.fake_firestore import FakeFirestore
+from tests.fakes.fake_gmail import FakeGmail
+from tests.unit.gmail_fetch_profile_test import make_gmail_service
+from utils.openai_service import LoadedIndexCache, OpenAIService, SentEmailProcessor
+
+REPLIES = [
+    ("Budget", "Thanks, the budget looks fine to me. Let's lock it in on Friday."),
+    ("Offsite", "I can't make the offsite, but send me the notes afterwards."),
+    ("Invoice", "Invoice received, I've passed it on to accounts."),
+    ("Order", "Order PO-88123 shipped this morning, tracking number to follow."),
+]
+
+
+def style_index():
+    documents = [
+        SentEmailProcessor.reply_document({"email_id": f"s{i}", "thread_id": f"t{i}", "subject": subject, "reply_text": reply,
+                                           "date": "", "internal_date": 0})
+        for i, (subject, reply) in enumerate(REPLIES)
+    ]
+    return VectorStoreIndex.from_documents(documents, embed_model=MockEmbedding(embed_dim=8))
+
+
+class TestRetrieveContext(unittest.TestCase):
+    def setUp(self):
+        self.index = style_index()
+
+    def test_retriever_mode_returns_past_replies_without_llm(self):
+        """Test retriever mode returns the top-k raw replies and never builds a query engine."""
+        service = OpenAIService(self.index, context_mode="retriever", similarity_top_k=2)
+        with patch.object(self.index, "as_query_engine") as as_query_engine:
+            context = service.retrieve_context("When is the budget due?")
+        as_query_engine.assert_not_called()
+        self.assertEqual(context.count("Subject: "), 2)
+        self.assertTrue(any(reply in context for _, reply in REPLIES))
+
+    def test_retriever_is_reused_across_services(self):
+        """Test services sharing an index and top-k reuse one retriever object."""
+        first = OpenAIService(self.index, context_mode="retriever", similarity_top_k=2)
+        second = OpenAIService(self.index, context_mode="retriever", similarity_top_k=2)
+        other_k = OpenAIService(self.index, context_mode="retriever", similarity_top_k=3)
+        self.assertIs(first.get_retriever(), second.get_retriever())
+        self.assertIsNot(first.get_retriever(), other_k.get_retriever())
+
+    def test_hybrid_mode_finds_exact_terms(self):
+        """Test hybrid mode ranks the reply containing a queried order number first."""
+        service = OpenAIService(self.index, context_mode="hybrid", similarity_top_k=2)
+        context = service.retrieve_context("Any update on PO-88123?")
+        self.assertTrue(context.startswith("Subject: Order"))
+        self.assertEqual(context.count("Subject: "), 2)
+        self.assertIs(service.get_bm25_index(), OpenAIService(self.index).get_bm25_index())
+
+    def test_context_settings_come_from_the_user(self):
+        """Test the per-user settings select the context mode and top-k."""
+        service = OpenAIService.for_user(self.index, {"settings": {"context_mode": "query_engine", "context_top_k": 6}})
+        self.assertEqual(service.context_mode, "query_engine")
+        self.assertEqual(service.similarity_top_k, 6)
+
+        query_engine = MagicMock()
+        query_engine.query.return_value = MagicMock(response="Synthesized context", usage=None)
+        with patch.object(self.index, "as_query_engine", return_value=query_engine):
+            self.assertEqual(service.retrieve_context("Budget?"), "Synthesized context")
+
+
+class TestSharedIndex(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeFirestore()
+        self.db.collection("users").document("user1").set({"email": "me@example.com"})
+        self.processor = make_gmail_service(FakeGmail([]), service_class=SentEmailProcessor, db=self.db)
+        self.processor.save_index_to_firestore(style_index())
+        cache = patch.object(openai_service, "_loaded_indexes", LoadedIndexCache(max_entries=2))
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    def test_drafts_reuse_the_loaded_index_and_retriever(self):
+        """Test shared loads of an unchanged blob return one index, read once, with one retriever."""
+        with patch.object(FirestoreBlobStore, "get", autospec=True, side_effect=FirestoreBlobStore.get) as get:
+            first = self.processor.load_index_from_firestore(shared=True)
+            second = self.processor.load_index_from_firestore(shared=True)
+        self.assertIs(first, second)
+        self.assertEqual(get.call_count, 1)
+        user = {"settings": {"context_mode": "retriever"}}
+        self.assertIs(OpenAIService.for_user(first, user).get_retriever(), OpenAIService.for_user(second, user).get_retriever())
+
+        # Builds and updates modify the index, so they get their own copy
+        self.assertIsNot(self.processor.load_index_from_firestore(), first)
+
+    def test_bm25_is_built_once_per_blob(self):
+        """Test concurrent hybrid drafts on a shared index build its BM25 index once."""
+        user = {"settings": {"context_mode": "hybrid"}}
+        # generate_draft loads on the event loop and retrieves on the executor
+        services = [OpenAIService.for_user(self.processor.load_index_from_firestore(shared=True), user) for _ in range(8)]
+        with patch.object(openai_service, "BM25Index", side_effect=openai_service.BM25Index) as bm25_class:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                indexes = list(executor.map(OpenAIService.get_bm25_index, services))
+        self.assertEqual(bm25_class.call_count, 1)
+        self.assertTrue(all(bm25 is indexes[0] for bm25 in indexes))
+
+    def test_saved_index_replaces_the_shared_one(self):
+        """Test a re-saved index is loaded under its new blob hash and the old one is dropped."""
+        first = self.processor.load_index_from_firestore(shared=True)
+        updated = style_index()
+        updated.insert(SentEmailProcessor.reply_document({"email_id": "s9", "thread_id": "t9", "subject": "New",
+                                                          "reply_text": "A brand new reply.", "date": "", "internal_date": 0}))
+        self.processor.save_index_to_firestore(updated)
+        second = self.processor.load_index_from_firestore(shared=True)
+        self.assertIsNot(second, first)
+        self.assertIn("s9", second.ref_doc_info)
+        self.assertEqual(len(openai_service._loaded_indexes._entries), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import time
+import random
+import unittest
+from typing import ClassVar
+
+from llama_index.core.embeddings import MockEmbedding
+
+from tests.fakes.fake_firestore import FakeFirestore
+from tests.fakes.fake_gmail import FakeGmail, make_message
+from tests.unit.gmail_fetch_profile_test import make_gmail_service
+from utils.openai_service import SentEmailProcessor
+
+
+class CountingEmbedding(MockEmbedding):
+    # Class-level so the count survives the index being pickled to Firestore and loaded back
+    texts_embedded: ClassVar[int] = 0
+
+    def _get_text_embedding(self, text):
+        CountingEmbedding.texts_embedded += 1
+        return super()._get_text_embedding(text)
+
+
+WORDS = ("budget", "meeting", "launch", "invoice", "design", "review", "travel", "hiring", "roadmap", "contract",
+         "feedback", "schedule", "report", "client", "deadline", "priority", "workshop", "release", "pricing", "survey")
+
+
+def sent_reply(i):
+    # Distinct replies: near-duplicates are collapsed before indexing
+    words = random.Random(i).sample(WORDS, 8)
+    return f"About the {words[0]} and {words[1]}: let's sync on {words[2]}, {words[3]} and {words[4]} before the {words[5]} {words[6]} {words[7]}."
+
+
+def sent_mailbox(count, start=0, internal_date=None):
+    now_ms = int(time.time() * 1000)
+    return [
+        make_message(f"s{i}", subject=f"Re: {i}", body=sent_reply(i), labels=("SENT",), html_size=0, extra_headers=0,
+                     internal_date=internal_date or now_ms - (count - i) * 60000)
+        for i in range(start, start + count)
+    ]
+
+
+class TestSentEmailPagination(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeGmail(sent_mailbox(250))
+        self.processor = make_gmail_service(self.fake, service_class=SentEmailProcessor)
+
+    def test_pages_are_followed(self):
+        """Test every page is fetched instead of only the first one."""
+        pages = list(self.processor.iter_sent_email_pages(page_size=100))
+        self.assertEqual([len(emails) for emails, _ in pages], [100, 100, 50])
+        self.assertIsNone(pages[-1][1])
+        self.assertEqual(len(self.processor.get_sent_emails()), 250)
+
+    def test_max_results_stops_early(self):
+        """Test max_results limits both the result and the pages fetched."""
+        self.assertEqual(len(self.processor.get_sent_emails(max_results=30)), 30)
+        list_requests = [uri for _, uri in self.fake.requests if "/messages?" in uri]
+        self.assertEqual(len(list_requests), 1)
+
+
+class TestStreamingIndexBuild(unittest.TestCase):
+    def setUp(self):
+        mailbox = sent_mailbox(45)
+        # A short reply and a duplicate reply are not indexed
+        mailbox.append(make_message("short", body="Thanks!", labels=("SENT",), html_size=0))
+        mailbox.append(make_message("dupe", body=sent_reply(0), labels=("SENT",), html_size=0))
+        self.fake = FakeGmail(mailbox)
+        self.db = FakeFirestore()
+        self.db.collection("users").document("user1").set({"email": "me@example.com"})
+        self.processor = make_gmail_service(self.fake, service_class=SentEmailProcessor, db=self.db)
+        self.embed_model = MockEmbedding(embed_dim=8)
+
+    def test_index_contains_each_reply_once(self):
+        """Test short and duplicate replies are skipped and the build is marked complete."""
+        index = self.processor.build_vector_store_index(page_size=10, embed_model=self.embed_model)
+
+        self.assertEqual(set(index.ref_doc_info), {f"s{i}" for i in range(45)})
+        checkpoint = self.db.collection("style_index_builds").document("user1").get().to_dict()
+        self.assertEqual(checkpoint["status"], "complete")
+        self.assertEqual(checkpoint["processed"], 47)
+
+    def test_near_duplicate_replies_are_collapsed(self):
+        """Test templated replies are not embedded and the savings are reported."""
+        template = "Hi {}, thanks for your order. It ships within two business days and you will receive a tracking link by email."
+        for i, name in enumerate(["Alice", "Bob", "Carol", "Dave"]):
+            self.fake.add_message(make_message(f"t{i}", body=template.format(name), labels=("SENT",), html_size=0))
+
+        index = self.processor.build_vector_store_index(page_size=10, embed_model=self.embed_model)
+
+        self.assertEqual(len([doc_id for doc_id in index.ref_doc_info if doc_id.startswith("t")]), 1)
+        checkpoint = self.db.collection("style_index_builds").document("user1").get().to_dict()
+        self.assertEqual(checkpoint["collapsed_replies"], 4)
+        self.assertGreater(checkpoint["embedding_tokens_saved"], 60)
+
+    def test_interrupted_build_resumes_from_checkpoint(self):
+        """Test a build that fails part-way resumes after the last checkpointed page."""
+        list_calls = []
+
+        def fail_on_fourth_page(method, uri):
+            if "/messages?" in uri:
+                list_calls.append(uri)
+                if len(list_calls) == 4:
+                    return 400, {"error": {"code": 400, "message": "Bad Request", "errors": [{"reason": "badRequest"}]}}
+            return None
+
+        self.fake.fail = fail_on_fourth_page
+        self.assertIsNone(self.processor.build_vector_store_index(page_size=10, checkpoint_every=2, embed_model=self.embed_model))
+        checkpoint = self.db.collection("style_index_builds").document("user1").get().to_dict()
+        self.assertEqual(checkpoint, {**checkpoint, "status": "in_progress", "page_token": "20", "processed": 20})
+
+        self.fake.fail = None
+        self.fake.requests.clear()
+        index = self.processor.build_vector_store_index(page_size=10, checkpoint_every=2, embed_model=self.embed_model)
+
+        self.assertEqual(len(index.ref_doc_info), 45)
+        fetched = [uri for _, uri in self.fake.requests if "/messages/" in uri]
+        self.assertEqual(len(fetched), 27)
+
+class TestIncrementalIndexUpdate(unittest.TestCase):
+    def setUp(self):
+        self.two_years_ago = int((time.time() - 2 * 365 * 24 * 3600) * 1000)
+        self.fake = FakeGmail(sent_mailbox(30) + sent_mailbox(1, start=99, internal_date=self.two_years_ago))
+        self.db = FakeFirestore()
+        self.db.collection("users").document("user1").set({"email": "me@example.com"})
+        self.processor = make_gmail_service(self.fake, service_class=SentEmailProcessor, db=self.db)
+        CountingEmbedding.texts_embedded = 0
+        self.index, added = self.processor.update_vector_store_index(page_size=10, embed_model=CountingEmbedding(embed_dim=8))
+        self.assertEqual(added, 31)
+
+    def _new_sent_email(self, i):
+        self.fake.add_message(sent_mailbox(1, start=i, internal_date=int(time.time() * 1000) + i)[0])
+
+    def test_update_embeds_only_new_replies(self):
+        """Test an update fetches and embeds only replies sent since the last build."""
+        for i in range(100, 103):
+            self._new_sent_email(i)
+        CountingEmbedding.texts_embedded = 0
+        self.fake.requests.clear()
+
+        index, added = self.processor.update_vector_store_index(page_size=10)
+
+        self.assertEqual(added, 3)
+        self.assertEqual(CountingEmbedding.texts_embedded, 3)
+        self.assertEqual(len([uri for _, uri in self.fake.requests if "/messages/" in uri]), 3)
+        self.assertEqual(len(index.ref_doc_info), 34)
+        self.assertEqual(len(self.processor.load_index_from_firestore().ref_doc_info), 34)
+
+    def test_update_without_new_mail_does_nothing(self):
+        """Test an update with no new sent mail embeds nothing and keeps the saved index."""
+        CountingEmbedding.texts_embedded = 0
+        _, added = self.processor.update_vector_store_index(page_size=10)
+        self.assertEqual(added, 0)
+        self.assertEqual(CountingEmbedding.texts_embedded, 0)
+
+    def test_compaction_drops_expired_replies_without_reembedding(self):
+        """Test compaction removes replies outside the one-year window and reuses stored embeddings."""
+        self._new_sent_email(100)
+        CountingEmbedding.texts_embedded = 0
+
+        index, added = self.processor.update_vector_store_index(page_size=10, compact_every=1)
+
+        self.assertEqual(added, 1)
+        self.assertEqual(CountingEmbedding.texts_embedded, 1)
+        self.assertNotIn("s99", index.ref_doc_info)
+        self.assertEqual(len(index.ref_doc_info), 31)
+        self.assertEqual(len(index.as_retriever(similarity_top_k=3).retrieve("follow up")), 3)
+        state = self.db.collection("style_index_builds").document("user1").get().to_dict()
+        self.assertEqual(state["updates_since_compaction"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from services.token_store import (
+    RESET_PASSWORD, VERIFY_EMAIL, ExpiredToken, InvalidToken, TokenStore, hash_token, migrate_user_tokens
+)
+from tests.fakes.fake_firestore import FakeDocumentReference, FakeFirestore
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenStore(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeFirestore()
+        self.clock = Clock()
+        self.store = TokenStore(self.db, clock=self.clock)
+
+    def test_tokens_are_stored_by_hash_and_used_once(self):
+        """Test a token is found by its hash, never stored in clear, and works once."""
+        token = self.store.issue("user1", VERIFY_EMAIL)
+        self.assertIn(f"tokens/{hash_token(token)}", self.db.docs)
+        self.assertNotIn(token, str(self.db.docs))
+
+        reads = self.db.reads
+        self.assertEqual(self.store.consume(token, VERIFY_EMAIL), "user1")
+        self.assertEqual(self.db.reads - reads, 1)
+        with self.assertRaises(InvalidToken):
+            self.store.consume(token, VERIFY_EMAIL)
+
+    def test_purpose_must_match(self):
+        """Test a verification token cannot reset a password."""
+        token = self.store.issue("user1", VERIFY_EMAIL)
+        with self.assertRaises(InvalidToken):
+            self.store.consume(token, RESET_PASSWORD)
+        self.assertEqual(self.store.consume(token, VERIFY_EMAIL), "user1")
+
+    def test_expired_tokens_are_rejected_and_purged(self):
+        """Test expiry is enforced on use and expired tokens are deleted."""
+        expired = self.store.issue("user1", VERIFY_EMAIL)
+        self.store.issue("user2", RESET_PASSWORD)
+        self.clock.now += timedelta(minutes=11)
+        with self.assertRaises(ExpiredToken):
+            self.store.consume(expired, VERIFY_EMAIL)
+        self.assertNotIn(f"tokens/{hash_token(expired)}", self.db.docs)
+
+        self.store.issue("user1", VERIFY_EMAIL)
+        self.clock.now += timedelta(minutes=50)
+        self.assertEqual(self.store.purge_expired(), 2)
+        self.assertEqual(self.store.purge_expired(), 0)
+
+    def test_concurrent_requests_use_a_token_once(self):
+        """Test only one of several concurrent requests with the same link gets the user."""
+        token = self.store.issue("user1", RESET_PASSWORD)
+        read = FakeDocumentReference.get
+
+        def slow_read(reference, *args, **kwargs):
+            # Widen the window between reading and deleting the token
+            snapshot = read(reference, *args, **kwargs)
+            time.sleep(0.01)
+            return snapshot
+
+        def consume(_):
+            try:
+                return self.store.consume(token, RESET_PASSWORD)
+            except InvalidToken:
+                return None
+
+        with patch.object(FakeDocumentReference, "get", slow_read), ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(consume, range(8)))
+        self.assertEqual(results.count("user1"), 1)
+        self.assertNotIn(f"tokens/{hash_token(token)}", self.db.docs)
+
+    def test_reissuing_revokes_earlier_tokens(self):
+        """Test only the newest token of a user and purpose is valid."""
+        first = self.store.issue("user1", RESET_PASSWORD)
+        other = self.store.issue("user1", VERIFY_EMAIL)
+        second = self.store.issue("user1", RESET_PASSWORD)
+        with self.assertRaises(InvalidToken):
+            self.store.consume(first, RESET_PASSWORD)
+        self.assertEqual(self.store.consume(second, RESET_PASSWORD), "user1")
+        self.assertEqual(self.store.consume(other, VERIFY_EMAIL), "user1")
+
+    def test_migrating_user_tokens(self):
+        """Test tokens on user documents move to the store and leave the users."""
+        self.db.docs["users/u1"] = {
+            "email": "a@x.com", "verification_token": "old-verify",
+            "token_expiry": datetime(2026, 10, 19, 12, 5)
+        }
+        self.db.docs["users/u2"] = {"email": "b@x.com", "reset_password_token": "old-reset"}
+        self.db.docs["users/u3"] = {"email": "c@x.com", "verification_token": None, "token_expiry": None}
+
+        self.assertEqual(migrate_user_tokens(self.db, self.store), 2)
+        self.assertEqual(self.db.docs["users/u1"], {"email": "a@x.com"})
+        self.assertEqual(self.db.docs["users/u2"], {"email": "b@x.com"})
+        self.assertEqual(self.store.consume("old-reset", RESET_PASSWORD), "u2")
+        self.clock.now += timedelta(minutes=6)
+        with self.assertRaises(ExpiredToken):
+            self.store.consume("old-verify", VERIFY_EMAIL)
+
+
+if __name__ == '__main__':
+    unittest.main()
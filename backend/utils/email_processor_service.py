@@ -1,10 +1,14 @@
 import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from concurrent.futures import ThreadPoolExecutor
-from utils.gmail_service import GmailService, Draft
+from utils.gmail_service import GmailService, Draft, FETCH_PROFILE_METADATA
 from utils.openai_service import OpenAIService, SentEmailProcessor
 from config.settings import settings
+from services.openai_scheduler import Priority
+from services.openai_batch import OpenAIBatchJob, TERMINAL_STATUSES
+from services.monitoring import monitoring_service
 from utils.firestore_client import get_firestore_client
+from google.cloud import firestore
 
 from bs4 import BeautifulSoup
 import re
@@ -16,12 +20,26 @@ import joblib
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Gmail's own promotions category; these are skipped before their bodies are downloaded
+PROMOTIONS_LABEL = 'CATEGORY_PROMOTIONS'
+
 class EmailProcessor:
-    def __init__(self):
+    def __init__(self, batch_mode=False, batch_poll_interval=60, batch_poll_timeout=25 * 60, refresh_style_index=False):
         self.db = get_firestore_client()
         self.users_ref = self.db.collection("users")
+        self.batches_ref = self.db.collection("draft_batches")
         self.executor = ThreadPoolExecutor(max_workers=10)  # Adjust the number of workers as needed
 
+        # In batch mode draft prompts are collected during the run and sent as one OpenAI Batch API job
+        self.batch_mode = batch_mode
+        self.batch_poll_interval = batch_poll_interval
+        self.batch_poll_timeout = batch_poll_timeout
+        self.batch_job = None
+        self.batch_entries = []
+
+        # Append replies sent since the last run to each user's style index before drafting
+        self.refresh_style_index = refresh_style_index
+
         model_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models', 'notaic_email_classifier.joblib')
         if os.path.exists(model_path):
             self.promotional_model = joblib.load(model_path)
@@ -50,7 +68,7 @@ class EmailProcessor:
             print(f"User {user_data.get('email')} not connected to Gmail. Skipping.")
             return
 
-        gmail_service = GmailService(user_data)
+        gmail_service = GmailService(user_data, priority=Priority.BACKGROUND)
 
         cleaned_email_content = await self._clean_email_body(email['body'])
 
@@ -63,20 +81,35 @@ class EmailProcessor:
             return
 
         # Initialize SentEmailProcessor and load index
-        sent_email_processor = SentEmailProcessor(user_data)
-        vector_store_index = sent_email_processor.load_index_from_firestore()
+        sent_email_processor = SentEmailProcessor(user_data, priority=Priority.BACKGROUND)
+        vector_store_index = sent_email_processor.load_index_from_firestore(shared=True)
 
         if not vector_store_index:
             print(f"No vector store index found for user {user_data.get('email')}. Skipping.")
             return
 
         # Initialize OpenAIService with the loaded index
-        openai_service = OpenAIService(vector_store_index)
+        openai_service = OpenAIService.for_user(vector_store_index, user_data, priority=Priority.BACKGROUND)
 
         name = user_data.get('full_name', 'None')
         length = user_data.get('questions', {}).get('averageLength', 'Short')
         stop_words = str(user_data.get('questions', {}).get('selectedWords', []))
         writing_style = user_data.get('settings', {}).get('writing_style', 'Professional')
+
+        if self.batch_mode:
+            # Only build the prompt now; the draft is created once the batch completes
+            request = await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                openai_service.build_generation_request,
+                name,
+                cleaned_email_content,
+                length,
+                stop_words,
+                writing_style
+            )
+            if request:
+                self.add_to_batch(user_id, email, request)
+            return
         
         # Run the OpenAI generation in the executor
         response = await asyncio.get_running_loop().run_in_executor(
@@ -89,6 +122,13 @@ class EmailProcessor:
             writing_style
         )
 
+        self.save_draft_reply(gmail_service, user_id, user_data, email, response)
+
+    def save_draft_reply(self, gmail_service, user_id, user_data, email, response):
+        """Create the Gmail draft reply for a generated response and store it in Firestore."""
+        if not response:
+            return
+
         # Create a draft reply
         draft_id, draft_link, compose_id = gmail_service.create_draft_reply(
             user_id='me',
@@ -120,6 +160,120 @@ class EmailProcessor:
             if stored_draft_id:
                 print(f"Draft stored with ID: {stored_draft_id}")
 
+    def add_to_batch(self, user_id, email, request):
+        """Queue a draft generation request for the OpenAI batch of this run."""
+        if self.batch_job is None:
+            self.batch_job = OpenAIBatchJob()
+        custom_id = f"{user_id}:{email['id']}"
+        self.batch_job.add(custom_id, request)
+        self.batch_entries.append({"custom_id": custom_id, "user_id": user_id, "email": email})
+
+    def submit_batch(self):
+        """
+        Submit the batch collected during this run.
+        The entries are persisted so a later run can finish the batch if it outlives this one.
+        """
+        if not self.batch_job or not len(self.batch_job):
+            return None
+
+        batch_id = self.batch_job.submit(metadata={"source": "email_processor"})
+        batch_ref = self.batches_ref.document(batch_id)
+        batch_ref.set({
+            "status": "submitted",
+            "request_count": len(self.batch_entries),
+            "created_at": firestore.SERVER_TIMESTAMP
+        })
+        for entry in self.batch_entries:
+            batch_ref.collection("entries").document(entry["custom_id"]).set(entry)
+
+        print(f"Submitted OpenAI batch {batch_id} with {len(self.batch_entries)} draft requests")
+        self.batch_job = None
+        self.batch_entries = []
+        return batch_id
+
+    def collect_batch(self, batch_id, wait=False):
+        """
+        Create drafts for a submitted batch once it has finished.
+
+        Returns:
+            bool: True if the batch reached a terminal status and was handled
+        """
+        job = OpenAIBatchJob(batch_id=batch_id)
+        if wait:
+            batch = job.wait(poll_interval=self.batch_poll_interval, timeout=self.batch_poll_timeout)
+        else:
+            batch = job.retrieve()
+
+        if batch.status not in TERMINAL_STATUSES:
+            return False
+
+        batch_ref = self.batches_ref.document(batch_id)
+        if batch.status != "completed":
+            logger.error(f"OpenAI batch {batch_id} ended with status {batch.status}; its drafts were not created")
+            batch_ref.update({"status": batch.status})
+            return True
+
+        results = job.results(batch)
+        gmail_services = {}
+        created = 0
+        for entry_doc in batch_ref.collection("entries").stream():
+            entry = entry_doc.to_dict()
+            result = results.get(entry["custom_id"], {})
+            if "response" not in result:
+                logger.error(f"No result for {entry['custom_id']} in batch {batch_id}: {result.get('error')}")
+                continue
+
+            user_id = entry["user_id"]
+            if user_id not in gmail_services:
+                user_data = self.users_ref.document(user_id).get().to_dict()
+                if not user_data or 'google_refresh_token' not in user_data:
+                    gmail_services[user_id] = None
+                else:
+                    user_data['id'] = user_id
+                    gmail_services[user_id] = (GmailService(user_data, priority=Priority.BACKGROUND), user_data)
+            if not gmail_services[user_id]:
+                continue
+
+            gmail_service, user_data = gmail_services[user_id]
+            message = result["response"]["choices"][0]["message"]
+            response = OpenAIService.parse_generation_response(message)
+            self.save_draft_reply(gmail_service, user_id, user_data, entry["email"], response)
+            entry_doc.reference.delete()
+            created += 1
+
+        batch_ref.update({"status": "completed", "drafts_created": created})
+        print(f"Created {created} drafts from OpenAI batch {batch_id}")
+        return True
+
+    async def collect_pending_batches(self):
+        """Finish batches submitted by earlier runs that have completed since."""
+        pending = self.batches_ref.where("status", "==", "submitted").stream()
+        for batch_doc in pending:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.collect_batch, batch_doc.id)
+
+    def update_style_index(self, user_id, user_data):
+        """Incrementally update a user's style index with newly sent replies."""
+        sent_email_processor = SentEmailProcessor({**user_data, 'id': user_id}, priority=Priority.BACKGROUND)
+        _, added = sent_email_processor.update_vector_store_index()
+        print(f"Added {added} sent replies to the style index of user {user_data.get('email')}")
+
+    def drafting_candidates(self, gmail_service, emails):
+        """
+        Select the emails listed with the metadata profile that may get a draft, and load their bodies.
+
+        Gmail's promotions label, which the metadata listing carries, rules an email out before its
+        body is downloaded. Unlabelled emails still go through the promotional classifier in
+        generate_draft once their body is loaded.
+        """
+        candidates = []
+        for email in emails:
+            if PROMOTIONS_LABEL in email.get('labelIds', []):
+                print(f"Skipping draft creation for promotional email with subject: {email['subject']}")
+            else:
+                candidates.append(email)
+        gmail_service.load_email_bodies(candidates)
+        return candidates
+
     async def process_user_emails(self, user_id, limit=5):
         """Process unread emails for a single user asynchronously."""
         user_data = self.users_ref.document(user_id).get().to_dict()
@@ -127,9 +281,13 @@ class EmailProcessor:
             print(f"User {user_data.get('email')} not connected to Gmail. Skipping.")
             return
 
-        gmail_service = GmailService(user_data)
+        if self.refresh_style_index:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.update_style_index, user_id, user_data)
+
+        gmail_service = GmailService(user_data, priority=Priority.BACKGROUND)
+        # List with headers and labels only; bodies are fetched below for emails worth drafting
         unread_emails = await asyncio.get_running_loop().run_in_executor(
-            self.executor, gmail_service.get_unread_emails
+            self.executor, gmail_service.get_unread_emails, FETCH_PROFILE_METADATA, limit
         )
 
         if not unread_emails:
@@ -138,12 +296,18 @@ class EmailProcessor:
 
         print(f"Found {len(unread_emails)} unread emails for user {user_data.get('email')}")
 
+        unread_emails = unread_emails[:limit]
+        candidates = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.drafting_candidates, gmail_service, unread_emails
+        )
+        gmail_service.report_fetch_stats()
+
         # Process up to the specified limit of emails concurrently
-        tasks = [self.generate_draft(user_id, email) for email in unread_emails[:limit]]
+        tasks = [self.generate_draft(user_id, email) for email in candidates]
         await asyncio.gather(*tasks)
 
         # Mark all processed emails as read
-        for email in unread_emails[:limit]:
+        for email in unread_emails:
             await asyncio.get_running_loop().run_in_executor(
                 self.executor, gmail_service.mark_email_as_read, email['id']
             )
@@ -178,12 +342,30 @@ class EmailProcessor:
     async def run(self):
         """Main method to run the email processor for all users."""
         print("Starting the EmailProcessor service...")
+        monitoring_service.start_gmail_quota_run()
+        if self.batch_mode:
+            await self.collect_pending_batches()
+
         await self.process_all_users()
+
+        if self.batch_mode:
+            batch_id = self.submit_batch()
+            if batch_id:
+                # Wait for the batch within this run; if it takes longer the next run picks it up
+                await asyncio.get_running_loop().run_in_executor(
+                    self.executor, lambda: self.collect_batch(batch_id, wait=True)
+                )
+
+        quota = monitoring_service.finish_gmail_quota_run()
+        print(f"Gmail quota used this run: {quota['units']} units {quota['by_method']}")
         print("Email processing completed for all users.")
 
 def run_periodically():
     """Scheduler entry point for periodic execution."""
-    email_processor = EmailProcessor()
+    email_processor = EmailProcessor(
+        batch_mode=os.getenv("EMAIL_PROCESSOR_BATCH_MODE", "false").lower() == "true",
+        refresh_style_index=os.getenv("EMAIL_PROCESSOR_REFRESH_STYLE_INDEX", "false").lower() == "true"
+    )
     asyncio.run(email_processor.run())
 
 if __name__ == "__main__":
@@ -1,18 +1,11 @@
-import boto3
-from botocore.exceptions import ClientError
-import os
 from datetime import datetime, timezone
-from config.settings import settings
-import ipinfo
+from services.mail_queue import mail_queue
 
 class EmailService:
-    def __init__(self):
-        self.ses_client = boto3.client(
-            'ses',
-            region_name=settings.aws_region,
-            aws_access_key_id=settings.aws_access_key_id,
-            aws_secret_access_key=settings.aws_secret_access_key
-        )
+    def __init__(self, outbox=None):
+        # Messages are queued and sent by the mail queue's workers, so handlers never wait on SES;
+        # the methods return whether the message was accepted for delivery
+        self.outbox = outbox or mail_queue
 
     def reset_password_email(self, recipient_email, reset_password_link):
         SENDER = "support@notaic.com"
@@ -74,13 +67,7 @@ This reset password link was requested on {current_time}.<br>If you didn't make
             }
         }
 
-        try:
-            response = self.ses_client.send_email(**email_message)
-            print(f"Reset password email sent to {recipient_email}! Message ID:", response['MessageId'])
-            return True
-        except ClientError as e:
-            print(f"Error sending reset password email to {recipient_email}:", e.response['Error']['Message'])
-            return False
+        return self.outbox.enqueue(email_message, f"Reset password email to {recipient_email}")
             
     def send_verification_email(self, recipient_email, verification_link):
         SENDER = "support@notaic.com"
@@ -142,13 +129,7 @@ This sign-up link was requested on {current_time}.<br>If you didn't make this re
             }
         }
 
-        try:
-            response = self.ses_client.send_email(**email_message)
-            print(f"Verification email sent to {recipient_email}! Message ID:", response['MessageId'])
-            return True
-        except ClientError as e:
-            print(f"Error sending verification email to {recipient_email}:", e.response['Error']['Message'])
-            return False
+        return self.outbox.enqueue(email_message, f"Verification email to {recipient_email}")
 
     def send_waitlist_confirmation_email(self, recipient_email, referral_code, token):
         SENDER = "support@notaic.com"
@@ -180,13 +161,7 @@ This sign-up link was requested on {current_time}.<br>If you didn't make this re
             }
         }
 
-        try:
-            response = self.ses_client.send_email(**email_message)
-            print(f"Waitlist confirmation email sent to {recipient_email}! Message ID:", response['MessageId'])
-            return True
-        except ClientError as e:
-            print(f"Error sending waitlist confirmation email to {recipient_email}:", e.response['Error']['Message'])
-            return False
+        return self.outbox.enqueue(email_message, f"Waitlist confirmation email to {recipient_email}")
 
     def send_free_month_email(self, recipient_email, referral_code):
         SENDER = "support@notaic.com"
@@ -216,10 +191,4 @@ This sign-up link was requested on {current_time}.<br>If you didn't make this re
             }
         }
 
-        try:
-            response = self.ses_client.send_email(**email_message)
-            print(f"Free month email sent to {recipient_email}! Message ID:", response['MessageId'])
-            return True
-        except ClientError as e:
-            print(f"Error sending free month email to {recipient_email}:", e.response['Error']['Message'])
-            return False
+        return self.outbox.enqueue(email_message, f"Free month email to {recipient_email}")
@@ -3,7 +3,9 @@ from google.cloud import firestore
 from google.oauth2 import service_account
 import os
 
-def get_firestore_client():
+_async_client = None
+
+def load_credentials():
     # Get the path to the project root directory
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
     
@@ -15,7 +17,15 @@ def get_firestore_client():
         raise FileNotFoundError(f"The credentials file was not found at {credentials_path}")
 
     # Load the service account credentials
-    credentials = service_account.Credentials.from_service_account_file(credentials_path)
+    return service_account.Credentials.from_service_account_file(credentials_path)
 
+def get_firestore_client():
     # Initialize and return the Firestore client with the credentials
-    return firestore.Client(credentials=credentials)
\ No newline at end of file
+    return firestore.Client(credentials=load_credentials())
+
+def get_async_firestore_client():
+    # One async client per process: it keeps a gRPC channel open, so concurrent reads share it
+    global _async_client
+    if _async_client is None:
+        _async_client = firestore.AsyncClient(credentials=load_credentials())
+    return _async_client
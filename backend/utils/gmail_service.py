@@ -11,8 +11,32 @@ from email.mime.text import MIMEText
 from googleapiclient.errors import HttpError
 from pydantic import BaseModel
 from openai import OpenAI
+from services.openai_scheduler import openai_scheduler, Priority
+from services.gmail_quota import gmail_executor
+from services.monitoring import monitoring_service
+from services.draft_analytics import DraftAnalytics, DRAFT_FIELDS
+from services.draft_rollups import DraftRollups
+from services.response_cache import account_cache
 import re
 import json
+import time
+from collections import defaultdict
+
+# Fetch profiles for message reads:
+# - 'full': the whole message resource (attachments, every header and MIME part)
+# - 'partial': format='full' trimmed by a fields mask to the headers and text parts we parse
+# - 'metadata': Subject/From/To/Date headers and labels only; bodies are fetched later with load_email_body
+FETCH_PROFILE_FULL = 'full'
+FETCH_PROFILE_PARTIAL = 'partial'
+FETCH_PROFILE_METADATA = 'metadata'
+
+MESSAGE_HEADERS = ['Subject', 'From', 'To', 'Date']
+METADATA_FIELDS = 'id,threadId,labelIds,snippet,internalDate,payload/headers'
+PARTIAL_FIELDS = 'id,threadId,labelIds,internalDate,payload(headers(name,value),body/data,parts(mimeType,body/data))'
+BODY_FIELDS = 'id,payload(body/data,parts(mimeType,body/data))'
+
+# Gmail allows up to 500 messages per list page
+SENT_PAGE_SIZE = 100
 
 class Draft(BaseModel):
     user_id: str
@@ -33,9 +57,12 @@ class Draft(BaseModel):
     compose_id: str = None
 
 class GmailService:
-    def __init__(self, user_data):
+    def __init__(self, user_data, priority=Priority.INTERACTIVE):
         self.user_data = user_data
+        self.priority = priority
         self.db = get_firestore_client()
+        self.analytics = DraftAnalytics(self.db)
+        self.rollups = DraftRollups(self.db)
         self.creds = Credentials(
             token=user_data.get('google_access_token'),
             refresh_token=user_data.get('google_refresh_token'),
@@ -43,7 +70,8 @@ class GmailService:
             client_id=settings.google_client_id,
             client_secret=settings.google_client_secret
         )
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        # Retries are handled by the shared scheduler
+        self.client = OpenAI(api_key=settings.openai_api_key, max_retries=0)
 
         if self.creds and self.creds.expired and self.creds.refresh_token:
             self.creds.refresh(Request())
@@ -53,50 +81,132 @@ class GmailService:
             })
 
         self.service = build('gmail', 'v1', credentials=self.creds)
+        # Building a discovery resource is not free; reuse the messages collection for bulk reads
+        self._messages_api = self.service.users().messages()
+        self.fetch_stats = defaultdict(lambda: {'requests': 0, 'bytes': 0, 'parse_ms': 0.0})
+
+    def _execute(self, request, fetch_profile=None):
+        # All Gmail calls go through the shared executor for per-user throttling, retries and quota accounting
+        if fetch_profile:
+            self._measure(request, fetch_profile)
+        return gmail_executor.execute(request, user_id=self.user_data.get('id') or self.user_data.get('email'))
+
+    def _measure(self, request, fetch_profile):
+        # Record response bytes and JSON decode time; postproc only runs for successful responses
+        postproc = request.postproc
+
+        def measured(resp, content):
+            started = time.perf_counter()
+            result = postproc(resp, content)
+            stats = self.fetch_stats[fetch_profile]
+            stats['requests'] += 1
+            stats['bytes'] += len(content or b'')
+            stats['parse_ms'] += (time.perf_counter() - started) * 1000
+            return result
+
+        request.postproc = measured
+
+    def report_fetch_stats(self):
+        """Log and record the bytes transferred and parse time of message reads for this mailbox, then reset them"""
+        stats = {profile: dict(values) for profile, values in self.fetch_stats.items()}
+        for profile, values in stats.items():
+            print(f"Gmail fetch [{profile}] for {self.user_data.get('email')}: {values['requests']} requests, "
+                  f"{values['bytes']} bytes, {values['parse_ms']:.1f} ms parsing")
+            monitoring_service.track_gmail_fetch(profile, values['requests'], values['bytes'], values['parse_ms'])
+        self.fetch_stats.clear()
+        return stats
+
+    def _get_message(self, message_id, fetch_profile):
+        messages = self._messages_api
+        if fetch_profile == FETCH_PROFILE_METADATA:
+            request = messages.get(userId='me', id=message_id, format='metadata',
+                                   metadataHeaders=MESSAGE_HEADERS, fields=METADATA_FIELDS)
+        elif fetch_profile == FETCH_PROFILE_PARTIAL:
+            request = messages.get(userId='me', id=message_id, format='full', fields=PARTIAL_FIELDS)
+        else:
+            request = messages.get(userId='me', id=message_id, format='full')
+        return self._execute(request, fetch_profile=fetch_profile)
+
+    @staticmethod
+    def _header(msg, name, default):
+        return next((header['value'] for header in msg['payload'].get('headers', []) if header['name'].lower() == name), default)
+
+    @staticmethod
+    def _extract_body(payload):
+        body = ""
+        if 'parts' in payload:
+            for part in payload['parts']:
+                if part['mimeType'] == 'text/plain':
+                    body = base64.urlsafe_b64decode(part['body'].get('data', '')).decode()
+                    break
+        else:
+            body = base64.urlsafe_b64decode(payload.get('body', {}).get('data', '')).decode()
+        return body
+
+    def _timed(self, fetch_profile, parse, *args):
+        # Header/body extraction counts towards the parse time of the profile
+        started = time.perf_counter()
+        result = parse(*args)
+        self.fetch_stats[fetch_profile]['parse_ms'] += (time.perf_counter() - started) * 1000
+        return result
+
+    def load_email_body(self, email):
+        """Fetch the plain-text body of an email listed with the metadata profile (no-op if already loaded)"""
+        if 'body' not in email:
+            msg = self._execute(
+                self._messages_api.get(userId='me', id=email['id'], format='full', fields=BODY_FIELDS),
+                fetch_profile='body'
+            )
+            email['body'] = self._timed('body', self._extract_body, msg['payload'])
+        return email['body']
 
-    def get_unread_emails(self):
+    def load_email_bodies(self, emails):
+        # One at a time: the underlying HTTP client is not thread-safe
+        for email in emails:
+            self.load_email_body(email)
+        return emails
+
+    def get_unread_emails(self, fetch_profile=FETCH_PROFILE_PARTIAL, max_results=None):
         # Calculate the timestamp for 24 hours ago
         time_24_hours_ago = (datetime.utcnow() - timedelta(days=1)).strftime('%Y/%m/%d')
 
         query = f'is:unread after:{time_24_hours_ago}'
-        results = self.service.users().messages().list(userId='me', q=query).execute()
+        # Only the messages that will be processed are fetched
+        limit = {'maxResults': max_results} if max_results else {}
+        results = self._execute(self.service.users().messages().list(userId='me', q=query, **limit))
 
         messages = results.get('messages', [])
         unread_emails = []
         for message in messages:
-            msg = self.service.users().messages().get(userId='me', id=message['id'], format='full').execute()
-            subject = next((header['value'] for header in msg['payload']['headers'] if header['name'].lower() == 'subject'), 'No Subject')
-            sender = next((header['value'] for header in msg['payload']['headers'] if header['name'].lower() == 'from'), 'Unknown Sender')
-            
-            # Extract full body
-            body = ""
-            if 'parts' in msg['payload']:
-                for part in msg['payload']['parts']:
-                    if part['mimeType'] == 'text/plain':
-                        body = base64.urlsafe_b64decode(part['body'].get('data', '')).decode()
-                        break
-            else:
-                body = base64.urlsafe_b64decode(msg['payload']['body'].get('data', '')).decode()
-            
-            unread_emails.append({
-                'subject': subject,
-                'sender': sender,
-                'body': body,
-                'id': message['id'],
-                'threadId': message['threadId']
-            })
+            msg = self._get_message(message['id'], fetch_profile)
+            unread_emails.append(self._timed(fetch_profile, self._parse_unread_email, message, msg, fetch_profile))
 
         return unread_emails
 
+    def _parse_unread_email(self, message, msg, fetch_profile):
+        email = {
+            'subject': self._header(msg, 'subject', 'No Subject'),
+            'sender': self._header(msg, 'from', 'Unknown Sender'),
+            'id': message['id'],
+            'threadId': message['threadId'],
+            'labelIds': msg.get('labelIds', [])
+        }
+        # Metadata reads leave the body to load_email_body
+        if fetch_profile != FETCH_PROFILE_METADATA:
+            email['body'] = self._extract_body(msg['payload'])
+        else:
+            email['snippet'] = msg.get('snippet', '')
+        return email
+
     
     def create_draft(self, user_id, message_body):
         try:
-            draft = self.service.users().drafts().create(userId=user_id, body={'message': message_body}).execute()
+            draft = self._execute(self.service.users().drafts().create(userId=user_id, body={'message': message_body}))
             draft_id = draft['id']
             print(f'Draft id: {draft_id}')
             
             # Get the draft details to extract the compose ID
-            draft_details = self.service.users().drafts().get(userId=user_id, id=draft_id, format='full').execute()
+            draft_details = self._execute(self.service.users().drafts().get(userId=user_id, id=draft_id, format='full'))
             
             # Extract the compose ID from the draft details
             message = draft_details.get('message', {})
@@ -146,7 +256,9 @@ class GmailService:
         You must output the priority level as a number between 1 and 4. You must output a JSON object with the priority level.
         """
 
-        response = self.client.chat.completions.create(
+        response = openai_scheduler.chat_completion(
+            self.client,
+            priority=self.priority,
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -193,7 +305,9 @@ class GmailService:
         In addition, you need to output a very short tagline for the email in under five words. You must output a JSON object with the to-do item and the tagline.
         """
 
-        response = self.client.chat.completions.create(
+        response = openai_scheduler.chat_completion(
+            self.client,
+            priority=self.priority,
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": prompt},
@@ -254,14 +368,22 @@ class GmailService:
         # Create a new document with an auto-generated ID
         draft_ref = self.db.collection("drafts").document()
 
-        # Set the data in the new document
-        draft_ref.set(draft_dict)
+        # Write the draft, the user's draft statistics and daily count, and the remaining drafts count together
+        @firestore.transactional
+        def create(transaction):
+            # The statistics are read first: a transaction's reads must precede its writes
+            self.analytics.record_created(transaction, draft.user_id, draft_ref.id, draft_dict)
+            transaction.set(draft_ref, draft_dict)
+            self.rollups.record_created(transaction, draft.user_id, draft.date_created)
 
-        # Decrement the drafts count if not unlimited
-        if not self.user_data.get('unlimited_drafts', False):
-            self.db.collection("users").document(draft.user_id).update({
-                "drafts": firestore.Increment(-1)
-            })
+            # Decrement the drafts count if not unlimited
+            if not self.user_data.get('unlimited_drafts', False):
+                transaction.update(self.db.collection("users").document(draft.user_id), {
+                    "drafts": firestore.Increment(-1)
+                })
+
+        create(self.db.transaction())
+        account_cache.invalidate(draft.user_id)
 
         # Return the auto-generated document ID
         return draft_ref.id
@@ -269,7 +391,7 @@ class GmailService:
     def save_draft(self, database_id, gmail_id, to, subject=None, body=None):
         try:
             # Get the existing draft
-            draft = self.service.users().drafts().get(userId='me', id=gmail_id).execute()
+            draft = self._execute(self.service.users().drafts().get(userId='me', id=gmail_id))
 
             # Create a new message object
             message = MIMEText(body)
@@ -290,15 +412,14 @@ class GmailService:
             }
 
             # Update the draft
-            updated_draft = self.service.users().drafts().update(
+            updated_draft = self._execute(self.service.users().drafts().update(
                 userId='me', 
                 id=gmail_id, 
                 body=updated_draft_body
-            ).execute()
+            ))
 
             # Update the draft in Firestore
-            draft_ref = self.db.collection("drafts").document(database_id)
-            draft_ref.update({
+            self._update_draft_document(database_id, {
                 'recipient_email': to,
                 'draft_subject': subject,
                 'draft_body': body,
@@ -314,12 +435,11 @@ class GmailService:
     def send_draft(self, database_id: str, gmail_id: str):
         try:
             # Send the draft
-            sent_message = self.service.users().drafts().send(userId='me', body={'id': gmail_id}).execute()
+            sent_message = self._execute(self.service.users().drafts().send(userId='me', body={'id': gmail_id}))
             print(f"Draft with ID {gmail_id} sent successfully.")
 
             # Remove the draft from Firestore
-            draft_ref = self.db.collection("drafts").document(database_id)
-            draft_ref.delete()
+            self._remove_draft(database_id)
             print(f"Draft with database ID {database_id} removed from Firestore.")
 
             return sent_message
@@ -335,57 +455,112 @@ class GmailService:
         return None
 
     def update_draft(self, draft_id: str, updated_data: dict) -> bool:
-        draft_ref = self.db.collection("drafts").document(draft_id)
         updated_data['date_modified'] = firestore.SERVER_TIMESTAMP
-        draft_ref.update(updated_data)
+        self._update_draft_document(draft_id, updated_data)
         return True
 
+    def _update_draft_document(self, database_id: str, changes: dict):
+        # Read the draft and write it with the change to the user's draft statistics in one transaction,
+        # so concurrent edits of the same draft cannot both be counted against the same old version
+        draft_ref = self.db.collection("drafts").document(database_id)
+
+        @firestore.transactional
+        def update(transaction):
+            if any(field in changes for field in DRAFT_FIELDS):
+                before = draft_ref.get(field_paths=DRAFT_FIELDS, transaction=transaction).to_dict() or {}
+                self.analytics.record_updated(
+                    transaction, before.get('user_id', self.user_data['id']), database_id, before, {**before, **changes}
+                )
+            transaction.update(draft_ref, changes)
+
+        update(self.db.transaction())
+
     def delete_draft(self, draft_id: str) -> bool:
-        draft_ref = self.db.collection("drafts").document(draft_id)
-        draft_ref.delete()
+        self._remove_draft(draft_id)
         return True
 
-    def get_sent_emails(self, max_results=None):
-        # Calculate the timestamp for 1 year ago
+    def _remove_draft(self, database_id: str):
+        # Delete the draft and take it out of the user's draft statistics in one transaction,
+        # so a draft removed twice concurrently is only subtracted once
+        draft_ref = self.db.collection("drafts").document(database_id)
+
+        @firestore.transactional
+        def remove(transaction):
+            snapshot = draft_ref.get(field_paths=DRAFT_FIELDS, transaction=transaction)
+            user_id = self.user_data['id']
+            if snapshot.exists:
+                draft = snapshot.to_dict()
+                user_id = draft.get('user_id', user_id)
+                self.analytics.record_removed(transaction, user_id, database_id, draft)
+            transaction.delete(draft_ref)
+            return user_id
+
+        account_cache.invalidate(remove(self.db.transaction()))
+
+    @staticmethod
+    def sent_emails_query(after_ms=None):
+        # Sent emails of the last year, or since a Gmail internalDate (epoch milliseconds).
+        # The one second of overlap is harmless because callers skip IDs they already have.
+        if after_ms:
+            return f'in:sent after:{after_ms // 1000 - 1}'
         one_year_ago = (datetime.utcnow() - timedelta(days=365)).strftime('%Y/%m/%d')
+        return f'in:sent after:{one_year_ago}'
 
-        query = f'in:sent after:{one_year_ago}'
-        
-        # If max_results is not specified, we'll fetch all emails
-        if max_results:
-            results = self.service.users().messages().list(userId='me', q=query, maxResults=max_results).execute()
-        else:
-            results = self.service.users().messages().list(userId='me', q=query).execute()
-
-        messages = results.get('messages', [])
-        sent_emails = []
-
-        for message in messages:
-            msg = self.service.users().messages().get(userId='me', id=message['id'], format='full').execute()
-            subject = next((header['value'] for header in msg['payload']['headers'] if header['name'].lower() == 'subject'), 'No Subject')
-            recipient = next((header['value'] for header in msg['payload']['headers'] if header['name'].lower() == 'to'), 'Unknown Recipient')
-            date = next((header['value'] for header in msg['payload']['headers'] if header['name'].lower() == 'date'), 'Unknown Date')
-            
-            # Extract full body
-            body = ""
-            if 'parts' in msg['payload']:
-                for part in msg['payload']['parts']:
-                    if part['mimeType'] == 'text/plain':
-                        body = base64.urlsafe_b64decode(part['body'].get('data', '')).decode()
-                        break
-            else:
-                body = base64.urlsafe_b64decode(msg['payload']['body'].get('data', '')).decode()
-            
-            sent_emails.append({
-                'id': message['id'],
-                'threadId': message['threadId'],
-                'subject': subject,
-                'recipient': recipient,
-                'date': date,
-                'body': body
-            })
+    def iter_sent_email_pages(self, page_size=SENT_PAGE_SIZE, page_token=None, query=None, fetch_profile=FETCH_PROFILE_PARTIAL,
+                              skip_ids=None):
+        """
+        Yield sent emails one page at a time as (emails, next_page_token).
 
-        return sent_emails
+        Only the current page is held in memory. Passing a page token from an earlier
+        run together with the same query resumes the listing from that page. Messages
+        whose IDs are in `skip_ids` are not fetched.
+        """
+        query = query or self.sent_emails_query()
+        while True:
+            results = self._execute(self._messages_api.list(
+                userId='me', q=query, maxResults=page_size, pageToken=page_token
+            ))
+
+            emails = []
+            for message in results.get('messages', []):
+                if skip_ids and message['id'] in skip_ids:
+                    continue
+                msg = self._get_message(message['id'], fetch_profile)
+                emails.append(self._timed(fetch_profile, self._parse_sent_email, message, msg, fetch_profile))
+
+            page_token = results.get('nextPageToken')
+            yield emails, page_token
+            if not page_token:
+                return
+
+    def iter_sent_emails(self, max_results=None, fetch_profile=FETCH_PROFILE_PARTIAL):
+        """Yield parsed sent emails across all pages, stopping after max_results if given"""
+        page_size = min(max_results, SENT_PAGE_SIZE) if max_results else SENT_PAGE_SIZE
+        count = 0
+        for emails, _ in self.iter_sent_email_pages(page_size=page_size, fetch_profile=fetch_profile):
+            for email in emails:
+                yield email
+                count += 1
+                if max_results and count >= max_results:
+                    return
+
+    def get_sent_emails(self, max_results=None, fetch_profile=FETCH_PROFILE_PARTIAL):
+        # Without max_results every page is fetched; prefer iter_sent_emails for large mailboxes
+        return list(self.iter_sent_emails(max_results=max_results, fetch_profile=fetch_profile))
+
+    def _parse_sent_email(self, message, msg, fetch_profile):
+        email = {
+            'id': message['id'],
+            'threadId': message['threadId'],
+            'subject': self._header(msg, 'subject', 'No Subject'),
+            'recipient': self._header(msg, 'to', 'Unknown Recipient'),
+            'date': self._header(msg, 'date', 'Unknown Date'),
+            # Milliseconds since the epoch, as assigned by Gmail
+            'internal_date': int(msg.get('internalDate', 0))
+        }
+        if fetch_profile != FETCH_PROFILE_METADATA:
+            email['body'] = self._extract_body(msg['payload'])
+        return email
 
     def can_create_draft(self):
         user_ref = self.db.collection("users").document(self.user_data['id'])
@@ -400,11 +575,11 @@ class GmailService:
 
     def mark_email_as_read(self, message_id):
         try:
-            self.service.users().messages().modify(
+            self._execute(self.service.users().messages().modify(
                 userId='me',
                 id=message_id,
                 body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            ))
             print(f"Marked email {message_id} as read.")
         except HttpError as error:
             print(f"An error occurred while marking email as read: {error}")
@@ -420,12 +595,12 @@ class GmailService:
                 message_id=message_id
             )
 
-            draft = self.service.users().drafts().create(userId=user_id, body={'message': message}).execute()
+            draft = self._execute(self.service.users().drafts().create(userId=user_id, body={'message': message}))
             draft_id = draft['id']
             print(f'Draft id: {draft_id}')
             
             # Get the draft details to extract the compose ID
-            draft_details = self.service.users().drafts().get(userId=user_id, id=draft_id, format='full').execute()
+            draft_details = self._execute(self.service.users().drafts().get(userId=user_id, id=draft_id, format='full'))
             
             # Extract the compose ID from the draft details
             message = draft_details.get('message', {})
@@ -1,14 +1,24 @@
 from openai import OpenAI
 from config.settings import settings
-from utils.gmail_service import GmailService
+from utils.gmail_service import GmailService, SENT_PAGE_SIZE
+from services.openai_scheduler import openai_scheduler, estimate_text_tokens, Priority
+from services.near_duplicates import NearDuplicateFilter, DEFAULT_JACCARD_THRESHOLD
+from services.blob_store import get_blob_store
+from services.hybrid_retriever import BM25Index, reciprocal_rank_fusion, HYBRID_CANDIDATE_MULTIPLIER
 import json
+import time
 import logging
+import weakref
+import threading
+from collections import OrderedDict
 
 import pandas
 from llama_index.core import Document, VectorStoreIndex
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI as LlamaOpenAI
 from llama_index.core.callbacks import CallbackManager
+from llama_index.core.ingestion import run_transformations
+from llama_index.core.schema import NodeWithScore
 from langchain.chat_models import ChatOpenAI
 
 import os
@@ -27,9 +37,69 @@ from firebase_admin import credentials, firestore
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Replies this short carry too little of the user's style to be worth indexing
+MIN_REPLY_LENGTH = 40
+# Incremental style index updates between compactions
+STYLE_INDEX_COMPACT_EVERY = int(os.getenv("STYLE_INDEX_COMPACT_EVERY", "20"))
+
+# How draft context is built from the style index: "retriever" returns the top-k past replies as-is,
+# "hybrid" does the same but fuses BM25 and vector rankings, "query_engine" has LlamaIndex synthesize
+# an answer from the replies (one extra LLM call per draft)
+CONTEXT_MODE_RETRIEVER = "retriever"
+CONTEXT_MODE_HYBRID = "hybrid"
+CONTEXT_MODE_QUERY_ENGINE = "query_engine"
+CONTEXT_MODE = os.getenv("CONTEXT_MODE", CONTEXT_MODE_HYBRID)
+CONTEXT_TOP_K = int(os.getenv("CONTEXT_TOP_K", "4"))
+
+# Users whose loaded style index is kept in memory for draft generation
+STYLE_INDEX_CACHE_SIZE = int(os.getenv("STYLE_INDEX_CACHE_SIZE", "32"))
+
+# Retrievers (per top-k) and BM25 indexes built per loaded index, shared by every OpenAIService using it;
+# entries live as long as the index, which _loaded_indexes keeps alive
+_retriever_cache = weakref.WeakKeyDictionary()
+
+
+class LoadedIndexCache:
+    """
+    Style indexes loaded from the blob store, keyed by user ID and blob hash (LRU).
+
+    A blob never changes under its content hash, so a hit is always current and a
+    re-saved index simply gets a new key. Indexes served from here are shared by
+    every draft of the user and must not be modified.
+    """
+
+    def __init__(self, max_entries=STYLE_INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, blob_hash):
+        with self._lock:
+            index = self._entries.get((user_id, blob_hash))
+            if index is not None:
+                self._entries.move_to_end((user_id, blob_hash))
+            return index
+
+    def put(self, user_id, blob_hash, index):
+        with self._lock:
+            # One entry per user: an older blob of the same user is not needed anymore
+            for key in [key for key in self._entries if key[0] == user_id and key[1] != blob_hash]:
+                del self._entries[key]
+            self._entries[(user_id, blob_hash)] = index
+            self._entries.move_to_end((user_id, blob_hash))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_loaded_indexes = LoadedIndexCache()
+
 class SentEmailProcessor(GmailService):
-    def __init__(self, user_data):
-        super().__init__(user_data)
+    def __init__(self, user_data, priority=Priority.INTERACTIVE):
+        super().__init__(user_data, priority=priority)
 
     def extract_reply(self, email_body):
         msg = email.message_from_string(email_body)
@@ -58,28 +128,243 @@ class SentEmailProcessor(GmailService):
         text = re.sub(r'\s+', ' ', text).strip()
         return text
 
+    def reply_record(self, email):
+        return {
+            'email_id': email['id'],
+            'thread_id': email['threadId'],
+            'subject': email['subject'],
+            'recipient': email['recipient'],
+            'date': email['date'],
+            'internal_date': email.get('internal_date', 0),
+            'reply_text': self.extract_reply(email['body'])
+        }
+
     def collect_sent_emails(self):
-        sent_emails = self.get_sent_emails()
-        
-        data = []
-        for email in sent_emails:
-            reply_text = self.extract_reply(email['body'])
-            data.append({
-                'email_id': email['id'],
-                'thread_id': email['threadId'],
-                'subject': email['subject'],
-                'recipient': email['recipient'],
-                'date': email['date'],
-                'reply_text': reply_text
-            })
+        data = [self.reply_record(email) for email in self.iter_sent_emails()]
         
         df = pd.DataFrame(data)
         return df
 
+    @staticmethod
+    def reply_document(record):
+        # The email metadata is kept for bookkeeping only; embeddings and prompts see just the reply text
+        metadata = {key: record[key] for key in ('email_id', 'thread_id', 'subject', 'date', 'internal_date')}
+        return Document(
+            text=record['reply_text'],
+            id_=record['email_id'],
+            metadata=metadata,
+            excluded_embed_metadata_keys=list(metadata),
+            excluded_llm_metadata_keys=list(metadata)
+        )
+
+    @staticmethod
+    def reply_filter(index=None, threshold=None):
+        """Create a near-duplicate filter seeded with the replies already in the index"""
+        reply_filter = NearDuplicateFilter(threshold=threshold or DEFAULT_JACCARD_THRESHOLD)
+        if index is not None:
+            for node in index.docstore.docs.values():
+                reply_filter.add(node.node_id, node.get_content())
+            reply_filter.reset_stats()
+        return reply_filter
+
+    def reply_documents(self, emails, reply_filter):
+        """Turn a page of sent emails into index documents, skipping short and near-duplicate replies"""
+        documents = []
+        for email in emails:
+            record = self.reply_record(email)
+            text = record['reply_text']
+            if not text or len(text) <= MIN_REPLY_LENGTH:
+                continue
+            if reply_filter.add(record['email_id'], text):
+                documents.append(self.reply_document(record))
+        return documents
+
+    def _log_dedup_stats(self, reply_filter):
+        stats = reply_filter.stats
+        logger.info(f"Collapsed {stats['collapsed']} near-duplicate sent replies for user {self.user_data['email']}, "
+                    f"saving ~{stats['tokens_saved']} embedding tokens")
+
+    def build_vector_store_index(self, page_size=SENT_PAGE_SIZE, checkpoint_every=10, resume=True, embed_model=None,
+                                 dedup_threshold=None):
+        """
+        Build the style index by streaming sent emails page by page.
+
+        Each page is parsed, filtered and embedded before the next one is fetched, so
+        memory stays flat regardless of mailbox size. Every `checkpoint_every` pages the
+        partial index is saved together with the Gmail page token; an interrupted build
+        resumes from the last checkpoint when `resume` is set. Replies whose Jaccard
+        similarity with an indexed reply reaches `dedup_threshold` are not embedded.
+
+        Returns:
+            VectorStoreIndex: The built index, or None if building failed
+        """
+        checkpoint_ref = self.db.collection("style_index_builds").document(self.user_data['id'])
+        try:
+            checkpoint_doc = checkpoint_ref.get()
+            checkpoint = checkpoint_doc.to_dict() if checkpoint_doc.exists else {}
+
+            index = None
+            page_token = None
+            query = None
+            processed = 0
+            last_indexed_at = 0
+            if resume and checkpoint.get('status') == 'in_progress' and checkpoint.get('page_token'):
+                index = self.load_index_from_firestore()
+                if index:
+                    page_token = checkpoint['page_token']
+                    query = checkpoint['query']
+                    processed = checkpoint.get('processed', 0)
+                    last_indexed_at = checkpoint.get('last_indexed_at', 0)
+                    logger.info(f"Resuming style index build for user {self.user_data['email']} after {processed} emails")
+
+            embed_model = embed_model or OpenAIEmbedding()
+            if index is None:
+                index = VectorStoreIndex(nodes=[], embed_model=embed_model, callback_manager=CallbackManager())
+            # Page tokens are only valid for the query that produced them
+            query = query or self.sent_emails_query()
+            reply_filter = self.reply_filter(index, dedup_threshold)
+            collapsed = checkpoint.get('collapsed_replies', 0) if page_token else 0
+            tokens_saved = checkpoint.get('embedding_tokens_saved', 0) if page_token else 0
+
+            pages = 0
+            for emails, next_page_token in self.iter_sent_email_pages(page_size=page_size, page_token=page_token, query=query):
+                documents = self.reply_documents(emails, reply_filter)
+                if documents:
+                    index.insert_nodes(run_transformations(documents, Settings.transformations))
+                processed += len(emails)
+                last_indexed_at = max([last_indexed_at] + [email['internal_date'] for email in emails])
+                pages += 1
+
+                if next_page_token and pages % checkpoint_every == 0:
+                    self.save_index_to_firestore(index)
+                    checkpoint_ref.set({
+                        'status': 'in_progress',
+                        'page_token': next_page_token,
+                        'query': query,
+                        'processed': processed,
+                        'last_indexed_at': last_indexed_at,
+                        'collapsed_replies': collapsed + reply_filter.stats['collapsed'],
+                        'embedding_tokens_saved': tokens_saved + reply_filter.stats['tokens_saved'],
+                        'updated_at': firestore.SERVER_TIMESTAMP
+                    })
+
+            checkpoint_ref.set({
+                'status': 'complete',
+                'page_token': None,
+                'query': query,
+                'processed': processed,
+                'last_indexed_at': last_indexed_at,
+                'updates_since_compaction': 0,
+                'collapsed_replies': collapsed + reply_filter.stats['collapsed'],
+                'embedding_tokens_saved': tokens_saved + reply_filter.stats['tokens_saved'],
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
+            self.report_fetch_stats()
+            self._log_dedup_stats(reply_filter)
+
+            Settings.llm = LlamaOpenAI(temperature=0, model_name="gpt-4o")
+            return index
+        except Exception as e:
+            logger.error(f"Error building vector store index: {e}")
+            return None
+
+    def update_vector_store_index(self, page_size=SENT_PAGE_SIZE, compact_every=STYLE_INDEX_COMPACT_EVERY, embed_model=None,
+                                  dedup_threshold=None):
+        """
+        Bring the saved style index up to date with replies sent since it was last built.
+
+        Only sent emails newer than the last indexed one are fetched, and only replies
+        whose email_id is not in the index yet are embedded, so an update costs
+        O(new emails) rather than O(mailbox). Falls back to a full build when no complete
+        index exists, and compacts the index every `compact_every` updates.
+
+        Args:
+            page_size (int): Sent emails listed per Gmail page
+            compact_every (int): Number of incremental updates between compactions
+            embed_model: Embedding model for a full build (a loaded index keeps its own)
+            dedup_threshold (float, optional): Jaccard similarity at which replies count as near-duplicates
+
+        Returns:
+            Tuple[VectorStoreIndex, int]: The saved index (None on failure) and the number of replies added
+        """
+        state_ref = self.db.collection("style_index_builds").document(self.user_data['id'])
+        try:
+            state_doc = state_ref.get()
+            state = state_doc.to_dict() if state_doc.exists else {}
+
+            index = None
+            if state.get('status') == 'complete' and state.get('last_indexed_at'):
+                index = self.load_index_from_firestore()
+            if index is None:
+                index = self.build_vector_store_index(page_size=page_size, embed_model=embed_model, dedup_threshold=dedup_threshold)
+                if index:
+                    self.save_index_to_firestore(index)
+                return index, len(index.ref_doc_info) if index else 0
+
+            # Sent email IDs already embedded (documents are keyed by email_id)
+            indexed_ids = set(index.ref_doc_info)
+            reply_filter = self.reply_filter(index, dedup_threshold)
+            last_indexed_at = state['last_indexed_at']
+            query = self.sent_emails_query(after_ms=last_indexed_at)
+
+            added = 0
+            processed = 0
+            for emails, _ in self.iter_sent_email_pages(page_size=page_size, query=query, skip_ids=indexed_ids):
+                documents = self.reply_documents(emails, reply_filter)
+                if documents:
+                    index.insert_nodes(run_transformations(documents, Settings.transformations))
+                    added += len(documents)
+                processed += len(emails)
+                last_indexed_at = max([last_indexed_at] + [email['internal_date'] for email in emails])
+
+            updates = state.get('updates_since_compaction', 0) + 1
+            compacted = updates >= compact_every
+            if compacted:
+                index = self.compact_vector_store_index(index)
+                updates = 0
+
+            if added or compacted:
+                self.save_index_to_firestore(index)
+            state_ref.update({
+                'processed': firestore.Increment(processed),
+                'last_indexed_at': last_indexed_at,
+                'updates_since_compaction': updates,
+                'collapsed_replies': firestore.Increment(reply_filter.stats['collapsed']),
+                'embedding_tokens_saved': firestore.Increment(reply_filter.stats['tokens_saved']),
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
+            self.report_fetch_stats()
+            self._log_dedup_stats(reply_filter)
+            logger.info(f"Style index for user {self.user_data['email']} updated with {added} new replies")
+            return index, added
+        except Exception as e:
+            logger.error(f"Error updating vector store index: {e}")
+            return None, 0
+
+    def compact_vector_store_index(self, index):
+        """
+        Rebuild the index from its stored embeddings, dropping replies older than the
+        one-year window the style index covers. Nothing is re-embedded.
+        """
+        cutoff_ms = int((time.time() - 365 * 24 * 3600) * 1000)
+        nodes = []
+        for node in index.docstore.docs.values():
+            # Replies indexed before internal dates were recorded are kept
+            if node.metadata.get('internal_date') and node.metadata['internal_date'] < cutoff_ms:
+                continue
+            node.embedding = index.vector_store.get(node.node_id)
+            nodes.append(node)
+
+        logger.info(f"Compacted style index from {len(index.docstore.docs)} to {len(nodes)} nodes")
+        return VectorStoreIndex(nodes=nodes, embed_model=index._embed_model, callback_manager=CallbackManager())
+
     def create_vector_store_index(self, df):
         try:
-            df = df[df['reply_text'].str.len() > 40]
+            df = df[df['reply_text'].str.len() > MIN_REPLY_LENGTH]
             df = df.drop_duplicates(subset=['reply_text'], keep='first')
+            reply_filter = self.reply_filter()
+            df = df[[reply_filter.add(key, text) for key, text in zip(df.index, df['reply_text'])]]
+            self._log_dedup_stats(reply_filter)
             
             text_data = df['reply_text'].dropna().tolist()
             documents = [Document(text=text) for text in text_data]
@@ -102,34 +387,68 @@ class SentEmailProcessor(GmailService):
         try:
             # Serialize the index to a binary format
             serialized_index = pickle.dumps(index)
-        
-            # Update the user's document in Firestore with the serialized index
+
+            # Store the payload in the blob store and keep only its content hash on the user's document
+            blob_store = get_blob_store(self.db)
+            blob_hash = blob_store.put(serialized_index)
             user_ref = self.db.collection("users").document(self.user_data['id'])
-            user_ref.update({"vector_store_index": serialized_index})
-            logger.info(f"Index saved to Firestore for user {self.user_data['email']}")
+            previous = user_ref.get(field_paths=["vector_store_index_ref"])
+            previous_hash = (previous.to_dict() or {}).get("vector_store_index_ref") if previous.exists else None
+            user_ref.update({
+                "vector_store_index_ref": blob_hash,
+                "vector_store_index": firestore.DELETE_FIELD
+            })
+            if previous_hash and previous_hash != blob_hash:
+                blob_store.delete(previous_hash)
+            logger.info(f"Index saved to blob {blob_hash[:12]} for user {self.user_data['email']}")
         except Exception as e:
             logger.error(f"Error saving index to Firestore: {e}")
 
-    def load_index_from_firestore(self):
+    def load_index_from_firestore(self, shared=False):
+        """
+        Load the user's style index from the blob store.
+
+        With `shared`, the index is served from (and added to) the per-user cache of
+        loaded indexes, so drafts reuse one index and the retrievers built on it instead
+        of unpickling it for every email; the returned index must then not be modified.
+        Builds and updates, which insert nodes, load a private copy.
+        """
         try:
-            # Retrieve the user's document from Firestore
+            # Only read the blob reference so the user's document read stays small
             user_ref = self.db.collection("users").document(self.user_data['id'])
-            user_doc = user_ref.get()
-            
-            if user_doc.exists:
-                user_data = user_doc.to_dict()
-                serialized_index = user_data.get("vector_store_index")
-                
-                if serialized_index:
-                    # Deserialize the index from the binary format
-                    index = pickle.loads(serialized_index)
-                    logger.info(f"Index loaded from Firestore for user {self.user_data['email']}")
+            user_doc = user_ref.get(field_paths=["vector_store_index_ref"])
+
+            if not user_doc.exists:
+                logger.info(f"User document not found for {self.user_data['email']}")
+                return None
+
+            blob_hash = (user_doc.to_dict() or {}).get("vector_store_index_ref")
+            if shared and blob_hash:
+                index = _loaded_indexes.get(self.user_data['id'], blob_hash)
+                if index is not None:
                     return index
-                else:
-                    logger.info(f"No index found for user {self.user_data['email']}")
-                    return None
+            if blob_hash:
+                serialized_index = get_blob_store(self.db).get(blob_hash)
             else:
-                logger.info(f"User document not found for {self.user_data['email']}")
+                # Indexes saved before the blob store are still inline; move them out on first load
+                legacy_doc = user_ref.get(field_paths=["vector_store_index"])
+                serialized_index = (legacy_doc.to_dict() or {}).get("vector_store_index")
+                if serialized_index:
+                    blob_hash = get_blob_store(self.db).put(serialized_index)
+                    user_ref.update({
+                        "vector_store_index_ref": blob_hash,
+                        "vector_store_index": firestore.DELETE_FIELD
+                    })
+
+            if serialized_index:
+                # Deserialize the index from the binary format
+                index = pickle.loads(serialized_index)
+                if shared:
+                    _loaded_indexes.put(self.user_data['id'], blob_hash, index)
+                logger.info(f"Index loaded from Firestore for user {self.user_data['email']}")
+                return index
+            else:
+                logger.info(f"No index found for user {self.user_data['email']}")
                 return None
         except Exception as e:
             logger.error(f"Error loading index from Firestore: {e}")
@@ -137,9 +456,25 @@ class SentEmailProcessor(GmailService):
 
 
 class OpenAIService:
-    def __init__(self, vector_store_index):
-        self.client = OpenAI(api_key=settings.openai_api_key)
+    def __init__(self, vector_store_index, priority=Priority.INTERACTIVE, context_mode=None, similarity_top_k=None):
+        # Retries are handled by the shared scheduler
+        self.client = OpenAI(api_key=settings.openai_api_key, max_retries=0)
         self.vector_store_index = vector_store_index
+        self.priority = priority
+        self.context_mode = context_mode or CONTEXT_MODE
+        self.similarity_top_k = int(similarity_top_k or CONTEXT_TOP_K)
+        self._index_cache = None
+
+    @classmethod
+    def for_user(cls, vector_store_index, user_data, priority=Priority.INTERACTIVE):
+        """Create a service using the context settings stored on the user's document"""
+        user_settings = user_data.get('settings') or {}
+        return cls(
+            vector_store_index,
+            priority=priority,
+            context_mode=user_settings.get('context_mode'),
+            similarity_top_k=user_settings.get('context_top_k')
+        )
 
     def preprocess_email(self, email_content):
         """
@@ -165,18 +500,102 @@ class OpenAIService:
             # If it's not HTML, just clean up whitespace
             return ' '.join(email_content.split())
 
+    def _cache(self):
+        if self._index_cache is None:
+            try:
+                self._index_cache = _retriever_cache.setdefault(self.vector_store_index, {})
+            except TypeError:
+                # Index objects that cannot be weakly referenced only get a per-service cache
+                self._index_cache = {}
+        return self._index_cache
+
+    def get_retriever(self, similarity_top_k=None):
+        """Return the similarity retriever for the index, reusing one already built for it"""
+        similarity_top_k = similarity_top_k or self.similarity_top_k
+        cache = self._cache()
+        if similarity_top_k not in cache:
+            cache[similarity_top_k] = self.vector_store_index.as_retriever(similarity_top_k=similarity_top_k)
+        return cache[similarity_top_k]
+
+    def get_bm25_index(self):
+        """Return a BM25 index over the nodes of the style index, rebuilt when nodes were added or removed"""
+        nodes = self.vector_store_index.docstore.docs
+        cache = self._cache()
+        cached = cache.get("bm25")
+        if cached is None or cached[0] != len(nodes):
+            # Drafts for one user run concurrently on the shared index; only the first one builds
+            with cache.setdefault("bm25_lock", threading.Lock()):
+                cached = cache.get("bm25")
+                if cached is None or cached[0] != len(nodes):
+                    bm25 = BM25Index()
+                    for node_id, node in nodes.items():
+                        bm25.add(node_id, node.get_content())
+                    cache["bm25"] = cached = (len(nodes), bm25)
+        return cached[1]
+
+    def retrieve_hybrid(self, query):
+        """Retrieve the top-k replies by reciprocal rank fusion of vector and BM25 rankings"""
+        candidates = self.similarity_top_k * HYBRID_CANDIDATE_MULTIPLIER
+        dense = openai_scheduler.submit(
+            self.get_retriever(candidates).retrieve,
+            query,
+            priority=self.priority,
+            estimated_tokens=estimate_text_tokens(query)
+        )
+        lexical = self.get_bm25_index().search(query, candidates)
+        fused = reciprocal_rank_fusion([
+            [node.node.node_id for node in dense],
+            [node_id for node_id, _ in lexical]
+        ])[:self.similarity_top_k]
+
+        nodes = {node.node.node_id: node.node for node in dense}
+        docstore = self.vector_store_index.docstore
+        return [NodeWithScore(node=nodes.get(node_id) or docstore.get_node(node_id), score=score) for node_id, score in fused]
+
+    @staticmethod
+    def format_context(nodes):
+        """Join retrieved past replies into the context block of the generation prompt"""
+        replies = []
+        for node in nodes:
+            subject = (node.node.metadata or {}).get("subject")
+            text = node.node.get_content().strip()
+            replies.append(f"Subject: {subject}\n{text}" if subject else text)
+        return "\n\n---\n\n".join(replies)
+
     def retrieve_context(self, email_content):
         # Preprocess the email content before querying
         preprocessed_content = self.preprocess_email(email_content)
+
+        if self.context_mode == CONTEXT_MODE_RETRIEVER:
+            # Similarity search only: the query is embedded, no synthesis call is made
+            nodes = openai_scheduler.submit(
+                self.get_retriever().retrieve,
+                preprocessed_content,
+                priority=self.priority,
+                estimated_tokens=estimate_text_tokens(preprocessed_content)
+            )
+            return self.format_context(nodes)
+
+        if self.context_mode == CONTEXT_MODE_HYBRID:
+            return self.format_context(self.retrieve_hybrid(preprocessed_content))
         
         # Query the vector store index with the preprocessed email content
         query_engine = self.vector_store_index.as_query_engine()
-        response = query_engine.query(preprocessed_content)
+        response = openai_scheduler.submit(
+            query_engine.query,
+            preprocessed_content,
+            priority=self.priority,
+            estimated_tokens=estimate_text_tokens(preprocessed_content) * 2 + 1024
+        )
         
         # Extract the most relevant context
         return response.response
 
-    def generate_response(self, name, email_content, length, stop_words, writing_style):
+    def build_generation_request(self, name, email_content, length, stop_words, writing_style):
+        """
+        Build the chat completion arguments for a draft response, or None if no context could be retrieved.
+        Shared by the synchronous path and the Batch API path of the email processor.
+        """
         # Preprocess the email content
         preprocessed_content = self.preprocess_email(email_content)
         
@@ -185,7 +604,7 @@ class OpenAIService:
             context = self.retrieve_context(preprocessed_content)
         except TypeError as e:
             logger.error(f"Error retrieving context: {e}")
-            return ''
+            return None
         
         # Modify the prompt to include the preprocessed content and context
         prompt = f"""
@@ -218,7 +637,7 @@ class OpenAIService:
         Ensure the subject is concise and relevant, and the body is professional and addresses the content of the original email.
         """
 
-        response = self.client.chat.completions.create(
+        return dict(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant skilled in writing professional email responses."},
@@ -251,8 +670,19 @@ class OpenAIService:
             function_call={"name": "generate_email"}
         )
 
+    @staticmethod
+    def parse_generation_response(message):
+        """
+        Extract subject, body and topic from a generate_email function call.
+        Accepts either an SDK message object or a raw message dict (as found in Batch API output).
+        """
+        if isinstance(message, dict):
+            arguments = message["function_call"]["arguments"]
+        else:
+            arguments = message.function_call.arguments
+
         # Extract the function call from the response
-        function_call = json.loads(response.choices[0].message.function_call.arguments)
+        function_call = json.loads(arguments)
 
         subject = function_call.get("subject")
         body = function_call.get("body")
@@ -263,3 +693,11 @@ class OpenAIService:
             "body": body,
             "topic": topic
         }
+
+    def generate_response(self, name, email_content, length, stop_words, writing_style):
+        request = self.build_generation_request(name, email_content, length, stop_words, writing_style)
+        if request is None:
+            return ''
+
+        response = openai_scheduler.chat_completion(self.client, priority=self.priority, **request)
+        return self.parse_generation_response(response.choices[0].message)
@@ -3,6 +3,7 @@ from fastapi import HTTPException
 from google.cloud import firestore
 from datetime import datetime
 from utils.firestore_client import get_firestore_client
+from services.response_cache import account_cache
 from dotenv import load_dotenv
 import os
 
@@ -49,6 +50,7 @@ class StripeService:
         user_ref = self.db.collection("users").document(user_id)
         if user_ref.get().exists:
             user_ref.update({"is_pro": is_pro})
+            account_cache.invalidate(user_id)
         else:
             raise HTTPException(status_code=404, detail="User not found")
 
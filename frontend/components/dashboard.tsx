@@ -43,7 +43,8 @@ interface StatProps {
 interface Draft {
   id: string;
   draft_subject: string;
-  email_body: string;
+  // Only returned by /account/drafts/{database_id}; the listing leaves it out
+  email_body?: string;
   draft_body: string;
   database_id: string;
   gmail_id: string;
@@ -390,6 +391,8 @@ export function DashboardPage() {
   const [topRecipients, setTopRecipients] = useState<[string, number][]>([]);
   const [topTopics, setTopTopics] = useState<[string, number][]>([]);
   const [recentDrafts, setRecentDrafts] = useState<Draft[]>([]);
+  const [draftsCursor, setDraftsCursor] = useState<string | null>(null);
+  const [isLoadingMoreDrafts, setIsLoadingMoreDrafts] = useState(false);
   const [numberOfMessages, setNumberOfMessages] = useState(0);
   const [averageWords, setAverageWords] = useState(0);
   const [remainingDrafts, setRemainingDrafts] = useState(0);
@@ -406,7 +409,7 @@ export function DashboardPage() {
 
     return recentDrafts.filter(draft => 
       draft.draft_subject.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      draft.email_body.toLowerCase().includes(searchQuery.toLowerCase()) ||
+      (draft.email_body ?? '').toLowerCase().includes(searchQuery.toLowerCase()) ||
       draft.draft_body.toLowerCase().includes(searchQuery.toLowerCase())
     );
   }, [recentDrafts, searchQuery]);
@@ -488,55 +491,30 @@ export function DashboardPage() {
     const fetchDashboardData = async () => {
       const token = localStorage.getItem('token')
       try {
-        const [draftsResponse, recipientsResponse, topicsResponse, recentDraftsResponse, messagesResponse, averageWordsResponse, remainingDraftsResponse, subscriptionResponse, highPriorityEmailsResponse] = await Promise.all([
-          fetch('https://api.notaic.site/account/drafts/count', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-          fetch('https://api.notaic.site/account/emails/top-senders', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-          fetch('https://api.notaic.site/account/emails/common-topics', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-          fetch('https://api.notaic.site/account/drafts/recent', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-          fetch('https://api.notaic.site/account/messages/count', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-          fetch('https://api.notaic.site/account/drafts/average-words', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-          fetch('https://api.notaic.site/account/remaining-drafts', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-          fetch('https://api.notaic.site/account/subscription-status', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-          fetch('https://api.notaic.site/account/emails/high-priority', {
-            headers: { 'Authorization': `Bearer ${token}` }
-          }),
-        ]);
+        const fields = [
+          'drafts_count', 'top_senders', 'common_topics', 'recent_drafts', 'messages_sent',
+          'average_words', 'remaining_drafts', 'highest_priority', 'subscription_status'
+        ].join(',');
+        const response = await fetch(`https://api.notaic.site/account/dashboard?fields=${fields}`, {
+          headers: { 'Authorization': `Bearer ${token}` }
+        });
 
-        const draftsData = await draftsResponse.json();
-        const recipientsData = await recipientsResponse.json();
-        const topicsData = await topicsResponse.json();
-        const recentDraftsData = await recentDraftsResponse.json();
-        const messagesData = await messagesResponse.json();
-        const averageWordsData = await averageWordsResponse.json();
-        const remainingDraftsData = await remainingDraftsResponse.json();
-        const subscriptionData = await subscriptionResponse.json();
-        const highPriorityEmailsData = await highPriorityEmailsResponse.json();
+        if (!response.ok) {
+          throw new Error('Failed to fetch dashboard');
+        }
+
+        const dashboardData = await response.json();
 
-        setNumberOfDrafts(draftsData.drafts_count);
-        setTopRecipients(recipientsData.top_senders);
-        setTopTopics(topicsData.common_topics);
-        setRecentDrafts(recentDraftsData.recent_drafts);
-        setNumberOfMessages(messagesData.messages_sent);
-        setAverageWords(averageWordsData.average_words);
-        setRemainingDrafts(remainingDraftsData.remaining_drafts);
-        setHighPriorityEmails(highPriorityEmailsData.highest_priority);
-        setIsPro(subscriptionData.subscription_status);
+        setNumberOfDrafts(dashboardData.drafts_count);
+        setTopRecipients(dashboardData.top_senders);
+        setTopTopics(dashboardData.common_topics);
+        setRecentDrafts(dashboardData.recent_drafts);
+        setDraftsCursor(dashboardData.next_cursor ?? null);
+        setNumberOfMessages(dashboardData.messages_sent);
+        setAverageWords(dashboardData.average_words);
+        setRemainingDrafts(dashboardData.remaining_drafts);
+        setHighPriorityEmails(dashboardData.highest_priority);
+        setIsPro(dashboardData.subscription_status);
       } catch (error) {
         console.error('Error fetching dashboard data:', error);
       }
@@ -631,10 +609,42 @@ export function DashboardPage() {
     setShowSettingsDropdown(!showSettingsDropdown)
   }
 
-  const handleEditDraft = (draft: Draft) => {
+  const handleEditDraft = async (draft: Draft) => {
     setSubject(draft.draft_subject);
     setContent(draft.draft_body);
     setEditingDraft(draft);
+
+    if (draft.email_body !== undefined) return;
+    try {
+      const token = localStorage.getItem('token');
+      const response = await fetch(`https://api.notaic.site/account/drafts/${draft.database_id}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (!response.ok) throw new Error(`Failed to load draft: ${response.status}`);
+      const { draft: detail } = await response.json();
+      setEditingDraft((current) => current?.database_id === draft.database_id ? { ...current, email_body: detail.email_body } : current);
+      setRecentDrafts((drafts) => drafts.map((item) => item.database_id === draft.database_id ? { ...item, email_body: detail.email_body } : item));
+    } catch (error) {
+      console.error('Error loading draft:', error);
+    }
+  }
+
+  const handleLoadMoreDrafts = async () => {
+    if (!draftsCursor) return;
+    setIsLoadingMoreDrafts(true);
+    try {
+      const token = localStorage.getItem('token');
+      const response = await fetch(`https://api.notaic.site/account/drafts/recent?start_after=${encodeURIComponent(draftsCursor)}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      const data = await response.json();
+      setRecentDrafts((drafts) => [...drafts, ...data.recent_drafts]);
+      setDraftsCursor(data.next_cursor ?? null);
+    } catch (error) {
+      console.error('Error loading more drafts:', error);
+    } finally {
+      setIsLoadingMoreDrafts(false);
+    }
   }
 
   const handleGmailAuth = async () => {
@@ -920,6 +930,13 @@ export function DashboardPage() {
                     </AnimatePresence>
                   </tbody>
                 </table>
+                {draftsCursor && (
+                  <div className="flex justify-center py-4">
+                    <Button variant="outline" onClick={handleLoadMoreDrafts} disabled={isLoadingMoreDrafts}>
+                      {isLoadingMoreDrafts ? 'Loading...' : 'Load more'}
+                    </Button>
+                  </div>
+                )}
               </motion.div>
             )}
 
@@ -992,7 +1009,7 @@ export function DashboardPage() {
                         <p><strong>From:</strong> {editingDraft.recipient_email}</p>
                         <p><strong>Subject:</strong> {editingDraft.recipient_subject}</p>
                         <p className="mt-4">
-                          {editingDraft.email_body}
+                          {editingDraft.email_body ?? 'Loading...'}
                         </p>
                       </div>
                     </CardContent>